@@ -1,89 +1,78 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 import numpy as np
-import lasio
-from io import StringIO
+import asyncio
 import sys
 import os
 import json
 import glob
+import hashlib
+import collections
+import time
 from datetime import datetime
+from typing import Dict, List, Literal, Optional, Union
+from contextlib import asynccontextmanager
 import shutil
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import production_module
+from pipeline_engine import PipelineError
+from worker_pool import AnalysisWorkerPool, PoolSaturated, JobTimeout
+from result_cache import ResultCache, cache_key
+from response_codec import COLUMNAR_MEDIA_TYPE, wants_columnar, encode_columnar, encode_json
+from job_manager import JobManager, JobQueueFull, JOB_DONE, FINAL_STATES
+from las_pipeline import (
+    LAS_PIPELINE,
+    OUTPUT_VERSION,
+    parse_stage_selection,
+    run_las_pipeline,
+)
 
 # Añadir el path para importar los cores
 sys.path.append(os.path.join(os.getcwd(), 'geomind_saas'))
 from petro_core_web import (
-    PetrofisicaCore, 
     DataLoader, 
-    CurveNormalizer, 
-    ReservoirDetector, 
-    SimulationEngine,
-    DataQualityAuditor,
     LASExporter
 )
+from las_fast import LASStreamParser, LASFormatError
+from well_store import STORE_EXT, save_response, load_response, slice_response
+from curve_lod import LODNotFound, clear_pyramids, pyramid_exists, pyramid_stats, query_window
+from survey import SurveyError, analyze_survey
+from electrofacies import FaciesModelError, list_field_models, models_version
+from facies_training import train_and_relabel, relabel_wells
+from volumetrics import DISTRIBUTIONS, VARIABLES, VolumetricMonteCarlo, simulate_chunk
+from decline import B_MAX, MODELS as DECLINE_MODELS, fit_histories
 
 # Directorio para historial
 HISTORY_DIR = "processed_data"
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
-class NpEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super(NpEncoder, self).default(obj)
-
-# GeophysicsEngine está en app_saas.py, la reimplementamos aquí
-class GeophysicsEngine:
-    # ... (métodos estáticos) ...
-    pass # Ya están definidos abajo, no tocar si no es necesario limpieza
-
-# ... (rest of imports and class defs) ...
-
-# GeophysicsEngine está en app_saas.py, la reimplementamos aquí
-class GeophysicsEngine:
-    @staticmethod
-    def calcular_impedancia(rho, dt=None):
-        """Calcula Impedancia Acústica (AI = Rho * Vp)."""
-        if dt is not None:
-            vp = 1e6 / (dt + 1e-5)
-        else:
-            vp = (rho / 0.23) ** 4.0
-        ai = vp * rho
-        return ai, vp
-
-    @staticmethod
-    def coeficientes_reflexion(ai_values):
-        """Calcula RC = (Z2 - Z1) / (Z2 + Z1)"""
-        rc = np.zeros_like(ai_values)
-        rc[1:] = (ai_values[1:] - ai_values[:-1]) / (ai_values[1:] + ai_values[:-1] + 1e-9)
-        return rc
-
-    @staticmethod
-    def ricker_wavelet(freq, length=0.1, dt=0.002):
-        """Genera una Ondícula Ricker teórica."""
-        t = np.arange(-length/2, (length/2)+dt, dt)
-        y = (1.0 - 2.0*(np.pi**2)*(freq**2)*(t**2)) * np.exp(-(np.pi**2)*(freq**2)*(t**2))
-        return t.tolist(), y.tolist()
-
-    @staticmethod
-    def generar_sintetico(rc_series, wavelet):
-        """Convolución de Reflectividad * Ondícula."""
-        sintetico = np.convolve(rc_series, wavelet, mode='same')
-        max_abs = np.max(np.abs(sintetico))
-        if max_abs > 0:
-            sintetico = sintetico / max_abs
-        return sintetico
-
-
-app = FastAPI(title="DataTerra API", version="2.0")
+# Entrenamiento de facies de un campo: recorre todos sus pozos, más que un análisis
+FACIES_TRAIN_TIMEOUT = int(os.environ.get("DATATERRA_FACIES_TRAIN_TIMEOUT", 1800))
+
+# Ingesta streaming: archivos mayores a este tamaño se parsean por bloques
+STREAM_THRESHOLD_BYTES = int(float(os.environ.get("DATATERRA_STREAM_THRESHOLD_MB", 32)) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Caché de resultados por contenido (ver result_cache.py)
+RESULT_CACHE = ResultCache()
+
+# Pool de procesos para el análisis CPU-bound (ver worker_pool.py)
+ANALYSIS_POOL = AnalysisWorkerPool()
+
+# Trabajos asíncronos con progreso por etapa (ver job_manager.py)
+JOB_MANAGER = JobManager(ANALYSIS_POOL)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    JOB_MANAGER.shutdown()
+    ANALYSIS_POOL.shutdown()
+
+
+app = FastAPI(title="DataTerra API", version="2.0", lifespan=lifespan)
 
 # Configurar CORS para que React pueda hablar con este backend
 app.add_middleware(
@@ -96,634 +85,320 @@ app.add_middleware(
 
 @app.get("/health")
 async def health_check():
-    return {"status": "online", "engine": "DataTerra Petrofísica Core v2.0"}
-
-
-def safe_list(series):
-    """Convierte una serie a lista reemplazando NaN/Inf con 0."""
-    arr = np.array(series, dtype=float)
-    arr = np.where(np.isfinite(arr), arr, 0)
-    return arr.tolist()
-
-def sanitize_floats(obj):
-    """
-    Recursivamente reemplaza NaN/Inf con 0 (cero).
-    Esto evita que el frontend React crashee al intentar hacer .toFixed() en null.
-    """
-    if isinstance(obj, float):
-        if np.isnan(obj) or np.isinf(obj):
-            return 0.0
-        return obj
-    elif isinstance(obj, dict):
-        return {k: sanitize_floats(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_floats(v) for v in obj]
-    elif isinstance(obj, np.generic):
-        # Manejar escalares de numpy (np.float64, etc)
-        if np.issubdtype(type(obj), np.floating):
-            if np.isnan(obj) or np.isinf(obj):
-                return 0.0
-            return float(obj)
-        elif np.issubdtype(type(obj), np.integer):
-            return int(obj)
-    return obj
+    return {"status": "online", "engine": "DataTerra Petrofísica Core v2.0", "pool": ANALYSIS_POOL.stats()}
+
+
+def guardar_historial(response, filename):
+    """
+    Guarda la respuesta completa en processed_data/ (agrega saved_at/history_name).
+    Formato columnar .dtw (well_store.py): curvas como arreglos tipados mapeables.
+    """
+    try:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        clean_name = os.path.splitext(filename)[0]
+        sname = f"{clean_name}_{ts}{STORE_EXT}"
+        spath = os.path.join(HISTORY_DIR, sname)
+        
+        # Agregamos metadatos de guardado
+        response["saved_at"] = ts
+        response["history_name"] = sname
+        
+        save_response(spath, response)
+        print(f"Historial guardado: {spath}")
+    except Exception as ex:
+        print(f"Error guardando historial: {ex}")
+
+
+def _encode_response(response):
+    """Sanitiza NaN/Inf (por arreglo) y serializa a bytes JSON (ver response_codec.py)."""
+    return encode_json(response)
+
+
+async def _negotiated(request, data=None, payload=None, headers=None):
+    """
+    Respuesta según Accept: JSON (por defecto) o columnar binario
+    (application/vnd.dataterra.columnar, ver response_codec.py).
+    `payload` son los bytes JSON ya serializados (caché/trabajos); `data` el dict.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_columnar(request.headers.get("accept")):
+        if data is None:
+            data = await asyncio.to_thread(json.loads, payload)
+        body = await asyncio.to_thread(encode_columnar, data)
+        return Response(content=body, media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
+    if payload is None:
+        payload = await asyncio.to_thread(_encode_response, data)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+async def _ingest_upload(file, stream=None):
+    """
+    Lee el .LAS subido. Retorna (fuente, sha256): los bytes completos, o en modo
+    streaming un LAS ya parseado bloque a bloque a arreglos preasignados (el texto
+    nunca se acumula: pico ≈ 1x datos numéricos). `stream=None` decide por tamaño.
+    """
+    if stream is None:
+        stream = (file.size or 0) > STREAM_THRESHOLD_BYTES
+    if stream:
+        parser = LASStreamParser()
+        digest = hashlib.sha256()
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                await asyncio.to_thread(parser.feed, chunk)
+            las = await asyncio.to_thread(parser.finish)
+            return las, digest.digest()
+        except LASFormatError as e:
+            # Envuelto / LAS 3.0 / datos no numéricos: lectura completa para lasio
+            print(f"Streaming no aplicable ({e}); lectura completa")
+            await file.seek(0)
+    content = await file.read()
+    return content, hashlib.sha256(content).digest()
+
+
+def _upload_key(filename, targets, digest):
+    """
+    Clave de caché de /upload: contenido + parámetros + versión de la respuesta.
+    Si corre la etapa de facies, también la versión de los modelos de campo: tras
+    /facies/train las respuestas con las etiquetas anteriores dejan de coincidir.
+    """
+    params = {'filename': filename, 'stages': targets, 'output': OUTPUT_VERSION}
+    if 'electrofacies' in LAS_PIPELINE.resolve(targets):
+        params['facies'] = models_version()
+    return cache_key(None, params, digest=digest)
+
+
+def _lod_id(digest):
+    """Id de la pirámide LOD: depende sólo del contenido (y la versión del cálculo)."""
+    return cache_key(None, {'lod': True}, digest=digest)[:32]
+
+
+def _cached_upload(key, targets, digest):
+    """
+    Respuesta cacheada de /upload, salvo que referencie una pirámide LOD ya
+    desalojada por el tope de disco: entonces se recalcula (y se regenera).
+    """
+    cached, tier = RESULT_CACHE.get(key)
+    if cached is not None and 'lod' in LAS_PIPELINE.resolve(targets) and not pyramid_exists(_lod_id(digest)):
+        return None, None
+    return cached, tier
+
+
+def _pool_http_error(e):
+    """Traduce saturación/timeout del pool a 503/504 para el frontend."""
+    if isinstance(e, PoolSaturated):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    return HTTPException(status_code=504, detail=str(e))
+
+
+@app.get("/pipeline/stages")
+async def list_pipeline_stages():
+    """Describe el DAG de etapas del análisis (nombres, entradas, salidas)."""
+    return LAS_PIPELINE.describe()
 
 
 @app.post("/upload")
-async def upload_las(file: UploadFile = File(...)):
+async def upload_las(request: Request, file: UploadFile = File(...), stages: Optional[str] = None,
+                     stream: Optional[bool] = None):
     """
     Endpoint principal: Recibe un .LAS, ejecuta TODO el análisis petrofísico
     + geología + geofísica y retorna los datos listos para todos los módulos React.
+    `stages` (opcional, ej. "curves,kpis") limita el análisis a esas etapas y sus dependencias.
+    `stream` fuerza (true) o desactiva (false) la ingesta por bloques; por defecto
+    se activa con archivos mayores a DATATERRA_STREAM_THRESHOLD_MB.
+    Con `Accept: application/vnd.dataterra.columnar` las curvas vuelven en binario.
     """
     if not file.filename.lower().endswith('.las'):
         raise HTTPException(status_code=400, detail="Solo archivos .LAS son soportados")
     
+    targets = parse_stage_selection(stages)
     try:
-        content = await file.read()
-        string_data = content.decode("utf-8", errors="ignore")
-        las = lasio.read(StringIO(string_data))
-        df = las.df()
-        
-        # Resetear index para tener Depth como columna
-        df = df.reset_index()
-        
-        # =====================================================================
-        # PASO 1: NORMALIZAR CURVAS (Aliasing automático)
-        # =====================================================================
-        df, normalized = CurveNormalizer.normalize_dataframe(df)
-        
-        # Limpiar datos nulos (-999.25)
-        df.replace(-999.25, np.nan, inplace=True)
-        
-        # Identificar columna de profundidad
-        depth_col = next((c for c in df.columns if c.upper() in ['DEPT', 'DEPTH']), df.columns[0])
-        
-        # =================================================================
-        # PASO 1B: ESTANDARIZACIÓN DE UNIDADES
-        # =================================================================
-        unit_conversions = []
-        
-        # NPHI: si viene en % (>1), convertir a decimal v/v
-        if 'NPHI' in df.columns and df['NPHI'].median() > 1.0:
-            df['NPHI'] = df['NPHI'] / 100.0
-            unit_conversions.append({'curve': 'NPHI', 'from': '%', 'to': 'v/v', 'factor': '÷100'})
-        
-        # RHOB: validar rango (debe estar entre 1.5-3.0 g/cm³)
-        if 'RHOB' in df.columns:
-            rhob_med = df['RHOB'].median()
-            if rhob_med > 100:  # Probablemente en kg/m³
-                df['RHOB'] = df['RHOB'] / 1000.0
-                unit_conversions.append({'curve': 'RHOB', 'from': 'kg/m³', 'to': 'g/cm³', 'factor': '÷1000'})
-            elif 1.5 <= rhob_med <= 3.0:
-                unit_conversions.append({'curve': 'RHOB', 'from': 'g/cm³', 'to': 'g/cm³', 'factor': 'OK'})
-        
-        # DT: validar rango (típico 40-200 μs/ft)
-        if 'DT' in df.columns:
-            dt_med = df['DT'].median()
-            if dt_med > 300:  # Probablemente en μs/m, convertir a μs/ft
-                df['DT'] = df['DT'] / 3.2808
-                unit_conversions.append({'curve': 'DT', 'from': 'μs/m', 'to': 'μs/ft', 'factor': '÷3.2808'})
-            else:
-                unit_conversions.append({'curve': 'DT', 'from': 'μs/ft', 'to': 'μs/ft', 'factor': 'OK'})
-        
-        # =====================================================================
-        # PASO 2: ANÁLISIS PETROFÍSICO COMPLETO
-        # =====================================================================
-        results = {}
-        
-        # --- Vsh (Volumen de Arcilla) ---
-        if 'GR' in df.columns:
-            df['VSH'] = PetrofisicaCore.calcular_vsh(df['GR'])
-            results['vsh_available'] = True
-        else:
-            df['VSH'] = 0
-            results['vsh_available'] = False
-        
-        # --- Porosidad (usar NPHI si existe, o RHOB para estimar) ---
-        if 'NPHI' in df.columns:
-            # Auto-detectar porcentaje vs decimal
-            if df['NPHI'].mean() > 1.0:
-                df['NPHI'] = df['NPHI'] / 100.0
-            
-            df['PHI'] = df['NPHI'].clip(0, 0.45)
-            results['phi_source'] = 'NPHI'
-        elif 'RHOB' in df.columns:
-            rho_ma = 2.65
-            rho_fl = 1.0
-            df['PHI'] = ((rho_ma - df['RHOB']) / (rho_ma - rho_fl)).clip(0, 0.45)
-            results['phi_source'] = 'RHOB (estimado)'
-        else:
-            df['PHI'] = 0.15
-            results['phi_source'] = 'Default (0.15)'
-        
-        # --- Sw (Saturación de Agua - Archie) ---
-        if 'RT' in df.columns:
-            df['SW'] = PetrofisicaCore.calcular_sw(df['RT'], df['PHI'])
-            results['sw_available'] = True
-            
-            if results['vsh_available']:
-                df['SW_SIM'] = PetrofisicaCore.calcular_sw_simandoux(
-                    df['RT'], df['PHI'], df['VSH']
-                )
-                results['sw_simandoux_available'] = True
-            else:
-                results['sw_simandoux_available'] = False
-        else:
-            df['SW'] = 0.5
-            results['sw_available'] = False
-            results['sw_simandoux_available'] = False
-        
-        # --- Permeabilidad (Timur-Coates) ---
-        df['PERM'] = PetrofisicaCore.calcular_permeabilidad(df['PHI'], df['SW'])
-        
-        # --- Permeabilidad Morris-Biggs (GAP #7) ---
-        # Para arenas: K = 62500 × PHI³ × Swirr
-        # Para carbonatos: K = 6241 × PHI⁶ / Swirr²
-        sw_irr = df['SW'].clip(0.05, 0.95)
-        df['PERM_MB'] = (62500.0 * np.power(df['PHI'], 3) * sw_irr).clip(0.001, 50000)
-        perm_comparison = {
-            'timur_coates_avg': round(float(df['PERM'].mean()), 3),
-            'morris_biggs_avg': round(float(df['PERM_MB'].mean()), 3),
-            'log_linear_available': False,
-        }
-        
-        # --- Saturación de Hidrocarburo ---
-        df['SH'] = (1 - df['SW']).clip(0, 1)
-        
-        # =====================================================================
-        # PASO 3: DETECCIÓN DE YACIMIENTOS (Pay Zones)
-        # =====================================================================
-        cutoffs = {
-            'porosity_min': 0.10,
-            'sw_max': 0.60,
-            'vshale_max': 0.50
-        }
-        pay_zones_df = ReservoirDetector.detect_prospect_intervals(df, cutoffs)
-        pay_zones = pay_zones_df.to_dict('records') if not pay_zones_df.empty else []
-        
-        # =====================================================================
-        # PASO 3B: ELECTROFACIES (PCA + K-Means Clustering) — GAP #3
-        # =====================================================================
-        electrofacies = {}
-        pca_results = {}
-        try:
-            from sklearn.cluster import KMeans
-            from sklearn.preprocessing import StandardScaler
-            from sklearn.decomposition import PCA
-            
-            # Seleccionar curvas disponibles para clustering
-            cluster_cols = [c for c in ['GR', 'PHI', 'RHOB', 'NPHI', 'RT', 'DT'] if c in df.columns]
-            if len(cluster_cols) >= 2:
-                cluster_data = df[cluster_cols].dropna()
-                if len(cluster_data) > 20:
-                    scaler = StandardScaler()
-                    scaled = scaler.fit_transform(cluster_data)
-                    
-                    # ---- PCA: Reducción de Dimensionalidad ----
-                    n_components = min(3, len(cluster_cols))
-                    pca = PCA(n_components=n_components)
-                    pca_transformed = pca.fit_transform(scaled)
-                    
-                    # Varianza explicada por componente
-                    variance_explained = pca.explained_variance_ratio_.tolist()
-                    cumulative_variance = float(sum(variance_explained))
-                    
-                    # Loadings (qué curva domina cada PC)
-                    loadings = {}
-                    for i, pc in enumerate(pca.components_):
-                        dominant_idx = int(np.argmax(np.abs(pc)))
-                        loadings[f'PC{i+1}'] = {
-                            'dominant_curve': cluster_cols[dominant_idx],
-                            'variance': round(variance_explained[i] * 100, 1),
-                            'weights': {col: round(float(w), 3) for col, w in zip(cluster_cols, pc)}
-                        }
-                    
-                    # ---- K-Means sobre PCA (mejor separación) ----
-                    n_clusters = 4
-                    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-                    labels = kmeans.fit_predict(pca_transformed)
-                    
-                    # Asignar nombres litológicos por centroide de GR
-                    cluster_data = cluster_data.copy()
-                    cluster_data['Facies'] = labels
-                    
-                    # Ordenar clusters por GR promedio (bajo GR = Arena, alto GR = Lutita)
-                    if 'GR' in cluster_cols:
-                        centroids_gr = cluster_data.groupby('Facies')['GR'].mean().sort_values()
-                    else:
-                        centroids_gr = cluster_data.groupby('Facies')[cluster_cols[0]].mean().sort_values()
-                    facies_names = ['Arena Limpia', 'Arena Arcillosa', 'Lutita', 'Carbonato/Tight']
-                    name_map = {cluster_id: facies_names[i] for i, cluster_id in enumerate(centroids_gr.index)}
-                    
-                    cluster_data['Facies_Name'] = cluster_data['Facies'].map(name_map)
-                    
-                    # Asignar al df principal
-                    df.loc[cluster_data.index, 'FACIES'] = cluster_data['Facies']
-                    df.loc[cluster_data.index, 'FACIES_NAME'] = cluster_data['Facies_Name']
-                    
-                    # Distribución para el frontend
-                    dist = cluster_data['Facies_Name'].value_counts().to_dict()
-                    electrofacies = {
-                        'distribution': dist,
-                        'n_clusters': n_clusters,
-                        'curves_used': cluster_cols,
-                        'total_classified': len(cluster_data),
-                        'method': 'PCA + K-Means',
-                    }
-                    
-                    # PCA scatter data (sampled for frontend)
-                    pca_step = max(1, len(pca_transformed) // 500)
-                    pca_results = {
-                        'available': True,
-                        'n_components': n_components,
-                        'variance_explained': [round(v * 100, 1) for v in variance_explained],
-                        'cumulative_variance': round(cumulative_variance * 100, 1),
-                        'loadings': loadings,
-                        'pc1': pca_transformed[::pca_step, 0].tolist(),
-                        'pc2': pca_transformed[::pca_step, 1].tolist(),
-                        'pc3': pca_transformed[::pca_step, 2].tolist() if n_components >= 3 else [],
-                        'labels': labels[::pca_step].tolist(),
-                        'facies_names': [name_map.get(l, f'Facies {l}') for l in labels[::pca_step]],
-                    }
-        except ImportError:
-            electrofacies = {'error': 'scikit-learn no instalado. Ejecutar: pip install scikit-learn'}
-        except Exception as e:
-            electrofacies = {'error': str(e)}
-        
-        # =====================================================================
-        # PASO 3C: PERMEABILIDAD MEJORADA (Log-Linear Poro-Perm)
-        # =====================================================================
-        if 'PHI' in df.columns:
-            # Modelo Log-Linear calibrado para areniscas (Timur-Coates mejorado)
-            # K = 10^(a * PHI + b) donde a=14, b=-1.5 (calibración genérica sandstone)
-            df['PERM_LL'] = np.power(10, (14.0 * df['PHI'] - 1.5))
-            df['PERM_LL'] = df['PERM_LL'].clip(0.001, 50000)  # Limitar rango físico (mD)
-            results['perm_method'] = 'Log-Linear Poro-Perm (Calibración Sandstone)'
-            perm_comparison['log_linear_avg'] = round(float(df['PERM_LL'].mean()), 3)
-            perm_comparison['log_linear_available'] = True
-        
-        # =====================================================================
-        # PASO 3D: DLS (Dog-Leg Severity) - Riesgo de Perforación
-        # =====================================================================
-        dls_data = []
-        try:
-            if depth_col in df.columns and len(df) > 10:
-                depths = df[depth_col].values
-                n_pts = len(depths)
-                
-                # Simular inclinación gradual (0° arriba, incrementa con profundidad)
-                inc = np.linspace(0, 15, n_pts) + np.random.normal(0, 0.5, n_pts)
-                inc = np.clip(inc, 0, 90)
-                azi = np.linspace(0, 30, n_pts) + np.random.normal(0, 1.0, n_pts)
-                azi = np.clip(azi, 0, 360)
-                
-                # Calcular DLS real (grados/100ft)
-                for i in range(1, n_pts):
-                    delta_md = abs(depths[i] - depths[i-1])
-                    if delta_md < 0.1:
-                        continue
-                    
-                    # Fórmula DLS = arccos(...)  * 100 / delta_MD
-                    cos_dls = (np.cos(np.radians(inc[i] - inc[i-1])) - 
-                               np.sin(np.radians(inc[i-1])) * np.sin(np.radians(inc[i])) * 
-                               (1 - np.cos(np.radians(azi[i] - azi[i-1]))))
-                    cos_dls = np.clip(cos_dls, -1, 1)
-                    dls_val = np.degrees(np.arccos(cos_dls)) * (100.0 / delta_md)
-                    
-                    if dls_val > 1.0:  # Solo reportar DLS significativos
-                        severity = "Bajo" if dls_val < 3 else "Medio" if dls_val < 6 else "Alto" if dls_val < 10 else "Crítico"
-                        dls_data.append({
-                            'depth': float(depths[i]),
-                            'dls': round(float(dls_val), 2),
-                            'inclination': round(float(inc[i]), 1),
-                            'azimuth': round(float(azi[i]), 1),
-                            'severity': severity
-                        })
-                
-                # Limitar a los 50 puntos más severos
-                dls_data = sorted(dls_data, key=lambda x: x['dls'], reverse=True)[:50]
-        except Exception as e:
-            dls_data = []
-        
-        # =====================================================================
-        # PASO 4: AUDITORÍA DE CALIDAD (Data QC)
-        # =====================================================================
-        audit_log = DataQualityAuditor.auditar_dataset(df)
-        
-        # =====================================================================
-        # PASO 5: EXTRAER HEADER DEL POZO
-        # =====================================================================
-        def get_header(mnemonic, default="-"):
-            try:
-                return str(las.well[mnemonic].value) if las.well[mnemonic].value else default
-            except:
-                return default
-        
-        well_info = {
-            "well_name": get_header("WELL"),
-            "field": get_header("FLD"),
-            "operator": get_header("COMP"),
-            "service": get_header("SRVC"),
-            "location": get_header("LOC"),
-            "date": get_header("DATE"),
-            "country": get_header("CTRY"),
-            "province": get_header("PROV"),
-        }
-        
-        # =====================================================================
-        # PASO 6: GEOFÍSICA - IMPEDANCIA, REFLECTIVIDAD, SINTÉTICO
-        # =====================================================================
-        geophysics_data = {}
-        
-        if 'RHOB' in df.columns:
-            df_clean = df.copy().interpolate().bfill().ffill()
-            
-            dt_col_val = df_clean['DT'].values if 'DT' in df_clean.columns else None
-            rho_vals = df_clean['RHOB'].values
-            
-            ai_vals, vp_vals = GeophysicsEngine.calcular_impedancia(rho_vals, dt_col_val)
-            rc_vals = GeophysicsEngine.coeficientes_reflexion(ai_vals)
-            
-            # Wavelet y sintético
-            t_wav, ricker = GeophysicsEngine.ricker_wavelet(30, 0.1, 0.002)
-            synth_vals = GeophysicsEngine.generar_sintetico(rc_vals, ricker)
-            
-            # Para Seismic Section (repetir traza en 2D)
-            nx_section = 80
-            synth_norm = synth_vals / (np.max(np.abs(synth_vals)) + 1e-9)
-            seismic_2d = np.tile(synth_norm, (nx_section, 1)).T
-            # Añadir variación lateral suave
-            for i in range(nx_section):
-                shift = int(5 * np.sin(i * np.pi / nx_section * 2))
-                seismic_2d[:, i] = np.roll(seismic_2d[:, i], shift)
-            
-            # Sampling para geofísica (máx 500 pts)
-            geo_step = max(1, len(ai_vals) // 500)
-            
-            geophysics_data = {
-                "available": True,
-                "has_dt": 'DT' in df.columns,
-                "impedance": safe_list(ai_vals[::geo_step]),
-                "reflectivity": safe_list(rc_vals[::geo_step]),
-                "synthetic": safe_list(synth_vals[::geo_step]),
-                "wavelet_t": t_wav,
-                "wavelet_amp": ricker,
-                "seismic_depths": safe_list(df_clean[depth_col].values[::geo_step]),
-                "seismic_2d": seismic_2d[::geo_step, :].tolist(),
-                "seismic_nx": nx_section,
-            }
-        else:
-            geophysics_data = {"available": False}
-        
-        # =====================================================================
-        # PASO 7: DATOS PARA GRÁFICOS 3D (Cubo Litológico + Bubble)
-        # =====================================================================
-        scatter3d_data = {}
-        
-        # Cubo 3D: usar PHI, RHOB, Depth, colorear por GR
-        all_cols_for_3d = {}
-        for col in df.columns:
-            if col != depth_col and df[col].dtype in [np.float64, np.float32, np.int64, np.int32, float, int]:
-                vals = df[col].values
-                valid_mask = np.isfinite(vals)
-                if valid_mask.sum() > 10:
-                    all_cols_for_3d[col] = True
-        
-        # Datos completos para scatter (sampled)
-        scatter_step = max(1, len(df) // 600)
-        df_scatter = df.iloc[::scatter_step].copy()
-        
-        scatter_cols_data = {}
-        for col in df_scatter.columns:
-            if df_scatter[col].dtype in [np.float64, np.float32, np.int64, np.int32, float, int]:
-                scatter_cols_data[col] = safe_list(df_scatter[col].values)
-        
-        scatter3d_data = {
-            "available_columns": list(all_cols_for_3d.keys()),
-            "columns_data": scatter_cols_data,
-            "depth_values": safe_list(df_scatter[depth_col].values),
-        }
-        
-        # =====================================================================
-        # PASO 8: HISTOGRAMAS (Distribución de cada curva)
-        # =====================================================================
-        histograms = {}
-        for col in ['GR', 'NPHI', 'RHOB', 'RT', 'PHI', 'VSH', 'SW', 'PERM']:
-            if col in df.columns:
-                valid = df[col].dropna()
-                valid = valid[np.isfinite(valid)]
-                if len(valid) > 10:
-                    counts, bin_edges = np.histogram(valid, bins=40)
-                    histograms[col] = {
-                        "counts": counts.tolist(),
-                        "bin_edges": bin_edges.tolist(),
-                    }
-        
-        # =====================================================================
-        # PASO 9: RADAR DE CALIDAD (Rock Quality Index)
-        # =====================================================================
-        radar_data = {}
-        phi_mean = float(df['PHI'].mean()) if 'PHI' in df.columns else 0.15
-        sw_mean = float(df['SW'].mean()) if 'SW' in df.columns else 0.5
-        vsh_mean = float(df['VSH'].mean()) if 'VSH' in df.columns else 0.5
-        
-        phi_score = min(1.0, phi_mean / 0.35)
-        so_score = 1.0 - sw_mean
-        vsh_score = 1.0 - vsh_mean
-        econ_score = (phi_score + so_score) / 2.0
-        # Data quality based on audit
-        dq_score = 1.0 - (sum(1 for a in audit_log if '❌' in a) * 0.25)
-        dq_score = max(0, min(1, dq_score))
-        
-        radar_data = {
-            "categories": ["Porosity", "Oil Saturation", "Rock Cleanliness", "Economic Potential", "Data Quality"],
-            "scores": [
-                round(phi_score, 3),
-                round(so_score, 3),
-                round(vsh_score, 3),
-                round(econ_score, 3),
-                round(dq_score, 3),
-            ]
-        }
-        
-        # =====================================================================
-        # PASO 10: CORRELACIONES (estadísticos para scatter)
-        # =====================================================================
-        correlations = {}
-        numeric_cols = [c for c in df.columns if df[c].dtype in [np.float64, np.float32, np.int64, np.int32, float, int] and c != depth_col]
-        if len(numeric_cols) >= 2:
-            corr_matrix = df[numeric_cols].corr()
-            # Enviar solo pares con |corr| > 0.3
-            pairs = []
-            for i, c1 in enumerate(numeric_cols):
-                for j, c2 in enumerate(numeric_cols):
-                    if i < j:
-                        val = float(corr_matrix.loc[c1, c2])
-                        if np.isfinite(val):
-                            pairs.append({"x": c1, "y": c2, "r": round(val, 3)})
-            correlations["pairs"] = sorted(pairs, key=lambda x: abs(x["r"]), reverse=True)[:20]
-            correlations["columns"] = numeric_cols
-        
-        # =====================================================================
-        # PASO 11: PRODUCCIÓN SIMULADA (Arps Decline) — GAPs #5, #6
-        # =====================================================================
-        production_sim = {}
-        net_pay_total = float(pay_zones_df['Espesor_ft'].sum()) if not pay_zones_df.empty else 50.0
-        avg_phi = float(df['PHI'].mean())
-        avg_sh = float(df['SH'].mean())
-        
-        # --- OOIP COMPLETO (GAP #6) ---
-        # OOIP = 7758 × A × h × φ × (1 - Sw) / Bo
-        area_acres = 40      # Área de drenaje (acres) — default
-        bo = 1.2             # Factor volumétrico de formación (bbl/STB)
-        oip_stb = 7758 * area_acres * net_pay_total * avg_phi * avg_sh / bo
-        
-        # Desglose OOIP para reporte
-        ooip_breakdown = {
-            'formula': 'OOIP = 7758 × A × h × φ × (1-Sw) / Bo',
-            'area_acres': area_acres,
-            'net_pay_ft': round(net_pay_total, 1),
-            'avg_porosity': round(avg_phi, 4),
-            'avg_sh': round(avg_sh, 4),
-            'bo': bo,
-            'ooip_stb': round(oip_stb, 0),
-            'ooip_bbl': round(oip_stb * bo, 0),
-        }
-        
-        # --- DECLINACIÓN EXPONENCIAL (original) ---
-        sim_df = SimulationEngine.simular_produccion(max(oip_stb, 100000), 70)
-        
-        # --- DECLINACIÓN HIPERBÓLICA (GAP #5) ---
-        # Q(t) = Qi / (1 + b × Di × t)^(1/b)
-        b_factor = 0.5       # Factor de curvatura (0=exponencial, 1=harmónica)
-        di = 0.15            # Tasa de declinación inicial (15%/año)
-        qi = max(oip_stb * 0.08, 5000)  # Tasa inicial (8% del OIP o mín 5000)
-        
-        hyp_months = list(range(1, 121))  # 10 años
-        hyp_barrels = []
-        hyp_cum = 0
-        for t in hyp_months:
-            t_years = t / 12.0
-            q_t = qi / ((1 + b_factor * di * t_years) ** (1 / b_factor))
-            hyp_barrels.append(round(q_t, 1))
-            hyp_cum += q_t
-        
-        production_sim = {
-            "months": sim_df["Mes"].tolist(),
-            "barrels": safe_list(sim_df["Barriles_Mes"].values),
-            "revenue": safe_list(sim_df["Ingresos_USD"].values),
-            "oip_estimate": round(oip_stb, 0),
-            "total_revenue_10y": round(float(sim_df["Ingresos_USD"].sum()), 0),
-            # Nuevos datos hiperbólicos
-            "hyperbolic": {
-                "months": hyp_months,
-                "barrels": hyp_barrels,
-                "b_factor": b_factor,
-                "di_percent": di * 100,
-                "qi_stb": round(qi, 0),
-                "cumulative_10y": round(hyp_cum, 0),
-            },
-            "ooip_breakdown": ooip_breakdown,
-            "decline_methods": ['Exponencial', 'Hiperbólica'],
-        }
-        
-        # =====================================================================
-        # PASO 12: SAMPLING PARA FRONTEND (máximo 800 puntos para curvas)
-        # =====================================================================
-        if len(df) > 800:
-            step = len(df) // 800
-            df_sampled = df.iloc[::step].copy()
-        else:
-            df_sampled = df.copy()
-        
-        df_sampled = df_sampled.where(pd.notnull(df_sampled), None)
-        
-        # =====================================================================
-        # PASO 13: CONSTRUIR RESPUESTA JSON COMPLETA
-        # =====================================================================
-        available_curves = [c for c in df.columns if c != depth_col]
-        
-        curves_data = {}
-        for col in ['GR', 'RT', 'NPHI', 'RHOB', 'DT', 'VSH', 'PHI', 'SW', 'PERM', 'SH']:
-            if col in df_sampled.columns:
-                curves_data[col.lower()] = safe_list(df_sampled[col].values)
-        
-        if 'SW_SIM' in df_sampled.columns:
-            curves_data['sw_sim'] = safe_list(df_sampled['SW_SIM'].values)
-        
-        # KPIs calculados
-        kpis = {
-            "total_depth": round(float(df[depth_col].max() - df[depth_col].min()), 2),
-            "min_depth": round(float(df[depth_col].min()), 2),
-            "max_depth": round(float(df[depth_col].max()), 2),
-            "total_points": len(df),
-            "avg_gr": round(float(df['GR'].mean()), 2) if 'GR' in df.columns else None,
-            "avg_phi": round(float(df['PHI'].mean() * 100), 1),
-            "avg_vsh": round(float(df['VSH'].mean() * 100), 1),
-            "avg_sw": round(float(df['SW'].mean() * 100), 1),
-            "avg_perm": round(float(df['PERM'].mean()), 2),
-            "avg_sh": round(float(df['SH'].mean() * 100), 1),
-            "net_pay_ft": round(float(pay_zones_df['Espesor_ft'].sum()), 1) if not pay_zones_df.empty else 0,
-            "num_pay_zones": len(pay_zones),
-            "curves_count": len(available_curves),
-        }
+        LAS_PIPELINE.resolve(targets)
+    except PipelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        source, digest = await _ingest_upload(file, stream)
         
-        response = {
-            "filename": file.filename,
-            "well_info": well_info,
-            "depths": safe_list(df_sampled[depth_col].values),
-            "curves": curves_data,
-            "available_curves": available_curves,
-            "kpis": kpis,
-            "pay_zones": pay_zones,
-            "audit": audit_log,
-            "analysis_meta": results,
-            # --- Geología & Analytics ---
-            "geophysics": geophysics_data,
-            "scatter3d": scatter3d_data,
-            "histograms": histograms,
-            "radar": radar_data,
-            "correlations": correlations,
-            "production": production_sim,
-            "electrofacies": electrofacies,
-            "dls_analysis": dls_data,
-            # --- NUEVOS: Gaps cerrados ---
-            "pca_analysis": pca_results,
-            "perm_comparison": perm_comparison,
-            "unit_conversions": unit_conversions,
-        }
+        # CACHÉ: mismo archivo + mismos parámetros → respuesta ya serializada
+        key = _upload_key(file.filename, targets, digest)
+        cached, tier = await asyncio.to_thread(_cached_upload, key, targets, digest)
+        if cached is not None:
+            return await _negotiated(request, payload=cached, headers={"X-Cache": f"HIT-{tier.upper()}"})
         
+        # Cálculo CPU-bound en un proceso worker: el event loop sigue atendiendo
+        response = await ANALYSIS_POOL.run(run_las_pipeline, source, file.filename, targets, _lod_id(digest))
         
-        # GUARDAR HISTORIAL
-        try:
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            clean_name = os.path.splitext(file.filename)[0]
-            sname = f"{clean_name}_{ts}.json"
-            spath = os.path.join(HISTORY_DIR, sname)
-            
-            # Agregamos metadatos de guardado
-            response["saved_at"] = ts
-            response["history_name"] = sname
-            
-            with open(spath, "w", encoding='utf-8') as f:
-                json.dump(response, f, ensure_ascii=False, cls=NpEncoder)
-            print(f"Historial guardado: {spath}")
-        except Exception as ex:
-            print(f"Error guardando historial: {ex}")
+        # GUARDAR HISTORIAL (sólo análisis completos: el dashboard espera todas las claves)
+        if targets is None:
+            await asyncio.to_thread(guardar_historial, response, file.filename)
 
         # Sanitizar respuesta para evitar NaN que rompen el frontend
-        return sanitize_floats(response)
+        payload = await asyncio.to_thread(_encode_response, response)
+        await asyncio.to_thread(RESULT_CACHE.put, key, payload)
+        return await _negotiated(request, data=response, payload=payload, headers={"X-Cache": "MISS"})
         
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+# =============================================================================
+# TRABAJOS ASÍNCRONOS: POST /jobs → GET /jobs/{id}/events (SSE) → /result
+# =============================================================================
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), stages: Optional[str] = None,
+                     stream: Optional[bool] = None):
+    """
+    Alternativa asíncrona a /upload: retorna un job_id de inmediato.
+    El progreso por etapa se sigue en /jobs/{id}/events y el resultado en /jobs/{id}/result.
+    """
+    if not file.filename.lower().endswith('.las'):
+        raise HTTPException(status_code=400, detail="Solo archivos .LAS son soportados")
+    
+    targets = parse_stage_selection(stages)
+    try:
+        LAS_PIPELINE.resolve(targets)
+    except PipelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        source, digest = await _ingest_upload(file, stream)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+    key = _upload_key(file.filename, targets, digest)
+    cached, _ = await asyncio.to_thread(_cached_upload, key, targets, digest)
+    
+    def finalize(response):
+        if targets is None:
+            guardar_historial(response, file.filename)
+        payload = _encode_response(response)
+        RESULT_CACHE.put(key, payload)
+        return payload
+    
+    try:
+        job = JOB_MANAGER.submit(
+            run_las_pipeline, (source, file.filename, targets, _lod_id(digest)),
+            finalize=finalize,
+            meta={'filename': file.filename, 'stages_requested': targets},
+            payload=cached,
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return {
+        **job.describe(),
+        "events_url": f"/jobs/{job.id}/events",
+        "result_url": f"/jobs/{job.id}/result",
+    }
+
+@app.get("/jobs")
+async def list_jobs():
+    """Trabajos recientes (en cola, en curso y terminados)."""
+    return JOB_MANAGER.list()
+
+def _get_job_or_404(job_id):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado y progreso de un trabajo."""
+    return _get_job_or_404(job_id).describe()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events con el progreso por etapa (parse, normalize, petrophysics, ...)."""
+    job = _get_job_or_404(job_id)
+    return StreamingResponse(
+        JOB_MANAGER.stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, request: Request):
+    """
+    Resultado del análisis: 200 si terminó, 202 si sigue en curso, 409 si falló/canceló/expiró.
+    Negociado por Accept igual que /upload (JSON o columnar binario).
+    """
+    job = _get_job_or_404(job_id)
+    if job.status == JOB_DONE:
+        return await _negotiated(request, payload=job.payload)
+    if job.status in FINAL_STATES:
+        raise HTTPException(status_code=409, detail=job.error or f"Trabajo {job.status}")
+    return Response(content=json.dumps(job.describe()), status_code=202, media_type="application/json")
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancela un trabajo en cola (inmediato) o en curso (antes de la siguiente etapa)."""
+    _get_job_or_404(job_id)
+    return JOB_MANAGER.cancel(job_id).describe()
+
+# =============================================================================
+# CURVAS POR VENTANA DE PROFUNDIDAD (zoom/pan desde la pirámide LOD)
+# =============================================================================
+@app.get("/curves/{lod_id}/window")
+async def curves_window(lod_id: str, request: Request, top: Optional[float] = None,
+                        base: Optional[float] = None, px: int = 800, curves: Optional[str] = None):
+    """
+    Curvas del intervalo [top, base] para `px` píxeles de alto. `lod_id` viene en
+    la respuesta de /upload (`lod.id`). Intervalos cortos → muestras crudas;
+    largos → envolvente min/max por píxel (sin perder picos ni capas delgadas).
+    """
+    if not 1 <= px <= 20000:
+        raise HTTPException(status_code=400, detail="px debe estar entre 1 y 20000")
+    names = [c.strip().lower() for c in curves.split(",") if c.strip()] if curves else None
+    try:
+        result = await asyncio.to_thread(query_window, lod_id, names, top, base, px)
+    except LODNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await _negotiated(request, data=result)
+
+# =============================================================================
+# SURVEY DIRECCIONAL (mínima curvatura → DLS + trayectoria 3D real)
+# =============================================================================
+@app.post("/survey")
+async def upload_survey(request: Request, file: UploadFile = File(...), top: int = 50):
+    """
+    Recibe un survey (.LAS con curvas INC/AZI, o .CSV/.TXT con columnas MD, INC, AZI)
+    y retorna `dls_analysis` (los `top` DLS más severos) y `trajectory` (TVD, N, E).
+    """
+    if not file.filename.lower().endswith(('.las', '.csv', '.txt')):
+        raise HTTPException(status_code=400, detail="Survey soportado: .LAS, .CSV o .TXT")
+    if not 1 <= top <= 1000:
+        raise HTTPException(status_code=400, detail="top debe estar entre 1 y 1000")
+    content = await file.read()
+    try:
+        result = await asyncio.to_thread(analyze_survey, content, file.filename, top)
+    except SurveyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el survey: {e}")
+    return await _negotiated(request, data=result)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de aciertos/fallos y ocupación de la caché de resultados y de las pirámides LOD."""
+    stats = await asyncio.to_thread(RESULT_CACHE.stats)
+    return {**stats, 'lod': await asyncio.to_thread(pyramid_stats)}
+
+@app.delete("/cache")
+async def clear_cache():
+    """Vacía la caché de resultados (memoria y disco) y las pirámides LOD."""
+    await asyncio.to_thread(RESULT_CACHE.clear)
+    await asyncio.to_thread(clear_pyramids)
+    return {"status": "cleared"}
+
 @app.get("/history")
 async def list_history():
-    """Retorna lista de archivos procesados anteriormente."""
+    """Retorna lista de archivos procesados anteriormente (.dtw y .json legados)."""
     files = []
-    for filepath in glob.glob(os.path.join(HISTORY_DIR, "*.json")):
+    for filepath in glob.glob(os.path.join(HISTORY_DIR, "*.json")) + glob.glob(os.path.join(HISTORY_DIR, f"*{STORE_EXT}")):
         filename = os.path.basename(filepath)
         stats = os.stat(filepath)
         mod_time = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M")
@@ -733,19 +408,71 @@ async def list_history():
     return files
 
 @app.get("/load_history/{filename}")
-async def load_history(filename: str):
-    """Carga un archivo JSON del historial."""
-    filepath = os.path.join(HISTORY_DIR, filename)
+async def load_history(filename: str, request: Request, top: Optional[float] = None,
+                       base: Optional[float] = None):
+    """
+    Carga un análisis del historial. `top`/`base` (opcionales) acotan depths y
+    curves a ese rango de profundidad; en .dtw sólo se leen esas filas del mmap.
+    """
+    filepath = os.path.join(HISTORY_DIR, os.path.basename(filename))
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        if filepath.endswith(STORE_EXT):
+            data = await asyncio.to_thread(load_response, filepath, top, base)
+        else:
+            # Historial JSON anterior al almacén columnar
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = slice_response(json.load(f), top, base)
+        return await _negotiated(request, data=data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error leyendo archivo: {str(e)}")
 
+# =============================================================================
+# ELECTROFACIES POR CAMPO (modelo único para todos los pozos guardados)
+# =============================================================================
+class FaciesTrainInput(BaseModel):
+    field: str                                  # Campo (header FLD)
+    k: Union[int, Literal["auto"]] = 4          # Número de facies o selección automática
+    curves: Optional[List[str]] = None          # Por defecto: curvas comunes a todos los pozos
+    epochs: int = Field(2, ge=1, le=20)         # Pasadas de partial_fit sobre el campo
+    include_projects: bool = False              # Sumar proyectos SQLite del mismo campo
+    relabel: bool = True                        # Re-etiquetar todos los pozos al terminar
+
+@app.get("/facies/models")
+async def list_facies_models():
+    """Modelos de facies guardados (uno por campo)."""
+    return await asyncio.to_thread(list_field_models)
+
+@app.post("/facies/train")
+async def train_facies(data: FaciesTrainInput):
+    """
+    Entrena el modelo de facies del campo con todos sus pozos guardados
+    (lectura por bloques + MiniBatchKMeans.partial_fit) y re-etiqueta los pozos.
+    Los análisis siguientes del campo usan este modelo.
+    """
+    try:
+        result = await ANALYSIS_POOL.run(train_and_relabel, data.field, data.k, data.curves, data.epochs,
+                                         data.include_projects, data.relabel, HISTORY_DIR,
+                                         timeout=FACIES_TRAIN_TIMEOUT)
+    except FaciesModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
+    return Response(content=_encode_response(result), media_type="application/json")
+
+@app.post("/facies/relabel")
+async def relabel_facies(field: str, include_projects: bool = False):
+    """Re-etiqueta todos los pozos guardados del campo con su modelo actual."""
+    try:
+        result = await ANALYSIS_POOL.run(relabel_wells, field, None, None, include_projects, HISTORY_DIR)
+    except FaciesModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
+    return Response(content=_encode_response(result), media_type="application/json")
+
 class NodalInput(BaseModel):
     k: float
     h: float
@@ -761,6 +488,12 @@ class NodalInput(BaseModel):
     temp_bh: float = 200
     temp_wh: float = 100
     skin: float = 0
+    n_points: int = Field(50, ge=2, le=20000)  # Tasas de la curva IPR/VLP (cálculo vectorizado)
+    vlp_method: Literal["segmented", "average"] = "segmented"  # Marcha por tramos o condiciones promedio
+    vlp_tol: float = Field(1.0, gt=0)  # Error local máximo por tramo (psi)
+    survey_md: Optional[List[float]] = None   # Survey direccional (TVD vs MD) para la marcha
+    survey_tvd: Optional[List[float]] = None
+    pvt_table: bool = True  # PVT por tabla (P × T) interpolada; False = correlaciones exactas
 
 @app.post("/analyze_nodal")
 async def analyze_nodal_system(data: NodalInput):
@@ -769,54 +502,212 @@ async def analyze_nodal_system(data: NodalInput):
     Calcula el Punto de Operación (Intersección IPR vs VLP).
     """
     try:
-        # 1. Calcular IPR (Oferta del Yacimiento)
-        # Usamos Vogel con la permeabilidad y espesor del .LAS (o inputs manuales)
-        ipr_res = production_module.calculate_ipr_vogel(
-            pr=data.pr,
-            k=data.k,
-            h=data.h,
-            skin=data.skin
-        )
-        
-        # 2. Calcular VLP (Demanda del Pozo)
-        # Usamos el rango de tasas del IPR para generar la curva VLP
-        rates_to_sim = ipr_res['rates'] 
-        # Filtramos tasas negativas o cero si hay
-        rates_to_sim = [r for r in rates_to_sim if r > 0]
-        
-        vlp_res = production_module.calculate_vlp_basic(
-            tvd=data.tvd, 
-            md=data.md,
-            tubing_id=data.tubing_id,
-            p_wh=data.p_wh,
-            q_liquid=rates_to_sim,
-            wc=data.wc,
-            gor=data.gor,
-            api=data.api,
-            gas_grav=data.gas_grav,
-            temp_bh=data.temp_bh,
-            temp_wh=data.temp_wh
-        )
-        
-        # 3. Encontrar Intersección
-        op_point = production_module.find_intersection(
-            ipr={'rates': ipr_res['rates'], 'pressures': ipr_res['pressures']},
-            vlp={'rates': vlp_res['rates'], 'pressures': vlp_res['pressures']}
+        result = await ANALYSIS_POOL.run(production_module.run_nodal_analysis, data.model_dump())
+        return Response(content=_encode_response(result), media_type="application/json")
+
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SweepRange(BaseModel):
+    """Eje del barrido: `values` explícitos o `num` puntos equiespaciados entre start y stop."""
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    num: int = Field(5, ge=1, le=100)
+
+    def resolve(self):
+        if self.values:
+            return self.values
+        if self.start is None or self.stop is None:
+            raise ValueError("Cada eje requiere `values` o `start`/`stop`")
+        return np.linspace(self.start, self.stop, self.num).tolist()
+
+class NodalSweepInput(NodalInput):
+    # Ejes barridos (tubing_id, p_wh, wc, gor, skin); los demás quedan fijos en el valor base
+    sweep: Dict[str, SweepRange]
+
+@app.post("/analyze_nodal/sweep")
+async def analyze_nodal_sweep(request: Request, data: NodalSweepInput):
+    """
+    Barrido de sensibilidad: evalúa la grilla cartesiana completa de los ejes
+    pedidos en una sola llamada y retorna las superficies de punto de operación
+    (q_op, pwf_op aplanadas en orden C sobre `shape`). Las combinaciones de VLP
+    se reparten en bloques entre los workers del pool.
+    """
+    params = data.model_dump(exclude={'sweep'})
+    try:
+        axes = production_module.sweep_axes(params, {name: r.resolve() for name, r in data.sweep.items()})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    combos = production_module.vlp_sweep_combos(axes)
+    blocks = np.array_split(combos, min(ANALYSIS_POOL.workers, len(combos)))
+    try:
+        parts = await asyncio.gather(*(ANALYSIS_POOL.run(production_module.run_nodal_sweep_chunk, params,
+                                                         block, axes['skin']) for block in blocks))
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+    result = production_module.assemble_sweep(axes, np.concatenate([q for q, _ in parts]),
+                                              np.concatenate([p for _, p in parts]))
+    return await _negotiated(request, data=result)
+
+class WellBatchItem(NodalInput):
+    well: Optional[str] = None  # Nombre del pozo
+    di: float = Field(0.3, gt=0)  # Declinación nominal anual (Arps)
+    b: float = Field(0.5, ge=0, le=B_MAX)
+    d_lim: Optional[float] = Field(None, gt=0)  # Declinación terminal: hiperbólica modificada
+    months: int = Field(60, ge=1, le=600)  # Horizonte del pronóstico
+    q_limit: float = Field(10.0, gt=0)  # Límite económico (bbl/d)
+
+class NodalBatchInput(BaseModel):
+    wells: List[WellBatchItem] = Field(..., min_length=1, max_length=5000)
+
+@app.post("/analyze_nodal/batch")
+async def analyze_nodal_batch(data: NodalBatchInput):
+    """
+    Nodal + declinación para un campo completo. Los pozos se reparten entre los
+    workers del pool (como máximo `workers` a la vez, para no saturar la cola de
+    los demás análisis) y cada resultado se emite al terminar como una línea
+    NDJSON con el avance y el throughput; la última línea es el resumen.
+    """
+    wells = [{**w.model_dump(), 'index': i} for i, w in enumerate(data.wells)]
+
+    async def stream():
+        start = time.perf_counter()
+        results, pending, backlog = [], {}, collections.deque(wells)
+        while backlog or pending:
+            while backlog and len(pending) < ANALYSIS_POOL.workers:
+                try:
+                    future = asyncio.wrap_future(ANALYSIS_POOL.submit(production_module.evaluate_well, backlog[0]))
+                except PoolSaturated:
+                    break  # Pool ocupado por otros análisis: se reintenta al liberar cupo
+                pending[future] = backlog.popleft()
+            if not pending:
+                await asyncio.sleep(0.5)
+                continue
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                well = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'index': well['index'], 'well': well.get('well'), 'status': 'error', 'error': str(e)}
+                results.append(result)
+                elapsed = time.perf_counter() - start
+                line = {'type': 'well', **result, 'done': len(results), 'total': len(wells),
+                        'wells_per_s': round(len(results) / elapsed, 2)}
+                yield _encode_response(line) + b"\n"
+        summary = production_module.batch_summary(results, time.perf_counter() - start)
+        yield _encode_response({'type': 'summary', **summary}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# =============================================================================
+# VOLUMETRÍA PROBABILÍSTICA (OOIP MONTE CARLO)
+# =============================================================================
+class DistributionSpec(BaseModel):
+    type: Literal[DISTRIBUTIONS]  # fixed [v] · uniform [mín, máx] · triangular [mín, moda, máx] · normal/lognormal [media, σ]
+    params: List[float]
+
+class CorrelationSpec(BaseModel):
+    a: Literal[VARIABLES]
+    b: Literal[VARIABLES]
+    rho: float = Field(..., gt=-1, lt=1)  # Correlación en el espacio normal (cópula gaussiana)
+
+class VolumetricsInput(BaseModel):
+    # Variables sin distribución usan las de volumetrics.DEFAULT_DISTS
+    distributions: Dict[Literal[VARIABLES], DistributionSpec] = {}
+    correlations: Optional[List[CorrelationSpec]] = None  # None = φ–Sw -0.5
+    tol: float = Field(0.005, gt=0, lt=0.5)  # Cambio relativo máximo de P10/P50/P90 entre bloques
+    chunk: int = Field(20000, ge=5000, le=500000)
+    min_samples: int = Field(40000, ge=1000)
+    max_samples: int = Field(2_000_000, ge=5000, le=5_000_000)
+    workers: Optional[int] = Field(None, ge=1)  # Bloques en paralelo por ronda (tope: workers del pool)
+    seed: Optional[int] = None
+
+@app.post("/volumetrics/ooip")
+async def volumetrics_ooip(request: Request, data: VolumetricsInput):
+    """
+    OOIP probabilístico: área, net pay, φ, Sw y Bo muestreados de sus
+    distribuciones (correlacionadas) por bloques vectorizados hasta que
+    P10/P50/P90 convergen. Cada ronda reparte hasta `workers` bloques entre los
+    workers del pool, cada uno con su propio flujo aleatorio; para una `seed`
+    dada el resultado no depende del número de workers.
+    """
+    try:
+        mc = VolumetricMonteCarlo(
+            {name: (d.type, *d.params) for name, d in data.distributions.items()},
+            None if data.correlations is None else [(c.a, c.b, c.rho) for c in data.correlations],
+            data.chunk, data.tol, data.min_samples, data.max_samples, data.seed,
         )
-        
-        return sanitize_floats({
-            "ipr": ipr_res,
-            "vlp": vlp_res,
-            "operating_point": op_point, # {q_op, pwf_op} o None
-            "status": "flowing" if op_point else "dead",
-            "message": "Pozo Fluyente Estable" if op_point else "Pozo Muerto - No hay intersección (Pwf < VLP min)"
-        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    workers = min(data.workers or ANALYSIS_POOL.workers, ANALYSIS_POOL.workers)
+    try:
+        while not mc.done:
+            parts = await asyncio.gather(*(ANALYSIS_POOL.run(simulate_chunk, *args) for args in mc.tasks(workers)))
+            # Acumular y estimar percentiles fuera del event loop
+            await asyncio.to_thread(mc.extend, parts)
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+    result = await asyncio.to_thread(mc.result)
+    return await _negotiated(request, data={**result, 'workers': workers})
 
+# =============================================================================
+# DECLINACIÓN (AJUSTE DE ARPS POR LOTES)
+# =============================================================================
+class ProductionHistory(BaseModel):
+    well: Optional[str] = None
+    months: List[float] = Field(..., min_length=1, max_length=1200)  # Tiempo desde el inicio (meses)
+    rate: List[Optional[float]] = Field(..., min_length=1, max_length=1200)  # bbl/d; null o ≤ 0 se ignoran
+
+class DeclineFitInput(BaseModel):
+    wells: List[ProductionHistory] = Field(..., min_length=1, max_length=20000)
+    model: Literal[DECLINE_MODELS] = 'hyperbolic'
+    d_lim: Optional[float] = Field(None, gt=0)  # Requerido por modified_hyperbolic (1/año)
+    forecast_months: int = Field(0, ge=0, le=600)  # 0 = solo parámetros
+
+@app.post("/decline/fit")
+async def decline_fit(request: Request, data: DeclineFitInput):
+    """
+    Ajuste de qi/di/b a las historias de producción de todos los pozos en una
+    sola resolución vectorizada (Levenberg-Marquardt por lotes, ver decline.py)
+    y, opcionalmente, el pronóstico mensual de cada pozo.
+    """
+    if data.model == 'modified_hyperbolic' and data.d_lim is None:
+        raise HTTPException(status_code=400, detail="modified_hyperbolic requiere d_lim")
+    bad = [w.well or str(i) for i, w in enumerate(data.wells) if len(w.months) != len(w.rate)]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"months y rate de distinto largo: {', '.join(bad[:10])}")
+    histories = [(np.asarray(w.months, dtype=np.float64) / 12.0, np.array(w.rate, dtype=np.float64))
+                 for w in data.wells]
+    try:
+        fit = await ANALYSIS_POOL.run(fit_histories, histories, data.model, data.d_lim, data.forecast_months)
+    except (PoolSaturated, JobTimeout) as e:
+        raise _pool_http_error(e)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+    return await _negotiated(request, data={'model': data.model, 'wells': [w.well for w in data.wells], **fit})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
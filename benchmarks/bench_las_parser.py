@@ -0,0 +1,108 @@
+"""
+Benchmark: lector LAS fast-path (las_fast.read_las) vs lasio.read.
+
+Reconstruye archivos LAS 2.0 a partir de los pozos guardados en processed_data/
+(depths + curvas), remuestreados a varios tamaños, y mide lectura + DataFrame.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_las_parser.py [--sizes 10000 100000] [--repeat 3]
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import tempfile
+import numpy as np
+import lasio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'geomind_saas'))
+from las_fast import read_las, FastLAS
+from well_store import STORE_EXT, load_response
+
+
+def load_wells(history_dir):
+    """Un pozo por nombre (el análisis más reciente) con sus curvas muestreadas."""
+    wells = {}
+    paths = glob.glob(os.path.join(history_dir, "*.json")) + glob.glob(os.path.join(history_dir, f"*{STORE_EXT}"))
+    for path in sorted(paths, key=os.path.basename):
+        if path.endswith(STORE_EXT):
+            data = load_response(path)
+        else:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        curves = {k.upper(): np.asarray(v, float) for k, v in data.get('curves', {}).items()
+                  if k in ('gr', 'rt', 'nphi', 'rhob', 'dt') and len(v) == len(data.get('depths', []))}
+        if curves and len(data['depths']) > 10:
+            wells[data.get('filename', os.path.basename(path))] = (np.asarray(data['depths'], float), curves)
+    return wells
+
+
+def write_las(path, depths, curves, n_samples):
+    """Interpola el pozo a n_samples y lo escribe como LAS 2.0 (una línea por profundidad)."""
+    z = np.linspace(depths[0], depths[-1], n_samples)
+    cols = [z] + [np.interp(z, depths, v) for v in curves.values()]
+    step = (z[-1] - z[0]) / max(n_samples - 1, 1)
+    lines = [
+        "~VERSION INFORMATION",
+        " VERS.   2.0 :   CWLS LOG ASCII STANDARD - VERSION 2.0",
+        " WRAP.    NO :   ONE LINE PER DEPTH STEP",
+        "~WELL INFORMATION",
+        f" STRT.FT      {z[0]:.4f} : START DEPTH",
+        f" STOP.FT      {z[-1]:.4f} : STOP DEPTH",
+        f" STEP.FT      {step:.4f} : STEP",
+        " NULL.        -999.25 : NULL VALUE",
+        " WELL.        BENCH : WELL NAME",
+        "~CURVE INFORMATION",
+        " DEPT.FT   :   DEPTH",
+    ] + [f" {name:<8}.UNIT :   {name}" for name in curves] + ["~ASCII"]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+        np.savetxt(f, np.column_stack(cols), fmt="%.4f")
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history-dir", default=os.path.join(ROOT, "processed_data"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    wells = load_wells(args.history_dir)
+    if not wells:
+        sys.exit(f"No hay pozos en {args.history_dir}")
+
+    print(f"{'Pozo':<34} {'Muestras':>9} {'MB':>6} {'lasio (s)':>10} {'fast (s)':>9} {'Speedup':>8} {'Mmuestras/s':>12}  OK")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (depths, curves) in wells.items():
+            for n in args.sizes:
+                path = os.path.join(tmp, "bench.las")
+                write_las(path, depths, curves, n)
+                size_mb = os.path.getsize(path) / 1e6
+                with open(path, "rb") as f:
+                    content = f.read()
+
+                t_lasio, df_lasio = best_of(lambda: lasio.read(path).df(), args.repeat)
+                t_fast, las_fast = best_of(lambda: read_las(content), args.repeat)
+                df_fast = las_fast.df()
+
+                ok = (isinstance(las_fast, FastLAS)
+                      and list(df_fast.columns) == list(df_lasio.columns)
+                      and np.allclose(df_fast.values, df_lasio.values, equal_nan=True))
+                print(f"{name[:34]:<34} {n:>9,} {size_mb:>6.1f} {t_lasio:>10.3f} {t_fast:>9.3f} "
+                      f"{t_lasio / t_fast:>7.1f}x {n * len(df_fast.columns) / t_fast / 1e6:>12.1f}  {'✓' if ok else '✗'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: kernel petrofísico fusionado (geomind_saas/petro_kernel.py) contra
+la cadena anterior de PASO 1 (PetrofisicaCore + operaciones de pandas).
+
+Para un registro sintético de N muestras (GR, RT, NPHI con nulos) reporta,
+por variante: tiempo (mejor de `repeat`), memoria temporal pico (tracemalloc,
+sin contar las salidas), memoria nueva tocada (fallos de página menores ×
+tamaño de página: cada temporal de largo completo se escribe en páginas
+nuevas) y la diferencia máxima con la cadena anterior.
+
+En Linux el script se re-ejecuta con MALLOC_MMAP_THRESHOLD_=131072 para que
+glibc no recicle los temporales grandes del heap y los fallos de página
+reflejen todas las asignaciones.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_petro.py [--samples 1000000] [--repeat 5] [--float32]
+"""
+import os
+import sys
+import time
+import resource
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'geomind_saas'))
+from petro_core_web import PetrofisicaCore
+from petro_kernel import OUTPUTS, available_backends, petro_kernel
+
+
+def legacy_chain(df):
+    """PASO 1 tal como estaba: una Serie/temporal por operación."""
+    df = df.copy()
+    df['VSH'] = PetrofisicaCore.calcular_vsh(df['GR'])
+    if df['NPHI'].mean() > 1.0:
+        df['NPHI'] = df['NPHI'] / 100.0
+    df['PHI'] = df['NPHI'].clip(0, 0.45)
+    df['SW'] = PetrofisicaCore.calcular_sw(df['RT'], df['PHI'])
+    df['SW_SIM'] = PetrofisicaCore.calcular_sw_simandoux(df['RT'], df['PHI'], df['VSH'])
+    df['PERM'] = PetrofisicaCore.calcular_permeabilidad(df['PHI'], df['SW'])
+    sw_irr = df['SW'].clip(0.05, 0.95)
+    df['PERM_MB'] = (62500.0 * np.power(df['PHI'], 3) * sw_irr).clip(0.001, 50000)
+    df['SH'] = (1 - df['SW']).clip(0, 1)
+    df['PERM_LL'] = np.power(10, (14.0 * df['PHI'] - 1.5))
+    df['PERM_LL'] = df['PERM_LL'].clip(0.001, 50000)
+    return {name: df[name].to_numpy() for name in OUTPUTS}
+
+
+def synthetic_log(n, seed=0):
+    rng = np.random.default_rng(seed)
+    gr = 20 + 110 * rng.beta(2, 3, n)
+    rt = np.exp(rng.normal(1.5, 1.2, n))
+    nphi = 100 * np.clip(rng.normal(0.2, 0.08, n), -0.02, 0.6)  # En %: fuerza la conversión
+    for curve in (gr, rt, nphi):
+        curve[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame({'GR': gr, 'RT': rt, 'NPHI': nphi})
+
+
+def measure(func, repeat):
+    """(mejor tiempo, pico tracemalloc, fallos de página menores, resultado)."""
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    result = func()
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, faults, result
+
+
+def main():
+    if sys.platform.startswith('linux') and 'MALLOC_MMAP_THRESHOLD_' not in os.environ:
+        os.execve(sys.executable, [sys.executable] + sys.argv, {**os.environ, 'MALLOC_MMAP_THRESHOLD_': '131072'})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--float32", action="store_true", help="Entradas float32 para el kernel")
+    args = parser.parse_args()
+
+    df = synthetic_log(args.samples)
+    dtype = np.float32 if args.float32 else np.float64
+    gr, rt, nphi = (np.ascontiguousarray(df[c].to_numpy(), dtype=dtype) for c in ('GR', 'RT', 'NPHI'))
+    out_mb = len(OUTPUTS) * args.samples * np.dtype(dtype).itemsize / 1e6
+
+    runs = [('Cadena anterior (pandas)', lambda: legacy_chain(df))]
+    runs += [(f"Kernel {b}", lambda b=b: petro_kernel(gr=gr, rt=rt, nphi=nphi, backend=b)[0])
+             for b in available_backends()]
+
+    print(f"{args.samples:,} muestras · {np.dtype(dtype).name} · salidas {out_mb:.1f} MB")
+    page = resource.getpagesize()
+    print(f"{'Variante':<26} {'Tiempo (ms)':>12} {'Pico temp. (MB)':>16} {'Mem. nueva (MB)':>16} {'Δ máx':>10}")
+    reference = None
+    for label, func in runs:
+        t, peak, faults, result = measure(func, args.repeat)
+        if reference is None:
+            reference = result
+        diff = max(float(np.nanmax(np.abs(result[k].astype(np.float64) - reference[k]))) for k in OUTPUTS)
+        temp = max(0.0, peak / 1e6 - out_mb)  # Lo que excede a las propias salidas
+        print(f"{label:<26} {t * 1e3:>12.1f} {temp:>16.1f} {faults * page / 1e6:>16.1f} {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: VLP por marcha de gradiente (production_module.pressure_march).
+
+Compara, para un pozo vertical y uno desviado (survey tipo J), la marcha
+adaptativa a varias tolerancias, la marcha de paso fijo con N tramos y el
+modelo de un solo tramo a condiciones promedio contra una referencia de
+paso fijo muy fino. Reporta tramos, error máximo de Pwf y tiempo.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_vlp.py [--rates 50] [--reference 8000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from production_module import pressure_march, pressure_traverse
+
+FLUID = dict(wc=30, gor=600, api=35, gas_grav=0.65, temp_bh=210, temp_wh=100)
+WELLS = {
+    'Vertical 10000 ft': dict(md=10000.0, tvd=10000.0),
+    'Desviado J 12000 ft MD': dict(md=12000.0, tvd=8500.0,
+                                   survey_md=[0, 2000, 3000, 4000, 5000, 6000, 12000],
+                                   survey_tvd=[0, 2000, 2980, 3900, 4720, 5500, 8500]),
+}
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=int, default=50, help="Tasas simultáneas (curva VLP)")
+    parser.add_argument("--tubing-id", type=float, default=2.441)
+    parser.add_argument("--p-wh", type=float, default=200.0)
+    parser.add_argument("--reference", type=int, default=8000, help="Tramos de la referencia de paso fijo")
+    parser.add_argument("--tols", type=float, nargs="+", default=[25.0, 5.0, 1.0, 0.2])
+    parser.add_argument("--segments", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    q = np.linspace(20, 3000, args.rates)
+    for name, well in WELLS.items():
+        survey = {k: well[k] for k in ('survey_md', 'survey_tvd') if k in well}
+        march = lambda **kw: pressure_march(q, well['md'], args.tubing_id, args.p_wh, tvd=well['tvd'],
+                                            **survey, **FLUID, **kw)
+        ref = march(n_segments=args.reference)['pwf']
+
+        print(f"\n{name} · {args.rates} tasas · referencia {args.reference} tramos")
+        print(f"{'Método':<24} {'Tramos':>7} {'Rechazos':>9} {'Err máx (psi)':>14} {'Tiempo (ms)':>12}")
+        runs = [(f"Adaptativo tol={tol:g}", dict(tol=tol)) for tol in args.tols]
+        runs += [(f"Paso fijo N={n}", dict(n_segments=n)) for n in args.segments]
+        for label, kw in runs:
+            t, res = best_of(lambda: march(**kw), args.repeat)
+            err = np.max(np.abs(res['pwf'] - ref))
+            print(f"{label:<24} {res['steps']:>7} {res['rejected']:>9} {err:>14.2f} {t * 1e3:>12.1f}")
+
+        t, res = best_of(lambda: pressure_traverse(q, well['tvd'], well['md'], args.tubing_id, args.p_wh, **FLUID),
+                         args.repeat)
+        err = np.max(np.abs(res['pwf'] - ref))
+        print(f"{'Promedio (1 tramo)':<24} {1:>7} {'-':>9} {err:>14.2f} {t * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
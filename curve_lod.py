@@ -0,0 +1,229 @@
+import os
+import re
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geomind_saas'))
+from well_store import STORE_EXT, WellStoreError, write_columns, open_well
+
+# ==============================================================================
+# DATATERRA - PIRÁMIDE MULTI-RESOLUCIÓN DE CURVAS (Level of Detail)
+# Nivel 0 = curvas a resolución completa. Nivel L = envolvente min/max por
+# bloques de FACTOR^L muestras. Una ventana de profundidad se sirve desde el
+# nivel más grueso que aún da >= 1 bloque por píxel; los bordes parciales se
+# calculan con las muestras crudas, así ningún pico dentro de la ventana se pierde.
+# ==============================================================================
+
+LOD_DIR = os.environ.get("DATATERRA_LOD_DIR", "lod_data")
+# Tope de disco de las pirámides: al superarlo se borran las de uso más antiguo
+# (LRU por mtime, como el nivel de disco de result_cache.py)
+try:
+    MAX_LOD_BYTES = int(float(os.environ.get("DATATERRA_LOD_DISK_MB", 1024)) * 1024 * 1024)
+except ValueError:
+    MAX_LOD_BYTES = 1024 * 1024 * 1024
+FACTOR = 4
+MIN_BUCKETS = 64
+_LOD_ID = re.compile(r"^[0-9a-f]{16,64}$")
+
+
+class LODNotFound(Exception):
+    """No existe pirámide para ese id (nunca se generó o fue borrada)."""
+
+
+def lod_path(lod_id):
+    if not _LOD_ID.match(lod_id or ""):
+        raise LODNotFound(f"Id de pirámide inválido: {lod_id}")
+    return os.path.join(LOD_DIR, f"{lod_id}{STORE_EXT}")
+
+
+def _reduce_blocks(lo, hi, factor):
+    """Un nivel más grueso: min/max de cada bloque de `factor` (NaN se ignora)."""
+    pad = (-len(lo)) % factor
+    if pad:
+        lo = np.concatenate([lo, np.full(pad, np.nan)])
+        hi = np.concatenate([hi, np.full(pad, np.nan)])
+    return np.fmin.reduce(lo.reshape(-1, factor), axis=1), np.fmax.reduce(hi.reshape(-1, factor), axis=1)
+
+
+def build_pyramid(depth, curves, factor=FACTOR, min_buckets=MIN_BUCKETS):
+    """Columnas del almacén: profundidad, curvas crudas y L{n}/{curva}/min|max."""
+    depth = np.asarray(depth, dtype=np.float64)
+    columns = {'depth': depth}
+    levels = 0
+    for name, values in curves.items():
+        raw = np.asarray(values, dtype=np.float64)
+        columns[name] = raw
+        lo, hi, level = raw, raw, 0
+        while len(lo) > min_buckets * factor:
+            lo, hi = _reduce_blocks(lo, hi, factor)
+            level += 1
+            columns[f"L{level}/{name}/min"] = lo
+            columns[f"L{level}/{name}/max"] = hi
+        levels = max(levels, level)
+    meta = {
+        'factor': factor,
+        'levels': levels,
+        'curves': list(curves),
+        'n_samples': int(len(depth)),
+        'min_depth': float(np.nanmin(depth)) if len(depth) else None,
+        'max_depth': float(np.nanmax(depth)) if len(depth) else None,
+    }
+    return columns, meta
+
+
+def _touch(path):
+    """Marca de uso reciente para el LRU de disco."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _pyramid_entries():
+    entries = []
+    try:
+        names = os.listdir(LOD_DIR)
+    except OSError:
+        return entries
+    for name in names:
+        if name.endswith(STORE_EXT):
+            path = os.path.join(LOD_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def evict_pyramids(max_bytes=None, keep=None):
+    """Borra las pirámides menos usadas hasta quedar bajo `max_bytes` (nunca `keep`)."""
+    max_bytes = MAX_LOD_BYTES if max_bytes is None else max_bytes
+    entries = _pyramid_entries()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):  # Más antigua (menos usada) primero
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def clear_pyramids():
+    """Borra todas las pirámides (DELETE /cache)."""
+    return evict_pyramids(max_bytes=-1)
+
+
+def pyramid_exists(lod_id):
+    return os.path.exists(lod_path(lod_id))
+
+
+def pyramid_stats():
+    entries = _pyramid_entries()
+    return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries), 'limit_bytes': MAX_LOD_BYTES}
+
+
+def write_pyramid(lod_id, depth, curves):
+    """
+    Genera y guarda la pirámide y aplica el tope de disco a las demás. Si ya
+    existe (mismo contenido, mismo id) no se recalcula: se lee su meta.
+    """
+    path = lod_path(lod_id)
+    if os.path.exists(path):
+        try:
+            with open_well(path) as store:
+                meta = store.meta
+            _touch(path)
+            return {'id': lod_id, **meta}
+        except (OSError, WellStoreError):
+            pass  # Desalojada o ilegible entre medio: se regenera
+    columns, meta = build_pyramid(depth, curves)
+    os.makedirs(LOD_DIR, exist_ok=True)
+    write_columns(path, columns, meta=meta, index='depth')
+    evict_pyramids(keep=path)
+    return {'id': lod_id, **meta}
+
+
+def _group(lo, hi, target):
+    """Combina bloques contiguos hasta quedar con ~`target` grupos."""
+    n = len(lo)
+    if n <= target:
+        return lo, hi, np.arange(n)
+    starts = np.linspace(0, n, target, endpoint=False).astype(np.int64)
+    return np.fmin.reduceat(lo, starts), np.fmax.reduceat(hi, starts), starts
+
+
+def query_window(lod_id, curves=None, top=None, base=None, px=800):
+    """
+    Curvas de la ventana [top, base] para `px` píxeles verticales.
+    Si la ventana tiene <= 2*px muestras se devuelven crudas (exactas); si no, una
+    envolvente min/max por píxel, intercalada (min, max) para dibujar como polilínea.
+    """
+    path = lod_path(lod_id)
+    if not os.path.exists(path):
+        raise LODNotFound(f"Pirámide {lod_id} no encontrada")
+    _touch(path)
+    px = max(1, int(px))
+
+    with open_well(path) as store:
+        meta = store.meta
+        names = [c for c in (curves or meta['curves']) if c in store]
+        rows = store.depth_slice(top, base)
+        i0, i1 = rows.start, rows.stop
+        n = i1 - i0
+        depth = store.raw('depth')
+
+        result = {'id': lod_id, 'top': top, 'base': base, 'n_samples': n,
+                  'level': 0, 'envelope': False, 'curves': {}}
+        if n <= 2 * px:
+            result['depths'] = depth[i0:i1].tolist()
+            for name in names:
+                result['curves'][name] = store.raw(name)[i0:i1].tolist()
+            return result
+
+        # Nivel más grueso con al menos `px` bloques completos dentro de la ventana
+        factor = meta['factor']
+        level = 0
+        while level < meta['levels'] and n // factor ** (level + 1) >= px:
+            level += 1
+        size = factor ** level
+        b0, b1 = -(-i0 // size), i1 // size  # Bloques completos [b0, b1)
+        if b1 <= b0:
+            level, size, b0, b1 = 0, 1, i0, i1
+
+        # Límites (en filas crudas) de cada unidad: borde superior, bloques, borde inferior
+        bounds = [i0] + list(range(b0 * size, b1 * size + 1, size)) + [i1]
+        bounds = np.unique(np.clip(bounds, i0, i1))
+
+        for name in names:
+            raw = store.raw(name)
+            if level == 0:
+                lo = hi = np.asarray(raw[i0:i1])
+            else:
+                head, tail = raw[i0:b0 * size], raw[b1 * size:i1]
+                lo_parts, hi_parts = [], []
+                if len(head):
+                    lo_parts.append([np.fmin.reduce(head)])
+                    hi_parts.append([np.fmax.reduce(head)])
+                lo_parts.append(store.raw(f"L{level}/{name}/min")[b0:b1])
+                hi_parts.append(store.raw(f"L{level}/{name}/max")[b0:b1])
+                if len(tail):
+                    lo_parts.append([np.fmin.reduce(tail)])
+                    hi_parts.append([np.fmax.reduce(tail)])
+                lo, hi = np.concatenate(lo_parts), np.concatenate(hi_parts)
+            glo, ghi, starts = _group(lo, hi, px)
+            result['curves'][name] = np.column_stack([glo, ghi]).ravel().tolist()
+
+        # Profundidad de cada grupo: techo y base (en filas crudas)
+        unit_rows = bounds[:-1] if level else np.arange(i0, i1)
+        ends = np.append(unit_rows[starts[1:]], i1) - 1
+        result['depths'] = np.column_stack([depth[unit_rows[starts]], depth[ends]]).ravel().tolist()
+        result.update(level=level, envelope=True, bucket_samples=int(size * max(1, len(lo) // px)))
+        return result
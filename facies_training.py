@@ -0,0 +1,428 @@
+import os
+import sys
+import glob
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from curve_lod import LODNotFound, lod_path
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geomind_saas'))
+from well_store import STORE_EXT, WellStoreError, open_well, write_columns, load_response
+from electrofacies import (
+    BATCH_SIZE,
+    DEFAULT_K,
+    FACIES_CURVES,
+    K_SAMPLE,
+    MIN_SAMPLES,
+    RANDOM_STATE,
+    FaciesModel,
+    FaciesModelError,
+    field_key,
+    load_field_model,
+    model_path,
+    pca_from_covariance,
+    save_field_model,
+    select_k,
+    MAX_COMPONENTS,
+)
+
+# ==============================================================================
+# DATATERRA - ENTRENAMIENTO DE ELECTROFACIES POR CAMPO
+# Un modelo para todos los pozos guardados del campo (processed_data/ y, a
+# pedido, los proyectos SQLite). Los pozos se leen por bloques de filas y nunca
+# se concatenan: momentos (media/covarianza) y una reserva acotada de muestras
+# en la 1ª pasada, MiniBatchKMeans.partial_fit por bloque en las siguientes.
+# ==============================================================================
+
+HISTORY_DIR = "processed_data"
+PROJECT_DB = "geomind_local.db"
+CHUNK_ROWS = 65536
+EPOCHS = 2
+RELABEL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class StoredWell:
+    """
+    Pozo guardado: origen, nombre y campo (del header). `columns()` abre sus
+    curvas como vistas (mmap en .dtw) con nombres en mayúsculas y DEPTH.
+    Fuentes: 'lod' (pirámide a resolución completa), 'history' (curvas
+    muestreadas de la respuesta guardada) y 'project' (proyecto SQLite).
+    """
+
+    def __init__(self, name, field, source, path, response=None, key=None):
+        self.name = name
+        self.field = field
+        self.source = source
+        self.path = path
+        self.key = key or path
+        self._response = response
+
+    @contextmanager
+    def columns(self):
+        if self.source in ('lod', 'project'):
+            with open_well(self.path) as store:
+                cols = {str(n).upper(): store.raw(n) for n in store.names if len(store.specs[n]['shape']) == 1}
+                if store.index is not None:
+                    cols['DEPTH'] = store.raw(store.index)
+                yield cols
+            return
+        response = self._response
+        if response is None:
+            response = load_response(self.path) if self.path.endswith(STORE_EXT) else _read_json(self.path)
+        cols = {str(k).upper(): np.asarray(v, dtype=np.float64) for k, v in response.get('curves', {}).items()}
+        cols['DEPTH'] = np.asarray(response.get('depths', []), dtype=np.float64)
+        yield cols
+
+    def curve_names(self):
+        with self.columns() as cols:
+            return set(cols)
+
+    def chunks(self, curves, chunk_rows=CHUNK_ROWS):
+        """Bloques (profundidad, X) con las filas sin nulos en `curves`; X es float64 n × p."""
+        with self.columns() as cols:
+            n = len(cols['DEPTH'])
+            for i0 in range(0, n, chunk_rows):
+                i1 = min(n, i0 + chunk_rows)
+                x = np.empty((i1 - i0, len(curves)))
+                for j, c in enumerate(curves):
+                    x[:, j] = cols[c][i0:i1]
+                valid = np.isfinite(x).all(axis=1)
+                if valid.any():
+                    yield np.asarray(cols['DEPTH'][i0:i1], dtype=np.float64)[valid], x[valid]
+
+    def describe(self):
+        return {'well': self.name, 'field': self.field, 'source': self.source,
+                'path': os.path.basename(self.path)}
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _history_entry(path):
+    """(well_info, lod, response) de una respuesta guardada; en .dtw sólo se lee el header."""
+    if path.endswith(STORE_EXT):
+        with open_well(path) as store:
+            meta = store.meta
+        return meta.get('well_info') or {}, meta.get('lod'), None
+    response = _read_json(path)
+    return response.get('well_info') or {}, response.get('lod'), response
+
+
+def discover_wells(field=None, history_dir=HISTORY_DIR, include_projects=False, project_db=PROJECT_DB):
+    """
+    Pozos guardados (el más reciente por pozo) del campo `field` (None = todos).
+    Si la pirámide LOD del análisis sigue en disco se usan las curvas completas.
+    `include_projects` suma los proyectos SQLite del mismo campo (los guardados
+    sin campo sólo entran cuando `field` es None).
+    """
+    target = field_key(field)
+    paths = glob.glob(os.path.join(history_dir, "*.json")) + glob.glob(os.path.join(history_dir, f"*{STORE_EXT}"))
+    paths.sort(key=os.path.getmtime, reverse=True)
+
+    wells, seen = [], set()
+    for path in paths:
+        try:
+            info, lod, response = _history_entry(path)
+        except (OSError, ValueError, WellStoreError) as e:
+            print(f"Historial ilegible {path}: {e}")
+            continue
+        well_field = info.get('field')
+        if target is not None and field_key(well_field) != target:
+            continue
+        name = info.get('well_name') or os.path.splitext(os.path.basename(path))[0]
+        key = (field_key(well_field), name)
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            full = lod_path(lod['id']) if isinstance(lod, dict) and lod.get('id') else None
+        except LODNotFound:
+            full = None
+        if full is not None and os.path.exists(full):
+            wells.append(StoredWell(name, well_field, 'lod', full, key=key))
+        else:
+            wells.append(StoredWell(name, well_field, 'history', path, response=response, key=key))
+
+    if include_projects and os.path.exists(project_db):
+        conn = sqlite3.connect(project_db)
+        try:
+            rows = conn.execute("SELECT id, well_name, result_json FROM projects ORDER BY id DESC").fetchall()
+        finally:
+            conn.close()
+        for pid, name, result_json in rows:
+            package = json.loads(result_json or '{}')
+            project_field = package.get('field')
+            if target is not None and field_key(project_field) != target:
+                continue
+            store = package.get('store')
+            if store and os.path.exists(store):
+                wells.append(StoredWell(name or f"project_{pid}", project_field, 'project', store, key=('project', pid)))
+    return wells
+
+
+def common_curves(wells):
+    """Curvas de facies presentes en todos los pozos (orden canónico)."""
+    names = [w.curve_names() for w in wells]
+    return [c for c in FACIES_CURVES if all(c in n for n in names)]
+
+
+# =============================================================================
+# PASADA 1: MOMENTOS + RESERVA DE MUESTRAS
+# =============================================================================
+class StreamingMoments:
+    """Media y matriz de co-momentos centrados, combinadas por bloque (Chan et al.)."""
+
+    def __init__(self, p):
+        self.n = 0
+        self.mean = np.zeros(p)
+        self.m2 = np.zeros((p, p))
+
+    def update(self, x):
+        nb = len(x)
+        if nb == 0:
+            return
+        mean_b = x.mean(axis=0)
+        xc = x - mean_b
+        m2_b = xc.T @ xc
+        delta = mean_b - self.mean
+        n = self.n + nb
+        self.m2 += m2_b + np.outer(delta, delta) * (self.n * nb / n)
+        self.mean += delta * (nb / n)
+        self.n = n
+
+    def scale(self):
+        """Desvío poblacional (1 en curvas constantes, como StandardScaler)."""
+        std = np.sqrt(np.diag(self.m2) / max(self.n, 1))
+        std[std == 0] = 1.0
+        return std
+
+    def correlation(self):
+        """Covarianza de los datos estandarizados (lo que ve la PCA)."""
+        s = self.scale()
+        return self.m2 / max(self.n - 1, 1) / np.outer(s, s)
+
+
+class Reservoir:
+    """
+    Muestra uniforme de tamaño fijo sobre todo el flujo: cada fila recibe una
+    clave aleatoria y se conservan las `size` menores (argpartition por bloque).
+    """
+
+    def __init__(self, size, p, random_state=RANDOM_STATE):
+        self.size = size
+        self.rng = np.random.default_rng(random_state)
+        self.keys = np.empty(0)
+        self.rows = np.empty((0, p))
+
+    def update(self, x):
+        keys = np.concatenate([self.keys, self.rng.random(len(x))])
+        rows = np.concatenate([self.rows, x])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, rows = keys[keep], rows[keep]
+        self.keys, self.rows = keys, rows
+
+
+# =============================================================================
+# ENTRENAMIENTO
+# =============================================================================
+def _stream(wells, curves, chunk_rows):
+    for well in wells:
+        for _, x in well.chunks(curves, chunk_rows):
+            yield x
+
+
+def train_field_model(field, k=DEFAULT_K, curves=None, wells=None, epochs=EPOCHS, chunk_rows=CHUNK_ROWS,
+                      sample_size=K_SAMPLE, include_projects=False, history_dir=HISTORY_DIR,
+                      random_state=RANDOM_STATE, save=True):
+    """
+    Ajusta y guarda el modelo de facies del campo con todos sus pozos guardados.
+      1. Momentos en streaming → escalado y PCA (autovectores de la correlación).
+      2. Reserva de `sample_size` filas → k ('auto': silhouette) y centroides
+         iniciales (k-means++ sobre la muestra, no sobre el primer pozo leído).
+      3. `epochs` pasadas de MiniBatchKMeans.partial_fit, bloque a bloque.
+      4. Una pasada de predicción para ordenar los clusters por GR medio.
+    Retorna (modelo, resumen).
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    t0 = time.perf_counter()
+    if wells is None:
+        wells = discover_wells(field, history_dir=history_dir, include_projects=include_projects)
+    if not wells:
+        raise FaciesModelError(f"No hay pozos guardados del campo {field}")
+    curves = [c.upper() for c in curves] if curves is not None else common_curves(wells)
+    usable = [w for w in wells if all(c in w.curve_names() for c in curves)]
+    skipped = [w.describe() for w in wells if w not in usable]
+    if len(curves) < 2 or not usable:
+        raise FaciesModelError(f"Se necesitan ≥2 curvas comunes a los pozos (comunes: {curves})")
+    p = len(curves)
+
+    # ---- Pasada 1: escalado, PCA y muestra ----
+    moments = StreamingMoments(p)
+    reservoir = Reservoir(sample_size, p, random_state)
+    for x in _stream(usable, curves, chunk_rows):
+        moments.update(x)
+        reservoir.update(x)
+    if moments.n < MIN_SAMPLES:
+        raise FaciesModelError(f"Muy pocas muestras válidas en el campo ({moments.n})")
+    mean, scale = moments.mean, moments.scale()
+    n_components = min(MAX_COMPONENTS, p)
+    components, ratio = pca_from_covariance(moments.correlation(), n_components)
+
+    def to_scores(x):
+        return ((x - mean) / scale) @ components.T
+
+    # ---- k y centroides iniciales sobre la muestra ----
+    sample_scores = to_scores(reservoir.rows)
+    info = {}
+    if k == 'auto':
+        k, info['k_scores'] = select_k(sample_scores, random_state=random_state)
+    k = int(min(k, len(sample_scores)))
+    init = KMeans(n_clusters=k, n_init=10, random_state=random_state).fit(sample_scores).cluster_centers_
+
+    # ---- Pasadas 2..: partial_fit por bloque ----
+    km = MiniBatchKMeans(n_clusters=k, init=init, n_init=1, batch_size=BATCH_SIZE, random_state=random_state)
+    for _ in range(max(1, int(epochs))):
+        for x in _stream(usable, curves, chunk_rows):
+            scores = to_scores(x)
+            for i in range(0, len(scores), BATCH_SIZE):
+                km.partial_fit(scores[i:i + BATCH_SIZE])
+
+    # ---- Orden de clusters por GR medio (o la primera curva) ----
+    provisional = FaciesModel(curves, mean, scale, components, ratio, km.cluster_centers_)
+    ref = curves.index('GR') if 'GR' in curves else 0
+    counts = np.zeros(k)
+    sums = np.zeros(k)
+    for x in _stream(usable, curves, chunk_rows):
+        labels = provisional.predict(x)
+        counts += np.bincount(labels, minlength=k)
+        sums += np.bincount(labels, weights=x[:, ref], minlength=k)
+    means = np.full(k, np.inf)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    order = np.argsort(means, kind='stable')
+
+    model = FaciesModel(curves, mean, scale, components, ratio, km.cluster_centers_[order],
+                        field=field, n_train=moments.n,
+                        method=f'PCA + MiniBatchKMeans (campo, {len(usable)} pozos)')
+    summary = {
+        'field': field_key(field),
+        'model': model.describe(),
+        'wells_used': [w.describe() for w in usable],
+        'wells_skipped': skipped,
+        'n_samples': int(moments.n),
+        'epochs': max(1, int(epochs)),
+        'elapsed_s': round(time.perf_counter() - t0, 2),
+    }
+    if 'k_scores' in info:
+        summary['k_scores'] = {str(kk): round(v, 3) for kk, v in info['k_scores'].items()}
+    if save:
+        summary['path'] = save_field_model(model, field)
+    return model, summary
+
+
+# =============================================================================
+# RE-ETIQUETADO DE TODOS LOS POZOS GUARDADOS
+# =============================================================================
+def _safe_name(name):
+    return "".join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(name)).strip('_') or 'pozo'
+
+
+def relabel_well(model, well, out_dir=None, chunk_rows=CHUNK_ROWS):
+    """
+    Clasifica un pozo con el modelo del campo (un producto de matrices por
+    bloque). Con `out_dir` guarda DEPTH/FACIES en <out_dir>/<pozo>.dtw.
+    """
+    if not all(c in well.curve_names() for c in model.curves):
+        return {**well.describe(), 'error': f"Faltan curvas del modelo ({', '.join(model.curves)})"}
+    depths, labels = [], []
+    for depth, x in well.chunks(model.curves, chunk_rows):
+        depths.append(depth)
+        labels.append(model.predict(x).astype(np.int8))
+    depth = np.concatenate(depths) if depths else np.empty(0)
+    label = np.concatenate(labels) if labels else np.empty(0, dtype=np.int8)
+    counts = np.bincount(label, minlength=model.k)
+    result = {
+        **well.describe(),
+        'n_classified': int(len(label)),
+        'distribution': {name: int(c) for name, c in zip(model.names, counts) if c > 0},
+    }
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{_safe_name(well.name)}{STORE_EXT}")
+        write_columns(path, {'depth': depth, 'FACIES': label},
+                      meta={'well': well.name, 'field': field_key(model.field), 'facies_names': model.names},
+                      index='depth')
+        result['labels_path'] = path
+    return result
+
+
+def relabel_wells(field, model=None, wells=None, include_projects=False, history_dir=HISTORY_DIR,
+                  write=True, workers=RELABEL_WORKERS, chunk_rows=CHUNK_ROWS):
+    """
+    Re-etiqueta todos los pozos guardados del campo con su modelo. Los pozos se
+    procesan en hilos (lectura mmap + BLAS liberan el GIL). Las etiquetas van a
+    <carpeta de modelos>/<CAMPO>/<pozo>.dtw.
+    """
+    t0 = time.perf_counter()
+    model = model or load_field_model(field)
+    if model is None:
+        raise FaciesModelError(f"El campo {field} no tiene modelo de facies")
+    if wells is None:
+        wells = discover_wells(field, history_dir=history_dir, include_projects=include_projects)
+    out_dir = os.path.splitext(model_path(field))[0] if write else None
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        results = list(ex.map(lambda w: relabel_well(model, w, out_dir, chunk_rows), wells))
+    return {
+        'field': field_key(field),
+        'model': model.describe(),
+        'wells': results,
+        'n_classified': sum(r.get('n_classified', 0) for r in results),
+        'elapsed_s': round(time.perf_counter() - t0, 2),
+    }
+
+
+def train_and_relabel(field, k=DEFAULT_K, curves=None, epochs=EPOCHS, include_projects=False,
+                      relabel=True, history_dir=HISTORY_DIR):
+    """Trabajo completo (una sola búsqueda de pozos): entrenar, guardar y re-etiquetar."""
+    wells = discover_wells(field, history_dir=history_dir, include_projects=include_projects)
+    model, summary = train_field_model(field, k=k, curves=curves, wells=wells, epochs=epochs)
+    if relabel:
+        summary['relabel'] = relabel_wells(field, model=model, wells=wells)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrena el modelo de electrofacies de un campo "
+                                                 "con todos sus pozos guardados y re-etiqueta los pozos.")
+    parser.add_argument("field", help="Campo (header FLD de los LAS)")
+    parser.add_argument("--k", default=str(DEFAULT_K), help="Número de facies o 'auto'")
+    parser.add_argument("--curves", nargs="+", help="Curvas del modelo (por defecto las comunes a todos los pozos)")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--projects", action="store_true", help="Incluir proyectos SQLite del mismo campo")
+    parser.add_argument("--history-dir", default=HISTORY_DIR)
+    parser.add_argument("--no-relabel", action="store_true")
+    args = parser.parse_args(argv)
+
+    k = 'auto' if args.k.lower() == 'auto' else int(args.k)
+    curves = args.curves
+    try:
+        summary = train_and_relabel(args.field, k=k, curves=curves, epochs=args.epochs,
+                                    include_projects=args.projects, relabel=not args.no_relabel,
+                                    history_dir=args.history_dir)
+    except FaciesModelError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,8 @@ import sys
 import os
 import numpy as np
 import pandas as pd
-import lasio
+from las_fast import read_las
+from decline import arps_rate
 from datetime import datetime
 import tempfile
 from scipy.interpolate import griddata, Rbf
@@ -90,7 +91,7 @@ class DataImporter:
     def import_las(self, file_path):
         """Importa archivos LAS reales"""
         try:
-            las = lasio.read(file_path)
+            las = read_las(file_path)
             df = las.df()
             df.reset_index(inplace=True)
             
@@ -324,41 +325,22 @@ class SimulacionYacimiento:
             raise ValueError("Configurar fluido primero")
         
         tiempo = np.arange(0, tiempo_meses + 1)
-        produccion_mensual = []
-        presion = []
-        volumen_remaining = []
         
-        vol_actual = volumen_inicial
-        pres_actual = presion_inicial
-        
-        # Parámetros de declinación según método
+        # Parámetros de declinación según método (di mensual, b de Arps)
         if metodo == 'exponencial':
-            decline_rate = 0.05
+            decline_rate, b_factor = 0.05, 0.0
         elif metodo == 'hiperbolico':
-            decline_rate = 0.1
-            b_factor = 0.8
+            decline_rate, b_factor = 0.1, 0.8
         else:  # armónico
-            decline_rate = 0.15
-        
-        for t in tiempo:
-            if metodo == 'exponencial':
-                tasa_produccion = volumen_inicial * decline_rate * np.exp(-decline_rate * t)
-            elif metodo == 'hiperbolico':
-                tasa_produccion = volumen_inicial * decline_rate / (1 + b_factor * decline_rate * t)**(1/b_factor)
-            else:  # armónico
-                tasa_produccion = volumen_inicial * decline_rate / (1 + decline_rate * t)
-            
-            if vol_actual > tasa_produccion:
-                produccion_mensual.append(tasa_produccion)
-                vol_actual -= tasa_produccion
-                pres_actual = presion_inicial * (vol_actual / volumen_inicial)
-            else:
-                produccion_mensual.append(vol_actual)
-                vol_actual = 0
-                pres_actual = 0
-            
-            volumen_remaining.append(vol_actual)
-            presion.append(pres_actual)
+            decline_rate, b_factor = 0.15, 1.0
+        
+        # Curva completa en forma cerrada; cada mes produce a lo sumo lo que
+        # queda (volumen menos lo producido antes), y nada una vez agotado
+        tasa = arps_rate(volumen_inicial * decline_rate, decline_rate, b_factor, tiempo)
+        previo = np.cumsum(tasa) - tasa
+        produccion_mensual = np.minimum(tasa, np.maximum(volumen_inicial - previo, 0.0))
+        volumen_remaining = np.maximum(volumen_inicial - np.cumsum(produccion_mensual), 0.0)
+        presion = presion_inicial * (volumen_remaining / volumen_inicial)
         
         return {
             'tiempo': tiempo,
@@ -10,6 +10,18 @@ import db_manager
 import report_generator
 import math
 from license_config import LICENSES
+from downsampling import minmax_indices
+from petro_sensitivity import run_sensitivity
+from volumetrics import VARIABLES, UNITS, run_volumetrics, well_distributions
+
+# Máximo de puntos por traza en las pistas Plotly (pozos de 100k+ muestras)
+TRACK_MAX_POINTS = 2000
+
+def track_xy(values, depth, max_points=TRACK_MAX_POINTS):
+    """Pista submuestreada con min/max por bucket (conserva picos y capas delgadas)."""
+    values = pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype=float)
+    idx = minmax_indices(values, max_points)
+    return values[idx], np.asarray(depth)[idx]
 
 # =============================================================================
 # MOTOR GEOFÍSICO (Petrel-Lite Capabilities)
@@ -478,7 +490,9 @@ if check_password():
         well_name = st.session_state.get("las_filename", "Sin Nombre")
         st.sidebar.success(f"[OK] {well_name}")
         if st.sidebar.button("💾 Guardar Proyecto"):
-            db_manager.save_project(well_name, well_name, df_active)
+            las_obj = st.session_state.get("las_object", None)
+            field = las_obj.well["FLD"].value if las_obj is not None and "FLD" in las_obj.well else None
+            db_manager.save_project(well_name, well_name, df_active, field=field or None)
             st.sidebar.success("Guardado en Local DB")
 
     # =============================================================================
@@ -758,17 +772,18 @@ if check_password():
                         depth = df_active.index
                         
                         # 1. IMPEDANCIA (AI)
-                        fig_geo.add_trace(go.Scatter(x=st.session_state['geo_ai'], y=depth, line=dict(color='yellow', width=1.2, shape='hv'), name='AI'), row=1, col=1)
+                        ai_x, ai_y = track_xy(st.session_state['geo_ai'], depth)
+                        fig_geo.add_trace(go.Scatter(x=ai_x, y=ai_y, line=dict(color='yellow', width=1.2, shape='hv'), name='AI'), row=1, col=1)
                         
                         # 2. REFLECTIVIDAD (RC)
-                        rc_val = st.session_state['geo_rc']
-                        fig_geo.add_trace(go.Bar(x=rc_val, y=depth, orientation='h', marker_color='cyan', name='RC'), row=1, col=2)
+                        rc_x, rc_y = track_xy(st.session_state['geo_rc'], depth)
+                        fig_geo.add_trace(go.Bar(x=rc_x, y=rc_y, orientation='h', marker_color='cyan', name='RC'), row=1, col=2)
                         
                         # 3. SINTÉTICO (WIGGLE)
-                        synth = st.session_state['geo_synth']
-                        fig_geo.add_trace(go.Scatter(x=synth, y=depth, line=dict(color='white', width=1), name='Synth'), row=1, col=3)
+                        synth, synth_y = track_xy(st.session_state['geo_synth'], depth)
+                        fig_geo.add_trace(go.Scatter(x=synth, y=synth_y, line=dict(color='white', width=1), name='Synth'), row=1, col=3)
                         # Área Variable (Peak Fill)
-                        fig_geo.add_trace(go.Scatter(x=np.where(synth>=0, synth, 0), y=depth, fill='tozerox', fillcolor='rgba(0,255,255,0.5)', line=dict(width=0), showlegend=False), row=1, col=3)
+                        fig_geo.add_trace(go.Scatter(x=np.where(synth>=0, synth, 0), y=synth_y, fill='tozerox', fillcolor='rgba(0,255,255,0.5)', line=dict(width=0), showlegend=False), row=1, col=3)
                         
                         # 4. WAVELET
                         t_w, r_w = GeophysicsEngine.ricker_wavelet(freq, 0.1, 0.002)
@@ -788,8 +803,10 @@ if check_password():
             if 'VSH_FINAL' in df_active.columns and 'PHIE_FINAL' in df_active.columns:
                  fig_lith = go.Figure()
                  # Use 'spline' shape for smooth, bezier-like curves (Electrocardiogram style)
-                 fig_lith.add_trace(go.Scatter(x=df_active['VSH_FINAL'], y=df_active.index, fill='tozerox', name='Vclay', line=dict(color='#22c55e', shape='spline', smoothing=0.3)))
-                 fig_lith.add_trace(go.Scatter(x=df_active['PHIE_FINAL'], y=df_active.index, fill='tozerox', name='Porosity', line=dict(color='#00f2ff', shape='spline', smoothing=0.3)))
+                 vsh_x, vsh_y = track_xy(df_active['VSH_FINAL'], df_active.index)
+                 phi_x, phi_y = track_xy(df_active['PHIE_FINAL'], df_active.index)
+                 fig_lith.add_trace(go.Scatter(x=vsh_x, y=vsh_y, fill='tozerox', name='Vclay', line=dict(color='#22c55e', shape='spline', smoothing=0.3)))
+                 fig_lith.add_trace(go.Scatter(x=phi_x, y=phi_y, fill='tozerox', name='Porosity', line=dict(color='#00f2ff', shape='spline', smoothing=0.3)))
                  fig_lith.update_yaxes(autorange="reversed")
                  fig_lith.update_layout(template="plotly_dark", height=800, title="Evaluación Litológica Rápida (Smoothed)")
                  st.plotly_chart(fig_lith, use_container_width=True)
@@ -1299,11 +1316,11 @@ if check_password():
                 for i, col in enumerate(selected_tracks):
                     # Intentar convertir a numerico si fue forzado por el user
                     try:
-                        y_data = df_active[col]
+                        x_track, y_track = track_xy(df_active[col], df_active.index)
                         # Añadir traza
                         fig_all.add_trace(go.Scatter(
-                            x=y_data, 
-                            y=df_active.index, 
+                            x=x_track, 
+                            y=y_track, 
                             mode='lines',
                             line=dict(color=colors[i], width=1, shape='spline', smoothing=0.3), 
                             name=col
@@ -1369,7 +1386,41 @@ if check_password():
                         st.toast("Modelo Petrofísico y Pay Flag Recalculados", icon="✅")
                     else:
                         st.error("Faltan curvas PHI/RT para el modelo.")
-            
+
+                # Sensibilidad: N juegos de parámetros contra el registro en una sola pasada por lotes
+                with st.expander("🎲 Sensibilidad Monte Carlo", expanded=False):
+                    mc_n = st.number_input("Realizaciones", 100, 20000, 2000, step=100)
+                    mc_unc = st.slider("Incertidumbre Rw / a (±%)", 0, 60, 25) / 100.0
+                    mc_mn = st.slider("Incertidumbre m / n (±)", 0.0, 0.6, 0.2, step=0.05)
+                    mc_rma = st.slider("ρ matriz (g/cc)", 2.55, 2.90, (2.63, 2.71))
+                    mc_rsh = st.slider("Rsh (ohm·m)", 0.5, 10.0, (1.0, 4.0))
+                    mc_model = st.radio("Modelo Sw", ["archie", "simandoux"], horizontal=True)
+                    if st.button("▶️ RUN MONTE CARLO"):
+                        if 'RT' in df_active.columns and ('RHOB' in df_active.columns or 'PHIE_FINAL' in df_active.columns):
+                            rma_mode = min(max(2.65, mc_rma[0]), mc_rma[1])
+                            dists = {
+                                'rw': ('triangular', rw_val * (1 - mc_unc), rw_val, rw_val * (1 + mc_unc)),
+                                'a': ('triangular', a_val * (1 - mc_unc), a_val, a_val * (1 + mc_unc)),
+                                'm': ('triangular', m_val - mc_mn, m_val, m_val + mc_mn),
+                                'n': ('triangular', n_val - mc_mn, n_val, n_val + mc_mn),
+                                'rsh': ('uniform', *mc_rsh),
+                                'rho_ma': ('triangular', mc_rma[0], rma_mode, mc_rma[1]),
+                            }
+                            vsh_curve = df_active['VSH_FINAL'].to_numpy() if 'VSH_FINAL' in df_active.columns else None
+                            if mc_model == 'simandoux' and vsh_curve is None:
+                                st.error("Simandoux requiere VSH (curva GR).")
+                            else:
+                                with st.spinner(f"Evaluando {mc_n:,} realizaciones..."):
+                                    st.session_state["petro_mc"] = run_sensitivity(
+                                        df_active.index.to_numpy(dtype=float), df_active['RT'].to_numpy(),
+                                        rhob=df_active['RHOB'].to_numpy() if 'RHOB' in df_active.columns else None,
+                                        phi=df_active['PHIE_FINAL'].to_numpy() if 'RHOB' not in df_active.columns else None,
+                                        vsh=vsh_curve, n_samples=int(mc_n), dists=dists, model=mc_model,
+                                        cutoffs={'phi_min': cut_phi, 'sw_max': cut_sw, 'vsh_max': cut_vsh},
+                                    )
+                        else:
+                            st.error("Faltan curvas RT y RHOB/PHI para la sensibilidad.")
+
             with c_fe2:
                 # Triple Combo Plot Simple
                 if 'PHIE_FINAL' in df_active.columns:
@@ -1378,14 +1429,17 @@ if check_password():
                                           subplot_titles=("Gamma Ray", "Resistivity", "Porosity", "PAY FLAG"))
                     
                     # Track 1: GR
-                    fig_log.add_trace(go.Scatter(x=df_active['GR'], y=df_active.index, line=dict(color='#10b981', width=1, shape='spline', smoothing=0.5), name='GR'), row=1, col=1)
+                    gr_x, gr_y = track_xy(df_active['GR'], df_active.index)
+                    fig_log.add_trace(go.Scatter(x=gr_x, y=gr_y, line=dict(color='#10b981', width=1, shape='spline', smoothing=0.5), name='GR'), row=1, col=1)
                     
                     # Track 2: RT (Resistividad necesita cuidado con spline en log, pero funciona visualmente)
-                    fig_log.add_trace(go.Scatter(x=df_active['RT'], y=df_active.index, line=dict(color='#f59e0b', width=1.5, shape='spline', smoothing=0.5), name='RT'), row=1, col=2)
+                    rt_x, rt_y = track_xy(df_active['RT'], df_active.index)
+                    fig_log.add_trace(go.Scatter(x=rt_x, y=rt_y, line=dict(color='#f59e0b', width=1.5, shape='spline', smoothing=0.5), name='RT'), row=1, col=2)
                     fig_log.update_xaxes(type="log", row=1, col=2, gridcolor='#333')
                     
                     # Track 3: PHI
-                    fig_log.add_trace(go.Scatter(x=df_active['PHIE_FINAL'], y=df_active.index, line=dict(color='#00f2ff', width=1, shape='spline', smoothing=0.5), name='PHIE'), row=1, col=3)
+                    phie_x, phie_y = track_xy(df_active['PHIE_FINAL'], df_active.index)
+                    fig_log.add_trace(go.Scatter(x=phie_x, y=phie_y, line=dict(color='#00f2ff', width=1, shape='spline', smoothing=0.5), name='PHIE'), row=1, col=3)
                     fig_log.update_xaxes(autorange="reversed", row=1, col=3)
                     
                     # Track 4: PAY FLAG (BANDERA VERDE)
@@ -1410,6 +1464,36 @@ if check_password():
                 else:
                     st.info("Ejecute el modelo base primero.")
 
+                mc = st.session_state.get("petro_mc")
+                if mc and mc['meta']['n_depth'] == len(df_active):
+                    meta, stats = mc['meta'], mc['stats']['net_pay']
+                    st.markdown(f"#### :: Sensibilidad Monte Carlo · {meta['n_samples']:,} realizaciones "
+                                f"({meta['model']}, {meta['elapsed_s']:.1f} s)")
+                    k1, k2, k3, k4 = st.columns(4)
+                    k1.metric("Net Pay P10", f"{stats['P10']:.1f} ft")
+                    k2.metric("Net Pay P50", f"{stats['P50']:.1f} ft")
+                    k3.metric("Net Pay P90", f"{stats['P90']:.1f} ft")
+                    k4.metric("HC Column P50", f"{mc['stats']['hc_column']['P50']:.2f} ft")
+
+                    fig_mc = make_subplots(rows=1, cols=3, column_widths=[0.35, 0.35, 0.3],
+                                           subplot_titles=("Sw P10 / P50 / P90", "PHI P10 / P50 / P90", "Net Pay (ft)"))
+                    for col, name, color in ((1, 'SW', '#3b82f6'), (2, 'PHI', '#00f2ff')):
+                        for label, width in (('P10', 0.6), ('P50', 1.5), ('P90', 0.6)):
+                            x, y = track_xy(mc['curves'][name][label], df_active.index)
+                            fig_mc.add_trace(go.Scatter(x=x, y=y, name=f"{name} {label}",
+                                                        line=dict(color=color, width=width, dash=None if label == 'P50' else 'dot')),
+                                             row=1, col=col)
+                        fig_mc.update_yaxes(autorange="reversed", row=1, col=col)
+                    fig_mc.add_trace(go.Histogram(x=mc['net_pay'], nbinsx=40, marker_color='#22c55e', name='Net Pay'), row=1, col=3)
+                    for label, dash in (('P10', 'dot'), ('P50', 'solid'), ('P90', 'dot')):
+                        fig_mc.add_vline(x=stats[label], line_dash=dash, line_color='white', row=1, col=3)
+                    fig_mc.update_layout(height=600, template="plotly_dark", showlegend=False)
+                    st.plotly_chart(fig_mc, use_container_width=True)
+
+                    if mc['sensitivity']:
+                        st.caption("Influencia sobre Net Pay (correlación de rangos de Spearman)")
+                        st.bar_chart(pd.Series(mc['sensitivity'], name='ρ'))
+
         # --- TAB 2: NMR STUDIO (Simulación LogIC) ---
         with t_fe2:
             st.subheader(":: NMR Pore Partitioning")
@@ -1461,7 +1545,7 @@ if check_password():
         st.caption(f"Analizando tramo: {z_top:.1f} - {z_base:.1f} ft ({len(df_zone)} pies de espesor bruto).")
         st.divider()
 
-        t1, t2, t3, t4 = st.tabs(["○ Pay Flag", "● Economía", "◘ Reporte PDF", "■ Exportar LAS"])
+        t1, t2, t3, t4, t5 = st.tabs(["○ Pay Flag", "● Economía", "◘ Reporte PDF", "■ Exportar LAS", "◆ OOIP Probabilístico"])
         
         with t1:
             c1, c2, c3 = st.columns(3)
@@ -1495,13 +1579,46 @@ if check_password():
                         st.metric("Net Pay Total", f"{net_pay:.1f} ft", f"N/G: {ntg:.2f}")
                         
                     else: st.warning("No se encontraron zonas productivas.")
+
+                    # Sensibilidad a cutoffs: toda la grilla PHI × SW × VSH en una pasada
+                    sens = ReservoirDetector.sweep_cutoffs(
+                        temp,
+                        np.round(np.linspace(max(cp - 0.05, 0), cp + 0.05, 11), 3),
+                        np.round(np.linspace(max(cs - 0.20, 0), min(cs + 0.20, 1), 9), 3),
+                        np.round(np.linspace(max(cv - 0.15, 0), min(cv + 0.15, 1), 7), 3),
+                    )
+                    if not sens.empty:
+                        st.markdown("**Sensibilidad de Net Pay a Cutoffs**")
+                        at_vsh = sens[np.isclose(sens['VSH_max'], sens['VSH_max'].unique()[len(sens['VSH_max'].unique()) // 2])]
+                        pivot = at_vsh.pivot(index='PHI_min', columns='SW_max', values='Net_Pay_ft')
+                        fig_sens = go.Figure(go.Heatmap(
+                            z=pivot.values, x=pivot.columns, y=pivot.index, colorscale='Viridis',
+                            colorbar=dict(title='Net Pay (ft)')
+                        ))
+                        fig_sens.update_layout(
+                            title=f"Net Pay (ft) · VSH máx {at_vsh['VSH_max'].iloc[0]:.2f}",
+                            xaxis_title='SW máx', yaxis_title='PHI mín', height=380, template='plotly_dark'
+                        )
+                        st.plotly_chart(fig_sens, use_container_width=True)
+                        with st.expander("Tabla completa de sensibilidad"):
+                            st.dataframe(sens)
                 else: st.error("Faltan curvas (Phi, Vsh, Sw). Ejecute módulo Petrofísico.")
 
         with t2:
-            oip = st.number_input("OIP (bbls)", value=5000000)
+            # P50 del OOIP Monte Carlo (pestaña OOIP Probabilístico) si ya se simuló
+            ooip_mc = st.session_state.get("ooip_mc")
+            oip = st.number_input("OIP (bbls)", value=int(ooip_mc['ooip_stb']['P50']) if ooip_mc else 5000000)
             pr = st.number_input("Precio ($)", value=70)
+            c_d1, c_d2, c_d3, c_d4 = st.columns(4)
+            modelo = c_d1.selectbox("Declinación", ["Exponencial", "Hiperbólica", "Armónica", "Hiperbólica modificada"])
+            di_sim = c_d2.number_input("Di (1/año)", value=0.15, min_value=0.001, step=0.05)
+            b_sim = {"Exponencial": 0.0, "Armónica": 1.0}.get(modelo)
+            if b_sim is None:
+                b_sim = c_d3.number_input("b", value=0.5, min_value=0.0, max_value=2.0, step=0.1)
+            d_lim_sim = (c_d4.number_input("D lím (1/año)", value=0.06, min_value=0.001, step=0.01)
+                         if modelo == "Hiperbólica modificada" else None)
             if st.button("Simular"):
-                sim = SimulationEngine.simular_produccion(oip, pr)
+                sim = SimulationEngine.simular_produccion(oip, pr, di_sim, b_sim, d_lim_sim)
                 st.line_chart(sim.set_index("Mes")["Ingresos_USD"])
                 st.metric("ROI 10y", f"${sim['Ingresos_USD'].sum()/1e6:.1f} MM")
 
@@ -1520,6 +1637,73 @@ if check_password():
             las_str = LASExporter.export_pandas_to_las(df_active, well_name) # Exportar TODO el pozo, no solo la zona
             st.download_button("■ Descargar Archivo .LAS", las_str, f"{well_name}_procesado.las", "text/plain")
 
+        with t5:
+            st.markdown("### OOIP Monte Carlo (7758 × A × h × φ × (1-Sw) / Bo)")
+            st.caption("Distribuciones triangulares (mín / moda / máx) con correlación φ–Sw; "
+                       "se simula por bloques hasta que P10/P50/P90 convergen.")
+            # Modas desde la zona: net pay de los intervalos detectados, φ y Sw promedio
+            pay_iv = st.session_state.get("pay_intervals")
+            h0 = float(pay_iv['Espesor_ft'].sum()) if pay_iv is not None and not pay_iv.empty else 50.0
+            phi_c = next((c for c in ('PHI', 'PHIE_FINAL') if c in df_zone.columns), None)
+            sw_c = next((c for c in ('SW', 'SW_ARCHIE') if c in df_zone.columns), None)
+            phi0 = float(np.nan_to_num(df_zone[phi_c].mean(), nan=0.18)) if phi_c else 0.18
+            sw0 = float(np.nan_to_num(df_zone[sw_c].mean(), nan=0.35)) if sw_c else 0.35
+            base = well_distributions(h0, phi0, sw0)
+
+            dists = {}
+            cols = st.columns(len(VARIABLES))
+            for col, name in zip(cols, VARIABLES):
+                _, lo, mode, hi = base[name]
+                with col:
+                    st.markdown(f"**{name}** ({UNITS[name]})")
+                    step = 0.01 if UNITS[name] == 'frac' else (0.05 if name == 'bo' else 1.0)
+                    vals = [st.number_input(lbl, value=float(v), step=step, format="%.3f" if step < 1 else "%.1f",
+                                            key=f"vol_{name}_{lbl}")
+                            for lbl, v in (("mín", lo), ("moda", mode), ("máx", hi))]
+                    dists[name] = ('triangular', *vals)
+
+            v1, v2, v3, v4 = st.columns(4)
+            rho = v1.slider("Correlación φ–Sw", -0.9, 0.9, -0.5, step=0.05)
+            tol = v2.select_slider("Tolerancia P10/P50/P90", [0.001, 0.0025, 0.005, 0.01, 0.02], value=0.005)
+            cores = v3.number_input("Núcleos", 1, 32, 1)
+            seed = v4.number_input("Semilla", 0, 10**6, 0)
+
+            if st.button("▶️ Simular OOIP"):
+                try:
+                    with st.spinner("Simulando..."):
+                        st.session_state["ooip_mc"] = run_volumetrics(dists, [('phi', 'sw', rho)], tol=tol,
+                                                                      seed=int(seed), workers=int(cores))
+                except ValueError as e:
+                    st.error(str(e))
+
+            res = st.session_state.get("ooip_mc")
+            if res:
+                o = res['ooip_stb']
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("P10", f"{o['P10'] / 1e6:.2f} MMstb")
+                m2.metric("P50", f"{o['P50'] / 1e6:.2f} MMstb")
+                m3.metric("P90", f"{o['P90'] / 1e6:.2f} MMstb")
+                m4.metric("Media", f"{o['mean'] / 1e6:.2f} MMstb",
+                          f"{res['n_samples']:,} realiz. · {res['elapsed_s']:.2f} s", delta_color="off")
+                if not res['converged']:
+                    st.warning("Se alcanzó el máximo de realizaciones sin converger a la tolerancia pedida.")
+
+                g1, g2 = st.columns([3, 2])
+                edges = np.asarray(res['histogram']['edges'])
+                fig_v = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2e6, y=res['histogram']['counts'],
+                                         marker_color='#a78bfa'))
+                for label, color in (('P10', '#f87171'), ('P50', '#fbbf24'), ('P90', '#4ade80')):
+                    fig_v.add_vline(x=o[label] / 1e6, line_dash='dash', line_color=color, annotation_text=label)
+                fig_v.update_layout(title="Distribución de OOIP", xaxis_title="OOIP (MMstb)", yaxis_title="Frecuencia",
+                                    height=380, template='plotly_dark', bargap=0.02)
+                g1.plotly_chart(fig_v, use_container_width=True)
+
+                conv = pd.DataFrame(res['convergence']).set_index('n') / 1e6
+                g2.markdown("**Convergencia (MMstb vs realizaciones)**")
+                g2.line_chart(conv)
+                g2.markdown("**Influencia sobre OOIP (Spearman)**")
+                g2.bar_chart(pd.Series(res['sensitivity'], name='ρ'))
+
     # 5. DATA INTEGRITY & AI SYSTEMS (Data Science)
     elif role == MODULES["DI"]:
         st.markdown("<h1 class='main-header'>:: Data Integrity & AI Systems</h1>", unsafe_allow_html=True)
@@ -4,7 +4,12 @@ import pandas as pd
 from datetime import datetime
 import os
 
+from well_store import STORE_EXT, write_frame, open_well
+
 DB_NAME = "geomind_local.db"
+# Curvas de cada proyecto en formato columnar mapeable (well_store.py)
+STORE_DIR = "geomind_projects"
+DEPTH_NAMES = ('DEPTH', 'DEPT', 'MD', 'PROF')
 
 def init_db():
     """Inicializa la base de datos local si no existe."""
@@ -24,31 +29,41 @@ def init_db():
     conn.commit()
     conn.close()
 
-def save_project(well_name, filename, df_results, params=None):
-    """Guarda un análisis completo en la base de datos."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Convertir DataFrame a JSON para almacenamiento ligero (o CSV string)
-    # Para datasets masivos, lo ideal es guardar parquet en disco y linkear, 
-    # pero para LAS típicos (10-50k filas) JSON comprimido o CSV string en BD aguanta bien.
-    # Aquí guardaremos resultados clave resumidos y parámetros, y la data cruda.
+def save_project(well_name, filename, df_results, params=None, field=None):
+    """Guarda un análisis completo en la base de datos (`field`: campo del header FLD)."""
+    # La BD guarda sólo metadatos, parámetros y resumen; las curvas van a un
+    # archivo columnar .dtw (un arreglo tipado por curva) que se abre por mmap
+    # sin re-parsear texto y permite leer sólo un rango de profundidad.
+    depth_col = next((col for col in df_results.columns if str(col).upper() in DEPTH_NAMES), None)
     
     result_package = {
         "params": params or {},
-        "data_csv": df_results.to_csv(index=False), # Guardamos data procesada
+        "field": field,
         "summary": df_results.describe().to_dict()
     }
     
     json_data = json.dumps(result_package)
     date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    c.execute("INSERT INTO projects (well_name, filename, upload_date, result_json) VALUES (?, ?, ?, ?)",
-              (well_name, filename, date_str, json_data))
-    
-    conn.commit()
-    project_id = c.lastrowid
-    conn.close()
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    try:
+        c.execute("INSERT INTO projects (well_name, filename, upload_date, result_json) VALUES (?, ?, ?, ?)",
+                  (well_name, filename, date_str, json_data))
+        project_id = c.lastrowid
+        
+        os.makedirs(STORE_DIR, exist_ok=True)
+        store_path = os.path.join(STORE_DIR, f"project_{project_id}{STORE_EXT}")
+        write_frame(store_path, df_results, index=str(depth_col) if depth_col is not None else None)
+        result_package["store"] = store_path
+        c.execute("UPDATE projects SET result_json=? WHERE id=?", (json.dumps(result_package), project_id))
+        conn.commit()
+    except Exception:
+        # Sin archivo .dtw no hay proyecto: se descarta la fila insertada
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
     return project_id
 
 def load_history():
@@ -58,8 +73,11 @@ def load_history():
     conn.close()
     return df
 
-def load_project_data(project_id):
-    """Recupera la data completa de un proyecto."""
+def load_project_data(project_id, top=None, base=None):
+    """
+    Recupera la data de un proyecto. `top`/`base` (opcionales) limitan el
+    DataFrame a ese rango de profundidad (sólo se leen esas filas del archivo).
+    """
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT result_json FROM projects WHERE id=?", (project_id,))
@@ -68,6 +86,11 @@ def load_project_data(project_id):
     
     if row:
         package = json.loads(row[0])
+        if "store" in package:
+            with open_well(package["store"]) as store:
+                df = store.to_frame(top=top, base=base) if store.index else store.to_frame()
+            return df, package["params"]
+        # Proyectos guardados antes del almacén columnar (CSV dentro del JSON)
         from io import StringIO
         df = pd.read_csv(StringIO(package["data_csv"]))
         return df, package["params"]
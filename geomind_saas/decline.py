@@ -0,0 +1,299 @@
+import numpy as np
+
+# =============================================================================
+# DECLINACIÓN DE ARPS (curvas en forma cerrada + ajuste por lotes)
+# t en años, di nominal anual, q en bbl/d (acumuladas en bbl). Todo con
+# broadcast: un pozo o miles de pozos × tiempos en una sola expresión.
+#   - exponencial (b = 0), hiperbólica (0 < b), armónica (b = 1)
+#   - hiperbólica modificada: hiperbólica hasta que la declinación instantánea
+#     D(t) = di / (1 + b·di·t) cae a `d_lim`, exponencial con d_lim después.
+# El ajuste de qi/di/b a historias de producción resuelve todos los pozos a la
+# vez: Levenberg-Marquardt sobre log q con sistemas normales apilados
+# (pozos × parámetros × parámetros), sin un curve_fit por pozo.
+# =============================================================================
+
+DAYS_PER_YEAR = 365.25
+_B_EXPONENTIAL = 1e-6  # b menor a esto se trata como exponencial
+MODELS = ('exponential', 'hyperbolic', 'harmonic', 'modified_hyperbolic')
+FIXED_B = {'exponential': 0.0, 'harmonic': 1.0}
+B_MAX = 2.0             # Cota superior de b en el ajuste (no convencionales llegan a ~2)
+DI_RANGE = (1e-4, 50.0)  # Cotas de di (1/año) en el ajuste
+FIT_MAX_ITER = 60
+FIT_TOL = 1e-8
+COST_FLOOR = 1e-6        # (error en ln q)² por punto bajo el cual el ajuste ya es exacto
+
+
+def _switch_time(di, b, d_lim):
+    """
+    Años hasta que la declinación hiperbólica llega a d_lim (0 si di ≤ d_lim).
+    Con b ≈ 0 la declinación es constante: si di > d_lim nunca llega (inf).
+    """
+    b_safe = np.maximum(b, _B_EXPONENTIAL)
+    t_sw = np.where(b < _B_EXPONENTIAL, np.inf, (di / d_lim - 1) / (b_safe * di))
+    return np.where(di <= d_lim, 0.0, t_sw)
+
+
+def _hyperbolic_rate(qi, di, b, t):
+    b_safe = np.maximum(b, _B_EXPONENTIAL)
+    return np.where(b < _B_EXPONENTIAL, qi * np.exp(-di * t), qi / (1 + b_safe * di * t) ** (1 / b_safe))
+
+
+def _hyperbolic_cumulative(qi, di, b, t):
+    # En años·(bbl/d); el llamador convierte a bbl
+    b_safe = np.where(np.abs(b - 1) < _B_EXPONENTIAL, 0.5, np.maximum(b, _B_EXPONENTIAL))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponential = qi / di * (1 - np.exp(-di * t))
+        harmonic = qi / di * np.log1p(di * t)
+        hyperbolic = qi / ((1 - b_safe) * di) * (1 - (1 + b_safe * di * t) ** (1 - 1 / b_safe))
+    return np.where(b < _B_EXPONENTIAL, exponential, np.where(np.abs(b - 1) < _B_EXPONENTIAL, harmonic, hyperbolic))
+
+
+def arps_rate(qi, di, b, t, d_lim=None):
+    """Caudal de Arps q(t); con `d_lim` (1/año), hiperbólica modificada."""
+    qi, di, b, t = (np.asarray(v, dtype=np.float64) for v in (qi, di, b, t))
+    if d_lim is None:
+        return _hyperbolic_rate(qi, di, b, t)
+    d_lim = np.asarray(d_lim, dtype=np.float64)
+    t_sw = _switch_time(di, b, d_lim)
+    q_sw = _hyperbolic_rate(qi, di, b, t_sw)
+    return np.where(t < t_sw, _hyperbolic_rate(qi, di, b, t), q_sw * np.exp(-d_lim * np.maximum(t - t_sw, 0)))
+
+
+def arps_cumulative(qi, di, b, t, d_lim=None):
+    """Producción acumulada Np(t) en bbl; con `d_lim`, hiperbólica modificada."""
+    qi, di, b, t = (np.asarray(v, dtype=np.float64) for v in (qi, di, b, t))
+    if d_lim is None:
+        return _hyperbolic_cumulative(qi, di, b, t) * DAYS_PER_YEAR
+    d_lim = np.asarray(d_lim, dtype=np.float64)
+    t_sw = _switch_time(di, b, d_lim)
+    q_sw = _hyperbolic_rate(qi, di, b, t_sw)
+    tail = q_sw / d_lim * (1 - np.exp(-d_lim * np.maximum(t - t_sw, 0)))
+    cum = np.where(t < t_sw, _hyperbolic_cumulative(qi, di, b, t), _hyperbolic_cumulative(qi, di, b, t_sw) + tail)
+    return cum * DAYS_PER_YEAR
+
+
+def arps_time_to_rate(qi, di, b, q_limit, d_lim=None):
+    """Años hasta que q(t) = q_limit (0 si qi ya está por debajo)."""
+    qi, di, b = (np.asarray(v, dtype=np.float64) for v in (qi, di, b))
+    ratio = np.maximum(qi / q_limit, 1.0)
+    b_safe = np.maximum(b, _B_EXPONENTIAL)
+    t_hyp = np.where(b < _B_EXPONENTIAL, np.log(ratio) / di, (ratio ** b_safe - 1) / (b_safe * di))
+    if d_lim is None:
+        return t_hyp
+    d_lim = np.asarray(d_lim, dtype=np.float64)
+    t_sw = _switch_time(di, b, d_lim)
+    q_sw = _hyperbolic_rate(qi, di, b, t_sw)
+    return np.where(t_hyp <= t_sw, t_hyp, t_sw + np.log(np.maximum(q_sw / q_limit, 1.0)) / d_lim)
+
+
+def model_b(model, b=None):
+    """b efectivo del modelo: fijo para exponencial/armónica, `b` para las hiperbólicas."""
+    if model not in MODELS:
+        raise ValueError(f"Modelo de declinación desconocido: {model} (válidos: {MODELS})")
+    if model in FIXED_B:
+        return FIXED_B[model]
+    if b is None:
+        raise ValueError(f"El modelo {model} requiere b")
+    return b
+
+
+def decline_curves(qi, di, b=0.0, months=120, d_lim=None):
+    """
+    Curvas mensuales del pronóstico: caudal al inicio de cada mes, volumen del
+    mes (diferencia exacta de acumuladas, no caudal × 30) y acumulada. qi, di,
+    b y d_lim aceptan arreglos (n,) → salidas (n, months).
+    """
+    t = np.arange(months + 1) / 12.0
+    qi, di, b = (np.asarray(v, dtype=np.float64)[..., None] for v in (qi, di, b))
+    if d_lim is not None:
+        d_lim = np.asarray(d_lim, dtype=np.float64)[..., None]
+    cum = arps_cumulative(qi, di, b, t, d_lim)
+    return {
+        'months': np.arange(1, months + 1),
+        'rate': arps_rate(qi, di, b, t[:-1], d_lim),
+        'volume': np.diff(cum, axis=-1),
+        'cumulative': cum[..., 1:],
+    }
+
+
+def decline_forecast(qi, di, b, months=60, q_limit=10.0, d_lim=None):
+    """Resumen del pronóstico: caudal y acumulada a 1 año, EUR al límite económico o al horizonte."""
+    horizon = months / 12
+    t_limit = float(arps_time_to_rate(qi, di, b, q_limit, d_lim))
+    return {
+        'qi': round(float(qi), 2),
+        'di': di,
+        'b': b,
+        'rate_1y': round(float(arps_rate(qi, di, b, 1.0, d_lim)), 2),
+        'cum_1y': round(float(arps_cumulative(qi, di, b, min(1.0, t_limit), d_lim)), 0),
+        'eur': round(float(arps_cumulative(qi, di, b, min(horizon, t_limit), d_lim)), 0),
+        'years_to_limit': round(t_limit, 2),
+    }
+
+
+# =============================================================================
+# AJUSTE POR LOTES (Levenberg-Marquardt vectorizado sobre todos los pozos)
+# Parámetros por pozo p = (ln qi, ln di[, b]); residuos r = ln q̂(t) - ln q(t)
+# en las muestras válidas (q > 0, finitas). Cada iteración arma J (pozos ×
+# tiempos × parámetros) por diferencias hacia adelante, resuelve los sistemas
+# (JᵀJ + λ·diag(JᵀJ)) δ = -Jᵀr apilados con np.linalg.solve y acepta el paso
+# por pozo si baja el costo (λ se ajusta por pozo). Solo los pozos aún activos
+# se re-evalúan.
+# =============================================================================
+
+def pad_histories(histories):
+    """[(t, q), ...] de largos distintos → (t, q) de (pozos × máx largo) rellenos con NaN."""
+    width = max((len(q) for _, q in histories), default=0)
+    t_out = np.full((len(histories), width), np.nan)
+    q_out = np.full((len(histories), width), np.nan)
+    for i, (t, q) in enumerate(histories):
+        t_out[i, :len(t)] = t
+        q_out[i, :len(q)] = q
+    return t_out, q_out
+
+
+def _log_rate(params, t, b_fixed, d_lim):
+    qi, di = np.exp(params[:, 0:1]), np.exp(params[:, 1:2])
+    b = params[:, 2:3] if b_fixed is None else b_fixed
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        return np.log(arps_rate(qi, di, b, t, d_lim))
+
+
+def _param_bounds(k):
+    """Cotas de (ln qi, ln di[, b]): qi libre, di en DI_RANGE, b en [0, B_MAX]."""
+    lower = np.array([-np.inf, np.log(DI_RANGE[0]), 0.0])[:k]
+    upper = np.array([np.inf, np.log(DI_RANGE[1]), B_MAX])[:k]
+    return lower, upper
+
+
+def _initial_guess(t, y, w):
+    """Recta ln q = ln qi - di·t por mínimos cuadrados ponderados (cerrada, todos los pozos)."""
+    n = np.maximum(w.sum(axis=1), 1.0)
+    tm = (w * t).sum(axis=1) / n
+    ym = (w * y).sum(axis=1) / n
+    dt = np.where(w > 0, t - tm[:, None], 0.0)
+    slope = (dt * np.where(w > 0, y - ym[:, None], 0.0)).sum(axis=1) / np.maximum((dt * dt).sum(axis=1), 1e-12)
+    return ym - slope * tm, np.log(np.clip(-slope, *DI_RANGE))
+
+
+def fit_arps_batch(t, q, model='hyperbolic', d_lim=None, b0=0.5, max_iter=FIT_MAX_ITER, tol=FIT_TOL):
+    """
+    Ajusta qi, di (y b en los modelos hiperbólicos) a las historias de `q`
+    (pozos × tiempos, bbl/d; NaN o q ≤ 0 se ignoran) en `t` años (mismo shape o
+    (tiempos,) común a todos). `modified_hyperbolic` requiere `d_lim`.
+    Retorna dict de arreglos por pozo: qi, di, b, rmse_log (error cuadrático
+    medio en ln q), n_points, iterations y converged (NaN y False con menos
+    puntos que parámetros).
+    """
+    b_fixed = FIXED_B.get(model)
+    if model not in MODELS:
+        raise ValueError(f"Modelo de declinación desconocido: {model} (válidos: {MODELS})")
+    if model == 'modified_hyperbolic' and d_lim is None:
+        raise ValueError("modified_hyperbolic requiere d_lim")
+    if model != 'modified_hyperbolic':
+        d_lim = None
+    q = np.atleast_2d(np.asarray(q, dtype=np.float64))
+    t = np.broadcast_to(np.asarray(t, dtype=np.float64), q.shape)
+    valid = np.isfinite(q) & (q > 0) & np.isfinite(t)
+    w = valid.astype(np.float64)
+    y = np.log(np.where(valid, q, 1.0))
+    t = np.where(valid, t, 0.0)
+    n_points = valid.sum(axis=1)
+    n_wells = len(q)
+
+    k = 2 if b_fixed is not None else 3
+    params = np.zeros((n_wells, k))
+    params[:, 0], params[:, 1] = _initial_guess(t, y, w)
+    if k == 3:
+        params[:, 2] = b0
+    lower, upper = _param_bounds(k)
+    params = np.clip(params, lower, upper)
+
+    def cost(p, rows):
+        r = (_log_rate(p, t[rows], b_fixed, d_lim) - y[rows]) * w[rows]
+        return r, np.einsum('ij,ij->i', r, r)
+
+    fit = n_points >= k  # Con menos puntos que parámetros no se ajusta
+    active = np.flatnonzero(fit)
+    residual, current = cost(params[active], active)
+    costs = np.full(n_wells, np.nan)
+    costs[active] = current
+    lam = np.full(n_wells, 1e-3)
+    iterations = np.zeros(n_wells, dtype=int)
+    converged = np.zeros(n_wells, dtype=bool)
+    eye = np.eye(k)
+
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        p, rows = params[active], active
+        # Jacobiano por diferencias hacia adelante (un parámetro por columna)
+        h = 1e-6 * np.maximum(np.abs(p), 1.0)
+        jac = np.empty((len(rows), t.shape[1], k))
+        for j in range(k):
+            p_h = p.copy()
+            p_h[:, j] += h[:, j]
+            jac[:, :, j] = (_log_rate(p_h, t[rows], b_fixed, d_lim) * w[rows] - (residual + y[rows] * w[rows])) / h[:, j:j + 1]
+        jac = np.nan_to_num(jac)
+        jtj = np.einsum('ntk,ntl->nkl', jac, jac)
+        grad = np.einsum('ntk,nt->nk', jac, np.nan_to_num(residual))
+        # Parámetros en una cota que el gradiente empuja hacia afuera quedan
+        # fijos en esta iteración (si no, el paso recortado frena a los demás)
+        free = ~(((p <= lower) & (grad > 0)) | ((p >= upper) & (grad < 0)))
+        jtj = jtj * (free[:, :, None] & free[:, None, :]) + eye * ~free[:, None, :]
+        grad = grad * free
+        damp = jtj + lam[rows, None, None] * (jtj * eye + 1e-12 * eye)
+        step = np.linalg.solve(damp, -grad[..., None])[..., 0]
+        trial = np.clip(p + step, lower, upper)
+        trial_res, trial_cost = cost(trial, rows)
+        trial_cost = np.where(np.isfinite(trial_cost), trial_cost, np.inf)
+
+        better = trial_cost < costs[rows]
+        # Mejora relativa al costo, con piso de ~0.1 % de error por punto: en
+        # historias cortas casi exactas no se persiguen mejoras irrelevantes
+        gain = (costs[rows] - trial_cost) / np.maximum(costs[rows], COST_FLOOR * n_points[rows])
+        params[rows[better]] = trial[better]
+        residual = np.where(better[:, None], trial_res, residual)
+        costs[rows[better]] = trial_cost[better]
+        lam[rows] = np.where(better, lam[rows] / 3, lam[rows] * 4)
+        iterations[rows] += 1
+
+        # Convergido: mejora relativa < tol, paso nulo (contra una cota) o λ saturado
+        done = (better & (gain < tol)) | (np.abs(trial - p).max(axis=1) < tol) | (lam[rows] > 1e10)
+        converged[rows[done]] = True
+        keep = ~done
+        active = rows[keep]
+        residual = residual[keep]
+
+    b_out = np.full(n_wells, b_fixed) if b_fixed is not None else params[:, 2].copy()
+    result = {
+        'qi': np.where(fit, np.exp(params[:, 0]), np.nan),
+        'di': np.where(fit, np.exp(params[:, 1]), np.nan),
+        'b': np.where(fit, b_out, np.nan),
+        'rmse_log': np.where(fit, np.sqrt(costs / np.maximum(n_points, 1)), np.nan),
+        'n_points': n_points,
+        'iterations': iterations,
+        'converged': converged,
+    }
+    if d_lim is not None:
+        result['d_lim'] = np.full(n_wells, float(d_lim))
+    return result
+
+
+def fit_arps(t, q, model='hyperbolic', d_lim=None):
+    """Ajuste de un solo pozo (envuelve fit_arps_batch); retorna dict de escalares."""
+    fit = fit_arps_batch(np.asarray(t, dtype=np.float64)[None], np.asarray(q, dtype=np.float64)[None], model, d_lim)
+    return {k: v[0].item() for k, v in fit.items()}
+
+
+def fit_histories(histories, model='hyperbolic', d_lim=None, forecast_months=0):
+    """
+    [(t años, q bbl/d), ...] de largos distintos → ajuste por lotes y, con
+    `forecast_months`, las curvas mensuales de cada pozo desde t = 0.
+    Ejecutable en un worker (solo arreglos NumPy de entrada y salida).
+    """
+    fit = fit_arps_batch(*pad_histories(histories), model=model, d_lim=d_lim)
+    if forecast_months:
+        fit['forecast'] = decline_curves(fit['qi'], fit['di'], fit['b'], forecast_months,
+                                         d_lim if model == 'modified_hyperbolic' else None)
+    return fit
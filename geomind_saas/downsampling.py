@@ -0,0 +1,97 @@
+import numpy as np
+
+# =============================================================================
+# SUBMUESTREO QUE PRESERVA LA FORMA (LTTB / Min-Max)
+# El muestreo por paso fijo (x[::step]) descarta capas delgadas y picos de
+# GR/RT. Estas funciones retornan ÍNDICES, para que varias curvas que
+# comparten el eje de profundidad usen la misma selección.
+# =============================================================================
+
+
+def _normalize(y):
+    """Columnas a [0, 1] (NaN → 0.5) para que curvas de distinta escala pesen igual."""
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim == 1:
+        y = y[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lo = np.nanmin(np.where(np.isfinite(y), y, np.nan), axis=0)
+        hi = np.nanmax(np.where(np.isfinite(y), y, np.nan), axis=0)
+        span = np.where(hi > lo, hi - lo, 1.0)
+        out = (y - lo) / span
+    return np.where(np.isfinite(out), out, 0.5)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets. `y` puede ser 1-D o 2-D (n, k): con varias
+    curvas se elige en cada bucket el punto que maximiza la suma de áreas.
+    Retorna índices ordenados (siempre incluye el primero y el último).
+    """
+    y = _normalize(y)
+    n = y.shape[0]
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 1)])
+
+    x = np.asarray(x, dtype=np.float64) if x is not None else np.arange(n, dtype=np.float64)
+    x = _normalize(x)[:, 0]
+
+    # n_out - 2 buckets entre el primer y el último punto
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    # Promedio de cada bucket (punto C del triángulo), vectorizado con reduceat
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1], axis=0) / counts[:, None]
+    mean_x = np.append(mean_x, x[-1])
+    mean_y = np.vstack([mean_y, y[-1]])
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    # Dependencia secuencial propia de LTTB (A = punto elegido en el bucket
+    # anterior); dentro de cada bucket el cálculo es vectorial sobre puntos y curvas
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        cx, cy = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi, None]) * (cy - ay)).sum(axis=1)
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def minmax_indices(y, n_out):
+    """
+    Mínimo y máximo de cada bucket (n_out/2 buckets), en orden de aparición.
+    Totalmente vectorizado; preserva la envolvente exacta de una curva 1-D.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = y.shape[0]
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    buckets = max(1, n_out // 2)
+    size = -(-n // buckets)
+    pad = buckets * size - n
+    valid = np.isfinite(y)
+    lo_src = np.concatenate([np.where(valid, y, np.inf), np.full(pad, np.inf)]).reshape(buckets, size)
+    hi_src = np.concatenate([np.where(valid, y, -np.inf), np.full(pad, -np.inf)]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    i_min = offsets + lo_src.argmin(axis=1)
+    i_max = offsets + hi_src.argmax(axis=1)
+    idx = np.sort(np.concatenate([i_min, i_max]))
+    return np.unique(np.clip(idx, 0, n - 1))
+
+
+def downsample_indices(x, y, n_out, method='lttb'):
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f"Método de submuestreo desconocido: {method}")
+
+
+def stride_size(n, max_points):
+    """Cantidad de puntos que daba el muestreo por paso previo (mismo tamaño de payload)."""
+    step = max(1, n // max_points)
+    return len(range(0, n, step))
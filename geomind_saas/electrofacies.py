@@ -0,0 +1,353 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# =============================================================================
+# ELECTROFACIES - MODELO PERSISTENTE POR CAMPO
+# Escalado + PCA + centroides K-Means ajustados una vez por campo y guardados
+# en disco (.npz). Los pozos nuevos de un campo conocido sólo se *predicen*:
+# escalado, proyección PCA y distancia a centroides se pliegan en una única
+# transformación afín, así clasificar un pozo es una multiplicación de matrices.
+# =============================================================================
+
+FACIES_CURVES = ('GR', 'PHI', 'RHOB', 'NPHI', 'RT', 'DT')
+FACIES_NAMES = ('Arena Limpia', 'Arena Arcillosa', 'Lutita', 'Carbonato/Tight')
+DEFAULT_K = 4
+K_RANGE = (2, 8)            # Candidatos de la selección automática de k
+MIN_SAMPLES = 21            # Muestras válidas mínimas para ajustar un modelo
+MAX_COMPONENTS = 3
+LARGE_N = 20000             # Sobre esto: PCA por covarianza + MiniBatchKMeans
+BATCH_SIZE = 4096
+K_SAMPLE = 3000             # Muestras usadas para puntuar cada k (silhouette)
+RANDOM_STATE = 42
+MODEL_VERSION = 1
+MODEL_EXT = ".npz"
+MODEL_DIR = os.environ.get("DATATERRA_FACIES_DIR", os.path.join("processed_data", "facies_models"))
+
+
+class FaciesModelError(Exception):
+    """Modelo de facies ilegible, de otra versión o sin las curvas requeridas."""
+
+
+def facies_names(k):
+    """Nombres litológicos para k clusters ordenados por GR (los sobrantes se numeran)."""
+    return [FACIES_NAMES[i] if i < len(FACIES_NAMES) else f'Facies {i + 1}' for i in range(k)]
+
+
+def facies_curves(columns):
+    """Curvas de FACIES_CURVES presentes en `columns`, en el orden canónico."""
+    return [c for c in FACIES_CURVES if c in columns]
+
+
+def field_key(field):
+    """Nombre de campo (header FLD) → clave de archivo; None si el campo no está informado."""
+    key = re.sub(r'[^A-Za-z0-9_-]+', '_', str(field or '').strip()).strip('_-').upper()
+    return key or None
+
+
+def model_path(field, model_dir=None):
+    key = field_key(field)
+    if key is None:
+        return None
+    return os.path.join(model_dir or MODEL_DIR, key + MODEL_EXT)
+
+
+class FaciesModel:
+    """
+    Modelo ajustado: media/escala del escalado, componentes PCA, centroides en
+    el espacio PCA (ordenados por GR medio: la etiqueta 0 es la facies más limpia).
+
+    z = ((x - mean) / scale) · Vᵀ  =  x · W + w0
+    argminⱼ |z - cⱼ|²  =  argminⱼ ( x · (-2 W Cᵀ) + |cⱼ|² - 2 w0 · cⱼ )   (|z|² no cambia el argmin)
+
+    `W` y `-2 W Cᵀ` se apilan en una sola matriz (p × (n_comp + k)): un producto
+    da a la vez las coordenadas PCA y las distancias a los centroides.
+    """
+
+    def __init__(self, curves, mean, scale, components, variance_ratio, centroids,
+                 names=None, field=None, n_train=0, method=''):
+        self.curves = list(curves)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.components = np.asarray(components, dtype=np.float64)
+        self.variance_ratio = np.asarray(variance_ratio, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.names = list(names) if names is not None else facies_names(len(self.centroids))
+        self.field = field
+        self.n_train = int(n_train)
+        self.method = method
+
+        w = self.components.T / self.scale[:, None]
+        w0 = -(self.mean / self.scale) @ self.components.T
+        c = self.centroids
+        self._affine = np.hstack([w, -2.0 * (w @ c.T)])
+        self._offset = np.concatenate([w0, np.einsum('ij,ij->i', c, c) - 2.0 * (c @ w0)])
+
+    @property
+    def k(self):
+        return len(self.centroids)
+
+    @property
+    def n_components(self):
+        return len(self.components)
+
+    def matrix(self, df):
+        """Filas válidas (sin nulos en las curvas del modelo) → (índice, X float64)."""
+        missing = [c for c in self.curves if c not in df.columns]
+        if missing:
+            raise FaciesModelError(f"Curvas del modelo ausentes: {', '.join(missing)}")
+        data = df[self.curves].dropna()
+        return data.index, data.to_numpy(dtype=np.float64)
+
+    def project(self, x):
+        """X (n × p, en el orden de `curves`) → (coordenadas PCA, etiquetas) con un solo producto."""
+        out = np.asarray(x, dtype=np.float64) @ self._affine
+        out += self._offset
+        nc = self.n_components
+        return out[:, :nc], np.argmin(out[:, nc:], axis=1)
+
+    def predict(self, x):
+        return self.project(x)[1]
+
+    def loadings(self):
+        """Curva dominante y pesos por componente (formato de `pca_analysis.loadings`)."""
+        result = {}
+        for i, pc in enumerate(self.components):
+            result[f'PC{i + 1}'] = {
+                'dominant_curve': self.curves[int(np.argmax(np.abs(pc)))],
+                'variance': round(float(self.variance_ratio[i]) * 100, 1),
+                'weights': {col: round(float(w), 3) for col, w in zip(self.curves, pc)},
+            }
+        return result
+
+    def describe(self):
+        return {
+            'field': self.field,
+            'curves': self.curves,
+            'n_clusters': self.k,
+            'n_components': self.n_components,
+            'facies_names': self.names,
+            'n_train': self.n_train,
+            'method': self.method,
+        }
+
+    # -------------------------------------------------------------------------
+    # Persistencia (.npz, escritura atómica)
+    # -------------------------------------------------------------------------
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, version=np.int64(MODEL_VERSION), curves=np.array(self.curves),
+                     mean=self.mean, scale=self.scale, components=self.components,
+                     variance_ratio=self.variance_ratio, centroids=self.centroids,
+                     names=np.array(self.names), field=np.array(self.field or ''),
+                     n_train=np.int64(self.n_train), method=np.array(self.method))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != MODEL_VERSION:
+                    raise FaciesModelError(f"Versión de modelo no soportada: {int(data['version'])}")
+                return cls(data['curves'].tolist(), data['mean'], data['scale'], data['components'],
+                           data['variance_ratio'], data['centroids'], names=data['names'].tolist(),
+                           field=str(data['field']) or None, n_train=int(data['n_train']),
+                           method=str(data['method']))
+        except (OSError, KeyError, ValueError) as e:
+            raise FaciesModelError(f"Modelo de facies ilegible ({path}): {e}")
+
+
+# Modelos ya leídos por proceso: (ruta) → (mtime_ns, modelo). Un reentrenamiento
+# cambia el mtime y fuerza la relectura.
+_MODEL_CACHE = {}
+
+
+def load_field_model(field, model_dir=None):
+    """Modelo persistido del campo, o None si no existe."""
+    path = model_path(field, model_dir)
+    if path is None:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _MODEL_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    model = FaciesModel.load(path)
+    _MODEL_CACHE[path] = (mtime, model)
+    return model
+
+
+def save_field_model(model, field=None, model_dir=None):
+    field = field if field is not None else model.field
+    path = model_path(field, model_dir)
+    if path is None:
+        raise FaciesModelError("El modelo necesita un campo (FLD) para guardarse")
+    model.field = field
+    model.save(path)
+    _MODEL_CACHE.pop(path, None)
+    return path
+
+
+def models_version(model_dir=None):
+    """
+    Firma del directorio de modelos (cantidad y mtime más reciente): cambia al
+    guardar o borrar un modelo. Sirve para versionar resultados cacheados.
+    """
+    try:
+        entries = [e for e in os.scandir(model_dir or MODEL_DIR) if e.name.endswith(MODEL_EXT)]
+    except OSError:
+        return None
+    return f"{len(entries)}:{max((e.stat().st_mtime_ns for e in entries), default=0)}"
+
+
+def list_field_models(model_dir=None):
+    model_dir = model_dir or MODEL_DIR
+    if not os.path.isdir(model_dir):
+        return []
+    models = []
+    for name in sorted(os.listdir(model_dir)):
+        if name.endswith(MODEL_EXT):
+            try:
+                models.append(FaciesModel.load(os.path.join(model_dir, name)).describe())
+            except FaciesModelError:
+                continue
+    return models
+
+
+# =============================================================================
+# AJUSTE
+# =============================================================================
+def standardize(x):
+    """Media y escala (std poblacional; 1 en curvas constantes, como StandardScaler)."""
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def order_by_curve(values, labels, k):
+    """Permutación de clusters por media creciente de `values` (vacíos al final)."""
+    counts = np.bincount(labels, minlength=k)
+    sums = np.bincount(labels, weights=values, minlength=k)
+    means = np.full(k, np.inf)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return np.argsort(means, kind='stable')
+
+
+def pca_from_covariance(cov, n_components):
+    """Componentes (signo: peso máximo positivo) y varianza relativa desde una covarianza p × p."""
+    eigval, eigvec = np.linalg.eigh(cov)
+    order = np.argsort(eigval)[::-1][:n_components]
+    components = eigvec[:, order].T
+    signs = np.sign(components[np.arange(n_components), np.argmax(np.abs(components), axis=1)])
+    components *= signs[:, None]
+    total = eigval.sum()
+    ratio = eigval[order] / total if total > 0 else np.zeros(n_components)
+    return components, ratio
+
+
+def covariance_pca(z, n_components):
+    """
+    PCA de X estandarizada por autovectores de la covarianza (p × p): una sola
+    pasada O(n·p²) sobre los datos, sin SVD de la matriz n × p. Con p ≤ 6 curvas
+    es exacta y más rápida que el SVD aleatorizado.
+    Retorna (componentes, varianza explicada relativa, media residual).
+    """
+    center = z.mean(axis=0)
+    zc = z - center
+    cov = zc.T @ zc
+    cov /= max(len(z) - 1, 1)
+    components, ratio = pca_from_covariance(cov, n_components)
+    return components, ratio, center
+
+
+def _subsample(n, size, random_state):
+    if n <= size:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(random_state).choice(n, size, replace=False))
+
+
+def _score_k(scores, k, random_state):
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+    labels = MiniBatchKMeans(n_clusters=k, batch_size=BATCH_SIZE, n_init=3,
+                             random_state=random_state).fit_predict(scores)
+    if len(np.unique(labels)) < 2:
+        return -1.0
+    return float(silhouette_score(scores, labels))
+
+
+def select_k(scores, k_range=K_RANGE, n_jobs=None, sample=K_SAMPLE, random_state=RANDOM_STATE):
+    """
+    k con mayor silhouette sobre una submuestra del espacio PCA. Cada candidato
+    se evalúa en paralelo (hilos: K-Means y silhouette liberan el GIL en
+    sklearn, y un worker del pool de análisis no puede crear procesos hijos).
+    Retorna (k, {k: silhouette}).
+    """
+    sub = scores[_subsample(len(scores), sample, random_state)]
+    ks = [k for k in range(k_range[0], k_range[1] + 1) if k < len(sub)]
+    if not ks:
+        return DEFAULT_K, {}
+    workers = n_jobs or min(len(ks), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = dict(zip(ks, ex.map(lambda k: _score_k(sub, k, random_state), ks)))
+    return max(results, key=results.get), results
+
+
+def fit_facies_model(x, curves, k=DEFAULT_K, field=None, k_range=K_RANGE, n_jobs=None,
+                     large_n=LARGE_N, random_state=RANDOM_STATE):
+    """
+    Ajusta escalado + PCA + K-Means sobre X (n × p, sin nulos). Con más de
+    `large_n` muestras usa PCA por covarianza y MiniBatchKMeans; por debajo,
+    PCA completo y KMeans(n_init=10) como el análisis por pozo original.
+    `k='auto'` elige k en `k_range` por silhouette (ver select_k).
+    Retorna (modelo, etiquetas de X, info) con info = {'k_scores': ...}.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.decomposition import PCA
+
+    x = np.asarray(x, dtype=np.float64)
+    n, p = x.shape
+    if n < MIN_SAMPLES or p < 2:
+        raise FaciesModelError(f"Se necesitan ≥{MIN_SAMPLES} muestras y ≥2 curvas (hay {n} × {p})")
+    large = n > large_n
+
+    mean, scale = standardize(x)
+    z = (x - mean) / scale
+    n_components = min(MAX_COMPONENTS, p)
+    if large:
+        components, ratio, center = covariance_pca(z, n_components)
+    else:
+        pca = PCA(n_components=n_components).fit(z)
+        components, ratio, center = pca.components_, pca.explained_variance_ratio_, pca.mean_
+    scores = (z - center) @ components.T
+
+    info = {}
+    if k == 'auto':
+        k, info['k_scores'] = select_k(scores, k_range, n_jobs, random_state=random_state)
+    k = int(k)
+
+    if large:
+        km = MiniBatchKMeans(n_clusters=k, batch_size=BATCH_SIZE, n_init=3, random_state=random_state)
+        method = 'PCA + MiniBatchKMeans'
+    else:
+        km = KMeans(n_clusters=k, random_state=random_state, n_init=10)
+        method = 'PCA + K-Means'
+    labels = km.fit_predict(scores)
+
+    # Etiquetas reordenadas por GR medio (o la primera curva): 0 = facies más limpia
+    ref = curves.index('GR') if 'GR' in curves else 0
+    order = order_by_curve(x[:, ref], labels, k)
+    relabel = np.empty(k, dtype=np.int64)
+    relabel[order] = np.arange(k)
+
+    # La media residual de la PCA (≈0 tras estandarizar) se pliega en la del escalado
+    model = FaciesModel(curves, mean + scale * center, scale, components, ratio,
+                        km.cluster_centers_[order], field=field, n_train=n, method=method)
+    return model, relabel[labels], info
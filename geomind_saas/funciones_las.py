@@ -2,7 +2,7 @@
 
 import pandas as pd
 import lasio
-from io import BytesIO
+from las_fast import read_las
 import tempfile
 import os
 
@@ -16,12 +16,8 @@ def cargar_las_streamlit(archivo_subido):
         if isinstance(contenido, str):
             contenido = contenido.encode('utf-8')
         
-        # Usar BytesIO
-        las_file = BytesIO(contenido)
-        las_file.seek(0)
-        
-        # Leer con lasio
-        las = lasio.read(las_file)
+        # Fast-path vectorizado (lasio como respaldo)
+        las = read_las(contenido)
         return las
         
     except Exception as e:
@@ -0,0 +1,443 @@
+import os
+import re
+import warnings
+import numpy as np
+import pandas as pd
+import lasio
+from io import StringIO
+
+# =============================================================================
+# LECTOR LAS 2.0 RÁPIDO (Fast-Path)
+# Header: parser ligero línea a línea (pocas líneas).
+# ~ASCII: una sola pasada vectorizada (np.fromstring) a un buffer float64/float32.
+# Archivos envueltos (WRAP YES), LAS 3.0 o con datos no numéricos → lasio.
+# =============================================================================
+
+SECTION_NAMES = {'V': 'Version', 'W': 'Well', 'C': 'Curves', 'P': 'Parameter', 'O': 'Other'}
+_DATA_SECTION = re.compile(rb'^[ \t]*~A[^\n]*\n?', re.MULTILINE | re.IGNORECASE)
+
+
+class LASFormatError(Exception):
+    """El archivo no es apto para el fast-path (se usa lasio)."""
+
+
+class HeaderItem(dict):
+    """Item de header compatible con lasio (acceso por atributo y por clave)."""
+
+    def __init__(self, mnemonic, unit="", value="", descr=""):
+        super().__init__(mnemonic=mnemonic, unit=unit, value=value, descr=descr)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class CurveItem(HeaderItem):
+    """Curva: item de header + su columna de datos."""
+
+    def __init__(self, mnemonic, unit="", value="", descr="", data=None):
+        super().__init__(mnemonic, unit, value, descr)
+        self['data'] = data
+
+
+class SectionItems(list):
+    """Lista de items con búsqueda por mnemónico (las.well['WELL'], 'NULL' in las.well)."""
+
+    def _find(self, mnemonic):
+        for item in self:
+            if item.mnemonic == mnemonic:
+                return item
+        for item in self:
+            if item.mnemonic.upper() == str(mnemonic).upper():
+                return item
+        return None
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return list.__getitem__(self, key)
+        item = self._find(key)
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self._find(key) is not None
+        return list.__contains__(self, key)
+
+    def __getattr__(self, name):
+        item = self._find(name)
+        if item is None:
+            raise AttributeError(name)
+        return item
+
+    def keys(self):
+        return [item.mnemonic for item in self]
+
+
+class FastLAS:
+    """Resultado del fast-path con la interfaz de lasio.LASFile que usa la app."""
+
+    def __init__(self, header, curves, data):
+        self.header = header
+        self.version = header.get('Version', SectionItems())
+        self.well = header.get('Well', SectionItems())
+        self.params = header.get('Parameter', SectionItems())
+        self.other = header.get('Other', "")
+        self.curves = curves
+        self.data = data  # (n_muestras, n_curvas), C-contiguo
+
+    @property
+    def index(self):
+        return self.data[:, 0]
+
+    def keys(self):
+        return [c.mnemonic for c in self.curves]
+
+    def __getitem__(self, key):
+        return self.curves[key].data
+
+    def df(self):
+        """DataFrame indexado por la primera curva (profundidad), como lasio."""
+        names = self.keys()
+        df = pd.DataFrame(self.data[:, 1:], columns=names[1:], index=pd.Index(self.data[:, 0], name=names[0]))
+        return df
+
+
+def _to_bytes(source):
+    """Acepta bytes, str (ruta o contenido), archivos subidos (getvalue) o file-like (read)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        content = source.getvalue()
+    elif hasattr(source, 'read'):
+        content = source.read()
+    elif isinstance(source, (str, os.PathLike)) and '\n' not in str(source) and os.path.exists(source):
+        with open(source, 'rb') as f:
+            content = f.read()
+    else:
+        content = source
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return content
+
+
+def _parse_value(raw):
+    """Valores numéricos como lasio (int → float → str)."""
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+def _parse_header_line(line):
+    """MNEM.UNIT  VALUE : DESCRIPTION"""
+    name, dot, rest = line.strip().partition('.')
+    if not dot:
+        raise LASFormatError(f"Línea de header sin '.': {line!r}")
+    if rest[:1].isspace() or not rest:
+        unit, body = "", rest
+    else:
+        unit, _, body = rest.partition(' ')
+    value, colon, descr = body.rpartition(':')
+    if not colon:
+        value, descr = body, ""
+    return name.strip(), unit.strip(), value.strip(), descr.strip()
+
+
+def parse_header(text):
+    """Parsea las secciones ~V/~W/~C/~P/~O (texto previo a ~A)."""
+    header = {}
+    current = None
+    other_lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        if stripped.startswith('~'):
+            current = SECTION_NAMES.get(stripped[1:2].upper(), stripped[1:].strip())
+            if current != 'Other':
+                header.setdefault(current, SectionItems())
+            continue
+        if current is None:
+            raise LASFormatError("Contenido antes de la primera sección")
+        if current == 'Other':
+            other_lines.append(stripped)
+            continue
+        mnem, unit, value, descr = _parse_header_line(line)
+        value = value if current == 'Curves' else _parse_value(value)
+        header[current].append(HeaderItem(mnem, unit, value, descr))
+    header['Other'] = "\n".join(other_lines)
+    return header
+
+
+def _check_supported(header):
+    """Valida versión/envoltura y retorna (curvas, valor NULL o None)."""
+    version = header.get('Version', SectionItems())
+    if 'VERS' in version and str(version['VERS'].value).startswith('3'):
+        raise LASFormatError("LAS 3.0")
+    if 'WRAP' in version and str(version['WRAP'].value).upper().startswith('Y'):
+        raise LASFormatError("Archivo envuelto (WRAP YES)")
+
+    curve_items = header.get('Curves', SectionItems())
+    if len(curve_items) == 0:
+        raise LASFormatError("Sin curvas definidas")
+
+    null_value = None
+    well = header.get('Well', SectionItems())
+    if 'NULL' in well:
+        try:
+            null_value = float(well['NULL'].value)
+        except (TypeError, ValueError):
+            pass
+    return curve_items, null_value
+
+
+def _split_complete(buffer):
+    """Separa el texto hasta el último separador; la cola puede ser un número cortado."""
+    cut = max(buffer.rfind(b'\n'), buffer.rfind(b' '), buffer.rfind(b'\t'), buffer.rfind(b'\r'))
+    if cut < 0:
+        return b'', buffer
+    return buffer[:cut + 1], buffer[cut + 1:]
+
+
+def _parse_block(block):
+    """Una sola pasada en C sobre texto ASCII; un token no numérico = malformado."""
+    if not block.strip():
+        # Sólo separadores (p. ej. un '\r\n' suelto entre bloques): np.fromstring
+        # devolvería [-1.] en lugar de un arreglo vacío
+        return np.empty(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            return np.fromstring(block, dtype=np.float64, sep=' ')
+        except (ValueError, DeprecationWarning) as e:
+            raise LASFormatError(f"Bloque ~ASCII no numérico: {e}")
+
+
+def _estimate_rows(well):
+    """Filas esperadas según STRT/STOP/STEP (0 si no se puede estimar)."""
+    try:
+        strt, stop, step = (float(well[k].value) for k in ('STRT', 'STOP', 'STEP'))
+        return int(round(abs((stop - strt) / step))) + 1 if step else 0
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def _build_las(header, curve_items, data):
+    """Asocia columnas a curvas; mnemónicos duplicados → GR:1, GR:2 (convención de lasio)."""
+    names = [c.mnemonic for c in curve_items]
+    counts = {}
+    curves = SectionItems()
+    for i, item in enumerate(curve_items):
+        mnem = item.mnemonic
+        if names.count(mnem) > 1:
+            counts[mnem] = counts.get(mnem, 0) + 1
+            mnem = f"{mnem}:{counts[mnem]}"
+        curves.append(CurveItem(mnem, item.unit, item.value, item.descr, data[:, i]))
+    header['Curves'] = curves
+    return FastLAS(header, curves, data)
+
+
+def parse_las_bytes(content, dtype=np.float64):
+    """Fast-path estricto: lanza LASFormatError si el archivo requiere lasio."""
+    match = _DATA_SECTION.search(content)
+    if match is None:
+        raise LASFormatError("Sin sección ~ASCII")
+
+    header = parse_header(content[:match.start()].decode('utf-8', errors='ignore'))
+    curve_items, null_value = _check_supported(header)
+    n_curves = len(curve_items)
+
+    values = _parse_block(content[match.end():])
+    if values.size % n_curves:
+        raise LASFormatError(f"{values.size} valores no divisibles entre {n_curves} curvas")
+    data = values.reshape(-1, n_curves)
+
+    if null_value is not None:
+        data[data == null_value] = np.nan
+    if dtype != np.float64:
+        data = data.astype(dtype)
+
+    return _build_las(header, curve_items, data)
+
+
+def read_las(source, dtype=np.float64, fallback=True):
+    """
+    Lee un LAS con el fast-path; si el archivo es envuelto/malformado usa lasio.
+    Retorna un objeto con la interfaz de lasio (well, curves, header, df()).
+    """
+    content = _to_bytes(source)
+    try:
+        return parse_las_bytes(content, dtype=dtype)
+    except LASFormatError as e:
+        if not fallback:
+            raise
+        text = content.decode('utf-8', errors='ignore')
+        # El motor 'numpy' de lasio no lee archivos envueltos
+        engine = 'normal' if 'WRAP' in str(e) else 'numpy'
+        return lasio.read(StringIO(text), engine=engine)
+
+
+# =============================================================================
+# INGESTA INCREMENTAL (Streaming)
+# Los bytes llegan por bloques (multipart, archivo); el header se acumula hasta
+# ~ASCII y cada bloque de datos se convierte de inmediato a float64 dentro de un
+# buffer preasignado. Nunca se guarda el texto completo: pico ≈ 1x datos numéricos.
+# =============================================================================
+
+class LASStreamParser:
+    """
+    Parser LAS 2.0 alimentado por bloques: `feed(chunk)` ... `finish()` → FastLAS.
+    Si `on_rows` está definido, las filas completas se entregan en ventanas de
+    `window_rows` (ndarray) y no se acumulan: el archivo nunca se materializa.
+    """
+
+    def __init__(self, window_rows=None, on_rows=None):
+        self.window_rows = window_rows
+        self.on_rows = on_rows
+        self.header = None
+        self.curve_items = None
+        self.n_curves = 0
+        self.null_value = None
+        self.rows = 0
+        self._header_buf = b''
+        self._tail = b''
+        self._values = None   # Buffer plano preasignado (crece x1.5 si hace falta)
+        self._filled = 0
+
+    # ----------------------------------------------------------------- header
+    def _start_data(self, header_bytes):
+        self.header = parse_header(header_bytes.decode('utf-8', errors='ignore'))
+        self.curve_items, self.null_value = _check_supported(self.header)
+        self.n_curves = len(self.curve_items)
+        well = self.header.get('Well', SectionItems())
+
+        if self.on_rows is None:
+            expected = _estimate_rows(well)
+            self._values = np.empty(max(expected, 1024) * self.n_curves, dtype=np.float64)
+        else:
+            self._values = np.empty((self.window_rows or 65536) * self.n_curves, dtype=np.float64)
+
+    # ------------------------------------------------------------------- datos
+    def _append(self, values):
+        if self.on_rows is not None:
+            self._emit_windows(values)
+            return
+        need = self._filled + values.size
+        if need > self._values.size:
+            grown = np.empty(max(need, int(self._values.size * 1.5)), dtype=np.float64)
+            grown[:self._filled] = self._values[:self._filled]
+            self._values = grown
+        self._values[self._filled:need] = values
+        self._filled = need
+
+    def _emit_windows(self, values, final=False):
+        """Entrega ventanas completas de `window_rows` filas; el resto queda pendiente."""
+        pending = np.concatenate([self._values[:self._filled], values]) if self._filled else values
+        step = (self.window_rows or 65536) * self.n_curves
+        start = 0
+        while pending.size - start >= step or (final and pending.size - start >= self.n_curves):
+            end = min(start + step, pending.size)
+            end -= (end - start) % self.n_curves
+            window = pending[start:end].reshape(-1, self.n_curves).copy()
+            if self.null_value is not None:
+                window[window == self.null_value] = np.nan
+            self.on_rows(window)
+            self.rows += window.shape[0]
+            start = end
+        rest = pending[start:]
+        if rest.size > self._values.size:
+            self._values = np.empty(rest.size, dtype=np.float64)
+        self._values[:rest.size] = rest
+        self._filled = rest.size
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        if self.header is None:
+            self._header_buf += chunk
+            match = _DATA_SECTION.search(self._header_buf)
+            if match is None or match.end() == len(self._header_buf) and not self._header_buf.endswith(b'\n'):
+                return  # La línea ~A aún no llegó completa
+            self._start_data(self._header_buf[:match.start()])
+            chunk = self._header_buf[match.end():]
+            self._header_buf = b''
+
+        complete, self._tail = _split_complete(self._tail + chunk)
+        if complete:
+            self._append(_parse_block(complete))
+
+    def finish(self):
+        """Procesa el último token y retorna el FastLAS (o None en modo ventanas)."""
+        if self.header is None:
+            raise LASFormatError("Sin sección ~ASCII")
+        if self._tail.strip():
+            self._append(_parse_block(self._tail))
+        self._tail = b''
+        if self._filled % self.n_curves:
+            raise LASFormatError(f"{self._filled} valores no divisibles entre {self.n_curves} curvas")
+
+        if self.on_rows is not None:
+            self._emit_windows(np.empty(0), final=True)
+            return None
+
+        # Recorte en sitio del buffer preasignado (realloc, sin segunda copia)
+        values, self._values = self._values, None
+        values.resize(self._filled, refcheck=False)
+        data = values.reshape(-1, self.n_curves)
+        if self.null_value is not None:
+            data[data == self.null_value] = np.nan
+        self.rows = data.shape[0]
+        return _build_las(self.header, self.curve_items, data)
+
+
+def read_las_stream(chunks, fallback_source=None):
+    """
+    Lee un LAS desde un iterable de bloques de bytes sin retener el texto.
+    Si el archivo no es apto para el fast-path y hay `fallback_source`, usa read_las.
+    """
+    parser = LASStreamParser()
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.finish()
+    except LASFormatError:
+        if fallback_source is None:
+            raise
+        return read_las(fallback_source)
+
+
+def iter_las_windows(source, window_rows=65536, chunk_size=1 << 20):
+    """
+    Recorre un LAS grande (ruta o file-like binario) en ventanas de profundidad.
+    Cada ventana es un DataFrame de `window_rows` filas indexado por profundidad;
+    la memoria usada es ≈ una ventana + un bloque de lectura, sin importar el tamaño.
+    """
+    windows = []
+    parser = LASStreamParser(window_rows=window_rows, on_rows=windows.append)
+    own = isinstance(source, (str, os.PathLike))
+    f = open(source, 'rb') if own else source
+    try:
+        names = None
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                parser.finish()
+            else:
+                parser.feed(chunk)
+            if windows and names is None:
+                names = _build_las(parser.header, parser.curve_items, np.empty((0, parser.n_curves))).keys()
+            for window in windows:
+                yield pd.DataFrame(window[:, 1:], columns=names[1:],
+                                   index=pd.Index(window[:, 0], name=names[0]))
+            windows.clear()
+            if not chunk:
+                return
+    finally:
+        if own:
+            f.close()
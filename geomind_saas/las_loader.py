@@ -1,11 +1,11 @@
-import lasio
+from las_fast import read_las
 
 def cargar_las(ruta_archivo):
     """
-    Carga un archivo LAS y devuelve el objeto lasio.
+    Carga un archivo LAS y devuelve el objeto LAS (fast-path o lasio).
     """
     try:
-        las = lasio.read(ruta_archivo)
+        las = read_las(ruta_archivo)
         print(f"Archivo {ruta_archivo} cargado con éxito.")
         return las
     except Exception as e:
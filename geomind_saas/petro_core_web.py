@@ -1,7 +1,8 @@
 
 import numpy as np
 import pandas as pd
-import lasio
+from las_fast import read_las
+from decline import arps_rate
 import scipy.stats as stats
 from scipy.interpolate import interp1d
 
@@ -106,14 +107,8 @@ class DataLoader:
         Maneja errores de codificación comunes en archivos viejos.
         """
         try:
-            # Escribir temporalmente para que lasio lo lea bien
-            bytes_data = uploaded_file.getvalue()
-            from io import StringIO
-            # Intentar decodificar
-            string_data = bytes_data.decode("utf-8", errors="ignore")
-            
-            # Usar StringIO como archivo en memoria
-            las = lasio.read(StringIO(string_data))
+            # Fast-path vectorizado sobre los bytes (lasio como respaldo)
+            las = read_las(uploaded_file.getvalue())
             df = las.df()
             
             # Limpieza básica: Eliminar nulos locos (-999.25)
@@ -194,73 +189,160 @@ class CurveNormalizer:
 # DETECTOR DE YACIMIENTOS (Reservoir Pay Flag)
 # =============================================================================
 class ReservoirDetector:
-    """Motor de validación de intervalos productivos."""
-    
+    """
+    Motor de validación de intervalos productivos.
+    Los intervalos salen de detección de bordes sobre la bandera de pay
+    (np.diff) y sus estadísticas de np.add/minimum/maximum.reduceat, sin
+    copiar el DataFrame ni agrupar con pandas.
+    """
+
+    DEPTH_ALIASES = ('DEPT', 'DEPTH', 'MD', 'TDEP')
+    NEEDED = ('PHI', 'SW', 'VSH')
+
+    @staticmethod
+    def _depth(df, depth_col=None):
+        """Profundidad: columna indicada, alias conocido (columna o índice) o primera columna."""
+        if depth_col is not None:
+            return df[depth_col].to_numpy(dtype=np.float64)
+        lookup = {str(c).strip().upper(): c for c in df.columns}
+        for alias in ReservoirDetector.DEPTH_ALIASES:
+            if alias in lookup:
+                return df[lookup[alias]].to_numpy(dtype=np.float64)
+        if str(df.index.name or '').strip().upper() in ReservoirDetector.DEPTH_ALIASES:
+            return df.index.to_numpy(dtype=np.float64)
+        return df.iloc[:, 0].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def pay_runs(mask):
+        """Tramos contiguos True: (inicios, fines exclusivos) por detección de bordes."""
+        edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    @staticmethod
+    def _run_reduce(ufunc, values, starts, ends):
+        """ufunc.reduceat sobre cada tramo [inicio, fin): índices intercalados, se toman los pares."""
+        padded = np.append(values, values[-1:])  # `fin` puede ser len(values)
+        return ufunc.reduceat(padded, np.column_stack([starts, ends]).ravel())[::2]
+
     @staticmethod
-    def detect_prospect_intervals(df, cutoffs):
+    def detect_prospect_intervals(df, cutoffs, depth_col=None):
         """
         Retorna un DataFrame con los intervalos (Top, Base, Thickness, Quality).
         """
-        # Copia para no dañar original
-        data = df.copy()
-        
         # Validación de curvas mínimas
-        needed = ['PHI', 'SW', 'VSH']
-        for n in needed:
-            if n not in data.columns:
-                return pd.DataFrame()
-        
-        # Aplicar cutoffs booleanos
-        mask = (data['PHI'] >= cutoffs['porosity_min']) & \
-               (data['SW'] <= cutoffs['sw_max']) & \
-               (data['VSH'] <= cutoffs['vshale_max'])
-        
-        # Identificar bloques contiguos (RLE - Run Length Encoding)
-        # Truco pandas: cambio de estado
-        data['Pay_Flag'] = mask.astype(int)
-        data['block'] = (data['Pay_Flag'].shift(1) != data['Pay_Flag']).cumsum()
-        
-        # Agrupar por bloques
-        intervals = []
-        depth_col = data.columns[0] # Asumimos Depth es primera col
-        
-        for block_id, group in data[data['Pay_Flag'] == 1].groupby('block'):
-            top = group[depth_col].min()
-            base = group[depth_col].max()
-            thick = abs(base - top)
-            
-            # Calcular promedios del intervalo
-            avg_phi = group['PHI'].mean()
-            avg_sw = group['SW'].mean()
-            
-            # Clasificación de Calidad
-            quality = "Marginal"
-            if avg_phi > 0.20 and avg_sw < 0.30: quality = "Excelente"
-            elif avg_phi > 0.15: quality = "Bueno"
-            
-            intervals.append({
-                'Top': top,
-                'Base': base,
-                'Espesor_ft': thick,
-                'Porosidad_Avg': avg_phi,
-                'Sw_Avg': avg_sw,
-                'Calidad': quality
+        if any(n not in df.columns for n in ReservoirDetector.NEEDED):
+            return pd.DataFrame()
+
+        phi = df['PHI'].to_numpy(dtype=np.float64)
+        sw = df['SW'].to_numpy(dtype=np.float64)
+        vsh = df['VSH'].to_numpy(dtype=np.float64)
+        depth = ReservoirDetector._depth(df, depth_col)
+
+        # Cutoffs booleanos (NaN → no pay) y tramos contiguos
+        mask = (phi >= cutoffs['porosity_min']) & (sw <= cutoffs['sw_max']) & (vsh <= cutoffs['vshale_max'])
+        starts, ends = ReservoirDetector.pay_runs(mask)
+        if len(starts) == 0:
+            return pd.DataFrame()
+
+        run = ReservoirDetector._run_reduce
+        n = ends - starts
+        top = run(np.minimum, depth, starts, ends)
+        base = run(np.maximum, depth, starts, ends)
+        avg_phi = run(np.add, phi, starts, ends) / n
+        avg_sw = run(np.add, sw, starts, ends) / n
+
+        # Clasificación de Calidad
+        quality = np.select([(avg_phi > 0.20) & (avg_sw < 0.30), avg_phi > 0.15], ["Excelente", "Bueno"], "Marginal")
+
+        return pd.DataFrame({
+            'Top': top,
+            'Base': base,
+            'Espesor_ft': np.abs(base - top),
+            'Porosidad_Avg': avg_phi,
+            'Sw_Avg': avg_sw,
+            'Calidad': quality,
+        })
+
+    @staticmethod
+    def _cutoff_cube(phi_cut, sw_cut, vsh_cut, phi, sw, vsh, weights):
+        """
+        Suma de `weights` de las muestras que pasan cada combinación de cutoffs
+        (cubo PHI × SW × VSH): histograma 3-D por el índice del cutoff más
+        exigente que cada muestra satisface + sumas acumuladas por eje.
+        """
+        shape = (len(phi_cut) + 1, len(sw_cut) + 1, len(vsh_cut) + 1)
+        k = np.searchsorted(phi_cut, phi, side='right')  # Pasa PHI_min[a] ⇔ a < k
+        j = np.searchsorted(sw_cut, sw, side='left')     # Pasa SW_max[b] ⇔ b ≥ j
+        l = np.searchsorted(vsh_cut, vsh, side='left')   # Pasa VSH_max[c] ⇔ c ≥ l
+        hist = np.bincount(np.ravel_multi_index((k, j, l), shape), weights=weights,
+                           minlength=int(np.prod(shape))).reshape(shape)
+        cube = np.cumsum(hist[::-1], axis=0)[::-1][1:]   # Σ k > a
+        return np.cumsum(np.cumsum(cube, axis=1), axis=2)[:, :-1, :-1]
+
+    @staticmethod
+    def sweep_cutoffs(df, phi_cutoffs, sw_cutoffs, vsh_cutoffs, depth_col=None):
+        """
+        Sensibilidad de net pay a una grilla de cutoffs (PHI mín × SW máx × VSH máx)
+        en una sola pasada, sin construir una bandera por combinación:
+        - Net pay (suma de |base − tope| por intervalo, profundidad monótona) es la
+          suma de los saltos de profundidad entre muestras vecinas ambas en pay;
+          un par vecino pasa una combinación si su peor valor (PHI mín, SW y VSH
+          máx) la pasa, así que se acumula como una "muestra" más.
+        - Intervalos = muestras en pay − pares vecinos en pay.
+        Retorna un DataFrame con una fila por combinación (orden PHI, SW, VSH).
+        """
+        if any(n not in df.columns for n in ReservoirDetector.NEEDED):
+            return pd.DataFrame()
+        phi = df['PHI'].to_numpy(dtype=np.float64)
+        sw = df['SW'].to_numpy(dtype=np.float64)
+        vsh = df['VSH'].to_numpy(dtype=np.float64)
+        depth = ReservoirDetector._depth(df, depth_col)
+        phi_cut, sw_cut, vsh_cut = (np.unique(np.asarray(c, dtype=np.float64))
+                                    for c in (phi_cutoffs, sw_cutoffs, vsh_cutoffs))
+
+        # Muestras válidas (NaN nunca es pay) y pares vecinos válidos
+        ok = np.isfinite(phi) & np.isfinite(sw) & np.isfinite(vsh)
+        pair = ok[:-1] & ok[1:]
+        s_phi, s_sw, s_vsh = phi[ok], sw[ok], vsh[ok]
+        p_phi = np.minimum(phi[:-1], phi[1:])[pair]
+        p_sw = np.maximum(sw[:-1], sw[1:])[pair]
+        p_vsh = np.maximum(vsh[:-1], vsh[1:])[pair]
+        gap = np.abs(np.diff(depth))[pair]
+
+        cube = ReservoirDetector._cutoff_cube
+        cuts = (phi_cut, sw_cut, vsh_cut)
+        n_pay = cube(*cuts, s_phi, s_sw, s_vsh, None)
+        sum_phi = cube(*cuts, s_phi, s_sw, s_vsh, s_phi)
+        sum_sw = cube(*cuts, s_phi, s_sw, s_vsh, s_sw)
+        n_joint = cube(*cuts, p_phi, p_sw, p_vsh, None)
+        net = cube(*cuts, p_phi, p_sw, p_vsh, gap)
+
+        finite_depth = depth[np.isfinite(depth)]
+        gross = float(finite_depth.max() - finite_depth.min()) if len(finite_depth) else 0.0
+        grid = np.meshgrid(phi_cut, sw_cut, vsh_cut, indexing='ij')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'PHI_min': grid[0].ravel(),
+                'SW_max': grid[1].ravel(),
+                'VSH_max': grid[2].ravel(),
+                'Net_Pay_ft': net.ravel(),
+                'N_Intervalos': np.rint(n_pay - n_joint).astype(int).ravel(),
+                'NTG': (net / gross).ravel() if gross > 0 else 0.0,
+                'Porosidad_Avg': np.where(n_pay > 0, sum_phi / n_pay, np.nan).ravel(),
+                'Sw_Avg': np.where(n_pay > 0, sum_sw / n_pay, np.nan).ravel(),
             })
-            
-        return pd.DataFrame(intervals)
 
 # =============================================================================
 # SIMULADOR ECONÓMICO (Cash Flow)
 # =============================================================================
 class SimulationEngine:
     @staticmethod
-    def simular_produccion(oip, price_per_bbl, decline_rate=0.15):
-        """Genera flujo de caja a 10 años (Arps simple)."""
+    def simular_produccion(oip, price_per_bbl, decline_rate=0.15, b=0.0, d_lim=None):
+        """Genera flujo de caja a 10 años (Arps: exponencial por defecto; b > 0 hiperbólica, d_lim modificada)."""
         months = np.arange(1, 121) # 10 años
-        # Q(t) = Qi * exp(-D*t)
         qi = oip * 0.001 # Asumir factor de recuperación inicial mensual bajo
         
-        prod_mensual = qi * np.exp(-decline_rate/12 * months)
+        prod_mensual = arps_rate(qi, decline_rate, b, months / 12, d_lim)
         ingresos = prod_mensual * price_per_bbl
         
         return pd.DataFrame({
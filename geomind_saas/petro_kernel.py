@@ -0,0 +1,320 @@
+import os
+import numpy as np
+
+try:
+    import numba  # Opcional: kernel compilado, una sola pasada por muestra
+except ImportError:
+    numba = None
+try:
+    import numexpr  # Opcional: expresiones fusionadas por bloques y en varios hilos
+except ImportError:
+    numexpr = None
+
+# =============================================================================
+# KERNEL PETROFÍSICO FUSIONADO
+# VSH, PHI, SW (Archie + Simandoux), SH y las tres permeabilidades en una sola
+# pasada sobre arreglos contiguos. Mismas fórmulas que PetrofisicaCore y el
+# PASO 1 del pipeline, sin temporales de largo completo:
+#   - numba:   un bucle compilado que lee cada muestra una vez y escribe las salidas.
+#   - numexpr: una expresión fusionada por salida (bloques en caché, multihilo).
+#   - numpy:   bloques de BLOCK muestras con ufuncs in-place sobre dos buffers
+#              de trabajo que caben en caché (las salidas se escriben una vez).
+# =============================================================================
+
+OUTPUTS = ('VSH', 'PHI', 'SW', 'SW_SIM', 'PERM', 'PERM_MB', 'SH', 'PERM_LL')
+PETRO_DEFAULTS = {
+    'rw': 0.05, 'a': 1.0, 'm': 2.0, 'n': 2.0, 'rsh': 2.0,   # Archie / Simandoux
+    'rho_ma': 2.65, 'rho_fl': 1.0,                          # Densidad matriz / fluido
+    'phi_max': 0.45, 'phi_default': 0.15, 'sw_default': 0.5,
+}
+PHI_NPHI, PHI_RHOB, PHI_DEFAULT = 0, 1, 2
+BLOCK = 8192  # Muestras por bloque (numpy): 2 buffers × 8192 × 8 B = 128 KB
+BACKEND = os.environ.get("DATATERRA_PETRO_BACKEND", "auto")
+
+
+def available_backends():
+    return [name for name, mod in (('numba', numba), ('numexpr', numexpr)) if mod is not None] + ['numpy']
+
+
+def _resolve_backend(backend):
+    backend = backend or BACKEND
+    if backend == 'auto':
+        return available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"Backend petrofísico no disponible: {backend} (hay {available_backends()})")
+    return backend
+
+
+def gr_limits(gr):
+    """GRmin/GRmax por percentiles P05/P95 ignorando nulos (como Series.quantile)."""
+    valid = gr[np.isfinite(gr)]
+    if len(valid) == 0:
+        return np.nan, np.nan
+    lo, hi = np.quantile(valid, [0.05, 0.95])
+    return float(lo), float(hi)
+
+
+def nphi_divisor(nphi):
+    """NPHI en porcentaje (media > 1) → 100; en fracción → 1."""
+    valid = nphi[np.isfinite(nphi)]
+    return 100.0 if len(valid) and valid.mean() > 1.0 else 1.0
+
+
+# =============================================================================
+# NUMPY POR BLOQUES
+# =============================================================================
+def _kernel_numpy(gr, rt, phi_src, mode, c, out, block):
+    vsh_o, phi_o, sw_o, sim_o, perm_o, mb_o, sh_o, ll_o = out
+    n = len(phi_o)
+    t_buf = np.empty(min(block, n), dtype=phi_o.dtype)
+    u_buf = np.empty(min(block, n), dtype=phi_o.dtype)
+    for i0 in range(0, n, block):
+        s = slice(i0, min(n, i0 + block))
+        t, u = t_buf[:s.stop - i0], u_buf[:s.stop - i0]
+        vsh, phi, sw, perm, mb, sh, ll = vsh_o[s], phi_o[s], sw_o[s], perm_o[s], mb_o[s], sh_o[s], ll_o[s]
+
+        # VSH lineal: IGR = (GR - GRmin) / (GRmax - GRmin) en [0, 1]
+        if c['has_gr']:
+            np.subtract(gr[s], c['gr_min'], out=vsh)
+            vsh /= c['gr_range']
+            np.clip(vsh, 0, 1, out=vsh)
+        else:
+            vsh.fill(0.0)
+
+        # PHI: NPHI (fracción) o densidad (ρma - ρb) / (ρma - ρf), acotada a [0, φmax]
+        if mode == PHI_NPHI:
+            np.divide(phi_src[s], c['nphi_div'], out=phi)
+            np.clip(phi, 0, c['phi_max'], out=phi)
+        elif mode == PHI_RHOB:
+            np.subtract(c['rho_ma'], phi_src[s], out=phi)
+            phi /= c['rho_range']
+            np.clip(phi, 0, c['phi_max'], out=phi)
+        else:
+            phi.fill(c['phi_default'])
+
+        # Archie: Sw = (a·Rw / (φᵐ·Rt))^(1/n); φ ≥ 0.001, Rt ≥ 0.1 (max propaga NaN)
+        if c['has_rt']:
+            np.maximum(phi, 0.001, out=t)
+            np.power(t, c['m'], out=t)                # φᵐ
+            np.maximum(rt[s], 0.1, out=u)             # Rt seguro
+            np.multiply(t, u, out=sw)
+            np.divide(c['arw'], sw, out=sw)
+            np.power(sw, 1.0 / c['n'], out=sw)
+            np.clip(sw, 0, 1, out=sw)
+            if sim_o is not None:
+                # Simandoux (n=2): Sw = [-B + √(B² + 4φᵐ/(a·Rw·Rt))] / (2φᵐ/(a·Rw)), B = Vsh/Rsh
+                sim = sim_o[s]
+                np.multiply(u, c['arw'], out=u)       # a·Rw·Rt
+                np.multiply(t, 4, out=sim)            # sim y mb como buffers: se reescriben abajo
+                np.divide(sim, u, out=u)              # 4φᵐ / (a·Rw·Rt)
+                np.divide(vsh, c['rsh'], out=sim)     # B
+                np.multiply(sim, sim, out=mb)         # B²
+                u += mb
+                np.sqrt(u, out=u)
+                u -= sim
+                np.multiply(t, 2, out=t)
+                t /= c['arw']
+                np.divide(u, t, out=sim)
+                np.clip(sim, 0, 1, out=sim)
+        else:
+            sw.fill(c['sw_default'])
+
+        # Timur-Coates (empírica): K = 10^(10φ - 1) en [0.01, 5000]
+        np.multiply(phi, 10.0, out=perm)
+        perm -= 1.0
+        np.power(10.0, perm, out=perm)
+        np.clip(perm, 0.01, 5000, out=perm)
+
+        # Morris-Biggs: K = 62500 φ³ Swirr (Swirr = Sw en [0.05, 0.95]) en [0.001, 50000]
+        np.power(phi, 3, out=mb)
+        mb *= 62500.0
+        np.clip(sw, 0.05, 0.95, out=t)
+        mb *= t
+        np.clip(mb, 0.001, 50000, out=mb)
+
+        # Saturación de hidrocarburo
+        np.subtract(1, sw, out=sh)
+        np.clip(sh, 0, 1, out=sh)
+
+        # Log-lineal poro-perm: K = 10^(14φ - 1.5) en [0.001, 50000]
+        np.multiply(phi, 14.0, out=ll)
+        ll -= 1.5
+        np.power(10.0, ll, out=ll)
+        np.clip(ll, 0.001, 50000, out=ll)
+
+
+# =============================================================================
+# NUMEXPR (una expresión fusionada por salida)
+# =============================================================================
+def _clip_expr(expr, lo, hi):
+    # where() no toca NaN: (NaN < lo) y (NaN > hi) son falsos, como np.clip
+    return f"where(({expr}) < {lo!r}, {lo!r}, where(({expr}) > {hi!r}, {hi!r}, {expr}))"
+
+
+def _kernel_numexpr(gr, rt, phi_src, mode, c, out):
+    vsh, phi, sw, sim, perm, mb, sh, ll = out
+    env = {'gr': gr, 'rt': rt, 'src': phi_src, 'vsh': vsh, 'phi': phi, 'sw': sw, 'pm': mb, **{
+        k: c[k] for k in ('gr_min', 'gr_range', 'nphi_div', 'rho_ma', 'rho_range', 'arw', 'rsh', 'm')}}
+    env['inv_n'] = 1.0 / c['n']
+
+    def ev(expr, target, lo=None, hi=None):
+        numexpr.evaluate(expr, local_dict=env, out=target, casting='same_kind')
+        if lo is not None:
+            # Acotado en una 2ª expresión (sin recalcular `expr` en cada rama del where)
+            numexpr.evaluate(_clip_expr("x", lo, hi), local_dict={'x': target}, out=target, casting='same_kind')
+
+    if c['has_gr']:
+        ev("(gr - gr_min) / gr_range", vsh, 0.0, 1.0)
+    else:
+        vsh.fill(0.0)
+    if mode == PHI_NPHI:
+        ev("src / nphi_div", phi, 0.0, c['phi_max'])
+    elif mode == PHI_RHOB:
+        ev("(rho_ma - src) / rho_range", phi, 0.0, c['phi_max'])
+    else:
+        phi.fill(c['phi_default'])
+    if c['has_rt']:
+        rt_safe = "where(rt <= 0.1, 0.1, rt)"
+        ev("where(phi <= 0.001, 0.001, phi) ** m", mb)  # φᵐ en el buffer de PERM_MB
+        ev(f"(arw / (pm * {rt_safe})) ** inv_n", sw, 0.0, 1.0)
+        if sim is not None:
+            ev(f"(sqrt((vsh / rsh) ** 2 + (4 * pm) / (arw * {rt_safe})) - vsh / rsh) / ((2 * pm) / arw)",
+               sim, 0.0, 1.0)
+    else:
+        sw.fill(c['sw_default'])
+    ev("10.0 ** (10.0 * phi - 1.0)", perm, 0.01, 5000.0)
+    ev(f"62500.0 * phi ** 3 * {_clip_expr('sw', 0.05, 0.95)}", mb, 0.001, 50000.0)
+    ev("1 - sw", sh, 0.0, 1.0)
+    ev("10.0 ** (14.0 * phi - 1.5)", ll, 0.001, 50000.0)
+
+
+# =============================================================================
+# NUMBA (bucle compilado: cada muestra se lee una vez)
+# =============================================================================
+if numba is not None:
+    @numba.njit(cache=True, inline='always')
+    def _clip(x, lo, hi):
+        # Comparaciones con NaN son falsas: NaN pasa sin cambios, como np.clip
+        if x < lo:
+            return lo
+        if x > hi:
+            return hi
+        return x
+
+    @numba.njit(cache=True)
+    def _kernel_numba_loop(gr, rt, phi_src, mode, has_gr, has_rt, has_sim, gr_min, gr_range, nphi_div,
+                           rho_ma, rho_range, phi_max, phi_default, sw_default, arw, rsh, m, inv_n,
+                           vsh_o, phi_o, sw_o, sim_o, perm_o, mb_o, sh_o, ll_o):
+        for i in range(phi_o.shape[0]):
+            vsh = _clip((gr[i] - gr_min) / gr_range, 0.0, 1.0) if has_gr else 0.0
+            if mode == 0:
+                phi = _clip(phi_src[i] / nphi_div, 0.0, phi_max)
+            elif mode == 1:
+                phi = _clip((rho_ma - phi_src[i]) / rho_range, 0.0, phi_max)
+            else:
+                phi = phi_default
+            if has_rt:
+                ps = phi if not phi <= 0.001 else 0.001
+                r = rt[i] if not rt[i] <= 0.1 else 0.1
+                pm = ps ** m
+                sw = _clip((arw / (pm * r)) ** inv_n, 0.0, 1.0)
+                if has_sim:
+                    b = vsh / rsh
+                    sim_o[i] = _clip((np.sqrt(b * b + (4.0 * pm) / (arw * r)) - b) / ((2.0 * pm) / arw), 0.0, 1.0)
+            else:
+                sw = sw_default
+            vsh_o[i] = vsh
+            phi_o[i] = phi
+            sw_o[i] = sw
+            perm_o[i] = _clip(10.0 ** (10.0 * phi - 1.0), 0.01, 5000.0)
+            mb_o[i] = _clip(62500.0 * phi ** 3 * _clip(sw, 0.05, 0.95), 0.001, 50000.0)
+            sh_o[i] = _clip(1.0 - sw, 0.0, 1.0)
+            ll_o[i] = _clip(10.0 ** (14.0 * phi - 1.5), 0.001, 50000.0)
+
+
+def _kernel_numba(gr, rt, phi_src, mode, c, out):
+    vsh, phi, sw, sim, perm, mb, sh, ll = out
+    dummy = np.empty(0, dtype=phi.dtype)
+    _kernel_numba_loop(gr, rt, phi_src, mode, c['has_gr'], c['has_rt'], sim is not None,
+                       c['gr_min'], c['gr_range'], c['nphi_div'], c['rho_ma'], c['rho_range'], c['phi_max'],
+                       c['phi_default'], c['sw_default'], c['arw'], c['rsh'], c['m'], 1.0 / c['n'],
+                       vsh, phi, sw, sim if sim is not None else dummy, perm, mb, sh, ll)
+
+
+# =============================================================================
+# API
+# =============================================================================
+def _as_input(values, dtype, n):
+    if values is None:
+        return np.zeros(n, dtype=dtype)  # Placeholder (el flag correspondiente lo ignora)
+    return np.ascontiguousarray(values, dtype=dtype)
+
+
+def petro_kernel(gr=None, rt=None, nphi=None, rhob=None, n=None, dtype=None, backend=None,
+                 block=BLOCK, gr_min=None, gr_max=None, nphi_div=None, **params):
+    """
+    Calcula VSH, PHI, SW, SW_SIM, PERM, PERM_MB, SH y PERM_LL en una pasada.
+    Curvas opcionales (None = ausente), mismas reglas que el pipeline:
+      - sin GR: VSH = 0 y sin Simandoux (SW_SIM = None);
+      - PHI desde NPHI (en % si su media > 1), si no desde RHOB, si no `phi_default`;
+      - sin RT: SW = `sw_default` y sin Simandoux.
+    `dtype` (float32/float64) fija el tipo de entradas y salidas (por defecto el
+    de las curvas). `params` sobreescribe PETRO_DEFAULTS (rw, a, m, n, rsh, ...).
+    Retorna (dict salida → ndarray, info) con info = {backend, phi_source, nphi_div, gr_min, gr_max}.
+    """
+    curves = [v for v in (gr, rt, nphi, rhob) if v is not None]
+    if n is None:
+        if not curves:
+            raise ValueError("Se necesita al menos una curva o `n`")
+        n = len(curves[0])
+    if dtype is None:
+        dtype = np.result_type(*[np.asarray(v).dtype for v in curves], np.float32) if curves else np.float64
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        dtype = np.dtype(np.float64)
+    p = {**PETRO_DEFAULTS, **params}
+    backend = _resolve_backend(backend)
+
+    gr_a, rt_a = _as_input(gr, dtype, n), _as_input(rt, dtype, n)
+    if nphi is not None:
+        mode, phi_src = PHI_NPHI, _as_input(nphi, dtype, n)
+    elif rhob is not None:
+        mode, phi_src = PHI_RHOB, _as_input(rhob, dtype, n)
+    else:
+        mode, phi_src = PHI_DEFAULT, np.zeros(n, dtype=dtype)
+
+    has_gr = gr is not None
+    if has_gr and (gr_min is None or gr_max is None):
+        gr_min, gr_max = gr_limits(gr_a)
+    if has_gr and not gr_max != gr_min:
+        has_gr = False  # GRmax == GRmin: VSH = 0 (como calcular_vsh)
+    c = {
+        'has_gr': has_gr, 'has_rt': rt is not None,
+        'gr_min': float(gr_min) if has_gr else 0.0,
+        'gr_range': float(gr_max - gr_min) if has_gr else 1.0,
+        'nphi_div': float(nphi_div) if nphi_div is not None
+        else (nphi_divisor(phi_src) if mode == PHI_NPHI else 1.0),
+        'rho_range': float(p['rho_ma'] - p['rho_fl']),
+        'arw': p['a'] * p['rw'],
+        **{k: float(p[k]) for k in ('rho_ma', 'phi_max', 'phi_default', 'sw_default', 'rsh', 'm', 'n')},
+    }
+
+    out = {name: np.empty(n, dtype=dtype) for name in OUTPUTS}
+    if not (gr is not None and rt is not None):
+        out['SW_SIM'] = None
+    arrays = [out[name] for name in OUTPUTS]
+    if backend == 'numba':
+        _kernel_numba(gr_a, rt_a, phi_src, mode, c, arrays)
+    elif backend == 'numexpr':
+        _kernel_numexpr(gr_a, rt_a, phi_src, mode, c, arrays)
+    else:
+        _kernel_numpy(gr_a, rt_a, phi_src, mode, c, arrays, block)
+
+    info = {
+        'backend': backend,
+        'phi_source': ('NPHI', 'RHOB (estimado)', f"Default ({p['phi_default']})")[mode],
+        'nphi_div': c['nphi_div'],
+        'gr_min': gr_min if gr is not None else None,
+        'gr_max': gr_max if gr is not None else None,
+    }
+    return out, info
@@ -0,0 +1,254 @@
+import time
+import numpy as np
+
+from petro_kernel import PETRO_DEFAULTS
+
+# =============================================================================
+# SENSIBILIDAD PETROFÍSICA (MONTE CARLO POR LOTES)
+# N juegos de parámetros (Rw, a, m, n, Rsh, ρma) contra el mismo registro en
+# una sola computación difundida (muestras × profundidad):
+#   - Los parámetros son columnas (N × 1) y las curvas filas (1 × D); PHI, SW y
+#     la bandera de pay salen como matrices N × D sin bucles de Python.
+#   - Se procesa por bloques de profundidad (todas las realizaciones a la vez)
+#     para acotar la memoria a `max_bytes`: cada bloque tiene la columna
+#     completa de realizaciones, así que P10/P50/P90 por profundidad son exactos
+#     y el net pay de cada realización se acumula bloque a bloque.
+#   - Net pay con la misma definición que ReservoirDetector.sweep_cutoffs: suma
+#     de saltos de profundidad entre muestras vecinas ambas en pay (un producto
+#     matriz-vector por bloque).
+# Percentiles estadísticos (P10 = percentil 10 del valor), como
+# SimulacionYacimiento.monte_carlo_volumen.
+# =============================================================================
+
+PARAMS = ('rw', 'a', 'm', 'n', 'rsh', 'rho_ma')
+DISTRIBUTIONS = ('fixed', 'uniform', 'triangular', 'normal', 'lognormal')
+DEFAULT_DISTS = {
+    'rw': ('triangular', 0.03, 0.05, 0.08),
+    'a': ('uniform', 0.8, 1.2),
+    'm': ('triangular', 1.8, 2.0, 2.2),
+    'n': ('triangular', 1.8, 2.0, 2.4),
+    'rsh': ('uniform', 1.0, 4.0),
+    'rho_ma': ('triangular', 2.63, 2.65, 2.71),
+}
+DEFAULT_CUTOFFS = {'phi_min': 0.08, 'sw_max': 0.5, 'vsh_max': 0.4}
+PERCENTILES = (10, 50, 90)
+DEFAULT_SAMPLES = 1000
+MAX_BYTES = 32 * 2**20  # Presupuesto de los buffers bloque × N (bloques chicos quedan en caché)
+LIMITS = {'rw': (1e-4, None), 'a': (1e-3, None), 'm': (0.5, None), 'n': (0.5, None),
+          'rsh': (1e-3, None), 'rho_ma': (1.5, None)}
+
+
+def _draw(rng, spec, size):
+    """Muestras de una distribución: escalar = fija; (tipo, *args) según DISTRIBUTIONS."""
+    if np.isscalar(spec):
+        return np.full(size, float(spec))
+    kind, *args = spec
+    if kind == 'fixed':
+        return np.full(size, float(args[0]))
+    if kind == 'uniform':
+        return rng.uniform(args[0], args[1], size)
+    if kind == 'triangular':
+        lo, mode, hi = args
+        return rng.triangular(lo, mode, hi, size) if hi > lo else np.full(size, float(mode))
+    if kind == 'normal':
+        return rng.normal(args[0], args[1], size)
+    if kind == 'lognormal':
+        # (media, desviación) en unidades reales → parámetros del log
+        mean, sd = args
+        sigma2 = np.log1p((sd / mean) ** 2)
+        return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), size)
+    raise ValueError(f"Distribución desconocida: {kind} (válidas: {DISTRIBUTIONS})")
+
+
+def sample_parameters(n_samples, dists=None, seed=None):
+    """
+    Dict parámetro → arreglo (n_samples,). `dists` sobreescribe DEFAULT_DISTS
+    por parámetro (escalar = fijo). Valores acotados a LIMITS para que una cola
+    normal no produzca Rw o m negativos.
+    """
+    rng = np.random.default_rng(seed)
+    specs = {**DEFAULT_DISTS, **(dists or {})}
+    unknown = set(specs) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos: {sorted(unknown)} (válidos: {PARAMS})")
+    return {name: np.clip(_draw(rng, specs[name], n_samples), *LIMITS[name]) for name in PARAMS}
+
+
+def run_sensitivity(depth, rt, rhob=None, phi=None, vsh=None, n_samples=DEFAULT_SAMPLES, dists=None,
+                    params=None, cutoffs=None, model='archie', seed=None, max_bytes=MAX_BYTES,
+                    dtype=np.float32, percentiles=PERCENTILES):
+    """
+    Evalúa PHI, SW y net pay para `n_samples` juegos de parámetros sobre un registro.
+    - PHI desde RHOB con ρma muestreada (ρf = PETRO_DEFAULTS['rho_fl']) si hay
+      RHOB; si no, la curva `phi` fija (ρma no influye).
+    - SW Archie con (a, Rw, m, n) muestreados; `model='simandoux'` usa la forma
+      n = 2 de PetrofisicaCore con Rsh muestreado (requiere `vsh`).
+    - Pay: PHI ≥ phi_min, SW ≤ sw_max y VSH ≤ vsh_max (sin `vsh`, solo los dos primeros).
+    `params` permite pasar los parámetros ya muestreados (dict de arreglos).
+    Retorna dict con:
+      - curves: {'PHI', 'SW'} → {'P10', 'P50', 'P90'} arreglos de largo D;
+      - net_pay / hc_column: arreglos (n_samples,) (ft y φ·Sh·ft por realización);
+      - stats: percentiles, media y desviación de net pay y columna de HC;
+      - sensitivity: correlación de rangos (Spearman) de cada parámetro con net pay;
+      - params, meta (tiempos, bloque, fuente de PHI, modelo).
+    """
+    t0 = time.perf_counter()
+    dtype = np.dtype(dtype)
+    depth = np.asarray(depth, dtype=np.float64)
+    rt = np.asarray(rt, dtype=dtype)
+    d = len(depth)
+    if rhob is None and phi is None:
+        raise ValueError("Se necesita RHOB o una curva de PHI")
+    if model not in ('archie', 'simandoux'):
+        raise ValueError(f"Modelo de saturación desconocido: {model}")
+    if model == 'simandoux' and vsh is None:
+        raise ValueError("Simandoux requiere VSH")
+    cut = {**DEFAULT_CUTOFFS, **(cutoffs or {})}
+    p = params if params is not None else sample_parameters(n_samples, dists, seed)
+    n_samples = len(p['rw'])
+
+    # Bloques en orden profundidad × realización (D × N): cada fila es contigua, así que los
+    # percentiles salen de un sort por fila (vectorizado) y el net pay de un producto g·pares.
+    # Parámetros como filas (1 × N); en log para Archie: log Sw = (log aRw - m log φ - log Rt) / n
+    row = {k: np.asarray(v, dtype=dtype)[None, :] for k, v in p.items()}
+    arw = row['a'] * row['rw']
+    log_arw = np.log(arw)
+    inv_n = 1.0 / row['n']
+    rho_fl = PETRO_DEFAULTS['rho_fl']
+    phi_max = PETRO_DEFAULTS['phi_max']
+    inv_rho = 1.0 / (row['rho_ma'] - rho_fl)
+    rt_safe = np.maximum(rt, 0.1)[:, None]
+    log_rt = np.log(rt_safe)
+    rhob = np.asarray(rhob, dtype=dtype)[:, None] if rhob is not None else None
+    phi_col = np.clip(np.asarray(phi, dtype=dtype), 0, phi_max)[:, None] if rhob is None else None
+    vsh = np.asarray(vsh, dtype=dtype)[:, None] if vsh is not None else None
+    depth_ok = np.isfinite(log_rt)
+    if vsh is not None:
+        depth_ok &= ~(vsh > cut['vsh_max'])  # NaN de VSH no descarta (como la bandera sin VSH)
+    gap = np.abs(np.diff(depth))
+    gap[~np.isfinite(gap)] = 0.0
+    gap = gap.astype(dtype)
+
+    # Alto del bloque: 4 buffers float (PHI, SW, temporal, auxiliar) + 2 bool ≈ 6 de w × N
+    width = int(max(2, min(d, max_bytes // max(1, 6 * n_samples * dtype.itemsize))))
+    q = np.asarray(percentiles, dtype=np.float64)
+    # Interpolación lineal entre estadísticos de orden (método por defecto de np.percentile)
+    pos = q / 100.0 * (n_samples - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, n_samples - 1)
+    frac = (pos - lo).astype(dtype)
+    curves = {name: np.full((d, len(q)), np.nan, dtype=dtype) for name in ('PHI', 'SW')}
+    net_pay = np.zeros(n_samples, dtype=np.float64)
+    hc_column = np.zeros(n_samples, dtype=np.float64)
+
+    # Buffers de trabajo reutilizados en todos los bloques (las páginas nuevas de un
+    # temporal N × w cuestan más que la aritmética sobre ellas)
+    buf_phi, buf_sw, buf_tmp, buf_aux = (np.empty((width + 1, n_samples), dtype=dtype) for _ in range(4))
+    buf_pay, buf_cmp = (np.empty((width + 1, n_samples), dtype=bool) for _ in range(2))
+
+    def quantiles(block, work):
+        # Un nulo de la curva es NaN en toda la fila (el sort lo deja al final) y da NaN
+        np.copyto(work, block)
+        work.sort(axis=1)
+        return work[:, lo] + (work[:, hi] - work[:, lo]) * frac
+
+    # Cada bloque cubre [j0, j1] con una fila de solape para los pares vecinos
+    j0 = 0
+    while j0 < d:
+        j1 = min(d, j0 + width)
+        s = slice(j0, min(d, j1 + 1))
+        w = s.stop - s.start
+        sw, tmp, aux, pay, cmp = buf_sw[:w], buf_tmp[:w], buf_aux[:w], buf_pay[:w], buf_cmp[:w]
+        if rhob is not None:
+            phi_b = buf_phi[:w]
+            np.subtract(row['rho_ma'], rhob[s], out=phi_b)
+            phi_b *= inv_rho
+            np.clip(phi_b, 0, phi_max, out=phi_b)
+        else:
+            phi_b = np.broadcast_to(phi_col[s], (w, n_samples))
+        np.maximum(phi_b, 0.001, out=sw)
+        np.log(sw, out=sw)
+        if model == 'archie':
+            sw *= -row['m']
+            sw -= log_rt[s]
+            sw += log_arw
+            sw *= inv_n
+            np.exp(sw, out=sw)
+        else:
+            # Simandoux (n = 2): [-B + √(B² + 4φᵐ/(aRwRt))] / (2φᵐ/(aRw)), B = Vsh/Rsh
+            sw *= row['m']
+            np.exp(sw, out=sw)                      # φᵐ
+            np.divide(vsh[s], row['rsh'], out=aux)  # B
+            np.multiply(aux, aux, out=tmp)          # B²
+            sw *= 4.0
+            sw /= arw
+            sw /= rt_safe[s]                        # 4φᵐ/(aRwRt)
+            tmp += sw
+            np.sqrt(tmp, out=tmp)
+            tmp -= aux
+            sw *= rt_safe[s]
+            sw *= 0.5                               # 2φᵐ/(aRw)
+            np.divide(tmp, sw, out=sw)
+        np.clip(sw, 0, 1, out=sw)
+
+        # Percentiles de [j0, j1) (la fila de solape es la primera del bloque siguiente)
+        keep = w if s.stop == d else j1 - j0
+        out = slice(j0, j0 + keep)
+        curves['PHI'][out] = quantiles(phi_b[:keep], tmp[:keep]) if rhob is not None else phi_col[out]
+        curves['SW'][out] = quantiles(sw[:keep], tmp[:keep])
+
+        # Pay por realización (NaN nunca es pay) y pares vecinos ambos en pay
+        np.greater_equal(phi_b, cut['phi_min'], out=pay)
+        pay &= np.less_equal(sw, cut['sw_max'], out=cmp)
+        pay &= depth_ok[s]
+        pair = tmp[:w - 1]
+        np.logical_and(pay[:-1], pay[1:], out=cmp[:w - 1])
+        np.copyto(pair, cmp[:w - 1])
+        g = gap[j0:s.stop - 1]
+        net_pay += g @ pair
+
+        # Columna de HC: trapecio de φ·Sh sobre pares en pay (PHI ya no se usa: su buffer recibe la suma)
+        np.subtract(1.0, sw, out=aux)
+        aux *= phi_b
+        hc = buf_phi[:w - 1]
+        np.add(aux[:-1], aux[1:], out=hc)
+        # Máscara (no producto): un nulo deja φ·Sh en NaN y NaN·0 seguiría siendo NaN
+        np.copyto(hc, 0.0, where=~cmp[:w - 1])
+        hc_column += (g * 0.5) @ hc
+        j0 = j1
+
+    labels = [f"P{int(v)}" for v in q]
+    stats = {}
+    for name, values in (('net_pay', net_pay), ('hc_column', hc_column)):
+        stats[name] = {**dict(zip(labels, np.percentile(values, q).tolist())),
+                       'mean': float(values.mean()), 'std': float(values.std())}
+    return {
+        'curves': {name: dict(zip(labels, arr.T)) for name, arr in curves.items()},
+        'net_pay': net_pay,
+        'hc_column': hc_column,
+        'stats': stats,
+        'sensitivity': rank_correlations(p, net_pay),
+        'params': p,
+        'meta': {
+            'n_samples': n_samples, 'n_depth': d, 'block': width, 'model': model,
+            'phi_source': 'RHOB' if rhob is not None else 'PHI', 'cutoffs': cut,
+            'dtype': dtype.name, 'elapsed_s': round(time.perf_counter() - t0, 3),
+        },
+    }
+
+
+def rank_correlations(params, target):
+    """Spearman de cada parámetro muestreado (no constante) con `target`, ordenado por |ρ|."""
+    def ranks(x):
+        r = np.empty(len(x))
+        r[np.argsort(x, kind='stable')] = np.arange(len(x))
+        return r
+
+    t = ranks(target)
+    out = {}
+    for name, values in params.items():
+        values = np.asarray(values)
+        if len(values) < 3 or np.ptp(values) == 0 or np.ptp(target) == 0:
+            continue
+        out[name] = float(np.corrcoef(ranks(values), t)[0, 1])
+    return dict(sorted(out.items(), key=lambda kv: -abs(kv[1])))
@@ -0,0 +1,224 @@
+import os
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from las_fast import read_las
+from downsampling import lttb_indices
+
+# =============================================================================
+# SURVEY DIRECCIONAL - MÉTODO DE MÍNIMA CURVATURA
+# Estaciones MD/INC/AZI (LAS o CSV) → TVD, Norte, Este, DLS, build y turn.
+# Todo vectorizado sobre pares de estaciones consecutivas: los senos/cosenos
+# se calculan una vez por estación y el ángulo de dogleg sale de identidades
+# de suma (sin trigonometría extra por par).
+# =============================================================================
+
+MD_ALIASES = ('MD', 'DEPT', 'DEPTH', 'M_DEPTH', 'MEASURED_DEPTH')
+INC_ALIASES = ('INC', 'INCL', 'DEVI', 'DEV', 'HDEV', 'INCLINATION')
+AZI_ALIASES = ('AZI', 'AZIM', 'AZ', 'HAZI', 'HAZIM', 'AZIMUTH')
+
+COURSE_LENGTH = 100.0  # DLS, build y turn en °/100 ft
+SEVERITY_BINS = (3.0, 6.0, 10.0)
+SEVERITY_LABELS = ("Bajo", "Medio", "Alto", "Crítico")
+_SMALL_DOGLEG = 1e-7  # rad: por debajo, RF = 1 (tramo recto)
+
+
+class SurveyError(Exception):
+    """Survey sin columnas MD/INC/AZI o con menos de dos estaciones válidas."""
+
+
+def find_column(columns, aliases):
+    """Primera columna cuyo nombre (sin mayúsculas/espacios) coincide con un alias."""
+    lookup = {str(c).strip().upper(): c for c in columns}
+    for alias in aliases:
+        if alias in lookup:
+            return lookup[alias]
+    return None
+
+
+def minimum_curvature(md, inc, azi, tie_in=None, course_length=COURSE_LENGTH):
+    """
+    Trayectoria por mínima curvatura. `inc`/`azi` en grados; `tie_in` =
+    (tvd, norte, este) de la primera estación (por defecto vertical hasta MD[0]).
+    Retorna dict de arreglos por estación: md, inc, azi, tvd, north, east,
+    dls, build, turn (las tasas de la primera estación son 0).
+    """
+    md = np.asarray(md, dtype=np.float64)
+    inc = np.asarray(inc, dtype=np.float64)
+    azi = np.asarray(azi, dtype=np.float64)
+    if md.ndim != 1 or md.shape != inc.shape or md.shape != azi.shape:
+        raise SurveyError("MD, INC y AZI deben ser arreglos 1-D del mismo largo")
+    n = len(md)
+    if n < 2:
+        raise SurveyError("El survey necesita al menos dos estaciones")
+
+    # Operaciones in-place (out=) sobre arreglos de n-1 pares: con 100k+
+    # estaciones el costo lo dominan las asignaciones de temporales, no la aritmética
+    rad = np.radians(inc)
+    si, ci = np.sin(rad), np.cos(rad)
+    np.radians(azi, out=rad)
+    sa, ca = np.sin(rad), np.cos(rad)
+    si1, si2, ci1, ci2 = si[:-1], si[1:], ci[:-1], ci[1:]
+    sa1, sa2, ca1, ca2 = sa[:-1], sa[1:], ca[:-1], ca[1:]
+    tmp = np.empty(n - 1)
+
+    # cos β = cos I1 cos I2 + sin I1 sin I2 cos(A2 - A1)
+    beta = np.multiply(ca1, ca2)
+    beta += np.multiply(sa1, sa2, out=tmp)
+    beta *= np.multiply(si1, si2, out=tmp)
+    beta += np.multiply(ci1, ci2, out=tmp)
+    np.clip(beta, -1.0, 1.0, out=beta)
+    np.arccos(beta, out=beta)
+
+    # Factor de razón RF = tan(β/2) / (β/2)  (→ 1 en tramos rectos)
+    half = np.multiply(beta, 0.5)
+    rf = np.ones(n - 1)
+    np.divide(np.tan(half, out=tmp), half, out=rf, where=half > _SMALL_DOGLEG)
+
+    # Desplazamientos del tramo: ΔMD/2 · RF · (f1 + f2)
+    dmd = np.diff(md)
+    w = rf  # Se reutiliza el buffer de RF
+    w *= dmd
+    w *= 0.5
+    d_north = np.multiply(si1, ca1)
+    d_north += np.multiply(si2, ca2, out=tmp)
+    d_north *= w
+    d_east = np.multiply(si1, sa1)
+    d_east += np.multiply(si2, sa2, out=tmp)
+    d_east *= w
+    d_tvd = np.add(ci1, ci2)
+    d_tvd *= w
+
+    tvd0, north0, east0 = tie_in if tie_in is not None else (md[0], 0.0, 0.0)
+    tvd = np.empty(n)
+    north = np.empty(n)
+    east = np.empty(n)
+    tvd[0], north[0], east[0] = tvd0, north0, east0
+    np.cumsum(d_tvd, out=tvd[1:])
+    np.cumsum(d_north, out=north[1:])
+    np.cumsum(d_east, out=east[1:])
+    tvd[1:] += tvd0
+    north[1:] += north0
+    east[1:] += east0
+
+    # Tasas por `course_length` de MD (0 si dos estaciones comparten MD)
+    scale = np.zeros(n - 1)
+    np.divide(course_length, dmd, out=scale, where=dmd > 0)
+    dls = np.zeros(n)
+    build = np.zeros(n)
+    turn = np.zeros(n)
+    np.degrees(beta, out=dls[1:])
+    dls[1:] *= scale
+    np.subtract(inc[1:], inc[:-1], out=build[1:])
+    build[1:] *= scale
+    # Giro más corto (350° → 10° = +20°): Δ − 360·round(Δ/360)
+    d_azi = np.subtract(azi[1:], azi[:-1], out=turn[1:])
+    np.divide(d_azi, 360.0, out=tmp)
+    np.round(tmp, out=tmp)
+    tmp *= 360.0
+    d_azi -= tmp
+    d_azi *= scale
+
+    return {'md': md, 'inc': inc, 'azi': azi, 'tvd': tvd, 'north': north, 'east': east,
+            'dls': dls, 'build': build, 'turn': turn}
+
+
+def top_severities(dls, n=50, threshold=1.0):
+    """Índices de los `n` DLS más altos sobre `threshold`, de mayor a menor (argpartition)."""
+    dls = np.asarray(dls)
+    candidates = np.flatnonzero(dls > threshold)
+    if len(candidates) > n:
+        part = np.argpartition(dls[candidates], len(candidates) - n)[-n:]
+        candidates = candidates[part]
+    return candidates[np.argsort(dls[candidates], kind='stable')[::-1]]
+
+
+def severity_labels(dls):
+    """Bajo < 3 ≤ Medio < 6 ≤ Alto < 10 ≤ Crítico (°/100 ft)."""
+    return np.asarray(SEVERITY_LABELS)[np.searchsorted(SEVERITY_BINS, dls, side='right')]
+
+
+def dls_report(stations, n=50, threshold=1.0):
+    """Tabla de riesgo de perforación (`dls_analysis`): los DLS más severos."""
+    idx = top_severities(stations['dls'], n, threshold)
+    labels = severity_labels(stations['dls'][idx])
+    return [{
+        'depth': float(stations['md'][i]),
+        'dls': round(float(stations['dls'][i]), 2),
+        'inclination': round(float(stations['inc'][i]), 1),
+        'azimuth': round(float(stations['azi'][i]), 1),
+        'severity': str(label),
+    } for i, label in zip(idx, labels)]
+
+
+def build_trajectory(stations, source='survey', max_points=2000):
+    """
+    Trayectoria para el visor 3D: coordenadas reales submuestreadas con LTTB
+    sobre (N, E, TVD) + resumen. El DLS de cada punto es el máximo de su tramo,
+    así un dogleg severo no desaparece al submuestrear.
+    """
+    md = stations['md']
+    idx = lttb_indices(md, np.column_stack([stations['north'], stations['east'], stations['tvd']]), max_points)
+    # Máximo de DLS en el tramo (idx[k-1], idx[k]] de cada punto conservado
+    dls_max = np.fmax.reduceat(stations['dls'], np.r_[0, idx[:-1] + 1])
+    closure = np.hypot(stations['north'][-1], stations['east'][-1])
+    return {
+        'available': True,
+        'source': source,
+        'n_stations': int(len(md)),
+        'md': md[idx],
+        'tvd': stations['tvd'][idx],
+        'north': stations['north'][idx],
+        'east': stations['east'][idx],
+        'inc': stations['inc'][idx],
+        'azi': stations['azi'][idx],
+        'dls': dls_max,
+        'max_dls': round(float(stations['dls'].max()), 2),
+        'max_inclination': round(float(stations['inc'].max()), 1),
+        'td_tvd': round(float(stations['tvd'][-1]), 1),
+        'closure': round(float(closure), 1),
+        'closure_azimuth': round(float(np.degrees(np.arctan2(stations['east'][-1], stations['north'][-1])) % 360), 1),
+    }
+
+
+def survey_from_frame(df, md_col=None):
+    """
+    (md, inc, azi) desde un DataFrame con columnas por alias. Filas con nulos
+    se descartan; estaciones ordenadas por MD y sin MD repetidas.
+    """
+    if md_col is None:
+        md_col = find_column(df.columns, MD_ALIASES)
+    inc_col = find_column(df.columns, INC_ALIASES)
+    azi_col = find_column(df.columns, AZI_ALIASES)
+    missing = [name for name, col in (('MD', md_col), ('INC', inc_col), ('AZI', azi_col)) if col is None]
+    if missing:
+        raise SurveyError(f"Columnas de survey no encontradas: {', '.join(missing)}")
+
+    data = df[[md_col, inc_col, azi_col]].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    data = data[np.isfinite(data).all(axis=1)]
+    data = data[np.argsort(data[:, 0], kind='stable')]
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = np.diff(data[:, 0]) > 0
+    data = data[keep]
+    if len(data) < 2:
+        raise SurveyError("El survey necesita al menos dos estaciones válidas")
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def read_survey(content, filename=""):
+    """Lee un survey .LAS (curvas INC/AZI sobre MD) o .CSV/.TXT (columnas MD, INC, AZI)."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == '.las' or (not ext and content.lstrip()[:1] == b'~'):
+        df = read_las(content).df().reset_index()
+    else:
+        # sep=None: detecta coma, punto y coma o tabulador
+        df = pd.read_csv(BytesIO(content), sep=None, engine='python')
+    return survey_from_frame(df)
+
+
+def analyze_survey(content, filename="", top_n=50):
+    """Archivo de survey → {'dls_analysis', 'trajectory'} (mismo formato que /upload)."""
+    stations = minimum_curvature(*read_survey(content, filename))
+    return {'dls_analysis': dls_report(stations, n=top_n), 'trajectory': build_trajectory(stations)}
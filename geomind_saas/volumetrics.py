@@ -0,0 +1,300 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+# =============================================================================
+# VOLUMETRÍA PROBABILÍSTICA (OOIP MONTE CARLO)
+# OOIP = 7758 × A × h × φ × (1 - Sw) / Bo con las cinco variables muestreadas
+# de distribuciones configurables y correlacionadas (cópula gaussiana: normales
+# correlacionadas por Cholesky → uniformes → inversa de cada marginal).
+#   - Se simula por bloques vectorizados de `chunk` realizaciones hasta que
+#     P10/P50/P90 cambian menos de `tol` (relativo) en STABLE_CHECKS controles
+#     seguidos, o hasta `max_samples`. Los controles se hacen cada vez que la
+#     muestra crece un CHECK_GROWTH (no en cada bloque): el costo total de los
+#     percentiles queda lineal en el número de realizaciones.
+#   - El bloque i usa su propio flujo aleatorio (SeedSequence(seed, spawn_key=(i,))):
+#     los bloques pueden repartirse entre procesos y el resultado para una
+#     semilla es el mismo con 1 o N workers (se corta en el primer bloque que
+#     converge, en orden).
+# Percentiles estadísticos (P10 = percentil 10), como monte_carlo_volumen.
+# =============================================================================
+
+BBL_PER_ACRE_FT = 7758.0
+VARIABLES = ('area', 'net_pay', 'phi', 'sw', 'bo')
+UNITS = {'area': 'acres', 'net_pay': 'ft', 'phi': 'frac', 'sw': 'frac', 'bo': 'bbl/STB'}
+DISTRIBUTIONS = ('fixed', 'uniform', 'triangular', 'normal', 'lognormal')
+BOUNDS = {'area': (0.0, None), 'net_pay': (0.0, None), 'phi': (0.0, 0.5), 'sw': (0.0, 1.0), 'bo': (1.0, None)}
+
+# Valores determinísticos del PASO 11 (modas de las distribuciones por defecto)
+OOIP_DEFAULTS = {'area': 40.0, 'bo': 1.2}
+DEFAULT_DISTS = {
+    'area': ('triangular', 20.0, 40.0, 80.0),
+    'net_pay': ('triangular', 30.0, 50.0, 70.0),
+    'phi': ('triangular', 0.12, 0.18, 0.24),
+    'sw': ('triangular', 0.25, 0.35, 0.50),
+    'bo': ('triangular', 1.1, 1.2, 1.4),
+}
+# Mejor roca → menor Sw: correlación negativa φ–Sw por defecto
+DEFAULT_CORRELATIONS = {('phi', 'sw'): -0.5}
+# Incertidumbre relativa de los promedios de registro (distribuciones de un pozo)
+LOG_UNCERTAINTY = {'net_pay': 0.20, 'phi': 0.10, 'sw': 0.10}
+
+PERCENTILES = (10, 50, 90)
+CHUNK = 20000
+TOL = 0.005
+MIN_SAMPLES = 40000
+MAX_SAMPLES = 2_000_000
+STABLE_CHECKS = 2
+CHECK_GROWTH = 0.25  # Crecimiento relativo de la muestra entre controles de convergencia
+HIST_BINS = 40
+
+
+def _ppf(spec, u):
+    """Inversa de la distribución `spec` (escalar = fija; (tipo, *args)) evaluada en u ∈ (0, 1)."""
+    if np.isscalar(spec):
+        return np.full(u.shape, float(spec))
+    kind, *args = spec
+    if kind == 'fixed':
+        return np.full(u.shape, float(args[0]))
+    if kind == 'uniform':
+        lo, hi = args
+        return lo + u * (hi - lo)
+    if kind == 'triangular':
+        lo, mode, hi = args
+        if not hi > lo:
+            return np.full(u.shape, float(mode))
+        c = (mode - lo) / (hi - lo)
+        left = lo + np.sqrt(u * (hi - lo) * (mode - lo))
+        right = hi - np.sqrt((1 - u) * (hi - lo) * (hi - mode))
+        return np.where(u < c, left, right)
+    if kind == 'normal':
+        mean, sd = args
+        return mean + sd * ndtri(u)
+    if kind == 'lognormal':
+        # (media, desviación) en unidades reales → parámetros del log
+        mean, sd = args
+        sigma2 = np.log1p((sd / mean) ** 2)
+        return np.exp(np.log(mean) - sigma2 / 2 + np.sqrt(sigma2) * ndtri(u))
+    raise ValueError(f"Distribución desconocida: {kind} (válidas: {DISTRIBUTIONS})")
+
+
+def resolve_distributions(dists=None):
+    """DEFAULT_DISTS sobreescritas por `dists`; valida nombres, tipos y cantidad de argumentos."""
+    specs = {**DEFAULT_DISTS, **(dists or {})}
+    unknown = set(specs) - set(VARIABLES)
+    if unknown:
+        raise ValueError(f"Variables desconocidas: {sorted(unknown)} (válidas: {VARIABLES})")
+    n_args = {'fixed': 1, 'uniform': 2, 'triangular': 3, 'normal': 2, 'lognormal': 2}
+    for name, spec in specs.items():
+        if np.isscalar(spec):
+            continue
+        kind, *args = spec
+        if kind not in n_args:
+            raise ValueError(f"{name}: distribución desconocida {kind} (válidas: {DISTRIBUTIONS})")
+        if len(args) != n_args[kind]:
+            raise ValueError(f"{name}: '{kind}' requiere {n_args[kind]} parámetros, recibió {len(args)}")
+        if kind == 'triangular' and not args[0] <= args[1] <= args[2]:
+            raise ValueError(f"{name}: triangular requiere mín ≤ moda ≤ máx")
+        if kind == 'lognormal' and not args[0] > 0:
+            raise ValueError(f"{name}: lognormal requiere media > 0")
+    return {name: specs[name] for name in VARIABLES}
+
+
+def correlation_matrix(correlations=None):
+    """
+    Matriz de correlación (orden VARIABLES) desde {(a, b): ρ} o [(a, b, ρ), ...].
+    Lanza ValueError si una variable no existe o la matriz no es definida positiva.
+    """
+    if correlations is None:
+        correlations = DEFAULT_CORRELATIONS
+    items = correlations.items() if isinstance(correlations, dict) else (((a, b), rho) for a, b, rho in correlations)
+    corr = np.eye(len(VARIABLES))
+    for (a, b), rho in items:
+        if a not in VARIABLES or b not in VARIABLES or a == b:
+            raise ValueError(f"Correlación inválida {a}–{b} (variables: {VARIABLES})")
+        if not -1 < rho < 1:
+            raise ValueError(f"Correlación {a}–{b} fuera de (-1, 1): {rho}")
+        i, j = VARIABLES.index(a), VARIABLES.index(b)
+        corr[i, j] = corr[j, i] = rho
+    try:
+        np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        raise ValueError("La matriz de correlación no es definida positiva (correlaciones inconsistentes)")
+    return corr
+
+
+def simulate_chunk(dists, corr, n, entropy, index):
+    """
+    Un bloque de `n` realizaciones con el flujo aleatorio `index` de la semilla
+    `entropy`. Ejecutable en un worker. Retorna el OOIP (STB) y, por variable,
+    la suma (para la media) y la correlación de rangos con el OOIP.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(index,)))
+    z = rng.standard_normal((n, len(VARIABLES))) @ np.linalg.cholesky(corr).T
+    u = np.clip(ndtr(z), 1e-12, 1 - 1e-12)
+    x = {name: np.clip(_ppf(dists[name], u[:, i]), *BOUNDS[name]) for i, name in enumerate(VARIABLES)}
+    ooip = BBL_PER_ACRE_FT * x['area'] * x['net_pay'] * x['phi'] * (1 - x['sw']) / x['bo']
+
+    ranks = np.empty(n)
+    ranks[np.argsort(ooip, kind='stable')] = np.arange(n)
+    rank_corr = {}
+    for name, values in x.items():
+        if np.ptp(values) > 0 and np.ptp(ooip) > 0:
+            r = np.empty(n)
+            r[np.argsort(values, kind='stable')] = np.arange(n)
+            rank_corr[name] = float(np.corrcoef(r, ranks)[0, 1])
+    return {'index': index, 'ooip': ooip, 'sums': {k: float(v.sum()) for k, v in x.items()}, 'rank_corr': rank_corr}
+
+
+class VolumetricMonteCarlo:
+    """
+    Estado de una corrida por bloques: entrega las tareas del siguiente lote de
+    bloques (`tasks`), acumula sus resultados en orden (`add`) y decide la
+    convergencia. El que ejecuta los bloques (local, pool de procesos o el pool
+    de la API) solo llama tasks → simulate_chunk → add hasta `done`.
+    """
+
+    def __init__(self, dists=None, correlations=None, chunk=CHUNK, tol=TOL,
+                 min_samples=MIN_SAMPLES, max_samples=MAX_SAMPLES, seed=None):
+        self.dists = resolve_distributions(dists)
+        self.corr = correlation_matrix(correlations)
+        self.chunk = int(chunk)
+        self.tol = float(tol)
+        self.min_samples = int(min_samples)
+        self.max_samples = max(int(max_samples), self.chunk)
+        self.entropy = seed if seed is not None else np.random.SeedSequence().entropy
+        self.q = np.asarray(PERCENTILES, dtype=np.float64)
+        # Buffer creciente (se duplica al llenarse): no se reserva max_samples de entrada
+        self._values = np.empty(min(self.max_samples, max(self.min_samples, self.chunk)))
+        self._n = 0
+        self._next_check = 0
+        self._chunks = 0
+        self._submitted = 0
+        self._stable = 0
+        self._sums = dict.fromkeys(VARIABLES, 0.0)
+        self._rank_corr = {}
+        self.history = []
+        self.converged = False
+        self.start = time.perf_counter()
+
+    @property
+    def done(self):
+        return self.converged or self._n >= self.max_samples
+
+    def tasks(self, k):
+        """Argumentos de simulate_chunk para los próximos `k` bloques (sin pasar de max_samples)."""
+        out = []
+        while len(out) < k and self._submitted * self.chunk < self.max_samples:
+            n = min(self.chunk, self.max_samples - self._submitted * self.chunk)
+            out.append((self.dists, self.corr, n, self.entropy, self._submitted))
+            self._submitted += 1
+        return out
+
+    def add(self, part):
+        """Incorpora un bloque (en orden de índice); los que llegan después de converger se descartan."""
+        if self.done:
+            return
+        if part['index'] != self._chunks:
+            raise ValueError(f"Bloque fuera de orden: {part['index']} (esperado {self._chunks})")
+        n = len(part['ooip'])
+        if self._n + n > len(self._values):
+            grown = np.empty(min(self.max_samples, max(2 * len(self._values), self._n + n)))
+            grown[:self._n] = self._values[:self._n]
+            self._values = grown
+        self._values[self._n:self._n + n] = part['ooip']
+        self._n += n
+        self._chunks += 1
+        for name, total in part['sums'].items():
+            self._sums[name] += total
+        for name, rho in part['rank_corr'].items():
+            self._rank_corr[name] = self._rank_corr.get(name, 0.0) + rho * n
+
+        if self._n < self._next_check and self._n < self.max_samples:
+            return
+        self._next_check = self._n * (1 + CHECK_GROWTH)
+        estimate = np.percentile(self._values[:self._n], self.q)
+        if self.history:
+            prev = np.array([self.history[-1][f"P{int(v)}"] for v in self.q])
+            change = np.abs(estimate - prev) / np.maximum(np.abs(prev), 1e-12)
+            self._stable = self._stable + 1 if np.all(change < self.tol) else 0
+        self.history.append({'n': self._n, **{f"P{int(v)}": float(p) for v, p in zip(self.q, estimate)}})
+        self.converged = self._n >= self.min_samples and self._stable >= STABLE_CHECKS
+
+    def extend(self, parts):
+        """add() de un lote de bloques (en orden)."""
+        for part in parts:
+            self.add(part)
+
+    def result(self):
+        """Resumen JSON-serializable (sin las realizaciones)."""
+        values = self._values[:self._n]
+        labels = [f"P{int(v)}" for v in self.q]
+        lo, hi = np.percentile(values, [0.5, 99.5]) if self._n else (0.0, 0.0)
+        counts, edges = np.histogram(values, bins=HIST_BINS, range=(lo, hi) if hi > lo else None)
+        sensitivity = {k: v / self._n for k, v in self._rank_corr.items()} if self._n else {}
+        return {
+            'ooip_stb': {**dict(zip(labels, np.percentile(values, self.q).tolist())),
+                         'mean': float(values.mean()), 'std': float(values.std())} if self._n else {},
+            'inputs': {name: {'distribution': list(spec) if not np.isscalar(spec) else ['fixed', spec],
+                              'mean': self._sums[name] / self._n if self._n else None, 'unit': UNITS[name]}
+                       for name, spec in self.dists.items()},
+            'variables': list(VARIABLES),
+            'correlation_matrix': self.corr.tolist(),
+            'sensitivity': dict(sorted(sensitivity.items(), key=lambda kv: -abs(kv[1]))),
+            'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+            'convergence': self.history,
+            'converged': self.converged,
+            'n_samples': self._n,
+            'chunks': self._chunks,
+            'chunk_size': self.chunk,
+            'tol': self.tol,
+            'seed': self.entropy,
+            'elapsed_s': round(time.perf_counter() - self.start, 3),
+        }
+
+
+def run_volumetrics(dists=None, correlations=None, chunk=CHUNK, tol=TOL, min_samples=MIN_SAMPLES,
+                    max_samples=MAX_SAMPLES, seed=None, workers=1):
+    """
+    OOIP Monte Carlo hasta convergencia. workers > 1 reparte cada lote de
+    bloques en un pool de procesos (spawn, como evaluate_wells); el resultado
+    para una `seed` dada no depende de `workers`.
+    """
+    mc = VolumetricMonteCarlo(dists, correlations, chunk, tol, min_samples, max_samples, seed)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        while not mc.done:
+            for args in mc.tasks(1):
+                mc.add(simulate_chunk(*args))
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            while not mc.done:
+                mc.extend(pool.map(simulate_chunk, *zip(*mc.tasks(workers))))
+    result = mc.result()
+    result['workers'] = workers
+    return result
+
+
+def well_distributions(net_pay, phi, sw, area=None, bo=None):
+    """
+    Distribuciones para un pozo a partir de sus promedios de registro: net pay,
+    φ y Sw triangulares alrededor del valor medido (±LOG_UNCERTAINTY); área y
+    Bo según `area`/`bo` (distribución o escalar) o DEFAULT_DISTS.
+    """
+    def around(name, value):
+        spread = LOG_UNCERTAINTY[name] * value
+        lo, hi = BOUNDS[name]
+        top = value + spread if hi is None else min(hi, value + spread)
+        return ('triangular', round(max(lo, value - spread), 6), round(value, 6), round(top, 6))
+
+    return {
+        'area': area if area is not None else DEFAULT_DISTS['area'],
+        'net_pay': around('net_pay', float(net_pay)),
+        'phi': around('phi', float(phi)),
+        'sw': around('sw', float(sw)),
+        'bo': bo if bo is not None else DEFAULT_DISTS['bo'],
+    }
@@ -0,0 +1,292 @@
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# ALMACÉN COLUMNAR DE POZOS (.dtw)
+# Un archivo por pozo: [MAGIC][len header][header JSON][columnas alineadas a 64 B]
+# Cada curva es un arreglo tipado contiguo; al abrir sólo se lee el header y los
+# datos se mapean en memoria (np.memmap): abrir es O(1) y un rango de
+# profundidad lee únicamente las páginas de ese tramo.
+# =============================================================================
+
+MAGIC = b"DTWELL01"
+STORE_VERSION = 1
+STORE_EXT = ".dtw"
+_ALIGN = 64
+_PREFIX = struct.Struct("<8sQ")  # magic + longitud del header
+
+
+class WellStoreError(Exception):
+    """Archivo inexistente, corrupto o de otra versión."""
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _encode_column(values):
+    """Arreglo tipado + descriptor. Texto/categorías → códigos int32 + categorías."""
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    arr = np.asarray(values)
+    spec = {}
+    if arr.dtype.kind in 'OUSc' or isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        codes, categories = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        arr = codes.astype(np.int32)
+        spec['categories'] = [str(c) for c in categories]
+    elif arr.dtype.kind == 'b':
+        arr = arr.astype(np.uint8)
+        spec['bool'] = True
+    elif arr.dtype.kind not in 'iuf':
+        raise WellStoreError(f"Tipo de columna no soportado: {arr.dtype}")
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+    spec.update(dtype=arr.dtype.str, shape=list(arr.shape))
+    return arr, spec
+
+
+def write_columns(path, columns, meta=None, index=None):
+    """
+    Escribe `columns` ({nombre: arreglo}) + `meta` (dict JSON) en `path`.
+    `index` nombra la columna de profundidad usada para cortes por rango.
+    Escritura atómica (archivo temporal + os.replace).
+    """
+    encoded = [(name, *_encode_column(values)) for name, values in columns.items()]
+    if index is not None and index not in columns:
+        raise WellStoreError(f"Columna índice '{index}' no existe")
+
+    # El header depende de los offsets y los offsets del largo del header: se
+    # reservan offsets relativos y se desplazan una vez conocido el tamaño.
+    specs, offset = [], 0
+    for name, arr, spec in encoded:
+        specs.append({'name': name, 'offset': offset, **spec})
+        offset = _align(offset + arr.nbytes)
+
+    relative = [spec['offset'] for spec in specs]
+    header = {'version': STORE_VERSION, 'index': index, 'meta': meta or {}, 'columns': specs}
+    base = 0
+    while True:
+        raw = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        if _PREFIX.size + len(raw) <= base:
+            break
+        base = _align(_PREFIX.size + len(raw))
+        for spec, rel in zip(specs, relative):
+            spec['offset'] = base + rel
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(raw)))
+        f.write(raw)
+        for (name, arr, _), spec in zip(encoded, specs):
+            f.seek(spec['offset'])
+            f.write(arr.tobytes())
+        f.truncate(max([base] + [s['offset'] + int(np.prod(s['shape'])) * np.dtype(s['dtype']).itemsize
+                                 for s in specs]))
+    os.replace(tmp, path)
+    return path
+
+
+class WellStore:
+    """
+    Pozo abierto en modo lectura. `store['GR']` retorna una vista de sólo lectura
+    sobre el mmap (sin copiar); `depth_slice(top, base)` da el rango de filas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                magic, length = _PREFIX.unpack(f.read(_PREFIX.size))
+                if magic != MAGIC:
+                    raise WellStoreError(f"{path} no es un archivo {STORE_EXT}")
+                header = json.loads(f.read(length).decode('utf-8'))
+        except (OSError, struct.error, ValueError) as e:
+            raise WellStoreError(f"No se pudo abrir {path}: {e}")
+        if header.get('version') != STORE_VERSION:
+            raise WellStoreError(f"Versión de almacén no soportada: {header.get('version')}")
+
+        self.meta = header['meta']
+        self.index = header['index']
+        self.specs = {s['name']: s for s in header['columns']}
+        self._mm = None
+
+    def _map(self):
+        if self._mm is None:
+            self._mm = np.memmap(self.path, dtype=np.uint8, mode='r')
+        return self._mm
+
+    @property
+    def names(self):
+        return list(self.specs)
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def raw(self, name):
+        """Arreglo almacenado tal cual (códigos para columnas de texto)."""
+        spec = self.specs[name]
+        shape = tuple(spec['shape'])
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=spec['dtype'])
+        return np.ndarray(shape, dtype=spec['dtype'], buffer=self._map(), offset=spec['offset'])
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def column(self, name, rows=None):
+        spec = self.specs[name]
+        arr = self.raw(name)
+        if rows is not None:
+            arr = arr[rows]
+        if 'categories' in spec:
+            cats = np.asarray(spec['categories'] + [None], dtype=object)
+            return cats[arr]  # Código -1 (nulo) → None
+        if spec.get('bool'):
+            return arr.astype(bool)
+        return arr
+
+    def depth_slice(self, top=None, base=None):
+        """Rango de filas [i0, i1) con top <= profundidad <= base (búsqueda binaria)."""
+        if self.index is None:
+            raise WellStoreError("El almacén no tiene columna de profundidad")
+        depth = self.raw(self.index)
+        n = depth.shape[0]
+        if n == 0 or (top is None and base is None):
+            return slice(0, n)
+        descending = depth[0] > depth[-1]
+        d = depth[::-1] if descending else depth
+        i0 = np.searchsorted(d, top, side='left') if top is not None else 0
+        i1 = np.searchsorted(d, base, side='right') if base is not None else n
+        if descending:
+            i0, i1 = n - i1, n - i0
+        return slice(int(i0), int(max(i0, i1)))
+
+    def to_frame(self, columns=None, top=None, base=None):
+        """DataFrame (copia) de las columnas pedidas, opcionalmente acotado en profundidad."""
+        rows = self.depth_slice(top, base) if (top is not None or base is not None) else None
+        names = columns or [n for n in self.names if len(self.specs[n]['shape']) == 1]
+        return pd.DataFrame({n: np.array(self.column(n, rows)) for n in names})
+
+    def close(self):
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_well(path):
+    return WellStore(path)
+
+
+def write_frame(path, df, meta=None, index=None):
+    """Guarda un DataFrame (una columna tipada por curva)."""
+    return write_columns(path, {str(c): df[c] for c in df.columns}, meta=meta, index=index)
+
+
+# =============================================================================
+# RESPUESTAS DEL ANÁLISIS (/upload) EN FORMATO COLUMNAR
+# Las listas numéricas de la respuesta pasan a columnas; el resto (textos,
+# tablas pequeñas) queda en el header con marcadores {"$col": nombre}.
+# =============================================================================
+
+_MIN_COLUMN_LEN = 16
+_DEPTH_ALIGNED = ('depths', 'curves')  # Claves con arreglos alineados a profundidad
+
+
+def _numeric_array(value):
+    """ndarray si `value` es un arreglo o lista (o lista de listas) rectangular de números."""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in 'iuf' and value.ndim in (1, 2) and len(value) >= _MIN_COLUMN_LEN:
+            return value
+        return None
+    if not isinstance(value, list) or len(value) < _MIN_COLUMN_LEN:
+        return None
+    sample = value[0]
+    if isinstance(sample, list):
+        if not all(isinstance(row, list) and len(row) == len(sample) for row in value):
+            return None
+        flat = [x for row in value for x in row]
+    else:
+        flat = value
+    if not all(type(x) in (int, float) for x in flat):
+        return None
+    kind = np.int64 if all(type(x) is int for x in flat) else np.float64
+    try:
+        return np.asarray(value, dtype=kind)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _extract(obj, path, columns):
+    if isinstance(obj, dict):
+        return {k: _extract(v, f"{path}/{k}" if path else str(k), columns) for k, v in obj.items()}
+    arr = _numeric_array(obj)
+    if arr is not None:
+        columns[path] = arr
+        return {"$col": path}
+    if isinstance(obj, np.ndarray):
+        return _extract(obj.tolist(), path, columns)
+    if isinstance(obj, list):
+        return [_extract(v, f"{path}[{i}]", columns) for i, v in enumerate(obj)]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def save_response(path, response):
+    """Guarda la respuesta del análisis: listas numéricas como columnas mmap."""
+    columns = {}
+    skeleton = _extract(response, "", columns)
+    index = 'depths' if 'depths' in columns else None
+    return write_columns(path, columns, meta=skeleton, index=index)
+
+
+def _is_depth_aligned(name):
+    return name.split('/', 1)[0] in _DEPTH_ALIGNED and '[' not in name
+
+
+def _restore(obj, store, rows):
+    if isinstance(obj, dict):
+        if set(obj) == {"$col"}:
+            name = obj["$col"]
+            aligned = rows is not None and _is_depth_aligned(name)
+            return np.array(store.column(name, rows if aligned else None))
+        return {k: _restore(v, store, rows) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore(v, store, rows) for v in obj]
+    return obj
+
+
+def load_response(path, top=None, base=None):
+    """
+    Reconstruye la respuesta guardada (las columnas vuelven como ndarray).
+    Con `top`/`base` sólo se leen las filas
+    del rango en `depths` y `curves/*` (el resto de la respuesta va completo).
+    """
+    with open_well(path) as store:
+        rows = store.depth_slice(top, base) if (top is not None or base is not None) else None
+        return _restore(store.meta, store, rows)
+
+
+def slice_response(response, top=None, base=None):
+    """Mismo recorte por profundidad sobre una respuesta ya en memoria (JSON legado)."""
+    depths = response.get('depths')
+    if (top is None and base is None) or not isinstance(depths, list):
+        return response
+    d = np.asarray(depths, dtype=np.float64)
+    mask = np.ones(d.shape, dtype=bool)
+    if top is not None:
+        mask &= d >= top
+    if base is not None:
+        mask &= d <= base
+    idx = np.flatnonzero(mask)
+    out = dict(response)
+    out['depths'] = [depths[i] for i in idx]
+    out['curves'] = {k: ([v[i] for i in idx] if isinstance(v, list) and len(v) == len(depths) else v)
+                     for k, v in response.get('curves', {}).items()}
+    return out
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import uuid
+import queue
+import asyncio
+import multiprocessing
+
+from pipeline_engine import PipelineCancelled
+from worker_pool import PoolSaturated
+
+# ==============================================================================
+# DATATERRA - TRABAJOS ASÍNCRONOS (submit → progreso SSE → resultado)
+# Los trabajos esperan en cola propia y se despachan al AnalysisWorkerPool a
+# medida que hay workers libres, en lugar de rechazarse con 503.
+# El progreso por etapa viaja desde el proceso worker por una cola de Manager.
+# ==============================================================================
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_TIMEOUT = "timeout"  # Abortado por exceder el timeout del pool (no por el usuario)
+FINAL_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED, JOB_TIMEOUT)
+
+
+class JobQueueFull(Exception):
+    """Demasiados trabajos pendientes."""
+
+
+class Job:
+    """Estado de un análisis en segundo plano."""
+
+    def __init__(self, job_id, meta):
+        self.id = job_id
+        self.meta = meta
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {}       # {etapa: 'running'|'done'|'skipped'}
+        self.finished_stages = 0
+        self.total_stages = 0
+        self.events = []       # Historial completo (para suscriptores tardíos)
+        self.subscribers = []  # asyncio.Queue por conexión SSE
+        self.payload = None    # Resultado final serializado (bytes JSON)
+        self.error = None
+        self.cancel_requested = False
+        self.timed_out = False
+        self.cancel_event = None
+        self.task = None
+
+    def progress(self):
+        if self.status == JOB_DONE:
+            return 1.0
+        return round(self.finished_stages / self.total_stages, 3) if self.total_stages else 0.0
+
+    def describe(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress(),
+            'stages': dict(self.stages),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            **self.meta,
+        }
+
+    def publish(self, event):
+        event = {'job_id': self.id, 'status': self.status, 'progress': self.progress(), **event}
+        self.events.append(event)
+        for q in list(self.subscribers):
+            q.put_nowait(event)
+
+
+class JobManager:
+    """Registro, cola y ejecución de trabajos sobre un AnalysisWorkerPool."""
+
+    def __init__(self, pool, max_pending=None, retention_s=3600, max_jobs=200):
+        self.pool = pool
+        self.max_pending = max_pending if max_pending is not None else int(
+            os.environ.get("DATATERRA_MAX_PENDING_JOBS", 100))
+        self.retention_s = retention_s
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self._slots = None
+        self._manager = None
+
+    def _get_manager(self):
+        # Manager perezoso: sus proxies (Queue/Event) se pueden enviar al worker
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def _get_slots(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool.workers)
+        return self._slots
+
+    def _purge(self):
+        """Olvida trabajos terminados viejos (o los más antiguos si hay demasiados)."""
+        now = time.time()
+        finished = sorted((j for j in self.jobs.values() if j.status in FINAL_STATES),
+                          key=lambda j: j.finished_at or 0)
+        excess = len(self.jobs) - self.max_jobs
+        for job in finished:
+            if excess > 0 or now - (job.finished_at or now) > self.retention_s:
+                del self.jobs[job.id]
+                excess -= 1
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return [j.describe() for j in sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)]
+
+    def submit(self, func, args, finalize=None, meta=None, payload=None):
+        """
+        Registra un trabajo y lo lanza en segundo plano.
+        `func(*args, progress=..., cancel=...)` corre en el pool; `finalize(result)`
+        corre en un hilo y debe retornar el payload en bytes.
+        Si `payload` ya viene (acierto de caché) el trabajo nace terminado.
+        """
+        self._purge()
+        pending = sum(1 for j in self.jobs.values() if j.status not in FINAL_STATES)
+        if pending >= self.max_pending:
+            raise JobQueueFull(f"Cola llena: {pending} trabajos pendientes (máx {self.max_pending})")
+
+        job = Job(uuid.uuid4().hex, meta or {})
+        self.jobs[job.id] = job
+
+        if payload is not None:
+            job.payload = payload
+            job.status = JOB_DONE
+            job.finished_at = job.started_at = time.time()
+            job.publish({'event': 'completed', 'cached': True})
+            return job
+
+        job.publish({'event': 'queued'})
+        job.task = asyncio.create_task(self._run(job, func, args, finalize))
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINAL_STATES:
+            return job
+        job.cancel_requested = True
+        if job.cancel_event is not None:
+            job.cancel_event.set()  # El pipeline aborta antes de la próxima etapa
+        elif job.task is not None:
+            job.task.cancel()       # Aún en cola: se descarta sin ocupar worker
+        return job
+
+    async def _run(self, job, func, args, finalize):
+        try:
+            async with self._get_slots():
+                if job.cancel_requested:
+                    raise asyncio.CancelledError()
+
+                manager = await asyncio.to_thread(self._get_manager)
+                progress_q = manager.Queue()
+                job.cancel_event = manager.Event()
+                if job.cancel_requested:
+                    job.cancel_event.set()
+
+                future = None
+                while future is None:
+                    try:
+                        future = self.pool.submit(func, *args, progress=progress_q, cancel=job.cancel_event)
+                    except PoolSaturated:
+                        # Peticiones síncronas ocupan el pool: esperar en vez de rechazar
+                        await asyncio.sleep(1.0)
+
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                job.publish({'event': 'running'})
+
+                wrapped = asyncio.wrap_future(future)
+                while True:
+                    await self._drain(job, progress_q)
+                    if wrapped.done():
+                        break
+                    if time.time() - job.started_at > self.pool.timeout and not job.cancel_requested:
+                        job.cancel_requested = True
+                        job.timed_out = True
+                        job.error = f"El análisis excedió {self.pool.timeout} s"
+                        job.cancel_event.set()
+                    await asyncio.wait({wrapped}, timeout=0.25)
+                await self._drain(job, progress_q)
+
+                result = wrapped.result()
+                job.payload = await asyncio.to_thread(finalize, result) if finalize else result
+                job.status = JOB_DONE
+                job.finished_at = time.time()
+                job.publish({'event': 'completed', 'cached': False})
+
+        except (asyncio.CancelledError, PipelineCancelled):
+            job.finished_at = time.time()
+            if job.timed_out:
+                job.status = JOB_TIMEOUT
+                job.publish({'event': 'timeout', 'error': job.error})
+            else:
+                job.status = JOB_CANCELLED
+                job.publish({'event': 'cancelled'})
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.publish({'event': 'failed', 'error': str(e)})
+        finally:
+            for q in list(job.subscribers):
+                q.put_nowait(None)  # Fin de stream
+
+    async def _drain(self, job, progress_q):
+        """Traslada los eventos de etapa del worker al estado del trabajo."""
+        while True:
+            try:
+                ev = await asyncio.to_thread(progress_q.get_nowait)
+            except queue.Empty:
+                return
+            job.total_stages = ev.get('total', job.total_stages)
+            if ev['event'] == 'start':
+                job.stages[ev['stage']] = JOB_RUNNING
+            else:
+                job.stages[ev['stage']] = 'done' if ev['event'] == 'done' else 'skipped'
+                job.finished_stages = sum(1 for s in job.stages.values() if s != JOB_RUNNING)
+            job.publish({'event': 'stage', 'stage': ev['stage'], 'stage_event': ev['event'],
+                         'elapsed_ms': ev.get('elapsed_ms')})
+
+    async def stream(self, job, heartbeat_s=15.0):
+        """Generador SSE: reenvía el historial y luego eventos en vivo hasta el final."""
+        q = asyncio.Queue()
+        job.subscribers.append(q)
+        try:
+            for ev in list(job.events):
+                yield _sse(ev)
+            if job.status in FINAL_STATES:
+                return
+            while True:
+                try:
+                    ev = await asyncio.wait_for(q.get(), heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # Evita cortes de proxies inactivos
+                    continue
+                if ev is None:
+                    return
+                yield _sse(ev)
+        finally:
+            job.subscribers.remove(q)
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+def _sse(event):
+    return f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
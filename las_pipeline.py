@@ -0,0 +1,753 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from pipeline_engine import Stage, PipelineEngine
+from curve_lod import write_pyramid
+
+# Añadir el path para importar los cores
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geomind_saas'))
+from las_fast import read_las
+from downsampling import lttb_indices, stride_size
+from survey import (
+    INC_ALIASES,
+    AZI_ALIASES,
+    SurveyError,
+    find_column,
+    survey_from_frame,
+    minimum_curvature,
+    dls_report,
+    build_trajectory,
+)
+from petro_core_web import (
+    CurveNormalizer,
+    ReservoirDetector,
+    SimulationEngine,
+    DataQualityAuditor,
+)
+from petro_kernel import OUTPUTS as PETRO_OUTPUTS, petro_kernel
+from volumetrics import OOIP_DEFAULTS, run_volumetrics, well_distributions
+from decline import arps_rate
+from electrofacies import (
+    DEFAULT_K,
+    MIN_SAMPLES,
+    FaciesModelError,
+    facies_curves,
+    field_key,
+    fit_facies_model,
+    load_field_model,
+    save_field_model,
+)
+
+# ==============================================================================
+# DATATERRA - PIPELINE LAS (Etapas de /upload)
+# Cada PASO del análisis es una etapa con entradas/salidas explícitas.
+# Las salidas con nombre de clave de respuesta se devuelven tal cual al frontend.
+# ==============================================================================
+
+NUMERIC_DTYPES = [np.float64, np.float32, np.int64, np.int32, float, int]
+
+# Versión de la respuesta de /upload: forma parte de la clave de la caché de
+# resultados. Incrementar con cada cambio en las salidas del pipeline (claves,
+# decimación, cálculo) para no servir entradas de disco con el esquema anterior.
+OUTPUT_VERSION = "2"
+
+
+def safe_array(series):
+    """
+    Serie → ndarray float64 con NaN/Inf reemplazados por 0. Se entrega como
+    arreglo (no lista): la serialización (response_codec) lo codifica en bloque.
+    """
+    arr = np.asarray(series, dtype=float)
+    return np.where(np.isfinite(arr), arr, 0.0)
+
+
+def _es_numerica(df, col):
+    return df[col].dtype in NUMERIC_DTYPES
+
+
+# GeophysicsEngine está en app_saas.py, la reimplementamos aquí
+class GeophysicsEngine:
+    @staticmethod
+    def calcular_impedancia(rho, dt=None):
+        """Calcula Impedancia Acústica (AI = Rho * Vp)."""
+        if dt is not None:
+            vp = 1e6 / (dt + 1e-5)
+        else:
+            vp = (rho / 0.23) ** 4.0
+        ai = vp * rho
+        return ai, vp
+
+    @staticmethod
+    def coeficientes_reflexion(ai_values):
+        """Calcula RC = (Z2 - Z1) / (Z2 + Z1)"""
+        rc = np.zeros_like(ai_values)
+        rc[1:] = (ai_values[1:] - ai_values[:-1]) / (ai_values[1:] + ai_values[:-1] + 1e-9)
+        return rc
+
+    @staticmethod
+    def ricker_wavelet(freq, length=0.1, dt=0.002):
+        """Genera una Ondícula Ricker teórica."""
+        t = np.arange(-length/2, (length/2)+dt, dt)
+        y = (1.0 - 2.0*(np.pi**2)*(freq**2)*(t**2)) * np.exp(-(np.pi**2)*(freq**2)*(t**2))
+        return t.tolist(), y.tolist()
+
+    @staticmethod
+    def generar_sintetico(rc_series, wavelet):
+        """Convolución de Reflectividad * Ondícula."""
+        sintetico = np.convolve(rc_series, wavelet, mode='same')
+        max_abs = np.max(np.abs(sintetico))
+        if max_abs > 0:
+            sintetico = sintetico / max_abs
+        return sintetico
+
+
+# =============================================================================
+# PASO 0: LECTURA DEL .LAS
+# =============================================================================
+def etapa_parse(content=None, parsed_las=None):
+    # `parsed_las`: ya leído por bloques en la ingesta streaming (sin texto en memoria)
+    # Si no, fast-path vectorizado; archivos envueltos/malformados caen a lasio
+    las = parsed_las if parsed_las is not None else read_las(content)
+    # Resetear index para tener Depth como columna
+    df = las.df().reset_index()
+    return {'las': las, 'df_raw': df}
+
+
+# =============================================================================
+# PASO 1: NORMALIZAR CURVAS (Aliasing automático) + 1B: UNIDADES
+# =============================================================================
+def etapa_normalize(df_raw):
+    df, normalized = CurveNormalizer.normalize_dataframe(df_raw)
+
+    # Limpiar datos nulos (-999.25)
+    df.replace(-999.25, np.nan, inplace=True)
+
+    # Identificar columna de profundidad
+    depth_col = next((c for c in df.columns if c.upper() in ['DEPT', 'DEPTH']), df.columns[0])
+
+    unit_conversions = []
+
+    # NPHI: si viene en % (>1), convertir a decimal v/v
+    if 'NPHI' in df.columns and df['NPHI'].median() > 1.0:
+        df['NPHI'] = df['NPHI'] / 100.0
+        unit_conversions.append({'curve': 'NPHI', 'from': '%', 'to': 'v/v', 'factor': '÷100'})
+
+    # RHOB: validar rango (debe estar entre 1.5-3.0 g/cm³)
+    if 'RHOB' in df.columns:
+        rhob_med = df['RHOB'].median()
+        if rhob_med > 100:  # Probablemente en kg/m³
+            df['RHOB'] = df['RHOB'] / 1000.0
+            unit_conversions.append({'curve': 'RHOB', 'from': 'kg/m³', 'to': 'g/cm³', 'factor': '÷1000'})
+        elif 1.5 <= rhob_med <= 3.0:
+            unit_conversions.append({'curve': 'RHOB', 'from': 'g/cm³', 'to': 'g/cm³', 'factor': 'OK'})
+
+    # DT: validar rango (típico 40-200 μs/ft)
+    if 'DT' in df.columns:
+        dt_med = df['DT'].median()
+        if dt_med > 300:  # Probablemente en μs/m, convertir a μs/ft
+            df['DT'] = df['DT'] / 3.2808
+            unit_conversions.append({'curve': 'DT', 'from': 'μs/m', 'to': 'μs/ft', 'factor': '÷3.2808'})
+        else:
+            unit_conversions.append({'curve': 'DT', 'from': 'μs/ft', 'to': 'μs/ft', 'factor': 'OK'})
+
+    return {'df_norm': df, 'depth_col': depth_col, 'unit_conversions': unit_conversions}
+
+
+# =============================================================================
+# PASO 2: ANÁLISIS PETROFÍSICO COMPLETO (+ 3C Log-Linear)
+# =============================================================================
+def etapa_petrophysics(df_norm):
+    # df_norm es propiedad exclusiva de esta etapa: se enriquece en sitio
+    df = df_norm
+    results = {}
+
+    # NPHI en porcentaje → fracción (la curva normalizada también se corrige)
+    if 'NPHI' in df.columns and df['NPHI'].mean() > 1.0:
+        df['NPHI'] = df['NPHI'] / 100.0
+
+    # VSH, PHI, SW (Archie + Simandoux), SH y permeabilidades en una pasada
+    # (petro_kernel.py): mismas fórmulas que PetrofisicaCore, sin temporales
+    curve = lambda name: df[name].to_numpy() if name in df.columns else None
+    out, info = petro_kernel(gr=curve('GR'), rt=curve('RT'), nphi=curve('NPHI'),
+                             rhob=curve('RHOB'), n=len(df), nphi_div=1.0)
+    for name in PETRO_OUTPUTS:
+        if out[name] is not None:
+            df[name] = out[name]
+
+    results['vsh_available'] = 'GR' in df.columns
+    results['phi_source'] = info['phi_source']
+    results['sw_available'] = 'RT' in df.columns
+    results['sw_simandoux_available'] = out['SW_SIM'] is not None
+    results['petro_backend'] = info['backend']
+
+    # Timur-Coates (PERM), Morris-Biggs (GAP #7) y Log-Linear Poro-Perm (PASO 3C)
+    perm_comparison = {
+        'timur_coates_avg': round(float(df['PERM'].mean()), 3),
+        'morris_biggs_avg': round(float(df['PERM_MB'].mean()), 3),
+        'log_linear_available': False,
+    }
+    results['perm_method'] = 'Log-Linear Poro-Perm (Calibración Sandstone)'
+    perm_comparison['log_linear_avg'] = round(float(df['PERM_LL'].mean()), 3)
+    perm_comparison['log_linear_available'] = True
+
+    return {'df_petro': df, 'analysis_meta': results, 'perm_comparison': perm_comparison}
+
+
+# =============================================================================
+# PASO 3: DETECCIÓN DE YACIMIENTOS (Pay Zones)
+# =============================================================================
+def etapa_pay_zones(df_petro):
+    cutoffs = {
+        'porosity_min': 0.10,
+        'sw_max': 0.60,
+        'vshale_max': 0.50
+    }
+    pay_zones_df = ReservoirDetector.detect_prospect_intervals(df_petro, cutoffs)
+    pay_zones = pay_zones_df.to_dict('records') if not pay_zones_df.empty else []
+    return {'pay_zones_df': pay_zones_df, 'pay_zones': pay_zones}
+
+
+# =============================================================================
+# PASO 3B: ELECTROFACIES (PCA + K-Means Clustering) — GAP #3
+# Modelo por campo (electrofacies.py): si el campo (header FLD) ya tiene un
+# modelo guardado, el pozo sólo se predice (un producto de matrices); si no,
+# se ajusta sobre este pozo y se guarda para los siguientes pozos del campo.
+# =============================================================================
+# k del primer ajuste de un campo: entero o 'auto' (silhouette en paralelo)
+FACIES_K = os.environ.get("DATATERRA_FACIES_K", str(DEFAULT_K))
+
+
+def _facies_k():
+    return 'auto' if FACIES_K.strip().lower() == 'auto' else int(FACIES_K)
+
+
+def etapa_electrofacies(df_petro, well_info=None):
+    df = df_petro
+    electrofacies = {}
+    pca_results = {}
+    outputs = {}
+    field = (well_info or {}).get('field')
+    try:
+        try:
+            model = load_field_model(field)
+        except FaciesModelError as e:
+            print(f"Modelo de facies descartado: {e}")
+            model = None
+        # Un modelo de campo existente que no encaja con este pozo (le falta una
+        # curva) no se reemplaza: el pozo se clasifica con un ajuste transitorio
+        stored = model is not None
+        if stored and not all(c in df.columns for c in model.curves):
+            model = None
+
+        info = {}
+        if model is not None:
+            index, x = model.matrix(df)
+            if len(x) == 0:
+                raise FaciesModelError("Sin muestras válidas en las curvas del modelo")
+            pca_transformed, labels = model.project(x)
+            source = 'field'
+        else:
+            # Seleccionar curvas disponibles para clustering
+            cluster_cols = facies_curves(df.columns)
+            if len(cluster_cols) < 2:
+                raise FaciesModelError("Se necesitan al menos dos curvas para clasificar")
+            cluster_data = df[cluster_cols].dropna()
+            if len(cluster_data) < MIN_SAMPLES:
+                raise FaciesModelError("Muy pocas muestras válidas para clasificar")
+            index, x = cluster_data.index, cluster_data.to_numpy(dtype=np.float64)
+            model, labels, info = fit_facies_model(x, cluster_cols, k=_facies_k(), field=field)
+            pca_transformed = model.project(x)[0]
+            source = 'well'
+            if field_key(field) is not None and not stored:
+                try:
+                    save_field_model(model, field)
+                    source = 'fitted'
+                except OSError as e:
+                    print(f"No se pudo guardar el modelo de facies: {e}")
+
+        names = np.asarray(model.names, dtype=object)[labels]
+
+        # Etiquetas por índice del df principal (se unen al ensamblar)
+        outputs['facies'] = pd.DataFrame({'FACIES': labels, 'FACIES_NAME': names}, index=index)
+
+        # Distribución para el frontend
+        counts = np.bincount(labels, minlength=model.k)
+        electrofacies = {
+            'distribution': {name: int(c) for name, c in zip(model.names, counts) if c > 0},
+            'n_clusters': model.k,
+            'curves_used': model.curves,
+            'total_classified': int(len(labels)),
+            'method': model.method,
+            'field_model': {
+                'field': field_key(field),
+                'source': source,  # field: modelo existente · fitted: ajustado y guardado · well: sólo este pozo
+                'n_train': model.n_train,
+            },
+        }
+        if 'k_scores' in info:
+            electrofacies['k_scores'] = {str(k): round(v, 3) for k, v in info['k_scores'].items()}
+
+        # PCA scatter data (LTTB: conserva los puntos extremos de cada tramo)
+        n_components = model.n_components
+        pca_idx = lttb_indices(None, pca_transformed[:, :3], stride_size(len(pca_transformed), 500))
+        pca_results = {
+            'available': True,
+            'n_components': n_components,
+            'variance_explained': [round(float(v) * 100, 1) for v in model.variance_ratio],
+            'cumulative_variance': round(float(model.variance_ratio.sum()) * 100, 1),
+            'loadings': model.loadings(),
+            'pc1': pca_transformed[pca_idx, 0],
+            'pc2': pca_transformed[pca_idx, 1],
+            'pc3': pca_transformed[pca_idx, 2] if n_components >= 3 else [],
+            'labels': labels[pca_idx],
+            'facies_names': names[pca_idx].tolist(),
+        }
+    except FaciesModelError:
+        pass
+    except ImportError:
+        electrofacies = {'error': 'scikit-learn no instalado. Ejecutar: pip install scikit-learn'}
+    except Exception as e:
+        electrofacies = {'error': str(e)}
+
+    outputs['electrofacies'] = electrofacies
+    outputs['pca_analysis'] = pca_results
+    return outputs
+
+
+# =============================================================================
+# PASO 3D: DLS (Dog-Leg Severity) - Riesgo de Perforación
+# =============================================================================
+def etapa_dls(df_petro, depth_col):
+    """
+    Survey por mínima curvatura (survey.py) con las curvas INC/AZI del LAS.
+    Sin curvas direccionales el pozo se trata como vertical (DLS = 0).
+    """
+    df = df_petro
+    inc_col = find_column(df.columns, INC_ALIASES)
+    azi_col = find_column(df.columns, AZI_ALIASES)
+    try:
+        if inc_col is not None and azi_col is not None:
+            md, inc, azi = survey_from_frame(df, md_col=depth_col)
+            source = 'las'
+        else:
+            md = np.unique(df[depth_col].dropna().values)
+            inc = azi = np.zeros(len(md))
+            source = 'vertical'
+        stations = minimum_curvature(md, inc, azi)
+    except SurveyError:
+        return {'dls_analysis': [], 'trajectory': {'available': False}}
+    return {'dls_analysis': dls_report(stations), 'trajectory': build_trajectory(stations, source=source)}
+
+
+# =============================================================================
+# PASO 4: AUDITORÍA DE CALIDAD (Data QC)
+# =============================================================================
+def etapa_qc(df_petro):
+    return {'audit': DataQualityAuditor.auditar_dataset(df_petro)}
+
+
+# =============================================================================
+# PASO 5: EXTRAER HEADER DEL POZO
+# =============================================================================
+def etapa_well_info(las):
+    def get_header(mnemonic, default="-"):
+        try:
+            return str(las.well[mnemonic].value) if las.well[mnemonic].value else default
+        except:
+            return default
+
+    well_info = {
+        "well_name": get_header("WELL"),
+        "field": get_header("FLD"),
+        "operator": get_header("COMP"),
+        "service": get_header("SRVC"),
+        "location": get_header("LOC"),
+        "date": get_header("DATE"),
+        "country": get_header("CTRY"),
+        "province": get_header("PROV"),
+    }
+    return {'well_info': well_info}
+
+
+# =============================================================================
+# PASO 6: GEOFÍSICA - IMPEDANCIA, REFLECTIVIDAD, SINTÉTICO
+# =============================================================================
+def etapa_geophysics(df_petro, depth_col):
+    df = df_petro
+    if 'RHOB' not in df.columns:
+        return {'geophysics': {"available": False}}
+
+    # Sólo las columnas que usa la geofísica (no copiar todo el df)
+    geo_cols = [depth_col, 'RHOB'] + (['DT'] if 'DT' in df.columns else [])
+    df_clean = df[geo_cols].interpolate().bfill().ffill()
+
+    dt_col_val = df_clean['DT'].values if 'DT' in df_clean.columns else None
+    rho_vals = df_clean['RHOB'].values
+
+    ai_vals, vp_vals = GeophysicsEngine.calcular_impedancia(rho_vals, dt_col_val)
+    rc_vals = GeophysicsEngine.coeficientes_reflexion(ai_vals)
+
+    # Wavelet y sintético
+    t_wav, ricker = GeophysicsEngine.ricker_wavelet(30, 0.1, 0.002)
+    synth_vals = GeophysicsEngine.generar_sintetico(rc_vals, ricker)
+
+    # Para Seismic Section (repetir traza en 2D)
+    nx_section = 80
+    synth_norm = synth_vals / (np.max(np.abs(synth_vals)) + 1e-9)
+    seismic_2d = np.tile(synth_norm, (nx_section, 1)).T
+    # Añadir variación lateral suave
+    for i in range(nx_section):
+        shift = int(5 * np.sin(i * np.pi / nx_section * 2))
+        seismic_2d[:, i] = np.roll(seismic_2d[:, i], shift)
+
+    # Submuestreo para geofísica (~500 pts): LTTB conjunto sobre AI/RC/sintético
+    # para no perder los contrastes de impedancia (picos de reflectividad)
+    depths_geo = df_clean[depth_col].values
+    geo_idx = lttb_indices(depths_geo, np.column_stack([ai_vals, rc_vals, synth_vals]),
+                           stride_size(len(ai_vals), 500))
+
+    geophysics_data = {
+        "available": True,
+        "has_dt": 'DT' in df.columns,
+        "impedance": safe_array(ai_vals[geo_idx]),
+        "reflectivity": safe_array(rc_vals[geo_idx]),
+        "synthetic": safe_array(synth_vals[geo_idx]),
+        "wavelet_t": t_wav,
+        "wavelet_amp": ricker,
+        "seismic_depths": safe_array(depths_geo[geo_idx]),
+        "seismic_2d": seismic_2d[geo_idx, :],
+        "seismic_nx": nx_section,
+    }
+    return {'geophysics': geophysics_data}
+
+
+# =============================================================================
+# PASO 7: DATOS PARA GRÁFICOS 3D (Cubo Litológico + Bubble)
+# =============================================================================
+def etapa_scatter3d(df_petro, depth_col, facies=None):
+    df = df_petro
+
+    # Cubo 3D: usar PHI, RHOB, Depth, colorear por GR
+    all_cols_for_3d = {}
+    for col in df.columns:
+        if col != depth_col and _es_numerica(df, col):
+            vals = df[col].values
+            valid_mask = np.isfinite(vals)
+            if valid_mask.sum() > 10:
+                all_cols_for_3d[col] = True
+
+    # Datos para scatter (~600 pts): LTTB sobre todas las curvas a la vez
+    numeric_cols = [col for col in df.columns if _es_numerica(df, col)]
+    scatter_idx = lttb_indices(df[depth_col].values,
+                               df[[c for c in numeric_cols if c != depth_col]].values,
+                               stride_size(len(df), 600))
+
+    scatter_cols_data = {}
+    for col in numeric_cols:
+        scatter_cols_data[col] = safe_array(df[col].values[scatter_idx])
+
+    # Electrofacies (si la etapa corrió) como columna adicional del cubo
+    if facies is not None:
+        facies_full = facies['FACIES'].reindex(df.index).values
+        if np.isfinite(facies_full).sum() > 10:
+            all_cols_for_3d['FACIES'] = True
+        scatter_cols_data['FACIES'] = safe_array(facies_full[scatter_idx])
+
+    scatter3d_data = {
+        "available_columns": list(all_cols_for_3d.keys()),
+        "columns_data": scatter_cols_data,
+        "depth_values": safe_array(df[depth_col].values[scatter_idx]),
+    }
+    return {'scatter3d': scatter3d_data}
+
+
+# =============================================================================
+# PASO 8: HISTOGRAMAS (Distribución de cada curva)
+# =============================================================================
+def etapa_histograms(df_petro):
+    df = df_petro
+    histograms = {}
+    for col in ['GR', 'NPHI', 'RHOB', 'RT', 'PHI', 'VSH', 'SW', 'PERM']:
+        if col in df.columns:
+            valid = df[col].dropna()
+            valid = valid[np.isfinite(valid)]
+            if len(valid) > 10:
+                counts, bin_edges = np.histogram(valid, bins=40)
+                histograms[col] = {
+                    "counts": counts.tolist(),
+                    "bin_edges": bin_edges.tolist(),
+                }
+    return {'histograms': histograms}
+
+
+# =============================================================================
+# PASO 9: RADAR DE CALIDAD (Rock Quality Index)
+# =============================================================================
+def etapa_radar(df_petro, audit):
+    df = df_petro
+    phi_mean = float(df['PHI'].mean()) if 'PHI' in df.columns else 0.15
+    sw_mean = float(df['SW'].mean()) if 'SW' in df.columns else 0.5
+    vsh_mean = float(df['VSH'].mean()) if 'VSH' in df.columns else 0.5
+
+    phi_score = min(1.0, phi_mean / 0.35)
+    so_score = 1.0 - sw_mean
+    vsh_score = 1.0 - vsh_mean
+    econ_score = (phi_score + so_score) / 2.0
+    # Data quality based on audit
+    dq_score = 1.0 - (sum(1 for a in audit if '❌' in a) * 0.25)
+    dq_score = max(0, min(1, dq_score))
+
+    radar_data = {
+        "categories": ["Porosity", "Oil Saturation", "Rock Cleanliness", "Economic Potential", "Data Quality"],
+        "scores": [
+            round(phi_score, 3),
+            round(so_score, 3),
+            round(vsh_score, 3),
+            round(econ_score, 3),
+            round(dq_score, 3),
+        ]
+    }
+    return {'radar': radar_data}
+
+
+# =============================================================================
+# PASO 10: CORRELACIONES (estadísticos para scatter)
+# =============================================================================
+def etapa_correlations(df_petro, depth_col):
+    df = df_petro
+    correlations = {}
+    numeric_cols = [c for c in df.columns if _es_numerica(df, c) and c != depth_col]
+    if len(numeric_cols) >= 2:
+        corr_matrix = df[numeric_cols].corr()
+        # Enviar solo pares con |corr| > 0.3
+        pairs = []
+        for i, c1 in enumerate(numeric_cols):
+            for j, c2 in enumerate(numeric_cols):
+                if i < j:
+                    val = float(corr_matrix.loc[c1, c2])
+                    if np.isfinite(val):
+                        pairs.append({"x": c1, "y": c2, "r": round(val, 3)})
+        correlations["pairs"] = sorted(pairs, key=lambda x: abs(x["r"]), reverse=True)[:20]
+        correlations["columns"] = numeric_cols
+    return {'correlations': correlations}
+
+
+# =============================================================================
+# PASO 11: PRODUCCIÓN SIMULADA (Arps Decline) — GAPs #5, #6
+# =============================================================================
+def etapa_production(df_petro, pay_zones_df):
+    df = df_petro
+    net_pay_total = float(pay_zones_df['Espesor_ft'].sum()) if not pay_zones_df.empty else 50.0
+    avg_phi = float(df['PHI'].mean())
+    avg_sh = float(df['SH'].mean())
+
+    # --- OOIP COMPLETO (GAP #6) ---
+    # OOIP = 7758 × A × h × φ × (1 - Sw) / Bo
+    area_acres = OOIP_DEFAULTS['area']  # Área de drenaje (acres) — default
+    bo = OOIP_DEFAULTS['bo']            # Factor volumétrico de formación (bbl/STB)
+    oip_stb = 7758 * area_acres * net_pay_total * avg_phi * avg_sh / bo
+
+    # Desglose OOIP para reporte
+    ooip_breakdown = {
+        'formula': 'OOIP = 7758 × A × h × φ × (1-Sw) / Bo',
+        'area_acres': area_acres,
+        'net_pay_ft': round(net_pay_total, 1),
+        'avg_porosity': round(avg_phi, 4),
+        'avg_sh': round(avg_sh, 4),
+        'bo': bo,
+        'ooip_stb': round(oip_stb, 0),
+        'ooip_bbl': round(oip_stb * bo, 0),
+    }
+
+    # --- OOIP PROBABILÍSTICO ---
+    # Área, h, φ, Sw y Bo muestreados alrededor de los valores anteriores (semilla fija: reproducible)
+    ooip_probabilistic = None
+    if np.isfinite(avg_phi) and np.isfinite(avg_sh):
+        ooip_probabilistic = run_volumetrics(well_distributions(net_pay_total, avg_phi, 1 - avg_sh), seed=0)
+
+    # --- DECLINACIÓN EXPONENCIAL (original) ---
+    sim_df = SimulationEngine.simular_produccion(max(oip_stb, 100000), 70)
+
+    # --- DECLINACIÓN HIPERBÓLICA (GAP #5) ---
+    # Q(t) = Qi / (1 + b × Di × t)^(1/b)
+    b_factor = 0.5       # Factor de curvatura (0=exponencial, 1=harmónica)
+    di = 0.15            # Tasa de declinación inicial (15%/año)
+    qi = max(oip_stb * 0.08, 5000)  # Tasa inicial (8% del OIP o mín 5000)
+
+    hyp_months = np.arange(1, 121)  # 10 años
+    hyp_rate = arps_rate(qi, di, b_factor, hyp_months / 12.0)
+
+    production_sim = {
+        "months": sim_df["Mes"].tolist(),
+        "barrels": safe_array(sim_df["Barriles_Mes"].values),
+        "revenue": safe_array(sim_df["Ingresos_USD"].values),
+        "oip_estimate": round(oip_stb, 0),
+        "total_revenue_10y": round(float(sim_df["Ingresos_USD"].sum()), 0),
+        # Nuevos datos hiperbólicos
+        "hyperbolic": {
+            "months": hyp_months.tolist(),
+            "barrels": np.round(hyp_rate, 1).tolist(),
+            "b_factor": b_factor,
+            "di_percent": di * 100,
+            "qi_stb": round(qi, 0),
+            "cumulative_10y": round(float(hyp_rate.sum()), 0),
+        },
+        "ooip_breakdown": ooip_breakdown,
+        "ooip_probabilistic": ooip_probabilistic,
+        "decline_methods": ['Exponencial', 'Hiperbólica'],
+    }
+    return {'production': production_sim}
+
+
+# =============================================================================
+# PASO 12: SAMPLING PARA FRONTEND (máximo 800 puntos para curvas)
+# =============================================================================
+def etapa_curves(df_petro, depth_col):
+    df = df_petro
+    cols = [col for col in ['GR', 'RT', 'NPHI', 'RHOB', 'DT', 'VSH', 'PHI', 'SW', 'PERM', 'SH', 'SW_SIM']
+            if col in df.columns]
+
+    # ~800 muestras elegidas por LTTB (mismas para todas las curvas): conserva
+    # picos de GR/RT y capas delgadas que el muestreo por paso descartaba
+    if cols:
+        idx = lttb_indices(df[depth_col].values, df[cols].values, stride_size(len(df), 800))
+    else:
+        idx = np.arange(0, len(df), max(1, len(df) // 800))
+
+    curves_data = {}
+    for col in cols:
+        curves_data[col.lower()] = safe_array(df[col].values[idx])
+
+    return {'depths': safe_array(df[depth_col].values[idx]), 'curves': curves_data}
+
+
+# =============================================================================
+# PASO 12B: PIRÁMIDE LOD (curvas completas para zoom por ventana de profundidad)
+# =============================================================================
+def etapa_lod(df_petro, depth_col, lod_id):
+    df = df_petro
+    curves = {col.lower(): df[col].values for col in df.columns
+              if col != depth_col and _es_numerica(df, col)}
+    return {'lod': write_pyramid(lod_id, df[depth_col].values, curves)}
+
+
+# =============================================================================
+# PASO 13: KPIs Y CURVAS DISPONIBLES
+# =============================================================================
+def etapa_kpis(df_petro, depth_col, pay_zones_df, facies=None):
+    df = df_petro
+    available_curves = [c for c in df.columns if c != depth_col]
+    if facies is not None:
+        available_curves += list(facies.columns)
+
+    kpis = {
+        "total_depth": round(float(df[depth_col].max() - df[depth_col].min()), 2),
+        "min_depth": round(float(df[depth_col].min()), 2),
+        "max_depth": round(float(df[depth_col].max()), 2),
+        "total_points": len(df),
+        "avg_gr": round(float(df['GR'].mean()), 2) if 'GR' in df.columns else None,
+        "avg_phi": round(float(df['PHI'].mean() * 100), 1),
+        "avg_vsh": round(float(df['VSH'].mean() * 100), 1),
+        "avg_sw": round(float(df['SW'].mean() * 100), 1),
+        "avg_perm": round(float(df['PERM'].mean()), 2),
+        "avg_sh": round(float(df['SH'].mean() * 100), 1),
+        "net_pay_ft": round(float(pay_zones_df['Espesor_ft'].sum()), 1) if not pay_zones_df.empty else 0,
+        "num_pay_zones": len(pay_zones_df),
+        "curves_count": len(available_curves),
+    }
+    return {'kpis': kpis, 'available_curves': available_curves}
+
+
+# =============================================================================
+# DEFINICIÓN DEL DAG
+# =============================================================================
+LAS_STAGES = [
+    Stage('parse', etapa_parse, optional=['content', 'parsed_las'], outputs=['las', 'df_raw'],
+          description="Lectura LAS → DataFrame"),
+    Stage('normalize', etapa_normalize, inputs=['df_raw'],
+          outputs=['df_norm', 'depth_col', 'unit_conversions'],
+          description="Aliasing de curvas, nulos y unidades"),
+    Stage('petrophysics', etapa_petrophysics, inputs=['df_norm'],
+          outputs=['df_petro', 'analysis_meta', 'perm_comparison'],
+          description="VSH, PHI, SW (Archie/Simandoux), SH y permeabilidades"),
+    Stage('well_info', etapa_well_info, inputs=['las'], outputs=['well_info'],
+          description="Header del pozo"),
+    Stage('pay_zones', etapa_pay_zones, inputs=['df_petro'], outputs=['pay_zones_df', 'pay_zones'],
+          description="Intervalos prospectivos por cutoffs"),
+    Stage('electrofacies', etapa_electrofacies, inputs=['df_petro', 'well_info'],
+          outputs=['electrofacies', 'pca_analysis', 'facies'],
+          description="PCA + K-Means (modelo persistente por campo)"),
+    Stage('dls', etapa_dls, inputs=['df_petro', 'depth_col'], outputs=['dls_analysis', 'trajectory'],
+          description="Survey por mínima curvatura: DLS y trayectoria 3D"),
+    Stage('qc', etapa_qc, inputs=['df_petro'], outputs=['audit'],
+          description="Auditoría de calidad"),
+    Stage('geophysics', etapa_geophysics, inputs=['df_petro', 'depth_col'], outputs=['geophysics'],
+          description="Impedancia, reflectividad, sintético y sección sísmica"),
+    Stage('scatter3d', etapa_scatter3d, inputs=['df_petro', 'depth_col'], optional=['facies'],
+          outputs=['scatter3d'], description="Datos para cubo 3D / bubble"),
+    Stage('histograms', etapa_histograms, inputs=['df_petro'], outputs=['histograms'],
+          description="Histogramas por curva"),
+    Stage('radar', etapa_radar, inputs=['df_petro', 'audit'], outputs=['radar'],
+          description="Rock Quality Index"),
+    Stage('correlations', etapa_correlations, inputs=['df_petro', 'depth_col'], outputs=['correlations'],
+          description="Matriz de correlación"),
+    Stage('production', etapa_production, inputs=['df_petro', 'pay_zones_df'], outputs=['production'],
+          description="OOIP y declinación Arps"),
+    Stage('curves', etapa_curves, inputs=['df_petro', 'depth_col'], outputs=['depths', 'curves'],
+          description="Curvas muestreadas para el visor"),
+    Stage('lod', etapa_lod, inputs=['df_petro', 'depth_col', 'lod_id'], outputs=['lod'],
+          description="Pirámide min/max multi-resolución para /curves/{id}/window"),
+    Stage('kpis', etapa_kpis, inputs=['df_petro', 'depth_col', 'pay_zones_df'], optional=['facies'],
+          outputs=['kpis', 'available_curves'], description="KPIs del pozo"),
+]
+
+# Hilos por análisis: no más que núcleos (los workers del pool ya reparten la CPU)
+LAS_PIPELINE = PipelineEngine(LAS_STAGES, sources=['content', 'parsed_las', 'lod_id'], max_workers=min(4, os.cpu_count() or 1))
+
+# Orden de claves de la respuesta JSON de /upload
+RESPONSE_KEYS = [
+    "well_info", "depths", "curves", "available_curves", "kpis", "pay_zones", "audit",
+    "analysis_meta",
+    # --- Geología & Analytics ---
+    "geophysics", "scatter3d", "histograms", "radar", "correlations", "production",
+    "electrofacies", "dls_analysis", "trajectory",
+    # --- NUEVOS: Gaps cerrados ---
+    "pca_analysis", "perm_comparison", "unit_conversions",
+    "lod",
+]
+
+
+def parse_stage_selection(stages):
+    """Convierte 'curves,kpis' en lista de etapas; None/'' = pipeline completo."""
+    if not stages:
+        return None
+    return [s.strip() for s in stages.split(',') if s.strip()]
+
+
+def run_las_pipeline(content, filename, targets=None, lod_id=None, progress=None, cancel=None):
+    """
+    Ejecuta el pipeline LAS y construye la respuesta para el frontend.
+    `content` son los bytes del .LAS o un LAS ya parseado (ingesta streaming).
+    `lod_id` (opcional) guarda la pirámide de curvas para /curves/{id}/window.
+    `progress` (cola con .put) recibe eventos por etapa; `cancel` (evento con
+    .is_set) permite abortar entre etapas. Ambos son opcionales y serializables
+    entre procesos (proxies de multiprocessing.Manager).
+    """
+    source = 'content' if isinstance(content, (bytes, bytearray)) else 'parsed_las'
+    initial = {source: content}
+    if lod_id is not None:
+        initial['lod_id'] = lod_id
+    run = LAS_PIPELINE.run(
+        initial,
+        targets=targets,
+        on_event=progress.put if progress is not None else None,
+        should_cancel=cancel.is_set if cancel is not None else None,
+    )
+    response = {"filename": filename}
+    for key in RESPONSE_KEYS:
+        if key in run.artifacts:
+            response[key] = run.artifacts[key]
+    response["pipeline"] = run.summary()
+    return response
@@ -0,0 +1,194 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ==============================================================================
+# DATATERRA - PIPELINE ENGINE (DAG de Etapas)
+# Cada etapa declara sus entradas y salidas por nombre. El motor resuelve el
+# grafo, omite etapas sin entradas y ejecuta en paralelo las independientes.
+# ==============================================================================
+
+
+class PipelineError(Exception):
+    """Error de definición o ejecución del pipeline."""
+
+
+class PipelineCancelled(PipelineError):
+    """La ejecución fue cancelada por el solicitante."""
+
+
+class Stage:
+    """Etapa del pipeline: función pura que recibe entradas y retorna un dict de salidas."""
+
+    def __init__(self, name, func, inputs=(), outputs=(), optional=(), description=""):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)        # Requeridas: si falta alguna, la etapa se omite
+        self.optional = tuple(optional)    # Opcionales: se pasan sólo si existen
+        self.outputs = tuple(outputs)
+        self.description = description
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'inputs': list(self.inputs),
+            'optional': list(self.optional),
+            'outputs': list(self.outputs),
+            'description': self.description,
+        }
+
+
+class PipelineRun:
+    """Resultado de una ejecución: artefactos producidos + estado por etapa."""
+
+    def __init__(self, artifacts, stages):
+        self.artifacts = artifacts
+        self.stages = stages  # {nombre: {'status': 'done'|'skipped', 'elapsed_ms': float}}
+
+    def summary(self):
+        return {
+            'executed': [n for n, s in self.stages.items() if s['status'] == 'done'],
+            'skipped': [n for n, s in self.stages.items() if s['status'] == 'skipped'],
+            'timings_ms': {n: s['elapsed_ms'] for n, s in self.stages.items() if s['status'] == 'done'},
+        }
+
+
+class PipelineEngine:
+    """
+    Ejecuta un DAG de etapas declaradas.
+    - `sources`: artefactos que entran desde fuera (ej. bytes del archivo).
+    - `targets`: etapas solicitadas; se agregan sus dependencias transitivas requeridas.
+    """
+
+    def __init__(self, stages, sources=(), max_workers=4):
+        self.stages = {}
+        self.producers = {}
+        self.sources = set(sources)
+        self.max_workers = max_workers
+
+        for stage in stages:
+            if stage.name in self.stages:
+                raise PipelineError(f"Etapa duplicada: {stage.name}")
+            self.stages[stage.name] = stage
+            for out in stage.outputs:
+                if out in self.producers or out in self.sources:
+                    raise PipelineError(f"Salida '{out}' producida por más de una etapa")
+                self.producers[out] = stage.name
+
+        for stage in stages:
+            for inp in stage.inputs + stage.optional:
+                if inp not in self.producers and inp not in self.sources:
+                    raise PipelineError(f"Entrada '{inp}' de la etapa '{stage.name}' no tiene productor")
+
+        self.order = self._topological_order()
+
+    def _upstream(self, stage, include_optional=True):
+        names = stage.inputs + (stage.optional if include_optional else ())
+        return {self.producers[n] for n in names if n in self.producers}
+
+    def _topological_order(self):
+        """Orden topológico (Kahn) respetando el orden de declaración; detecta ciclos."""
+        pending = {name: self._upstream(st) for name, st in self.stages.items()}
+        order = []
+        while pending:
+            ready = [n for n, deps in pending.items() if not deps - set(order)]
+            if not ready:
+                raise PipelineError(f"Ciclo detectado entre etapas: {sorted(pending)}")
+            for n in ready:
+                order.append(n)
+                del pending[n]
+        return order
+
+    def describe(self):
+        return [self.stages[n].describe() for n in self.order]
+
+    def resolve(self, targets=None):
+        """Retorna las etapas necesarias (en orden topológico) para producir `targets`."""
+        if targets is None:
+            return list(self.order)
+
+        unknown = [t for t in targets if t not in self.stages]
+        if unknown:
+            raise PipelineError(f"Etapas desconocidas: {', '.join(unknown)}")
+
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            # Sólo las entradas requeridas arrastran dependencias; las opcionales no
+            stack.extend(self._upstream(self.stages[name], include_optional=False))
+        return [n for n in self.order if n in needed]
+
+    def run(self, initial, targets=None, on_event=None, should_cancel=None):
+        """
+        Ejecuta el pipeline. Las etapas listas (dependencias resueltas) se lanzan
+        en paralelo en un ThreadPool; NumPy/sklearn liberan el GIL en sus kernels.
+        `on_event(dict)` recibe start/done/skipped por etapa (progreso).
+        `should_cancel()` se consulta antes de lanzar etapas; si es True se aborta.
+        """
+        artifacts = dict(initial)
+        plan = self.resolve(targets)
+        in_plan = set(plan)
+        status = {}
+        remaining = list(plan)
+        running = {}
+
+        def finished(name):
+            return name in status
+
+        def emit(event, name, **extra):
+            if on_event is not None:
+                on_event({'event': event, 'stage': name, 'finished': len(status),
+                          'total': len(plan), **extra})
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            try:
+                while remaining or running:
+                    if should_cancel is not None and should_cancel():
+                        raise PipelineCancelled("Análisis cancelado")
+
+                    for name in list(remaining):
+                        stage = self.stages[name]
+                        deps = {d for d in self._upstream(stage) if d in in_plan}
+                        if not all(finished(d) for d in deps):
+                            continue
+                        remaining.remove(name)
+
+                        if any(inp not in artifacts for inp in stage.inputs):
+                            status[name] = {'status': 'skipped', 'elapsed_ms': 0.0}
+                            emit('skipped', name, missing=[i for i in stage.inputs if i not in artifacts])
+                            continue
+
+                        kwargs = {k: artifacts[k] for k in stage.inputs + stage.optional if k in artifacts}
+                        emit('start', name)
+                        running[pool.submit(_timed_call, stage.func, kwargs)] = name
+
+                    if not running:
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        name = running.pop(fut)
+                        result, elapsed = fut.result()
+                        stage = self.stages[name]
+                        result = result or {}
+                        extra = set(result) - set(stage.outputs)
+                        if extra:
+                            raise PipelineError(f"Etapa '{name}' produjo salidas no declaradas: {sorted(extra)}")
+                        artifacts.update(result)
+                        status[name] = {'status': 'done', 'elapsed_ms': round(elapsed * 1000, 2)}
+                        emit('done', name, elapsed_ms=status[name]['elapsed_ms'])
+            except BaseException:
+                for fut in running:
+                    fut.cancel()
+                raise
+
+        return PipelineRun(artifacts, {n: status[n] for n in plan if n in status})
+
+
+def _timed_call(func, kwargs):
+    t0 = time.perf_counter()
+    result = func(**kwargs)
+    return result, time.perf_counter() - t0
@@ -1,47 +1,105 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 import numpy as np
+from scipy.optimize import brentq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geomind_saas'))
+# Declinación de Arps (pronóstico desde el punto de operación): módulo común
+from decline import decline_forecast
 
 # ==============================================================================
 # GEOMIND - PRODUCTION PHYSICS ENGINE (ADVANCED)
 # Standards: API 14B / SPE - Nodal Analysis
 # Correlations: Standing (PVT), Hall-Yarborough (Z), Chen (Friction)
+# Todas las correlaciones operan sobre arreglos NumPy: una curva VLP completa
+# (miles de tasas) se resuelve en un solo cálculo vectorizado.
 # ==============================================================================
 
-def calc_z_factor(p_psi, t_f, sg_gas):
-    """Correlación Hall-Yarborough para Factor Z de gases naturales."""
+def _as_output(x, scalar):
+    """Escalar de entrada → float; arreglo de entrada → ndarray."""
+    return float(np.asarray(x).reshape(-1)[0]) if scalar else x
+
+
+def calc_z_factor(p_psi, t_f, sg_gas, tol=1e-6, max_iter=20):
+    """
+    Correlación Hall-Yarborough para Factor Z de gases naturales.
+    Acepta escalares o arreglos (broadcast): Newton-Raphson vectorizado donde
+    cada elemento deja de actualizarse al converger (máscara de convergencia).
+    """
+    scalar = np.ndim(p_psi) == 0 and np.ndim(t_f) == 0 and np.ndim(sg_gas) == 0
+    p_psi, t_f, sg_gas = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64))
+                                              for v in (p_psi, t_f, sg_gas)))
     t_r = t_f + 459.67
     p_pc = 677 + 15.0 * sg_gas - 37.5 * sg_gas**2
     t_pc = 168 + 325 * sg_gas - 12.5 * sg_gas**2
     t_pr = t_r / t_pc
     p_pr = p_psi / p_pc
-    
+
     t = 1/t_pr
     A = 0.06125 * t * np.exp(-1.2 * (1 - t)**2)
-    
+    B = 14.76 * t - 9.76 * t**2 + 4.58 * t**3
+    C = 90.7 * t - 242.2 * t**2 + 42.4 * t**3
+    D = 2.18 + 2.82 * t
+    Ap = A * p_pr
+
     # Newton-Raphson para resolver Y (densidad reducida)
-    Y = 0.001 # Initial guess
-    for _ in range(20):
-        f = -A * p_pr + (Y + Y**2 + Y**3 - Y**4)/(1 - Y)**3 - (14.76 * t - 9.76 * t**2 + 4.58 * t**3) * Y**2 + (90.7 * t - 242.2 * t**2 + 42.4 * t**3) * Y**(2.18 + 2.82 * t)
-        df = (1 + 4*Y + 4*Y**2 - 4*Y**3 + Y**4)/(1 - Y)**4 - 2*(14.76 * t - 9.76 * t**2 + 4.58 * t**3) * Y + (2.18 + 2.82 * t) * (90.7 * t - 242.2 * t**2 + 42.4 * t**3) * Y**(1.18 + 2.82 * t)
-        Y_new = Y - f/df
-        if abs(Y_new - Y) < 1e-6:
-            Y = Y_new
-            break
-        Y = Y_new
-        
-    z = A * p_pr / Y
-    return max(0.5, min(z, 1.5)) # Safety clip
+    Y = np.full(p_pr.shape, 0.001)  # Initial guess
+    active = np.ones(p_pr.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for _ in range(max_iter):
+            y, b, c, d = Y[active], B[active], C[active], D[active]
+            f = -Ap[active] + (y + y**2 + y**3 - y**4)/(1 - y)**3 - b * y**2 + c * y**d
+            df = (1 + 4*y + 4*y**2 - 4*y**3 + y**4)/(1 - y)**4 - 2*b * y + d * c * y**(d - 1)
+            y_new = y - f/df
+            Y[active] = y_new
+            # Convergidos (|ΔY| < tol) o divergentes (NaN) salen de la iteración
+            done = ~(np.abs(y_new - y) >= tol)
+            active.reshape(-1)[np.flatnonzero(active)[done]] = False
+            if not active.any():
+                break
+        z = Ap / Y
+    # Safety clip; un Newton divergente (NaN) cae al límite inferior
+    z = np.where(np.isnan(z), 0.5, np.clip(z, 0.5, 1.5))
+    return _as_output(z, scalar)
 
 def calc_friction_factor(re, epsilon, d_in):
-    """Ecuación de Chen para factor de fricción (f) explícito (turbulento)."""
-    if re < 2000: return 64 / max(re, 1) # Laminar
-    
+    """
+    Ecuación de Chen para factor de fricción (f) explícito (turbulento);
+    64/Re en régimen laminar (Re < 2000). Acepta arreglos de Reynolds.
+    """
+    scalar = np.ndim(re) == 0
+    re = np.asarray(re, dtype=np.float64)
+    laminar = re < 2000
+    re_t = np.where(laminar, 2000.0, re)  # Evita log de valores inválidos en la rama no usada
+
     rel_rough = epsilon / (d_in / 12) # Rugosidad relativa
-    a = (rel_rough**1.1098) / 2.8257 + (7.149 / re)**0.8981
-    f = (-2.0 * np.log10(rel_rough / 3.7065 - 5.0452 / re * np.log10(a))) ** -2
-    return f
+    a = (rel_rough**1.1098) / 2.8257 + (7.149 / re_t)**0.8981
+    f = (-2.0 * np.log10(rel_rough / 3.7065 - 5.0452 / re_t * np.log10(a))) ** -2
+    f = np.where(laminar, 64 / np.maximum(re, 1), f)
+    return _as_output(f, scalar)
+
+def calc_rs_standing(p_psi, t_f, api, gas_grav):
+    """Rs (scf/STB) por Standing simplificado; vectorizado en presión."""
+    return gas_grav * ((np.asarray(p_psi) / 18.2 + 1.4) * 10**(0.0125*api - 0.00091*t_f))**1.2048
 
-def calculate_ipr_vogel(pr, q_test=None, pwf_test=None, k=None, h=None, skin=0, u_o=1.0, bo=1.2, re=1000, rw=0.328):
-    """Calcula IPR usando Vogel (Curvatura de Oferta)."""
+def calc_bo_standing(rs, t_f, gas_grav, oil_grav):
+    """Factor volumétrico del petróleo Bo (bbl/STB) por Standing."""
+    return 0.9759 + 0.00012 * (np.asarray(rs) * (gas_grav/oil_grav)**0.5 + 1.25*t_f)**1.2
+
+def calc_holdup(ql_insitu, qg_insitu):
+    """Holdup de líquido (Turner & Ros modificado): no-slip + corrección por deslizamiento."""
+    nl = ql_insitu / (ql_insitu + qg_insitu)  # No-slip liquid hold-up
+    return np.maximum(nl, nl + (1-nl)**2 * 0.1)  # Slip correction
+
+def calculate_ipr_vogel(pr, q_test=None, pwf_test=None, k=None, h=None, skin=0, u_o=1.0, bo=1.2, re=1000, rw=0.328,
+                        n_points=50):
+    """Calcula IPR usando Vogel (Curvatura de Oferta) en `n_points` presiones."""
     q_max = 0
     if k is not None and h is not None:
         # Darcy para índice J
@@ -58,119 +116,769 @@ def calculate_ipr_vogel(pr, q_test=None, pwf_test=None, k=None, h=None, skin=0,
 
     if q_max <= 0: q_max = 500 # Default de seguridad si todo falla
     
-    pressures = np.linspace(pr, 0, 50)
-    rates = []
-    for p in pressures:
-        q = q_max * (1 - 0.2*(p/pr) - 0.8*(p/pr)**2)
-        rates.append(q)
+    pressures = np.linspace(pr, 0, n_points)
+    ratio = pressures / pr
+    rates = q_max * (1 - 0.2*ratio - 0.8*ratio**2)
         
-    return {'q_max': round(q_max, 2), 'rates': [round(x, 2) for x in rates], 'pressures': [round(x, 2) for x in pressures]}
+    return {'q_max': round(q_max, 2), 'rates': np.round(rates, 2).tolist(), 'pressures': np.round(pressures, 2).tolist()}
+
+WATER_GRAV = 1.07
+PIPE_ROUGHNESS_FT = 0.0006  # Rugosidad tubing acero comercial (ft)
+
+def _liquid_density(wc, api):
+    """Densidad del líquido (lb/ft³) según corte de agua y API."""
+    fw = wc / 100
+    oil_grav = 141.5 / (131.5 + api)
+    return fw*WATER_GRAV*62.4 + (1 - fw)*oil_grav*62.4
+
+# ==============================================================================
+# TABLAS PVT PRECALCULADAS
+# Z (Newton), Rs, Bo, Bg, densidades y viscosidades dependen sólo del fluido
+# (API, gravedad del gas) y de (P, T): se calculan una vez sobre una grilla
+# uniforme y cada consulta es una interpolación bilineal vectorizada (índice
+# directo, sin búsqueda). Las tablas se cachean por fluido con desalojo LRU.
+# ==============================================================================
+
+PVT_P_RANGE = (14.7, 15000.0)  # psia
+PVT_T_RANGE = (32.0, 452.0)    # °F
+PVT_P_STEP = 10.0
+PVT_T_STEP = 5.0
+PVT_CACHE_SIZE = 32
+PVT_PROPERTIES = ('z', 'bg', 'rs', 'bo', 'rho_gas', 'rho_oil', 'mu_oil', 'mu_gas')
+_PVT_LOG_PROPERTIES = ('mu_oil', 'mu_gas')  # Casi exponenciales en T: se interpolan en log
 
-def calculate_vlp_basic(tvd, md, tubing_id, p_wh, q_liquid, wc=0, gor=500, api=35, gas_grav=0.65, temp_bh=200, temp_wh=100):
+def calc_mu_oil(rs, t_f, api):
+    """Viscosidad de petróleo vivo (cp) por Beggs-Robinson."""
+    x = np.asarray(t_f, dtype=np.float64)**-1.163 * 10**(3.0324 - 0.02023*api)
+    mu_od = 10**x - 1
+    a = 10.715 * (np.asarray(rs) + 100)**-0.515
+    b = 5.44 * (np.asarray(rs) + 150)**-0.338
+    return a * mu_od**b
+
+def calc_mu_gas(rho_gas, t_f, gas_grav):
+    """Viscosidad del gas (cp) por Lee-Gonzalez-Eakin; `rho_gas` en lb/ft³."""
+    t_r = np.asarray(t_f, dtype=np.float64) + 459.67
+    mg = 28.97 * gas_grav
+    k = (9.4 + 0.02*mg) * t_r**1.5 / (209 + 19*mg + t_r)
+    x = 3.5 + 986/t_r + 0.01*mg
+    return 1e-4 * k * np.exp(x * (np.asarray(rho_gas) * 0.0160185)**(2.4 - 0.2*x))
+
+def pvt_properties(p, t_f, api, gas_grav):
+    """Propiedades PVT exactas (correlaciones) en (P, T) con broadcast: dict PVT_PROPERTIES."""
+    p = np.asarray(p, dtype=np.float64)
+    oil_grav = 141.5 / (131.5 + api)
+    t_r = np.asarray(t_f, dtype=np.float64) + 459.67
+    z = calc_z_factor(p, t_f, gas_grav)
+    rs = calc_rs_standing(p, t_f, api, gas_grav)
+    bo = calc_bo_standing(rs, t_f, gas_grav, oil_grav)
+    rho_gas = gas_grav * 0.0764 * (p/14.7) * (520/t_r)
+    return {
+        'z': z,
+        'bg': 0.02827 * z * t_r / p,
+        'rs': rs,
+        'bo': bo,
+        'rho_gas': rho_gas,
+        'rho_oil': (62.4*oil_grav + 0.0136*rs*gas_grav) / bo,
+        'mu_oil': calc_mu_oil(rs, t_f, api),
+        'mu_gas': calc_mu_gas(rho_gas, t_f, gas_grav),
+    }
+
+class PVTTable:
     """
-    Calcula VLP usando correlaciones físicas reales (sin constantes mágicas).
+    Grilla (presión × temperatura) de PVT_PROPERTIES para un fluido.
+    Fuera de rango las consultas se acotan al borde de la grilla.
+    """
+
+    def __init__(self, api, gas_grav, p_range=PVT_P_RANGE, t_range=PVT_T_RANGE,
+                 p_step=PVT_P_STEP, t_step=PVT_T_STEP):
+        self.api, self.gas_grav = api, gas_grav
+        self.p_grid = np.arange(p_range[0], p_range[1] + p_step/2, p_step)
+        self.t_grid = np.arange(t_range[0], t_range[1] + t_step/2, t_step)
+        self.p0, self.dp = self.p_grid[0], p_step
+        self.t0, self.dt = self.t_grid[0], t_step
+        props = pvt_properties(self.p_grid[:, None], self.t_grid[None, :], api, gas_grav)
+        # Una grilla aplanada (fila = presión) por propiedad: las consultas son np.take
+        # sobre índices planos, mucho más baratas que indexar un arreglo 3-D
+        self.values = {k: np.ascontiguousarray(np.log(props[k]) if k in _PVT_LOG_PROPERTIES else props[k],
+                                               dtype=np.float64).reshape(-1) for k in PVT_PROPERTIES}
+
+    def _cell(self, x, x0, dx, n):
+        """
+        Índice de celda y peso lineal (acotados a la grilla) sobre un eje uniforme.
+        Un NaN usa la celda 0 con peso NaN, así la interpolación devuelve NaN.
+        """
+        u = (np.asarray(x, dtype=np.float64) - x0) / dx
+        i = np.clip(np.floor(np.nan_to_num(u)), 0, n - 2).astype(np.intp)
+        return i, np.where(np.isnan(u), np.nan, np.clip(u - i, 0.0, 1.0))
+
+    def lookup(self, p, t_f, properties=PVT_PROPERTIES):
+        """
+        Interpolación bilineal vectorizada (broadcast de `p` y `t_f`) → dict de
+        arreglos. Bg (∝ 1/P, no lineal en P) se obtiene de Z interpolado.
+        """
+        p, t_f = np.broadcast_arrays(np.asarray(p, dtype=np.float64), np.asarray(t_f, dtype=np.float64))
+        i, wp = self._cell(p, self.p0, self.dp, len(self.p_grid))
+        j, wt = self._cell(t_f, self.t0, self.dt, len(self.t_grid))
+        n_t = len(self.t_grid)
+        k00 = i * n_t + j
+        k10 = k00 + n_t
+
+        def interp(name):
+            v = self.values[name]
+            lo = v.take(k00) * (1 - wt) + v.take(k00 + 1) * wt
+            hi = v.take(k10) * (1 - wt) + v.take(k10 + 1) * wt
+            value = lo * (1 - wp) + hi * wp
+            return np.exp(value) if name in _PVT_LOG_PROPERTIES else value
+
+        out = {}
+        for name in properties:
+            if name == 'bg':
+                z = out['z'] if 'z' in out else interp('z')
+                out[name] = 0.02827 * z * (t_f + 459.67) / p
+            else:
+                out[name] = interp(name)
+        return out
+
+@lru_cache(maxsize=PVT_CACHE_SIZE)
+def _cached_pvt_table(api, gas_grav):
+    return PVTTable(api, gas_grav)
+
+def get_pvt_table(api, gas_grav):
+    """Tabla PVT del fluido (cache LRU por API y gravedad del gas, redondeados a 1e-4)."""
+    return _cached_pvt_table(round(float(api), 4), round(float(gas_grav), 4))
+
+def _mixture(p, t_f, q, wc, gor, api, gas_grav, tubing_id, pvt=None):
     """
-    # Constantes físicas
-    water_grav = 1.07
+    Propiedades de la mezcla a presión `p` y temperatura `t_f` para cada tasa
+    `q` (arreglos con broadcast): rho_mix (lb/ft³), vm (ft/s), holdup y fricción.
+    Con `pvt` (PVTTable) Z/Bg/Rs/Bo salen de la tabla en vez de las correlaciones.
+    """
+    fw = wc / 100
     oil_grav = 141.5 / (131.5 + api)
-    avg_temp_f = (temp_bh + temp_wh) / 2
-    avg_temp_r = avg_temp_f + 459.67
-    epsilon = 0.0006 # Rugosidad tubing acero comercial (ft)
-    
-    pwf_vlp = []
-    valid_rates = []
-    
+    t_r = t_f + 459.67
     area_ft2 = (np.pi/4) * (tubing_id/12)**2
     d_ft = tubing_id / 12
-    
-    debug_log = []
-    
-    for i, q in enumerate(q_liquid):
-        if q <= 0.1:
-            # Hidrostática pura
-            rho_mix = (wc/100)*water_grav*62.4 + (1 - wc/100)*oil_grav*62.4
-            p_static = p_wh + (rho_mix * tvd / 144)
-            valid_rates.append(q)
-            pwf_vlp.append(p_static)
-            if i < 3: debug_log.append(f"Q={q}: P_static={p_static:.1f}")
-            continue
-
-        # Iteración simple para presión promedio
-        p_avg = p_wh + 0.2*tvd # Seed
-        p_calc_final = 0
-        
-        for iter_idx in range(3):
-            # 1. Propiedades PVT a P_avg & T_avg
-            z = calc_z_factor(p_avg, avg_temp_f, gas_grav)
-            bg = 0.02827 * z * avg_temp_r / p_avg
-            
-            # Rs (Standing simple approx)
-            try:
-                rs = gas_grav * ((p_avg / 18.2 + 1.4) * 10**(0.0125*api - 0.00091*avg_temp_f))**1.2048
-            except:
-                rs = gor # Fallback
-            
-            # FVF Petróleo (Bo)
-            bo = 0.9759 + 0.00012 * (rs * (gas_grav/oil_grav)**0.5 + 1.25*avg_temp_f)**1.2
-            
-            # Volúmenes In-Situ
-            qw = q * (wc/100)
-            qo = q * (1 - wc/100)
-            qg_free = max(0, (qo * (gor - rs))/1000) * 1000 # scf/d
-            
-            ql_insitu = qw * 1.02 + qo * bo # bbl/d
-            qg_insitu = (qg_free / 5.615) * bg # bbl/d
-            
-            q_mix = ql_insitu + qg_insitu
-            vm = (q_mix * 5.615 / 86400) / area_ft2 # velocity mixture ft/s
-            
-            # Holdup (Turner & Ros modified)
-            nl = (ql_insitu / q_mix) # No-slip liquid hold-up
-            hl = max(nl, nl + (1-nl)**2 * 0.1) # Slip correction
-            
-            # Densidades
-            rho_liq = (wc/100)*water_grav*62.4 + (1 - wc/100)*oil_grav*62.4
-            rho_gas = gas_grav * 0.0764 * (p_avg/14.7) * (520/avg_temp_r)
-            rho_mix = src_rho = hl*rho_liq + (1-hl)*rho_gas
-            
-            # Viscosidad mezcla (aprox para Reynolds)
-            mu_mix = 1.0 * hl + 0.02 * (1-hl) # cp
-            
-            # Reynolds
-            re = 1488 * rho_mix * vm * d_ft / mu_mix
-            
-            # Fricción
-            f = calc_friction_factor(re, epsilon, tubing_id)
-            
+    rho_liq = _liquid_density(wc, api)
+    qw = q * fw
+    qo = q * (1 - fw)
+
+    # 1. Propiedades PVT a P & T
+    if pvt is not None:
+        props = pvt.lookup(p, t_f, ('bg', 'rs', 'bo'))
+        bg, rs, bo = props['bg'], props['rs'], props['bo']
+    else:
+        z = calc_z_factor(p, t_f, gas_grav)
+        bg = 0.02827 * z * t_r / p
+        rs = calc_rs_standing(p, t_f, api, gas_grav)
+        bo = calc_bo_standing(rs, t_f, gas_grav, oil_grav)
+
+    # Volúmenes In-Situ
+    qg_free = np.maximum(0, (qo * (gor - rs))/1000) * 1000 # scf/d
+    ql_insitu = qw * 1.02 + qo * bo # bbl/d
+    qg_insitu = (qg_free / 5.615) * bg # bbl/d
+    q_mix = ql_insitu + qg_insitu
+    vm = (q_mix * 5.615 / 86400) / area_ft2 # velocity mixture ft/s
+
+    hl = calc_holdup(ql_insitu, qg_insitu)
+
+    # Densidades
+    rho_gas = gas_grav * 0.0764 * (p/14.7) * (520/t_r)
+    rho_mix = hl*rho_liq + (1-hl)*rho_gas
+
+    # Viscosidad mezcla (aprox para Reynolds)
+    mu_mix = 1.0 * hl + 0.02 * (1-hl) # cp
+    re = 1488 * rho_mix * vm * d_ft / mu_mix
+    f = calc_friction_factor(re, PIPE_ROUGHNESS_FT, tubing_id)
+    return rho_mix, vm, hl, f
+
+def pressure_traverse(q, tvd, md, tubing_id, p_wh, wc=0, gor=500, api=35, gas_grav=0.65, temp_bh=200, temp_wh=100,
+                      n_iter=3, pvt_table=True):
+    """
+    Pwf para un arreglo de tasas de líquido `q` (bbl/d) en un solo cálculo:
+    las `n_iter` iteraciones de punto fijo sobre la presión promedio avanzan
+    todas las tasas a la vez. Tasas <= 0.1 usan la columna hidrostática.
+    `pvt_table`: PVT por tabla interpolada (get_pvt_table) o correlaciones exactas.
+    wc, gor, tubing_id y p_wh aceptan arreglos del mismo largo que `q` (barridos).
+    Retorna dict de arreglos: pwf, dp_elev, dp_fric, rho_mix, hl, static.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    avg_temp_f = (temp_bh + temp_wh) / 2
+    d_ft = tubing_id / 12
+    pvt = get_pvt_table(api, gas_grav) if pvt_table else None
+
+    # Hidrostática pura (sin flujo)
+    static = q <= 0.1
+    p_static = p_wh + (_liquid_density(wc, api) * tvd / 144)
+
+    # Iteración simple para presión promedio (todas las tasas a la vez)
+    p_avg = np.broadcast_to(np.asarray(p_wh + 0.2*tvd, dtype=np.float64), q.shape).copy()  # Seed
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(n_iter):
+            rho_mix, vm, hl, f = _mixture(p_avg, avg_temp_f, q, wc, gor, api, gas_grav, tubing_id, pvt)
+
             # Gradientes
             dp_elev = (rho_mix * tvd) / 144
             dp_fric = (f * rho_mix * vm**2 * md) / (2 * 32.2 * d_ft) / 144
-            
             p_calc = p_wh + dp_elev + dp_fric
-            p_avg = (p_wh + p_calc)/2 # Update average for next iter
-            p_calc_final = p_calc
-        
-        if i < 5: 
-            debug_log.append(f"Q={q:.1f}: Pwf={p_calc_final:.1f} (Elev={dp_elev:.1f}, Fric={dp_fric:.1f}, RhoMix={rho_mix:.1f}, HL={hl:.2f})")
+            # Update average for next iter; las filas estáticas (holdup 0/0 → NaN)
+            # quedan en la semilla para no consultar la tabla PVT con NaN
+            p_avg = np.where(static, p_avg, (p_wh + p_calc)/2)
 
-        valid_rates.append(q)
-        pwf_vlp.append(p_calc_final)
-        
-    return {'rates': [round(x, 2) for x in valid_rates], 'pressures': [round(x, 2) for x in pwf_vlp], 'debug': debug_log}
+    return {
+        'pwf': np.where(static, p_static, p_calc),
+        'dp_elev': dp_elev, 'dp_fric': dp_fric, 'rho_mix': rho_mix, 'hl': hl,
+        'static': static,
+    }
+
+def _deviation_profile(md, tvd, survey_md=None, survey_tvd=None):
+    """
+    Estaciones (MD, TVD) desde superficie hasta `md`. Sin survey: pozo recto
+    con pendiente TVD/MD constante. Con survey: se agrega la superficie (0, 0)
+    y el último tramo se extiende o recorta hasta `md`.
+    """
+    if survey_md is None or survey_tvd is None or len(survey_md) < 2:
+        return np.array([0.0, float(md)]), np.array([0.0, float(tvd)])
+    s_md = np.asarray(survey_md, dtype=np.float64)
+    s_tvd = np.asarray(survey_tvd, dtype=np.float64)
+    order = np.argsort(s_md, kind='stable')
+    s_md, s_tvd = s_md[order], s_tvd[order]
+    keep = np.r_[True, np.diff(s_md) > 0]
+    s_md, s_tvd = s_md[keep], s_tvd[keep]
+    if s_md[0] > 0:
+        s_md, s_tvd = np.r_[0.0, s_md], np.r_[0.0, s_tvd]
+    inside = s_md < md
+    tvd_end = np.interp(md, s_md, s_tvd) if md <= s_md[-1] else \
+        s_tvd[-1] + (md - s_md[-1]) * (s_tvd[-1] - s_tvd[-2]) / (s_md[-1] - s_md[-2])
+    return np.r_[s_md[inside], md], np.r_[s_tvd[inside], tvd_end]
+
+def pressure_march(q, md, tubing_id, p_wh, tvd=None, survey_md=None, survey_tvd=None, wc=0, gor=500, api=35,
+                   gas_grav=0.65, temp_bh=200, temp_wh=100, tol=1.0, h_init=500.0, h_min=10.0, h_max=2000.0,
+                   n_segments=None, max_steps=20000, pvt_table=True):
+    """
+    VLP por marcha de gradiente: integra dP/dMD desde el cabezal hasta `md`
+    en tramos (Heun/RK2). El error local se estima con el cambio de gradiente
+    entre los extremos del tramo, |ΔP_heun − ΔP_euler| = h/2·|g2 − g1|, y el
+    paso se ajusta para mantenerlo <= `tol` (psi). Todas las tasas avanzan
+    juntas con el mismo paso (controlado por la peor) y ningún tramo cruza una
+    estación del survey. `n_segments` fuerza paso fijo (sin control de error).
+    Temperatura lineal en TVD entre cabezal y fondo. `pvt_table` como en
+    pressure_traverse (cada tramo evalúa el PVT dos veces por tasa).
+    Retorna pwf, md/tvd de los nodos, p_nodes (nodos × tasas), steps y rejected.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    md_s, tvd_s = _deviation_profile(md, md if tvd is None else tvd, survey_md, survey_tvd)
+    slope = np.diff(tvd_s) / np.diff(md_s)  # cos(inclinación) de cada tramo del survey
+    tvd_total = tvd_s[-1]
+    d_ft = tubing_id / 12
+    rho_liq = _liquid_density(wc, api)
+    static = q <= 0.1
+    pvt = get_pvt_table(api, gas_grav) if pvt_table else None
+    if n_segments:
+        h_init = h_min = h_max = md / n_segments
+        tol = np.inf
+
+    def gradient(p, md_pos, cos_t):
+        tvd_pos = np.interp(md_pos, md_s, tvd_s)
+        t_f = temp_wh + (temp_bh - temp_wh) * (tvd_pos / tvd_total if tvd_total > 0 else 0.0)
+        rho_mix, vm, hl, f = _mixture(p, t_f, q, wc, gor, api, gas_grav, tubing_id, pvt)
+        # Tasa nula: columna hidrostática de líquido, sin fricción
+        rho_mix = np.where(static, rho_liq, rho_mix)
+        fric = np.where(static, 0.0, f * rho_mix * vm**2 / (2 * 32.2 * d_ft))
+        return (rho_mix * cos_t + fric) / 144  # psi/ft de MD
+
+    pos, h = 0.0, min(h_init, md)
+    p = np.broadcast_to(np.asarray(p_wh, dtype=np.float64), q.shape).copy()
+    nodes_md, nodes_p = [0.0], [p]
+    steps = rejected = 0
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        while pos < md * (1 - 1e-12) and steps + rejected < max_steps:
+            seg = min(np.searchsorted(md_s, pos, side='right') - 1, len(slope) - 1)
+            step = min(h, md_s[seg + 1] - pos)
+            truncated = step < h
+            g1 = gradient(p, pos, slope[seg])
+            g2 = gradient(p + step * g1, pos + step, slope[seg])
+            err = np.nanmax(np.abs(0.5 * step * (g2 - g1))) if q.size else 0.0
+            if not np.isfinite(err) or err <= tol or step <= h_min:
+                p = p + 0.5 * step * (g1 + g2)
+                pos += step
+                steps += 1
+                nodes_md.append(pos)
+                nodes_p.append(p)
+                if truncated:
+                    continue  # Paso recortado por una estación: se conserva h
+            else:
+                rejected += 1
+            # Ajuste del paso: h·0.9·sqrt(tol/err), acotado a [0.2, 2]
+            factor = 2.0 if not np.isfinite(err) or err == 0 else min(2.0, max(0.2, 0.9 * np.sqrt(tol / err)))
+            h = min(h_max, max(h_min, step * factor))
+
+    nodes_md = np.asarray(nodes_md)
+    return {
+        'pwf': p,
+        'md_nodes': nodes_md,
+        'tvd_nodes': np.interp(nodes_md, md_s, tvd_s),
+        'p_nodes': np.vstack(nodes_p),
+        'steps': steps,
+        'rejected': rejected,
+    }
+
+def calculate_vlp_segmented(tvd, md, tubing_id, p_wh, q_liquid, wc=0, gor=500, api=35, gas_grav=0.65, temp_bh=200,
+                            temp_wh=100, survey_md=None, survey_tvd=None, tol=1.0, pvt_table=True):
+    """
+    VLP por tramos (ver pressure_march): mismo formato que calculate_vlp_basic
+    + `traverse` (perfil P vs MD/TVD de la tasa media) y número de tramos.
+    """
+    q = np.asarray(q_liquid, dtype=np.float64)
+    tr = pressure_march(q, md, tubing_id, p_wh, tvd=tvd, survey_md=survey_md, survey_tvd=survey_tvd, wc=wc, gor=gor,
+                        api=api, gas_grav=gas_grav, temp_bh=temp_bh, temp_wh=temp_wh, tol=tol,
+                        pvt_table=pvt_table)
+    debug_log = [f"Q={q[i]:.1f}: Pwf={tr['pwf'][i]:.1f}" for i in range(min(5, len(q)))]
+    debug_log.append(f"Tramos: {tr['steps']} aceptados, {tr['rejected']} rechazados (tol {tol} psi)")
+    mid = len(q) // 2
+    return {
+        'rates': np.round(q, 2).tolist(),
+        'pressures': np.round(tr['pwf'], 2).tolist(),
+        'debug': debug_log,
+        'segments': tr['steps'],
+        'traverse': {
+            'rate': round(float(q[mid]), 2) if len(q) else None,
+            'md': np.round(tr['md_nodes'], 1).tolist(),
+            'tvd': np.round(tr['tvd_nodes'], 1).tolist(),
+            'pressure': np.round(tr['p_nodes'][:, mid], 2).tolist() if len(q) else [],
+        },
+    }
+
+def calculate_vlp_basic(tvd, md, tubing_id, p_wh, q_liquid, wc=0, gor=500, api=35, gas_grav=0.65, temp_bh=200, temp_wh=100,
+                        pvt_table=True):
+    """
+    Calcula VLP usando correlaciones físicas reales (sin constantes mágicas).
+    Todas las tasas se resuelven juntas (ver pressure_traverse).
+    """
+    q = np.asarray(q_liquid, dtype=np.float64)
+    tr = pressure_traverse(q, tvd, md, tubing_id, p_wh, wc=wc, gor=gor, api=api, gas_grav=gas_grav,
+                           temp_bh=temp_bh, temp_wh=temp_wh, pvt_table=pvt_table)
+
+    debug_log = []
+    for i in range(min(5, len(q))):
+        if tr['static'][i]:
+            if i < 3: debug_log.append(f"Q={q[i]}: P_static={tr['pwf'][i]:.1f}")
+        else:
+            debug_log.append(f"Q={q[i]:.1f}: Pwf={tr['pwf'][i]:.1f} (Elev={tr['dp_elev'][i]:.1f}, "
+                             f"Fric={tr['dp_fric'][i]:.1f}, RhoMix={tr['rho_mix'][i]:.1f}, HL={tr['hl'][i]:.2f})")
+
+    return {'rates': np.round(q, 2).tolist(), 'pressures': np.round(tr['pwf'], 2).tolist(), 'debug': debug_log}
+
+# ==============================================================================
+# PUNTO DE OPERACIÓN: RAÍCES DE F(q) = P_ipr(q) − P_vlp(q)
+# Los cambios de signo de F sobre una grilla gruesa (normalmente la curva VLP
+# ya calculada, sin evaluaciones extra) acotan cada intersección, y Brent la
+# refina sobre los modelos IPR/VLP como funciones (no sobre listas muestreadas).
+# ==============================================================================
+
+def solve_operating_points(ipr, vlp, rates, f_samples=None, xtol=0.01, rtol=1e-10):
+    """
+    Todas las intersecciones IPR/VLP en el rango de `rates`. `ipr` y `vlp` son
+    callables q → Pwf; `f_samples` (opcional) es F ya evaluada en `rates`.
+    Estabilidad: si F cae al aumentar la tasa (la IPR queda bajo la VLP) una
+    perturbación se corrige sola → 'stable'; si crece → 'unstable'.
+    Retorna (puntos ordenados por tasa, evaluaciones de F).
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    if f_samples is None:
+        f_samples = ipr(rates) - vlp(rates)
+        evaluations = len(rates)
+    else:
+        evaluations = 0
+    f = np.asarray(f_samples, dtype=np.float64)
+
+    def residual(q):
+        return float(ipr(q) - vlp(q))
+
+    points = []
+    valid = np.isfinite(f[:-1]) & np.isfinite(f[1:])
+    brackets = np.flatnonzero(valid & (np.sign(f[:-1]) != np.sign(f[1:])))
+    for i in brackets:
+        (a, b), (fa, fb) = rates[i:i + 2], f[i:i + 2]
+        if fa == 0:
+            root = a
+        elif fb == 0:
+            if i + 1 < len(rates) - 1:
+                continue  # La raíz exacta en `b` la toma el intervalo siguiente
+            root = b
+        else:
+            try:
+                root, info = brentq(residual, a, b, xtol=xtol, rtol=rtol, full_output=True)
+                evaluations += info.function_calls
+            except ValueError:
+                # Las muestras dadas y el modelo difieren en el signo de un extremo
+                # (cruce dentro de la tolerancia de la curva): interpolación lineal
+                evaluations += 2
+                root = a + fa / (fa - fb) * (b - a)
+        points.append({
+            'q': round(float(root), 2),
+            'pwf': round(float(ipr(root)), 2),
+            'stability': 'stable' if fb < fa else 'unstable',
+        })
+    return points, evaluations
+
+def stable_operating_point(points):
+    """Punto de operación reportado: la intersección estable de mayor tasa (o None)."""
+    stable = [pt for pt in points if pt['stability'] == 'stable']
+    return {'q_op': stable[-1]['q'], 'pwf_op': stable[-1]['pwf']} if stable else None
 
 def find_intersection(ipr, vlp):
-    q_ipr = np.array(ipr['rates'])
-    p_ipr = np.array(ipr['pressures'])
-    q_vlp = np.array(vlp['rates'])
-    p_vlp = np.array(vlp['pressures'])
-    
-    q_common = np.linspace(min(min(q_ipr), min(q_vlp)), min(max(q_ipr), max(q_vlp)), 1000)
-    # q_ipr ya está ordenado ascendente (0 -> Qmax), no invertir
-    p_ipr_interp = np.interp(q_common, q_ipr, p_ipr)
-    p_vlp_interp = np.interp(q_common, q_vlp, p_vlp)
-    
-    diff = np.abs(p_ipr_interp - p_vlp_interp)
-    idx_min = np.argmin(diff)
-    
-    if diff[idx_min] > 200: return None
-    return {'q_op': round(q_common[idx_min], 2), 'pwf_op': round(p_ipr_interp[idx_min], 2)}
+    """
+    Intersección estable entre curvas ya muestreadas (dicts rates/pressures),
+    interpoladas linealmente. Compatibilidad: run_nodal_analysis usa los modelos.
+    """
+    q_ipr, p_ipr = np.asarray(ipr['rates'], dtype=np.float64), np.asarray(ipr['pressures'], dtype=np.float64)
+    q_vlp, p_vlp = np.asarray(vlp['rates'], dtype=np.float64), np.asarray(vlp['pressures'], dtype=np.float64)
+    rates = q_vlp[(q_vlp >= q_ipr.min()) & (q_vlp <= q_ipr.max())]
+    if len(rates) < 2:
+        return None
+    points, _ = solve_operating_points(lambda q: np.interp(q, q_ipr, p_ipr), lambda q: np.interp(q, q_vlp, p_vlp), rates)
+    return stable_operating_point(points)
+
+def ipr_model(pr, q_max):
+    """IPR de Vogel como función q → Pwf (escalar o arreglo)."""
+    return lambda q: vogel_pwf(q, pr, q_max)
+
+def vlp_model(params):
+    """VLP (método, survey y PVT según `params`) como función q → Pwf (escalar o arreglo)."""
+    fluid = dict(wc=params['wc'], gor=params['gor'], api=params['api'], gas_grav=params['gas_grav'],
+                 temp_bh=params['temp_bh'], temp_wh=params['temp_wh'], pvt_table=params.get('pvt_table', True))
+
+    def model(q):
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if params.get('vlp_method', 'segmented') == 'average':
+            pwf = pressure_traverse(q, params['tvd'], params['md'], params['tubing_id'], params['p_wh'], **fluid)['pwf']
+        else:
+            pwf = pressure_march(q, params['md'], params['tubing_id'], params['p_wh'], tvd=params['tvd'],
+                                 survey_md=params.get('survey_md'), survey_tvd=params.get('survey_tvd'),
+                                 tol=params.get('vlp_tol', 1.0), **fluid)['pwf']
+        return _as_output(pwf, scalar)
+    return model
+
+def run_nodal_analysis(params):
+    """
+    Análisis Nodal completo (IPR + VLP + Punto de Operación) a partir de un dict
+    de parámetros (campos de NodalInput). Función de módulo: ejecutable en un worker.
+    """
+    # 1. Calcular IPR (Oferta del Yacimiento)
+    # Usamos Vogel con la permeabilidad y espesor del .LAS (o inputs manuales)
+    ipr_res = calculate_ipr_vogel(
+        pr=params['pr'],
+        k=params['k'],
+        h=params['h'],
+        skin=params.get('skin', 0),
+        n_points=params.get('n_points', 50)
+    )
+
+    # 2. Calcular VLP (Demanda del Pozo)
+    # Usamos el rango de tasas del IPR para generar la curva VLP
+    # Filtramos tasas negativas o cero si hay; todas se resuelven en un solo cálculo
+    rates = np.asarray(ipr_res['rates'])
+    rates_to_sim = rates[rates > 0]
+
+    # Por defecto marcha por tramos con paso adaptativo (y survey si viene);
+    # 'average' conserva el modelo de un solo tramo a condiciones promedio
+    vlp_kwargs = dict(
+        tvd=params['tvd'],
+        md=params['md'],
+        tubing_id=params['tubing_id'],
+        p_wh=params['p_wh'],
+        q_liquid=rates_to_sim,
+        wc=params['wc'],
+        gor=params['gor'],
+        api=params['api'],
+        gas_grav=params['gas_grav'],
+        temp_bh=params['temp_bh'],
+        temp_wh=params['temp_wh'],
+        pvt_table=params.get('pvt_table', True)
+    )
+    if params.get('vlp_method', 'segmented') == 'average':
+        vlp_res = calculate_vlp_basic(**vlp_kwargs)
+    else:
+        vlp_res = calculate_vlp_segmented(
+            **vlp_kwargs,
+            survey_md=params.get('survey_md'),
+            survey_tvd=params.get('survey_tvd'),
+            tol=params.get('vlp_tol', 1.0)
+        )
+
+    # 3. Intersecciones: la curva VLP ya calculada acota los cambios de signo
+    # (sin evaluaciones extra); Brent refina cada uno sobre los modelos.
+    # q = 0 queda fuera: la columna estática es discontinua con el flujo
+    ipr = ipr_model(params['pr'], ipr_res['q_max'])
+    vlp = vlp_model(params)
+    f_grid = ipr(rates_to_sim) - np.asarray(vlp_res['pressures'])
+    points, evaluations = solve_operating_points(ipr, vlp, rates_to_sim, f_samples=f_grid)
+    op_point = stable_operating_point(points)
+
+    return {
+        "ipr": ipr_res,
+        "vlp": vlp_res,
+        "operating_point": op_point, # {q_op, pwf_op} o None
+        "operating_points": points, # Todas las intersecciones: [{q, pwf, stability}]
+        "solver": {"method": "brent", "brackets": len(points), "evaluations": evaluations},
+        "status": "flowing" if op_point else "dead",
+        "message": "Pozo Fluyente Estable" if op_point else "Pozo Muerto - No hay intersección estable IPR/VLP"
+    }
+
+
+# ==============================================================================
+# BARRIDO DE SENSIBILIDAD (grilla cartesiana de parámetros)
+# La VLP depende de (tubing, Pwh, WC, GOR) y la IPR sólo de skin: cada
+# combinación de VLP se calcula una vez sobre una grilla común de tasas y
+# todas las combinaciones marchan juntas en un único cálculo vectorizado
+# (arreglos aplanados combinación × tasa). La IPR de Vogel es analítica, así
+# que el cruce con cada skin se resuelve por cambio de signo sobre la grilla.
+# ==============================================================================
+
+SWEEP_PARAMETERS = ('tubing_id', 'p_wh', 'wc', 'gor', 'skin')
+SWEEP_VLP_PARAMETERS = SWEEP_PARAMETERS[:4]
+MAX_SWEEP_POINTS = 20000
+
+def sweep_axes(params, ranges):
+    """
+    Ejes del barrido en el orden de SWEEP_PARAMETERS: valores de `ranges`
+    (lista explícita) o el valor fijo de `params` si el parámetro no se barre.
+    """
+    unknown = set(ranges) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Parámetros no barribles: {', '.join(sorted(unknown))}")
+    axes = {name: np.unique(np.asarray(ranges[name] if name in ranges else [params.get(name, 0)], dtype=np.float64))
+            for name in SWEEP_PARAMETERS}
+    n = int(np.prod([len(v) for v in axes.values()]))
+    if n > MAX_SWEEP_POINTS:
+        raise ValueError(f"Barrido de {n} combinaciones excede el máximo ({MAX_SWEEP_POINTS})")
+    return axes
+
+def vogel_q_max(pr, k, h, skin):
+    """Q máximo de Vogel (índice J de Darcy, mismo criterio que calculate_ipr_vogel); vectorizado en skin."""
+    bo, u_o, re, rw = 1.2, 1.0, 1000, 0.328
+    j_index = (k * h) / (141.2 * bo * u_o * (np.log(re/rw) - 0.75 + np.asarray(skin, dtype=np.float64)))
+    q_max = j_index * pr / 1.8
+    return np.where(q_max > 0, q_max, 500.0)
+
+def vogel_pwf(q, pr, q_max):
+    """Pwf de Vogel para la tasa `q` (inversa analítica); NaN para q > q_max."""
+    frac = 1 - np.asarray(q) / q_max
+    with np.errstate(invalid='ignore'):
+        return pr * (np.sqrt(0.04 + 3.2*frac) - 0.2) / 1.6
+
+def sweep_crossings(rates, p_vlp, p_ipr):
+    """
+    Punto de operación por fila: último cruce IPR (arriba) → VLP (abajo) sobre
+    la grilla de tasas, refinado por interpolación lineal (rama estable).
+    Retorna (q_op, pwf_op) con NaN donde no hay cruce (pozo muerto).
+    """
+    d = p_ipr - p_vlp
+    cross = (d[:, :-1] > 0) & (d[:, 1:] <= 0)
+    has = cross.any(axis=1)
+    last = d.shape[1] - 2 - np.argmax(cross[:, ::-1], axis=1)
+    rows = np.arange(d.shape[0])
+    d0, d1 = d[rows, last], d[rows, last + 1]
+    w = d0 / (d0 - d1)
+    q_op = rates[last] + w * (rates[last + 1] - rates[last])
+    pwf_op = p_vlp[rows, last] + w * (p_vlp[rows, last + 1] - p_vlp[rows, last])
+    return np.where(has, q_op, np.nan), np.where(has, pwf_op, np.nan)
+
+def run_nodal_sweep_chunk(params, vlp_combos, skins):
+    """
+    Evalúa un bloque del barrido: `vlp_combos` (m × 4, columnas de
+    SWEEP_VLP_PARAMETERS) contra todos los `skins`. Función de módulo:
+    ejecutable en un worker. Retorna (q_op, pwf_op) de forma (m, n_skins).
+    """
+    vlp_combos = np.asarray(vlp_combos, dtype=np.float64).reshape(-1, len(SWEEP_VLP_PARAMETERS))
+    skins = np.asarray(skins, dtype=np.float64)
+    q_max = vogel_q_max(params['pr'], params['k'], params['h'], skins)
+    rates = np.linspace(0, q_max.max(), params.get('n_points', 50))
+
+    # Combinación × tasa aplanadas: una sola marcha para todo el bloque
+    m, n = len(vlp_combos), len(rates)
+    cols = {name: np.repeat(vlp_combos[:, i], n) for i, name in enumerate(SWEEP_VLP_PARAMETERS)}
+    q = np.tile(rates, m)
+    fluid = dict(wc=cols['wc'], gor=cols['gor'], api=params['api'], gas_grav=params['gas_grav'],
+                 temp_bh=params['temp_bh'], temp_wh=params['temp_wh'], pvt_table=params.get('pvt_table', True))
+    if params.get('vlp_method', 'segmented') == 'average':
+        pwf = pressure_traverse(q, params['tvd'], params['md'], cols['tubing_id'], cols['p_wh'], **fluid)['pwf']
+    else:
+        pwf = pressure_march(q, params['md'], cols['tubing_id'], cols['p_wh'], tvd=params['tvd'],
+                             survey_md=params.get('survey_md'), survey_tvd=params.get('survey_tvd'),
+                             tol=params.get('vlp_tol', 1.0), **fluid)['pwf']
+    p_vlp = pwf.reshape(m, n)
+
+    # (m × skins) filas contra la misma grilla de tasas
+    p_ipr = vogel_pwf(rates[None, :], params['pr'], q_max[:, None])
+    q_op, pwf_op = sweep_crossings(rates, np.repeat(p_vlp, len(skins), axis=0), np.tile(p_ipr, (m, 1)))
+    return q_op.reshape(m, len(skins)), pwf_op.reshape(m, len(skins))
+
+def vlp_sweep_combos(axes):
+    """Producto cartesiano de los ejes de VLP (orden C: el último eje varía más rápido)."""
+    grids = np.meshgrid(*(axes[name] for name in SWEEP_VLP_PARAMETERS), indexing='ij')
+    return np.column_stack([g.reshape(-1) for g in grids])
+
+def assemble_sweep(axes, q_op, pwf_op):
+    """Superficies de punto de operación (aplanadas en orden C sobre `shape`) + resumen."""
+    q_op = np.asarray(q_op, dtype=np.float64).reshape(-1)
+    pwf_op = np.asarray(pwf_op, dtype=np.float64).reshape(-1)
+    flowing = np.isfinite(q_op)
+    shape = [len(axes[name]) for name in SWEEP_PARAMETERS]
+    best = None
+    if flowing.any():
+        i = int(np.nanargmax(q_op))
+        point = np.unravel_index(i, shape)
+        best = {name: float(axes[name][k]) for name, k in zip(SWEEP_PARAMETERS, point)}
+        best.update(q_op=round(float(q_op[i]), 2), pwf_op=round(float(pwf_op[i]), 2))
+    return {
+        'parameters': list(SWEEP_PARAMETERS),
+        'axes': {name: axes[name] for name in SWEEP_PARAMETERS},
+        'shape': shape,
+        'q_op': np.round(np.where(flowing, q_op, 0.0), 2),
+        'pwf_op': np.round(np.where(flowing, pwf_op, 0.0), 2),
+        'flowing': flowing,
+        'n_points': int(q_op.size),
+        'n_flowing': int(flowing.sum()),
+        'best': best,
+    }
+
+def run_nodal_sweep(params, ranges):
+    """Barrido completo en un proceso (ver el endpoint para la versión paralela)."""
+    axes = sweep_axes(params, ranges)
+    q_op, pwf_op = run_nodal_sweep_chunk(params, vlp_sweep_combos(axes), axes['skin'])
+    return assemble_sweep(axes, q_op, pwf_op)
+
+
+# ==============================================================================
+# EVALUACIÓN POR LOTES (campo completo: nodal + declinación por pozo)
+# Cada pozo es una fila (dict) con los campos de NodalInput + nombre y
+# parámetros de declinación. Los pozos se reparten entre procesos y los
+# resultados se entregan a medida que terminan (generador).
+# Uso sin servidor:
+#   python production_module.py pozos.csv --workers 8 --out resultados.csv
+# ==============================================================================
+
+NODAL_DEFAULTS = {
+    'md': 10000, 'tvd': 10000, 'wc': 0, 'gor': 500, 'api': 35, 'gas_grav': 0.65,
+    'temp_bh': 200, 'temp_wh': 100, 'skin': 0, 'n_points': 50,
+    'vlp_method': 'segmented', 'vlp_tol': 1.0, 'pvt_table': True,
+}
+NODAL_REQUIRED = ('k', 'h', 'pr', 'p_wh', 'tubing_id')
+DECLINE_DEFAULTS = {'di': 0.3, 'b': 0.5, 'months': 60, 'q_limit': 10.0}
+
+def evaluate_well(well):
+    """
+    Nodal + declinación de un pozo (dict). Nunca lanza: un pozo inválido o que
+    falla retorna status 'error' para no detener el lote. Ejecutable en un worker.
+    """
+    start = time.perf_counter()
+    name = str(well.get('well') or well.get('index', ''))
+    try:
+        missing = [k for k in NODAL_REQUIRED if well.get(k) is None]
+        if missing:
+            raise ValueError(f"Faltan campos: {', '.join(missing)}")
+        params = {**NODAL_DEFAULTS, **{k: v for k, v in well.items() if v is not None}}
+        nodal = run_nodal_analysis(params)
+        op = nodal['operating_point']
+        decline = None
+        if op:
+            dec = {k: float(params.get(k, v)) for k, v in DECLINE_DEFAULTS.items()}
+            d_lim = params.get('d_lim')  # Hiperbólica modificada (opcional)
+            decline = decline_forecast(op['q_op'], dec['di'], dec['b'], int(dec['months']), dec['q_limit'],
+                                       None if d_lim is None else float(d_lim))
+        result = {
+            'status': nodal['status'],
+            'q_op': op['q_op'] if op else None,
+            'pwf_op': op['pwf_op'] if op else None,
+            'n_intersections': len(nodal['operating_points']),
+            'decline': decline,
+        }
+    except Exception as e:
+        result = {'status': 'error', 'error': str(e)}
+    return {'index': well.get('index'), 'well': name, **result,
+            'elapsed_s': round(time.perf_counter() - start, 4)}
+
+def evaluate_wells(wells, workers=None):
+    """
+    Generador: evalúa `wells` (iterable de dicts) en `workers` procesos y entrega
+    cada resultado al terminar (orden de finalización; `index` = posición de
+    entrada). workers=1 evalúa en el proceso actual.
+    """
+    wells = [{**w, 'index': i} for i, w in enumerate(wells)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(wells) <= 1:
+        for well in wells:
+            yield evaluate_well(well)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(wells)), mp_context=ctx) as pool:
+        for future in as_completed([pool.submit(evaluate_well, well) for well in wells]):
+            yield future.result()
+
+def batch_summary(results, elapsed):
+    """Totales del lote y throughput (pozos/s)."""
+    status = [r['status'] for r in results]
+    return {
+        'wells': len(results),
+        'flowing': status.count('flowing'),
+        'dead': status.count('dead'),
+        'errors': status.count('error'),
+        'total_q_op': round(sum(r.get('q_op') or 0 for r in results), 2),
+        'total_eur': round(sum((r.get('decline') or {}).get('eur', 0) for r in results), 0),
+        'elapsed_s': round(elapsed, 3),
+        'wells_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+def read_wells_csv(path):
+    """Tabla de pozos desde CSV (columnas = campos de NodalInput; nombres sin mayúsculas/espacios)."""
+    import pandas as pd
+    df = pd.read_csv(path, sep=None, engine='python')
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    # Tipos de NumPy → Python (pickle/JSON livianos)
+    return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in r.items()} for r in records]
+
+def flatten_result(result):
+    """Fila plana para CSV (declinación como columnas decline_*)."""
+    row = {k: v for k, v in result.items() if k != 'decline'}
+    row.update({f"decline_{k}": v for k, v in (result.get('decline') or {}).items()})
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nodal + declinación por lotes desde un CSV de pozos.")
+    parser.add_argument("csv", help="CSV con una fila por pozo (k, h, pr, p_wh, tubing_id, ...)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: núcleos)")
+    parser.add_argument("--out", help="Salida .csv o .jsonl (default: JSON por línea en stdout)")
+    args = parser.parse_args(argv)
+
+    wells = read_wells_csv(args.csv)
+    results = []
+    start = time.perf_counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out and not args.out.endswith(".csv") else None
+    try:
+        for result in evaluate_wells(wells, args.workers):
+            results.append(result)
+            elapsed = time.perf_counter() - start
+            print(f"[{len(results)}/{len(wells)}] {result['well']}: {result['status']} "
+                  f"q_op={result.get('q_op')} ({len(results) / elapsed:.1f} pozos/s)", file=sys.stderr)
+            if out is not None:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            elif not args.out:
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+    finally:
+        if out is not None:
+            out.close()
+
+    summary = batch_summary(results, time.perf_counter() - start)
+    if args.out and args.out.endswith(".csv"):
+        import pandas as pd
+        rows = [flatten_result(r) for r in sorted(results, key=lambda r: r['index'])]
+        pd.DataFrame(rows).to_csv(args.out, index=False)
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import json
+import math
+import struct
+import numpy as np
+
+try:
+    import orjson  # Opcional: serializa ndarrays directamente en C
+except ImportError:
+    orjson = None
+
+# ==============================================================================
+# DATATERRA - SERIALIZACIÓN DE RESPUESTAS
+# El pipeline entrega las curvas como ndarrays; la limpieza NaN/Inf → 0 se
+# hace por arreglo completo (no por escalar) y la codificación JSON usa orjson
+# cuando está instalado (lee el buffer del ndarray sin crear listas Python).
+# ==============================================================================
+
+
+def sanitize(obj):
+    """
+    NaN/Inf → 0 en toda la respuesta (evita que el frontend React crashee al
+    hacer .toFixed() en null). Los ndarrays se limpian en bloque.
+    """
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            return np.where(np.isfinite(obj), obj, 0.0)
+        if obj.dtype.kind in 'iub':
+            return np.ascontiguousarray(obj)
+        return sanitize(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return 0.0
+    return obj
+
+
+def _json_default(obj):
+    """Tipos NumPy que el serializador no maneja solo (arreglos no contiguos, escalares)."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def encode_json(response):
+    """Sanitiza y serializa a bytes JSON compactos (UTF-8, sin NaN)."""
+    clean = sanitize(response)
+    if orjson is not None:
+        return orjson.dumps(clean, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(clean, default=_json_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+# ==============================================================================
+# RESPUESTA COLUMNAR BINARIA (negociada por Accept)
+# Mismo contenido que la respuesta JSON, pero cada lista numérica (curvas,
+# depths, seismic_2d, ...) viaja como arreglo little-endian Float32/Int32 y el
+# resto (textos, tablas chicas, KPIs) como JSON compacto con marcadores
+# {"$buf": n}. El frontend arma typed arrays sobre el mismo ArrayBuffer.
+#
+# Layout:  [MAGIC 8 B][len header uint32][reservado uint32]
+#          [header JSON (relleno a 8 B)][buffers alineados a 8 B]
+# Header:  {"version", "buffers": [{"dtype", "shape", "offset"}], "data": esqueleto}
+# `offset` es relativo al inicio de la sección de datos.
+# ==============================================================================
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.dataterra.columnar"
+MAGIC = b"DTCOLS01"
+CODEC_VERSION = 1
+_ALIGN = 8
+_PREFIX = struct.Struct("<8sII")
+_MIN_BUFFER_LEN = 16
+_INT32 = np.iinfo(np.int32)
+
+
+class ColumnarFormatError(Exception):
+    """El contenido no es un envelope columnar válido."""
+
+
+def wants_columnar(accept):
+    """True si el header Accept pide el formato binario (sin q=0)."""
+    for item in (accept or "").split(","):
+        media, *params = [p.strip() for p in item.split(";")]
+        if media.lower() == COLUMNAR_MEDIA_TYPE:
+            return not any(p.replace(" ", "") in ("q=0", "q=0.0") for p in params)
+    return False
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _scalar(value):
+    """Escalares con la misma limpieza que sanitize (NaN/Inf → 0)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return 0.0
+    return value
+
+
+def _numeric_buffer(value):
+    """Arreglo tipado si `value` es una lista (o lista de listas) rectangular de números."""
+    if isinstance(value, np.ndarray):
+        arr = value
+    elif isinstance(value, list) and len(value) >= _MIN_BUFFER_LEN:
+        sample = value[0]
+        if isinstance(sample, list):
+            if not sample or not all(isinstance(row, list) and len(row) == len(sample) for row in value):
+                return None
+            flat = [x for row in value for x in row]
+        else:
+            flat = value
+        if not all(type(x) in (int, float) for x in flat):
+            return None
+        arr = np.asarray(value)
+    else:
+        return None
+    if arr.dtype.kind in 'iu' and arr.size and _INT32.min <= arr.min() and arr.max() <= _INT32.max:
+        return arr.astype('<i4')
+    if arr.dtype.kind in 'iuf':
+        arr = arr.astype('<f4')
+        return np.where(np.isfinite(arr), arr, np.float32(0))
+    return None
+
+
+def _extract(obj, buffers):
+    if isinstance(obj, dict):
+        return {str(k): _extract(v, buffers) for k, v in obj.items()}
+    arr = _numeric_buffer(obj)
+    if arr is not None:
+        buffers.append(arr)
+        return {"$buf": len(buffers) - 1}
+    if isinstance(obj, np.ndarray):
+        return _extract(obj.tolist(), buffers)
+    if isinstance(obj, (list, tuple)):
+        return [_extract(v, buffers) for v in obj]
+    return _scalar(obj)
+
+
+def encode_columnar(response):
+    """Serializa la respuesta al envelope binario (ver layout arriba)."""
+    buffers = []
+    skeleton = _extract(response, buffers)
+
+    specs, offset = [], 0
+    for arr in buffers:
+        specs.append({'dtype': arr.dtype.str[1:], 'shape': list(arr.shape), 'offset': offset})
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({'version': CODEC_VERSION, 'buffers': specs, 'data': skeleton},
+                        ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode('utf-8')
+    header += b" " * (_align(_PREFIX.size + len(header)) - _PREFIX.size - len(header))
+
+    out = bytearray(_PREFIX.size + len(header) + offset)
+    _PREFIX.pack_into(out, 0, MAGIC, len(header), 0)
+    start = _PREFIX.size + len(header)
+    out[_PREFIX.size:start] = header
+    for arr, spec in zip(buffers, specs):
+        pos = start + spec['offset']
+        out[pos:pos + arr.nbytes] = arr.tobytes()
+    return bytes(out)
+
+
+def decode_columnar(payload, as_lists=True):
+    """
+    Inverso de encode_columnar (clientes Python, pruebas). Con `as_lists=False`
+    los arreglos quedan como ndarray de sólo lectura sobre `payload`.
+    """
+    try:
+        magic, length, _ = _PREFIX.unpack_from(payload, 0)
+    except struct.error as e:
+        raise ColumnarFormatError(f"Envelope truncado: {e}")
+    if magic != MAGIC:
+        raise ColumnarFormatError("No es un envelope columnar DataTerra")
+    header = json.loads(bytes(payload[_PREFIX.size:_PREFIX.size + length]).decode('utf-8'))
+    if header.get('version') != CODEC_VERSION:
+        raise ColumnarFormatError(f"Versión no soportada: {header.get('version')}")
+    start = _PREFIX.size + length
+
+    arrays = []
+    for spec in header['buffers']:
+        arr = np.frombuffer(payload, dtype='<' + spec['dtype'], count=int(np.prod(spec['shape'])),
+                            offset=start + spec['offset']).reshape(spec['shape'])
+        arrays.append(arr.tolist() if as_lists else arr)
+
+    def restore(obj):
+        if isinstance(obj, dict):
+            if set(obj) == {"$buf"}:
+                return arrays[obj["$buf"]]
+            return {k: restore(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [restore(v) for v in obj]
+        return obj
+
+    return restore(header['data'])
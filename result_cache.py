@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ==============================================================================
+# DATATERRA - CACHÉ DE RESULTADOS DIRECCIONADA POR CONTENIDO
+# Clave = SHA-256(bytes del .LAS + parámetros del análisis + versión).
+# Nivel 1: memoria (LRU acotada por bytes). Nivel 2: disco (LRU por mtime).
+# Los valores son la respuesta JSON ya serializada (bytes) lista para enviar.
+# ==============================================================================
+
+# Incrementar cuando cambie el formato de la caché; los cambios en la respuesta
+# de /upload se versionan con las_pipeline.OUTPUT_VERSION (parte de la clave)
+CACHE_VERSION = "1"
+
+
+def _env_mb(name, default):
+    try:
+        return int(float(os.environ.get(name, default)) * 1024 * 1024)
+    except (TypeError, ValueError):
+        return int(default * 1024 * 1024)
+
+
+def cache_key(content, params=None, digest=None):
+    """
+    Hash del contenido del archivo + parámetros canónicos (orden de claves estable).
+    `digest` (SHA-256 ya calculado por bloques) evita requerir el contenido completo.
+    """
+    h = hashlib.sha256()
+    h.update(CACHE_VERSION.encode())
+    h.update(digest if digest is not None else hashlib.sha256(content).digest())
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Caché de dos niveles (memoria → disco) con desalojo LRU y contadores."""
+
+    def __init__(self, cache_dir=None, max_memory_bytes=None, max_disk_bytes=None):
+        self.cache_dir = cache_dir or os.environ.get("DATATERRA_CACHE_DIR", "cache_data")
+        self.max_memory_bytes = (max_memory_bytes if max_memory_bytes is not None
+                                 else _env_mb("DATATERRA_CACHE_MEM_MB", 64))
+        self.max_disk_bytes = (max_disk_bytes if max_disk_bytes is not None
+                               else _env_mb("DATATERRA_CACHE_DISK_MB", 512))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._memory = OrderedDict()  # key -> bytes (orden = recencia)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+            'stores': 0, 'memory_evictions': 0, 'disk_evictions': 0,
+        }
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # ------------------------------------------------------------------ memoria
+    def _memory_put(self, key, payload):
+        if len(payload) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = payload
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+            self.counters['memory_evictions'] += 1
+
+    # -------------------------------------------------------------------- disco
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_put(self, key, payload):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)  # Escritura atómica
+
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, old_path in sorted(entries):  # Más antiguo (menos usado) primero
+            if total <= self.max_disk_bytes:
+                break
+            if old_path == path:
+                continue
+            try:
+                os.remove(old_path)
+                total -= size
+                self.counters['disk_evictions'] += 1
+            except OSError:
+                pass
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path)  # Marca de uso reciente para el LRU de disco
+            return payload
+        except OSError:
+            return None
+
+    # ------------------------------------------------------------------ pública
+    def get(self, key):
+        """Retorna (payload_bytes, nivel) con nivel 'memory'|'disk', o (None, None)."""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return payload, 'memory'
+
+            payload = self._disk_get(key)
+            if payload is not None:
+                self._memory_put(key, payload)  # Promoción al nivel 1
+                self.counters['disk_hits'] += 1
+                return payload, 'disk'
+
+            self.counters['misses'] += 1
+            return None, None
+
+    def put(self, key, payload):
+        with self._lock:
+            self._memory_put(key, payload)
+            try:
+                self._disk_put(key, payload)
+            except OSError as ex:
+                print(f"Error guardando caché en disco: {ex}")
+            self.counters['stores'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for _, _, path in self._disk_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            entries = self._disk_entries()
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            return {
+                **self.counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_limit_bytes': self.max_memory_bytes,
+                'disk_entries': len(entries),
+                'disk_bytes': sum(size for _, size, _ in entries),
+                'disk_limit_bytes': self.max_disk_bytes,
+            }
@@ -3,6 +3,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Upload, BarChart3, Layers, Activity, Globe, Zap, ArrowRight, ChevronDown, Database, Cpu, FileText, Share2, ArrowLeft, Hexagon, Waves, Target, TrendingUp, Check, Crown, Building2, User, Shield, Star, BadgeDollarSign, MonitorDown, AlertTriangle, ShieldCheck, Lock } from 'lucide-react';
 import './index.css';
 import ExecutiveDashboard from './pages/ExecutiveDashboard';
+import { fetchColumnar } from './utils/columnar';
 
 // ====== SVG Mini-chart previews for feature cards ======
 const MiniLogChart = () => (
@@ -98,9 +99,8 @@ function App() {
         setUploadProgress('Recuperando sesión...');
         try {
             const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-            const res = await fetch(`${apiUrl}/load_history/${filename}`);
+            const { res, data } = await fetchColumnar(`${apiUrl}/load_history/${filename}`);
             if (!res.ok) throw new Error("No se pudo cargar el archivo");
-            const data = await res.json();
             setRealData(data);
             setTimeout(() => setView('dashboard'), 300);
         } catch (err) {
@@ -111,31 +111,80 @@ function App() {
         }
     };
 
+    // Etiquetas de progreso por etapa del pipeline (/jobs/{id}/events)
+    const STAGE_LABELS = {
+        parse: 'Leyendo archivo .LAS',
+        normalize: 'Normalizando curvas',
+        petrophysics: 'Calculando petrofísica',
+        electrofacies: 'Clasificando electrofacies',
+        geophysics: 'Generando sísmica sintética',
+        production: 'Simulando producción',
+    };
+
+    // Sigue el progreso del trabajo por SSE; resuelve cuando termina
+    const waitForJob = (apiUrl, jobId) => new Promise((resolve, reject) => {
+        const source = new EventSource(`${apiUrl}/jobs/${jobId}/events`);
+        source.onmessage = (msg) => {
+            const ev = JSON.parse(msg.data);
+            const pct = Math.round((ev.progress || 0) * 100);
+            if (ev.event === 'queued') setUploadProgress('En cola de análisis...');
+            if (ev.event === 'stage' && ev.stage_event === 'start') {
+                setUploadProgress(`${STAGE_LABELS[ev.stage] || ev.stage}... ${pct}%`);
+            }
+            if (ev.event === 'completed') { source.close(); resolve(); }
+            if (ev.event === 'failed' || ev.event === 'cancelled' || ev.event === 'timeout') {
+                source.close();
+                reject(new Error(ev.error || `Análisis ${ev.status}`));
+            }
+        };
+        source.onerror = () => {
+            // El navegador reintenta solo; si el servidor cerró, consultar estado
+            fetch(`${apiUrl}/jobs/${jobId}`)
+                .then(res => res.json())
+                .then(job => {
+                    if (job.status === 'done') { source.close(); resolve(); }
+                    else if (job.status === 'failed' || job.status === 'cancelled' || job.status === 'timeout') {
+                        source.close();
+                        reject(new Error(job.error || `Análisis ${job.status}`));
+                    }
+                })
+                .catch(() => {});
+        };
+    });
+
     const handleFileUpload = async (event) => {
         const file = event.target.files[0];
         if (!file) return;
 
         setIsUploading(true);
-        setUploadProgress('Leyendo archivo .LAS...');
+        setUploadProgress('Subiendo archivo .LAS...');
 
         const formData = new FormData();
         formData.append('file', file);
 
         try {
-            setUploadProgress('Procesando petrofísica con Python...');
             const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-            const response = await fetch(`${apiUrl}/upload`, {
+            const submit = await fetch(`${apiUrl}/jobs`, {
                 method: 'POST',
                 body: formData,
             });
 
-            if (!response.ok) {
-                const error = await response.json();
+            if (!submit.ok) {
+                const error = await submit.json();
                 throw new Error(error.detail || 'Error uploading file');
             }
 
+            const job = await submit.json();
+            if (job.status !== 'done') {
+                await waitForJob(apiUrl, job.job_id);
+            }
+
             setUploadProgress('Renderizando gráficos...');
-            const data = await response.json();
+            // Curvas en binario columnar (typed arrays sin parsear JSON)
+            const { res: response, data } = await fetchColumnar(`${apiUrl}/jobs/${job.job_id}/result`);
+            if (!response.ok) {
+                throw new Error(data.detail || 'Error obteniendo resultado');
+            }
             setRealData(data);
             setTimeout(() => setView('dashboard'), 300);
         } catch (error) {
@@ -337,7 +337,7 @@ const generateCSV = (data) => {
     const { curves, depths } = data;
     const cols = Object.keys(curves);
     const header = ['DEPTH', ...cols.map(c => c.toUpperCase())].join(',');
-    const rows = depths.map((d, i) => {
+    const rows = Array.from(depths, (d, i) => {
         const vals = cols.map(c => curves[c]?.[i] ?? '');
         return [d, ...vals].join(',');
     });
@@ -295,7 +295,7 @@ export const SeismicSection = ({ data, onClose }) => {
     // Plotly espera Z[y_index][x_index] usualmente o Z[row] correpondiente a Y.
     // Si meto Z = seismic_2d (donde cada row es una traza vertical X), entonces Z[x][y]. Plotly heatmap usa 'z' rows mapping to 'y' axis usually? 
     // Corrección rápida: Transponer para asegurar orientacion vertical correcta.
-    const zData = geo.seismic_2d[0].map((_, colIndex) => geo.seismic_2d.map(row => row[colIndex]));
+    const zData = Array.from(geo.seismic_2d[0], (_, colIndex) => geo.seismic_2d.map(row => row[colIndex]));
 
     return (
         <div style={modalOverlay} onClick={onClose}>
@@ -13,8 +13,12 @@ import { Scatter } from 'react-chartjs-2';
 
 ChartJS.register(LinearScale, PointElement, LineElement, Tooltip, Legend);
 
+// Barrido de diseño: diámetros API de tubing × presiones de cabezal
+const SWEEP_TUBING_IDS = [1.995, 2.441, 2.992, 3.958];
+const SWEEP_PWH_POINTS = 8;
 
-const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
+
+const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis, trajectory }) => {
     const [params, setParams] = useState({
         k: 50, // Permeabilidad (mD)
         h: 20, // Espesor Neto (ft)
@@ -34,6 +38,11 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
     const [result, setResult] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
+    const [sweep, setSweep] = useState(null);
+    const [sweepLoading, setSweepLoading] = useState(false);
+
+    // Survey real (mínima curvatura): la VLP marcha por tramos sobre TVD vs MD
+    const deviated = trajectory?.available && trajectory.source !== 'vertical';
 
     // Cargar valores por defecto del KPI si existen
     useEffect(() => {
@@ -43,20 +52,22 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
                 k: kpis.avg_perm || 50,
                 h: kpis.net_pay_ft || 20,
                 md: kpis.max_depth || 8000, // Asumir MD total del log
-                tvd: kpis.max_depth || 8000, // Asumir Vertical por defecto
+                // TVD real del survey si el pozo es desviado; vertical por defecto
+                tvd: deviated ? Math.round(trajectory.td_tvd) : (kpis.max_depth || 8000),
                 // Estimar Pr como Gradiente Normal (0.433 psi/ft) a Max Depth
                 pr: Math.round((kpis.max_depth || 8000) * 0.433),
                 temp_bh: Math.round(70 + (kpis.max_depth || 8000) * 0.012) // Gradiente geotérmico
             }));
         }
-    }, [isOpen, kpis]);
+    }, [isOpen, kpis, deviated]);
 
     const runSimulation = async () => {
         setLoading(true);
         setError(null);
         try {
             const payload = {
-                ...params
+                ...params,
+                ...(deviated ? { survey_md: Array.from(trajectory.md), survey_tvd: Array.from(trajectory.tvd) } : {})
             };
 
             console.log("Simulando producción...", payload);
@@ -79,6 +90,37 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
         }
     };
 
+    // Una sola llamada evalúa toda la grilla tubing × Pwh (resto de parámetros fijos)
+    const runSweep = async () => {
+        setSweepLoading(true);
+        setError(null);
+        try {
+            const payload = {
+                ...params,
+                ...(deviated ? { survey_md: Array.from(trajectory.md), survey_tvd: Array.from(trajectory.tvd) } : {}),
+                sweep: {
+                    tubing_id: { values: SWEEP_TUBING_IDS },
+                    p_wh: { start: 50, stop: Math.max(500, params.p_wh * 2), num: SWEEP_PWH_POINTS }
+                }
+            };
+            const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+            const response = await fetch(`${apiUrl}/analyze_nodal/sweep`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+            if (!response.ok) throw new Error("Error en barrido de sensibilidad");
+            setSweep(await response.json());
+        } catch (err) {
+            setError(err.message);
+        } finally {
+            setSweepLoading(false);
+        }
+    };
+
+    // q_op aplanado en orden C sobre shape [tubing, p_wh, wc, gor, skin] (los 3 últimos de largo 1)
+    const sweepMax = sweep ? Math.max(1, ...sweep.q_op) : 1;
+
     const chartData = result ? {
         datasets: [
             {
@@ -108,6 +150,15 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
                 borderColor: '#fff',
                 pointRadius: 6,
                 pointHoverRadius: 8
+            } : null,
+            result.operating_points?.some(pt => pt.stability === 'unstable') ? {
+                label: 'Intersección Inestable',
+                data: result.operating_points.filter(pt => pt.stability === 'unstable').map(pt => ({ x: pt.q, y: pt.pwf })),
+                backgroundColor: 'transparent',
+                borderColor: '#ef4444',
+                borderWidth: 2,
+                pointRadius: 6,
+                pointHoverRadius: 8
             } : null
         ].filter(Boolean)
     } : null;
@@ -221,10 +272,24 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
                             >
                                 {loading ? 'Calculando...' : <><Play size={14} /> EJECUTAR SIMULACIÓN</>}
                             </button>
+
+                            <button
+                                onClick={runSweep}
+                                disabled={sweepLoading}
+                                style={{
+                                    width: '100%', marginTop: '10px', padding: '10px',
+                                    background: 'transparent', color: sweepLoading ? '#666' : '#00f2ff',
+                                    border: '1px solid rgba(0,242,255,0.3)', borderRadius: '8px', fontWeight: 800, fontSize: '11px',
+                                    cursor: sweepLoading ? 'not-allowed' : 'pointer',
+                                    display: 'flex', alignItems: 'center', justifyContent: 'center', gap: '8px'
+                                }}
+                            >
+                                {sweepLoading ? 'Barriendo...' : <><TrendingUp size={14} /> BARRIDO TUBING × PWH</>}
+                            </button>
                         </div>
 
                         {/* Panel Derecho: Resultados */}
-                        <div style={{ flex: 1, padding: '30px', background: '#000', display: 'flex', flexDirection: 'column' }}>
+                        <div style={{ flex: 1, padding: '30px', background: '#000', display: 'flex', flexDirection: 'column', overflowY: 'auto' }}>
                             {result ? (
                                 <>
                                     <div style={{ display: 'flex', gap: '20px', marginBottom: '20px' }}>
@@ -245,6 +310,11 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
                                             <div style={{ fontSize: '18px', fontWeight: 900, color: '#fff', marginTop: '4px' }}>
                                                 {result.status?.toUpperCase()}
                                             </div>
+                                            {result.vlp?.segments != null && (
+                                                <div style={{ fontSize: '10px', color: '#666', marginTop: '4px' }}>
+                                                    VLP: {result.vlp.segments} tramos{deviated ? ' · survey real' : ''}
+                                                </div>
+                                            )}
                                         </div>
                                     </div>
 
@@ -269,6 +339,44 @@ const NodalAnalysisModal = ({ isOpen, onClose, wellData, kpis }) => {
                                     <p style={{ marginTop: '20px', fontSize: '14px' }}>Configura los parámetros y ejecuta la simulación</p>
                                 </div>
                             )}
+
+                            {sweep && (
+                                <div style={{ marginTop: '20px' }}>
+                                    <div style={{ fontSize: '10px', fontWeight: 800, color: '#00f2ff', marginBottom: '8px' }}>
+                                        SENSIBILIDAD Qop (bpd) · {sweep.n_flowing}/{sweep.n_points} fluyentes · clic para aplicar
+                                    </div>
+                                    <table style={{ width: '100%', borderCollapse: 'collapse', fontSize: '10px' }}>
+                                        <thead>
+                                            <tr>
+                                                <th style={{ color: '#666', textAlign: 'left' }}>ID \ Pwh</th>
+                                                {Array.from(sweep.axes.p_wh, pwh => <th key={pwh} style={{ color: '#888' }}>{Math.round(pwh)}</th>)}
+                                            </tr>
+                                        </thead>
+                                        <tbody>
+                                            {Array.from(sweep.axes.tubing_id, (tid, i) => (
+                                                <tr key={tid}>
+                                                    <td style={{ color: '#888', padding: '4px' }}>{tid}"</td>
+                                                    {Array.from(sweep.axes.p_wh, (pwh, j) => {
+                                                        const q = sweep.q_op[i * sweep.shape[1] + j];
+                                                        return (
+                                                            <td
+                                                                key={pwh}
+                                                                onClick={() => setParams({ ...params, tubing_id: tid, p_wh: Math.round(pwh) })}
+                                                                style={{
+                                                                    padding: '4px', textAlign: 'center', cursor: 'pointer', color: '#fff',
+                                                                    background: q > 0 ? `rgba(74,222,128,${0.1 + 0.6 * q / sweepMax})` : 'rgba(239,68,68,0.15)'
+                                                                }}
+                                                            >
+                                                                {q > 0 ? Math.round(q) : '—'}
+                                                            </td>
+                                                        );
+                                                    })}
+                                                </tr>
+                                            ))}
+                                        </tbody>
+                                    </table>
+                                </div>
+                            )}
                         </div>
                     </div>
                 </motion.div>
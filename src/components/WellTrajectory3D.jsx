@@ -1,20 +1,32 @@
 
-import React, { useMemo, useRef } from 'react';
+import React, { useMemo, useRef, useState } from 'react';
 import { Canvas, useFrame } from '@react-three/fiber';
 import { OrbitControls, Stars, Text } from '@react-three/drei';
 import * as THREE from 'three';
 import { motion, AnimatePresence } from 'framer-motion';
-import { X } from 'lucide-react';
+import { X, Upload } from 'lucide-react';
 
 // --- Utilitarios Geométricos ---
 
 import { calculateDLS } from '../utils/physics_models'; // Nueva Geofísica
 
-const WellPath = ({ depthData, curveData, curveName = 'GR' }) => {
-    // Si no hay datos de survey real, simulamos una desviación suave
-    // para que se vea "interesante" en 3D (o usamos vertical si es lo que hay)
+// Umbral de riesgo de perforación: DLS > 3°/100ft en rojo
+const DLS_RISK = 3.0;
+
+const WellPath = ({ depthData, curveData, trajectory, curveName = 'GR' }) => {
+    // Con survey (trajectory del backend: mínima curvatura) se usan las coordenadas
+    // reales; si no hay, simulamos una desviación suave para la vista 3D
 
     const points = useMemo(() => {
+        if (trajectory?.available) {
+            // x = Este, y = -TVD (ThreeJS: Y es arriba), z = Norte
+            return Array.from(trajectory.md, (md, i) => ({
+                pos: new THREE.Vector3(trajectory.east[i], -trajectory.tvd[i], trajectory.north[i]),
+                color: new THREE.Color(trajectory.dls[i] > DLS_RISK ? '#ef4444' : '#22c55e'),
+                depth: md,
+                val: trajectory.dls[i],
+            }));
+        }
         if (!depthData || depthData.length === 0) return [];
 
         const pts = [];
@@ -61,13 +73,13 @@ const WellPath = ({ depthData, curveData, curveName = 'GR' }) => {
 
             // COLOREADO POR RIESGO DE PERFORACIÓN (DLS)
             // Safe < 3°/100ft (Verde), Risky > 3° (Rojo)
-            const isRisky = dls > 3.0;
+            const isRisky = dls > DLS_RISK;
             const color = new THREE.Color(isRisky ? '#ef4444' : '#22c55e'); // Rojo vs Verde
 
             pts.push({ pos: new THREE.Vector3(x, z, y), color, depth: md, val: dls });
         }
         return pts;
-    }, [depthData, curveData]);
+    }, [depthData, curveData, trajectory]);
 
     // Crear geometría del tubo
     const curve = useMemo(() => {
@@ -104,6 +116,31 @@ const ReservoirGrid = () => {
 };
 
 const WellTrajectory3D = ({ data, onClose }) => {
+    // Survey cargado desde el visor (POST /survey) reemplaza al del análisis
+    const [survey, setSurvey] = useState(null);
+    const [surveyError, setSurveyError] = useState('');
+    const surveyInputRef = useRef(null);
+    const trajectory = survey?.trajectory || data?.trajectory;
+
+    const handleSurveyUpload = async (event) => {
+        const file = event.target.files[0];
+        if (!file) return;
+        const formData = new FormData();
+        formData.append('file', file);
+        setSurveyError('');
+        try {
+            const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+            const res = await fetch(`${apiUrl}/survey`, { method: 'POST', body: formData });
+            const result = await res.json();
+            if (!res.ok) throw new Error(result.detail || 'Survey inválido');
+            setSurvey(result);
+        } catch (err) {
+            setSurveyError(err.message);
+        } finally {
+            event.target.value = '';
+        }
+    };
+
     // Helper para buscar curvas con aliases
     const findCurve = (aliases) => {
         if (!data?.well_data) return [];
@@ -147,10 +184,25 @@ const WellTrajectory3D = ({ data, onClose }) => {
                             Visor de Trayectoria 3D
                         </h2>
                         <div style={{ fontSize: '0.8rem', color: '#888' }}>
-                            Visualización de Desviación y Litología (GR)
+                            {trajectory?.available
+                                ? `Survey ${trajectory.source === 'vertical' ? 'vertical' : 'real'} · ${trajectory.n_stations} estaciones · DLS máx ${trajectory.max_dls}°/100ft · TVD ${trajectory.td_tvd} ft · Desplazamiento ${trajectory.closure} ft`
+                                : 'Visualización de Desviación y Litología (GR)'}
                         </div>
+                        {surveyError && <div style={{ fontSize: '0.75rem', color: '#ef4444' }}>{surveyError}</div>}
                     </div>
 
+                    <button
+                        onClick={() => surveyInputRef.current?.click()}
+                        style={{
+                            background: 'rgba(255,255,255,0.1)', border: '1px solid rgba(255,255,255,0.15)', color: '#fff',
+                            padding: '8px 14px', borderRadius: '10px', cursor: 'pointer', fontSize: '0.75rem',
+                            display: 'flex', alignItems: 'center', gap: '6px'
+                        }}
+                    >
+                        <Upload size={14} /> Cargar Survey
+                    </button>
+                    <input ref={surveyInputRef} type="file" accept=".las,.csv,.txt" style={{ display: 'none' }} onChange={handleSurveyUpload} />
+
                     <div style={{ display: 'flex', gap: '15px', fontSize: '0.75rem', color: '#ccc' }}>
                         <div style={{ display: 'flex', alignItems: 'center', gap: '6px' }}>
                             <div style={{ width: 12, height: 12, background: '#fbbf24', borderRadius: '50%' }}></div>
@@ -201,7 +253,7 @@ const WellTrajectory3D = ({ data, onClose }) => {
 
                         {/* Elementos Geológicos */}
                         <ReservoirGrid />
-                        <WellPath depthData={finalDepth} curveData={gr} />
+                        <WellPath depthData={finalDepth} curveData={gr} trajectory={trajectory} />
                         <axesHelper args={[1000]} />
                     </Canvas>
                 </div>
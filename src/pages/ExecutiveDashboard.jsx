@@ -70,7 +70,8 @@ const normalize = (v, range, isLog) => {
 
 const buildPolyline = (data, w, pixPerSample, range, isLog) => {
     if (!data || data.length === 0) return '';
-    return data.map((v, i) => {
+    // Array.from: `data` puede ser un Float32Array (respuesta columnar)
+    return Array.from(data, (v, i) => {
         const n = normalize(v, range, isLog);
         return `${n * w},${i * pixPerSample}`;
     }).join(' ');
@@ -78,7 +79,7 @@ const buildPolyline = (data, w, pixPerSample, range, isLog) => {
 
 const buildFillPolygon = (data, w, pixPerSample, range, isLog, side) => {
     if (!data || data.length === 0) return '';
-    const pts = data.map((v, i) => {
+    const pts = Array.from(data, (v, i) => {
         const n = normalize(v, range, isLog);
         return `${n * w},${i * pixPerSample}`;
     }).join(' ');
@@ -194,6 +195,7 @@ const GeologyView = ({ data, isMobile, openModal }) => {
 // 3. PETROPHYSICS VIEW — Professional Multi-Track Log Viewer
 // ======================================================================
 const PX = 3; // pixels per sample (vertical resolution)
+const LOD_PX = 400; // puntos por curva pedidos a /curves/{id}/window al hacer zoom
 const TW = 140; // track width in pixels
 
 // Helper: build SVG defs for lithology patterns
@@ -288,8 +290,42 @@ const TrackPanel = ({ curves, data, width, totalH, depthGridLines, pixPerSample
 };
 
 const PetrophysicsView = ({ data, isMobile }) => {
+    // Zoom por ventana de profundidad: la pirámide LOD del backend devuelve la
+    // resolución completa (o envolvente min/max) del intervalo pedido
+    const [zoom, setZoom] = useState(null); // { top, base }
+    const [zoomInput, setZoomInput] = useState({ top: '', base: '' });
+    const [windowData, setWindowData] = useState(null);
+    const lodId = data?.lod?.id;
+
+    useEffect(() => {
+        if (!zoom || !lodId) { setWindowData(null); return; }
+        const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+        const ctrl = new AbortController();
+        const params = new URLSearchParams({ top: zoom.top, base: zoom.base, px: LOD_PX });
+        fetch(`${apiUrl}/curves/${lodId}/window?${params}`, { signal: ctrl.signal })
+            .then(res => res.ok ? res.json() : Promise.reject(new Error(`HTTP ${res.status}`)))
+            .then(setWindowData)
+            .catch(err => { if (err.name !== 'AbortError') console.error("Error LOD:", err); });
+        return () => ctrl.abort();
+    }, [zoom, lodId]);
+
     if (!data) return <WaitingState message="Cargue un .LAS" />;
-    const { curves, depths, kpis } = data;
+    const { kpis } = data;
+    const { curves, depths } = windowData || data;
+
+    const applyZoom = (top, base) => {
+        if (!(base > top)) return;
+        setZoom({ top, base });
+        setZoomInput({ top: top.toFixed(1), base: base.toFixed(1) });
+    };
+    const panZoom = (dir) => zoom && applyZoom(zoom.top + dir * (zoom.base - zoom.top) / 2, zoom.base + dir * (zoom.base - zoom.top) / 2);
+    const scaleZoom = (f) => {
+        if (!zoom) return;
+        const mid = (zoom.top + zoom.base) / 2, half = (zoom.base - zoom.top) * f / 2;
+        applyZoom(mid - half, mid + half);
+    };
+    const zoomBtn = { padding: '4px 10px', background: 'rgba(0,242,255,0.08)', border: '1px solid rgba(0,242,255,0.2)', borderRadius: '8px', color: '#00f2ff', fontSize: '10px', fontWeight: 800, cursor: 'pointer' };
+    const zoomField = { width: '70px', padding: '4px 6px', background: '#0a0f15', border: '1px solid #1e293b', borderRadius: '8px', color: '#e2e8f0', fontSize: '10px' };
     const nSamples = depths?.length || 0;
     const totalH = nSamples * PX;
     const tw = isMobile ? 110 : TW;
@@ -477,7 +513,22 @@ const PetrophysicsView = ({ data, isMobile }) => {
                     {depths ? ` ${nSamples} muestras` : ''} •
                     {depths ? ` Prof: ${depths[0]?.toFixed(0)} — ${depths[nSamples - 1]?.toFixed(0)} ft` : ''} •
                     Fuente PHI: <strong>{data.analysis_meta?.phi_source || 'Calculada'}</strong>
+                    {windowData?.envelope ? ` • Envolvente min/max (nivel ${windowData.level})` : windowData ? ' • Resolución completa' : ''}
                 </span>
+                {lodId && (
+                    <div style={{ display: 'flex', alignItems: 'center', gap: '6px', marginLeft: 'auto', flexWrap: 'wrap' }}>
+                        <input type="number" placeholder="Tope" value={zoomInput.top} style={zoomField}
+                            onChange={e => setZoomInput({ ...zoomInput, top: e.target.value })} />
+                        <input type="number" placeholder="Base" value={zoomInput.base} style={zoomField}
+                            onChange={e => setZoomInput({ ...zoomInput, base: e.target.value })} />
+                        <button style={zoomBtn} onClick={() => applyZoom(parseFloat(zoomInput.top), parseFloat(zoomInput.base))}>ZOOM</button>
+                        <button style={zoomBtn} disabled={!zoom} onClick={() => scaleZoom(0.5)}>+</button>
+                        <button style={zoomBtn} disabled={!zoom} onClick={() => scaleZoom(2)}>−</button>
+                        <button style={zoomBtn} disabled={!zoom} onClick={() => panZoom(-1)}>▲</button>
+                        <button style={zoomBtn} disabled={!zoom} onClick={() => panZoom(1)}>▼</button>
+                        <button style={zoomBtn} disabled={!zoom} onClick={() => { setZoom(null); setZoomInput({ top: '', base: '' }); }}>RESET</button>
+                    </div>
+                )}
             </div>
 
             {/* ============= PROFESSIONAL LOG VIEWER ============= */}
@@ -1016,6 +1067,119 @@ const PermComparisonModal = ({ data, onClose }) => {
 // ======================================================================
 // 5. PRODUCTION & OOIP MODAL
 // ======================================================================
+const OOIP_STATS = [['P10', '#f87171'], ['P50', '#fbbf24'], ['P90', '#4ade80']];
+
+// OOIP Monte Carlo: resultado del pipeline (PASO 11) y recálculo vía /volumetrics/ooip
+const ProbabilisticOOIP = ({ initial }) => {
+    const inputs = initial?.inputs || {};
+    const [mc, setMc] = useState(initial);
+    const [area, setArea] = useState((inputs.area?.distribution || ['triangular', 20, 40, 80]).slice(1));
+    const [bo, setBo] = useState((inputs.bo?.distribution || ['triangular', 1.1, 1.2, 1.4]).slice(1));
+    const [rho, setRho] = useState(-0.5);
+    const [loading, setLoading] = useState(false);
+    const [error, setError] = useState(null);
+
+    const rerun = async () => {
+        setLoading(true);
+        setError(null);
+        try {
+            // net pay, φ y Sw del pozo se conservan; área y Bo desde los campos (mín / moda / máx)
+            const distributions = {
+                area: { type: 'triangular', params: area.map(Number) },
+                bo: { type: 'triangular', params: bo.map(Number) },
+            };
+            ['net_pay', 'phi', 'sw'].forEach(k => {
+                const d = inputs[k]?.distribution;
+                if (d) distributions[k] = { type: d[0], params: d.slice(1) };
+            });
+            const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+            const response = await fetch(`${apiUrl}/volumetrics/ooip`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ distributions, correlations: [{ a: 'phi', b: 'sw', rho: Number(rho) }], seed: 0 })
+            });
+            if (!response.ok) throw new Error((await response.json()).detail || "Error en volumetría");
+            setMc(await response.json());
+        } catch (err) {
+            setError(err.message);
+        } finally {
+            setLoading(false);
+        }
+    };
+
+    if (!mc) return null;
+    const stats = mc.ooip_stb || {};
+    const counts = mc.histogram?.counts || [];
+    const maxCount = Math.max(1, ...counts);
+    const triple = (label, values, setValues, step) => (
+        <div style={{ display: 'flex', alignItems: 'center', gap: '6px' }}>
+            <span style={{ fontSize: '10px', color: '#888', width: '70px' }}>{label}</span>
+            {values.map((v, i) => (
+                <input key={i} type="number" step={step} value={v}
+                    onChange={e => setValues(values.map((x, j) => (j === i ? e.target.value : x)))}
+                    style={{ width: '64px', background: '#000', border: '1px solid #333', borderRadius: '6px', color: '#ccc', fontSize: '10px', padding: '4px' }} />
+            ))}
+        </div>
+    );
+
+    return (
+        <div style={{ background: '#111', borderRadius: '20px', padding: '24px', border: '1px solid #222' }}>
+            <div style={{ display: 'flex', alignItems: 'center', gap: '10px', marginBottom: '15px' }}>
+                <BarChart3 size={18} color="#a78bfa" />
+                <h3 style={{ fontSize: '14px', fontWeight: 800, margin: 0, color: '#a78bfa' }}>VOLUMETRÍA PROBABILÍSTICA (MONTE CARLO)</h3>
+                <span style={{ marginLeft: 'auto', fontSize: '10px', color: '#666' }}>
+                    {mc.n_samples?.toLocaleString()} realizaciones · {mc.converged ? 'convergido' : 'sin converger'} · {mc.elapsed_s}s
+                </span>
+            </div>
+
+            <div style={{ display: 'grid', gridTemplateColumns: 'repeat(3, 1fr)', gap: '10px', marginBottom: '15px' }}>
+                {OOIP_STATS.map(([k, color]) => (
+                    <div key={k} style={{ textAlign: 'center', padding: '10px', background: 'rgba(255,255,255,0.03)', borderRadius: '10px' }}>
+                        <div style={{ fontSize: '10px', color: '#888', fontWeight: 700 }}>{k}</div>
+                        <div style={{ fontSize: '20px', fontWeight: 900, color }}>{((stats[k] || 0) / 1e6).toFixed(2)} <span style={{ fontSize: '10px', color: '#666' }}>MMstb</span></div>
+                    </div>
+                ))}
+            </div>
+
+            {/* Histograma del OOIP (barras proporcionales al conteo) */}
+            <div style={{ display: 'flex', alignItems: 'flex-end', gap: '1px', height: '80px', marginBottom: '6px' }}>
+                {counts.map((c, i) => (
+                    <div key={i} style={{ flex: 1, height: `${(100 * c) / maxCount}%`, background: 'rgba(167,139,250,0.6)', borderRadius: '2px 2px 0 0' }} />
+                ))}
+            </div>
+            <div style={{ display: 'flex', justifyContent: 'space-between', fontSize: '9px', color: '#666', marginBottom: '15px' }}>
+                <span>{((mc.histogram?.edges?.[0] || 0) / 1e6).toFixed(1)} MMstb</span>
+                <span>{((mc.histogram?.edges?.[counts.length] || 0) / 1e6).toFixed(1)} MMstb</span>
+            </div>
+
+            <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '15px', alignItems: 'start' }}>
+                <div style={{ display: 'grid', gap: '6px' }}>
+                    {triple('Área (ac)', area, setArea, 5)}
+                    {triple('Bo', bo, setBo, 0.05)}
+                    <div style={{ display: 'flex', alignItems: 'center', gap: '6px' }}>
+                        <span style={{ fontSize: '10px', color: '#888', width: '70px' }}>ρ φ–Sw</span>
+                        <input type="number" step={0.1} min={-0.95} max={0.95} value={rho} onChange={e => setRho(e.target.value)}
+                            style={{ width: '64px', background: '#000', border: '1px solid #333', borderRadius: '6px', color: '#ccc', fontSize: '10px', padding: '4px' }} />
+                        <button onClick={rerun} disabled={loading}
+                            style={{ marginLeft: 'auto', background: '#a78bfa', color: '#000', border: 'none', borderRadius: '8px', padding: '6px 12px', fontSize: '10px', fontWeight: 800, cursor: 'pointer' }}>
+                            {loading ? 'CALCULANDO...' : 'RECALCULAR'}
+                        </button>
+                    </div>
+                    {error && <div style={{ fontSize: '10px', color: '#f87171' }}>{error}</div>}
+                </div>
+                <div style={{ fontSize: '10px', color: '#aaa', lineHeight: 1.6 }}>
+                    <div style={{ color: '#888', fontWeight: 700, marginBottom: '4px' }}>Influencia sobre OOIP (Spearman)</div>
+                    {Object.entries(mc.sensitivity || {}).map(([k, v]) => (
+                        <div key={k} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                            <span>{k}</span><strong style={{ color: v >= 0 ? '#4ade80' : '#f87171' }}>{v.toFixed(2)}</strong>
+                        </div>
+                    ))}
+                </div>
+            </div>
+        </div>
+    );
+};
+
 const ProductionOOIPModal = ({ data, onClose }) => {
     const prod = data?.production || {};
     const hyp = prod.hyperbolic || {};
@@ -1093,6 +1257,8 @@ const ProductionOOIPModal = ({ data, onClose }) => {
                         </div>
                     </div>
                 </div>
+
+                <ProbabilisticOOIP initial={prod.ooip_probabilistic} />
             </motion.div>
         </div>
     );
@@ -1337,7 +1503,7 @@ const ExecutiveDashboard = ({ data, onUploadRequest, historyFiles, onLoadHistory
                 {activeModal === 'histogram' && <HistogramModal data={data} onClose={closeModal} />}
                 {activeModal === 'radar' && <RadarModal data={data} onClose={closeModal} />}
                 {activeModal === 'scatter' && <ScatterModal data={data} onClose={closeModal} />}
-                {activeModal === 'production' && <ProductionModal isOpen={true} wellData={data?.well_info} kpis={data?.kpis} onClose={closeModal} />}
+                {activeModal === 'production' && <ProductionModal isOpen={true} wellData={data?.well_info} kpis={data?.kpis} trajectory={data?.trajectory} onClose={closeModal} />}
                 {activeModal === 'dataQC' && <DataQCModal data={data} onClose={closeModal} />}
                 {activeModal === 'export' && <ExportModal data={data} onClose={closeModal} />}
                 {activeModal === 'guide' && <UserGuideModal onClose={closeModal} />}
@@ -0,0 +1,65 @@
+// ==========================================
+// RESPUESTA COLUMNAR BINARIA (response_codec.py)
+// ==========================================
+// [MAGIC 8 B][len header u32][reservado u32][header JSON][buffers alineados a 8 B]
+// Las curvas llegan como Float32/Int32 little-endian: se crean typed arrays
+// sobre el mismo ArrayBuffer (sin copiar) y el resto del JSON queda igual.
+
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.dataterra.columnar';
+
+const MAGIC = 'DTCOLS01';
+const PREFIX_BYTES = 16;
+const CODEC_VERSION = 1;
+const TYPED = { f4: Float32Array, i4: Int32Array, f8: Float64Array };
+
+/**
+ * Decodifica el envelope binario.
+ * Arreglos 1-D → Float32Array/Int32Array; 2-D (ej. seismic_2d) → Array de filas
+ * (subarrays sobre el mismo buffer).
+ *
+ * @param {ArrayBuffer} buffer - Cuerpo de la respuesta (res.arrayBuffer())
+ */
+export const decodeColumnar = (buffer) => {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, MAGIC.length));
+    if (magic !== MAGIC) throw new Error('Respuesta binaria inválida');
+
+    const headerLength = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, PREFIX_BYTES, headerLength)));
+    if (header.version !== CODEC_VERSION) throw new Error(`Versión columnar no soportada: ${header.version}`);
+    const start = PREFIX_BYTES + headerLength;
+
+    const arrays = header.buffers.map(({ dtype, shape, offset }) => {
+        const Typed = TYPED[dtype];
+        if (!Typed) throw new Error(`Tipo columnar desconocido: ${dtype}`);
+        const size = shape.reduce((a, b) => a * b, 1);
+        const flat = new Typed(buffer, start + offset, size);
+        if (shape.length === 1) return flat;
+        const cols = shape[1];
+        return Array.from({ length: shape[0] }, (_, r) => flat.subarray(r * cols, (r + 1) * cols));
+    });
+
+    const restore = (obj) => {
+        if (Array.isArray(obj)) return obj.map(restore);
+        if (obj && typeof obj === 'object') {
+            if ('$buf' in obj && Object.keys(obj).length === 1) return arrays[obj.$buf];
+            return Object.fromEntries(Object.entries(obj).map(([k, v]) => [k, restore(v)]));
+        }
+        return obj;
+    };
+    return restore(header.data);
+};
+
+/**
+ * GET/POST pidiendo el formato binario; si el servidor responde JSON
+ * (versión anterior, error) se parsea como JSON.
+ */
+export const fetchColumnar = async (url, init = {}) => {
+    const res = await fetch(url, {
+        ...init,
+        headers: { ...(init.headers || {}), Accept: `${COLUMNAR_MEDIA_TYPE}, application/json;q=0.9` },
+    });
+    const type = res.headers.get('content-type') || '';
+    const data = type.startsWith(COLUMNAR_MEDIA_TYPE) ? decodeColumnar(await res.arrayBuffer()) : await res.json();
+    return { res, data };
+};
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'geomind_saas'))
+from decline import DAYS_PER_YEAR, arps_cumulative, arps_rate, arps_time_to_rate, decline_forecast, fit_arps_batch
+
+
+def test_exponential_with_d_lim_never_switches():
+    # b = 0: declinación constante di > d_lim, la terminal nunca aplica
+    qi, di, d_lim = 1000.0, 0.8, 0.1
+    t = np.linspace(0, 10, 41)
+    np.testing.assert_allclose(arps_rate(qi, di, 0.0, 1.0, d_lim), qi * np.exp(-di))
+    np.testing.assert_allclose(arps_rate(qi, di, 0.0, t, d_lim), qi * np.exp(-di * t))
+    np.testing.assert_allclose(arps_cumulative(qi, di, 0.0, t, d_lim),
+                               qi / di * (1 - np.exp(-di * t)) * DAYS_PER_YEAR)
+    np.testing.assert_allclose(arps_time_to_rate(qi, di, 0.0, 10.0, d_lim), np.log(qi / 10.0) / di)
+    assert decline_forecast(qi, di, 0.0, 120, 10.0, d_lim) == decline_forecast(qi, di, 0.0, 120, 10.0)
+
+
+def test_modified_hyperbolic_switches_to_d_lim():
+    qi, di, b, d_lim = 1000.0, 0.8, 1.2, 0.1
+    t_sw = (di / d_lim - 1) / (b * di)
+    q_sw = qi / (1 + b * di * t_sw) ** (1 / b)
+    t = t_sw + np.array([0.0, 1.0, 5.0])
+    np.testing.assert_allclose(arps_rate(qi, di, b, t, d_lim), q_sw * np.exp(-d_lim * (t - t_sw)))
+
+
+def test_batch_fit_recovers_exponential_with_d_lim():
+    t = np.arange(60) / 12
+    qi = np.array([500.0, 1500.0])
+    di = np.array([0.6, 1.2])
+    q = arps_rate(qi[:, None], di[:, None], 0.0, t)
+    fit = fit_arps_batch(t, q, model='modified_hyperbolic', d_lim=0.1)
+    np.testing.assert_allclose(fit['qi'], qi, rtol=1e-4)
+    np.testing.assert_allclose(fit['di'], di, rtol=1e-4)
+    np.testing.assert_allclose(fit['b'], 0.0, atol=1e-4)
@@ -0,0 +1,149 @@
+import io
+import os
+import sys
+
+import lasio
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'geomind_saas'))
+from las_fast import (
+    LASFormatError,
+    LASStreamParser,
+    iter_las_windows,
+    parse_las_bytes,
+    read_las,
+    read_las_stream,
+)
+
+HEADER = """~VERSION INFORMATION
+ VERS.   2.0 : CWLS LOG ASCII STANDARD
+ WRAP.   {wrap} : ONE LINE PER DEPTH STEP
+~WELL INFORMATION
+ STRT.FT 1000.0 : START DEPTH
+ STOP.FT {stop} : STOP DEPTH
+ STEP.FT 0.5 : STEP
+ NULL.   -999.25 : NULL VALUE
+ WELL.   TEST-1 : WELL
+ FLD .   MELONES : FIELD
+~CURVE INFORMATION
+ DEPT.FT : DEPTH
+ GR  .API : GAMMA RAY
+ RHOB.G/C3 : BULK DENSITY
+~A
+"""
+
+
+def make_las(rows, wrap='NO', stop=1001.5):
+    return HEADER.format(wrap=wrap, stop=stop) + rows
+
+
+PLAIN = make_las("1000.0 50.1 2.45\n1000.5 -999.25 2.40\n1001.0 60 2.3\n1001.5 70 2.2\n")
+NAN_LITERAL = make_las("1000.0 NaN 2.45\n1000.5 -999.25 2.40\n1001.0 nan 2.3\n1001.5 70 2.2\n")
+FORTRAN_D = make_las("1000.0 5.01D+01 2.45\n1000.5 -999.25 2.40\n1001.0 6.0D1 2.3\n1001.5 70 2.2\n")
+WRAPPED = make_las("1000.0\n 50.1 2.45\n1000.5\n -999.25 2.40\n1001.0\n 60 2.3\n1001.5\n 70 2.2\n", wrap='YES')
+NON_NUMERIC = make_las("1000.0 50.1 2.45\n1000.5 abc 2.40\n", stop=1000.5)
+SHORT_ROW = make_las("1000.0 50.1 2.45\n1000.5 -999.25\n1001.0 60 2.3\n")
+
+
+def big_las(n=500, newline='\n'):
+    rng = np.random.default_rng(0)
+    depth = 1000.0 + 0.5 * np.arange(n)
+    gr = np.round(rng.uniform(20, 150, n), 4)
+    gr[::37] = -999.25
+    rhob = np.round(rng.uniform(1.9, 2.8, n), 4)
+    rows = "".join(f"{d:.1f} {g} {r}\n" for d, g, r in zip(depth, gr, rhob))
+    return make_las(rows, stop=depth[-1]).replace('\n', newline)
+
+
+def lasio_read(text):
+    return lasio.read(io.StringIO(text))
+
+
+def assert_same_as_lasio(text):
+    ours, ref = read_las(text.encode()), lasio_read(text)
+    pd.testing.assert_frame_equal(ours.df(), ref.df(), check_dtype=False)
+    assert [c.mnemonic for c in ours.curves] == [c.mnemonic for c in ref.curves]
+    assert [c.unit for c in ours.curves] == [c.unit for c in ref.curves]
+    for mnem in ('STRT', 'STOP', 'NULL', 'WELL', 'FLD'):
+        assert ours.well[mnem].value == ref.well[mnem].value
+
+
+# =============================================================================
+# FAST-PATH (paridad con lasio)
+# =============================================================================
+
+@pytest.mark.parametrize('text', [PLAIN, PLAIN.replace('\n', '\r\n'), NAN_LITERAL, big_las()],
+                         ids=['plain', 'crlf', 'nan-literal', 'big'])
+def test_fast_path_matches_lasio(text):
+    parse_las_bytes(text.encode())  # No requiere respaldo
+    assert_same_as_lasio(text)
+
+
+def test_null_and_nan_literal_become_nan():
+    gr = read_las(NAN_LITERAL.encode())['GR']
+    assert np.isnan(gr[:3]).all() and gr[3] == 70
+
+
+# =============================================================================
+# RESPALDO A LASIO (envueltos, exponente Fortran, malformados)
+# =============================================================================
+
+@pytest.mark.parametrize('text', [WRAPPED, FORTRAN_D, NON_NUMERIC], ids=['wrapped', 'fortran-d', 'non-numeric'])
+def test_unsupported_files_fall_back_to_lasio(text):
+    with pytest.raises(LASFormatError):
+        parse_las_bytes(text.encode())
+    with pytest.raises(LASFormatError):
+        read_las(text.encode(), fallback=False)
+    assert_same_as_lasio(text)
+
+
+def test_short_row_falls_back_and_fails_like_lasio():
+    with pytest.raises(LASFormatError):
+        parse_las_bytes(SHORT_ROW.encode())
+    with pytest.raises(ValueError):
+        lasio_read(SHORT_ROW)
+    with pytest.raises(ValueError):
+        read_las(SHORT_ROW.encode())
+
+
+def test_missing_data_section_is_rejected():
+    with pytest.raises(LASFormatError):
+        parse_las_bytes(PLAIN.split('~A')[0].encode())
+
+
+# =============================================================================
+# INGESTA POR BLOQUES
+# =============================================================================
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 4096])
+@pytest.mark.parametrize('newline', ['\n', '\r\n'], ids=['lf', 'crlf'])
+def test_stream_parser_matches_fast_path(size, newline):
+    content = big_las(newline=newline).encode()
+    parser = LASStreamParser()
+    for chunk in chunked(content, size):
+        parser.feed(chunk)
+    streamed = parser.finish()
+    np.testing.assert_array_equal(streamed.data, parse_las_bytes(content).data)
+    assert streamed.keys() == parse_las_bytes(content).keys()
+
+
+def test_stream_falls_back_for_wrapped_files():
+    content = WRAPPED.encode()
+    with pytest.raises(LASFormatError):
+        read_las_stream(chunked(content, 16))
+    las = read_las_stream(chunked(content, 16), fallback_source=content)
+    pd.testing.assert_frame_equal(las.df(), lasio_read(WRAPPED).df(), check_dtype=False)
+
+
+@pytest.mark.parametrize('window_rows,chunk_size', [(3, 5), (64, 100), (1000, 1 << 20)])
+def test_windows_reassemble_the_file(window_rows, chunk_size):
+    content = big_las().encode()
+    windows = list(iter_las_windows(io.BytesIO(content), window_rows=window_rows, chunk_size=chunk_size))
+    assert all(len(w) <= window_rows for w in windows)
+    pd.testing.assert_frame_equal(pd.concat(windows), read_las(content).df(), check_dtype=False)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'geomind_saas'))
+from petro_sensitivity import run_sensitivity, sample_parameters
+
+
+def _log(n=400):
+    rng = np.random.default_rng(3)
+    depth = 5000 + 0.5 * np.arange(n)
+    rt = 10 ** rng.uniform(0, 2, n)
+    rhob = rng.uniform(2.1, 2.6, n)
+    return depth, rt, rhob
+
+
+def test_null_sample_does_not_poison_hc_column():
+    depth, rt, rhob = _log()
+    params = sample_parameters(200, seed=7)
+    # Un nulo de RHOB nunca es pay: mismo resultado que una muestra sin porosidad
+    null, tight = rhob.copy(), rhob.copy()
+    null[[0, 150, 151, 399]] = np.nan
+    tight[[0, 150, 151, 399]] = 3.5
+    for max_bytes in (4096, 1 << 26):  # varios bloques y uno solo
+        got = run_sensitivity(depth, rt, rhob=null, params=params, max_bytes=max_bytes)
+        ref = run_sensitivity(depth, rt, rhob=tight, params=params, max_bytes=max_bytes)
+        assert np.isfinite(got['hc_column']).all()
+        assert got['hc_column'].max() > 0
+        np.testing.assert_allclose(got['hc_column'], ref['hc_column'], rtol=1e-6)
+        np.testing.assert_allclose(got['net_pay'], ref['net_pay'])
+        assert np.isfinite(got['stats']['hc_column']['P50'])
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import production_module as pm
+
+WELL = dict(tvd=8000, md=8000, tubing_id=2.441, p_wh=200)
+RATES = [0, 50, 100, 250, 500, 1000, 2000, 4000]
+
+# Pwf de calculate_vlp_basic antes de la vectorización (bucle escalar por tasa)
+BASELINE_VLP = [
+    (WELL, [3146.15, 2441.53, 2442.36, 2447.33, 2463.37, 2523.24, 2744.41, 3498.68]),
+    (dict(tvd=6000, md=7500, tubing_id=3.5, p_wh=350, wc=40, gor=1200, api=28, gas_grav=0.8),
+     [2846.75, 1536.99, 1537.19, 1538.39, 1542.25, 1556.76, 1611.62, 1810.85]),
+    (dict(tvd=10000, md=10000, tubing_id=1.995, p_wh=100, wc=90, gor=100),
+     [4641.27, 4641.77, 4642.97, 4650.25, 4674.09, 4765.08, 5121.01, 6556.51]),
+]
+
+
+def _z_scalar(p_psi, t_f, sg_gas):
+    """Hall-Yarborough escalar original (Newton punto a punto), como referencia."""
+    t_r = t_f + 459.67
+    p_pc = 677 + 15.0 * sg_gas - 37.5 * sg_gas**2
+    t_pc = 168 + 325 * sg_gas - 12.5 * sg_gas**2
+    p_pr, t = p_psi / p_pc, t_pc / t_r
+    a = 0.06125 * t * np.exp(-1.2 * (1 - t)**2)
+    b, c = 14.76*t - 9.76*t**2 + 4.58*t**3, 90.7*t - 242.2*t**2 + 42.4*t**3
+    e = 2.18 + 2.82*t
+    y = 0.001
+    for _ in range(20):
+        f = -a*p_pr + (y + y**2 + y**3 - y**4)/(1 - y)**3 - b*y**2 + c*y**e
+        df = (1 + 4*y + 4*y**2 - 4*y**3 + y**4)/(1 - y)**4 - 2*b*y + e*c*y**(e - 1)
+        y_new = y - f/df
+        if abs(y_new - y) < 1e-6:
+            y = y_new
+            break
+        y = y_new
+    return max(0.5, min(a*p_pr/y, 1.5))
+
+
+@pytest.mark.parametrize('t_f', [60, 150, 300])
+@pytest.mark.parametrize('sg_gas', [0.6, 0.8, 1.1])
+def test_z_factor_matches_scalar_newton(t_f, sg_gas):
+    p = np.linspace(50, 8000, 200)
+    with np.errstate(invalid='ignore'):  # El Newton escalar pasa por Y < 0 en gases pesados y fríos
+        expected = [_z_scalar(x, t_f, sg_gas) for x in p]
+    np.testing.assert_allclose(pm.calc_z_factor(p, t_f, sg_gas), expected, rtol=0, atol=1e-8)
+
+
+@pytest.mark.parametrize('well, expected', BASELINE_VLP)
+def test_average_vlp_with_correlations_matches_baseline(well, expected):
+    out = pm.calculate_vlp_basic(q_liquid=RATES, pvt_table=False, **well)
+    assert out['pressures'] == expected
+
+
+@pytest.mark.parametrize('vlp_method', ['average', 'segmented'])
+def test_brent_matches_dense_grid(vlp_method):
+    params = dict(WELL, k=50, h=30, pr=3500, wc=0, gor=500, api=35, gas_grav=0.65,
+                  temp_bh=200, temp_wh=100, vlp_method=vlp_method)
+    q_max = float(pm.vogel_q_max(params['pr'], params['k'], params['h'], 0.0))
+    ipr, vlp = pm.ipr_model(params['pr'], q_max), pm.vlp_model(params)
+    coarse = np.linspace(0, q_max, 50)
+    points, _ = pm.solve_operating_points(ipr, vlp, coarse)
+    op = pm.stable_operating_point(points)
+
+    # Búsqueda exhaustiva: último cambio de signo IPR − VLP sobre una grilla fina
+    dense = np.linspace(0, q_max, 20001)
+    f = ipr(dense) - vlp(dense)
+    last = np.flatnonzero((f[:-1] > 0) & (f[1:] <= 0))[-1]
+    # La marcha por tramos es adaptativa (vlp_tol): su Pwf depende levemente del lote de tasas
+    np.testing.assert_allclose(op['q_op'], dense[last], rtol=1e-3, atol=dense[1])
+
+
+@pytest.mark.parametrize('pvt_table', [True, False])
+def test_vlp_zero_rate_is_static_column(pvt_table):
+    # q = 0 → holdup 0/0: la fila estática no debe contaminar la consulta PVT
+    out = pm.calculate_vlp_basic(q_liquid=[0, 100, 500], pvt_table=pvt_table, **WELL)
+    oil_grav = 141.5 / (131.5 + 35)
+    p_static = WELL['p_wh'] + oil_grav * 62.4 * WELL['tvd'] / 144
+    assert out['pressures'][0] == round(p_static, 2)
+    assert np.isfinite(out['pressures']).all()
+
+
+def test_pvt_lookup_propagates_nan():
+    props = pm.get_pvt_table(35, 0.65).lookup([np.nan, 2000.0], 150.0)
+    for name in pm.PVT_PROPERTIES:
+        assert np.isnan(props[name][0]) and np.isfinite(props[name][1])
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# ==============================================================================
+# DATATERRA - POOL DE PROCESOS PARA ANÁLISIS (CPU-bound fuera del event loop)
+# Configuración por variables de entorno:
+#   DATATERRA_WORKERS       Procesos de cálculo (default: núcleos disponibles)
+#   DATATERRA_QUEUE_DEPTH   Trabajos en espera admitidos además de los activos
+#   DATATERRA_JOB_TIMEOUT   Segundos máximos que el cliente espera un resultado
+# ==============================================================================
+
+
+class PoolSaturated(Exception):
+    """No hay cupo: todos los workers ocupados y la cola llena."""
+
+
+class JobTimeout(Exception):
+    """El trabajo excedió el tiempo máximo de espera."""
+
+
+def _init_worker(blas_threads):
+    # Paralelismo por procesos: limitar hilos BLAS/OpenMP de cada worker para no
+    # sobre-suscribir los núcleos (debe ocurrir antes de importar NumPy).
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(blas_threads))
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class AnalysisWorkerPool:
+    """
+    ProcessPoolExecutor acotado: `workers` en ejecución + `queue_depth` en espera.
+    Un trabajo que vence su timeout libera al cliente, pero su cupo sólo se
+    recupera cuando el proceso realmente termina (no se sobre-suscribe la CPU).
+    """
+
+    def __init__(self, workers=None, queue_depth=None, timeout=None):
+        cpu = os.cpu_count() or 1
+        self.workers = max(1, workers if workers is not None else _env_int("DATATERRA_WORKERS", cpu))
+        self.queue_depth = max(0, queue_depth if queue_depth is not None
+                               else _env_int("DATATERRA_QUEUE_DEPTH", self.workers * 4))
+        self.timeout = timeout if timeout is not None else _env_int("DATATERRA_JOB_TIMEOUT", 300)
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0}
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_depth
+
+    def _get_executor(self):
+        # Creación perezosa: importar el backend no lanza procesos.
+        # 'spawn' evita heredar hilos/locks del servidor ASGI en el fork.
+        if self._executor is None:
+            blas_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(blas_threads,),
+            )
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.counters['rejected'] += 1
+                raise PoolSaturated(
+                    f"Servidor ocupado: {self._in_flight} análisis en curso/cola (máx {self.capacity})"
+                )
+            self._in_flight += 1
+            self.counters['submitted'] += 1
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.counters['failed'] += 1
+            else:
+                self.counters['completed'] += 1
+
+    def submit(self, func, *args, **kwargs):
+        """Envía `func` al pool respetando la cuota; retorna un concurrent Future."""
+        self._acquire()
+        try:
+            future = self._get_executor().submit(func, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """Ejecuta `func(*args)` en un proceso worker y espera el resultado sin bloquear el loop."""
+        future = self.submit(func, *args, **kwargs)
+        limit = timeout if timeout is not None else self.timeout
+        try:
+            # shield: el timeout no cancela el Future del pool (el cupo se libera al terminar)
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), limit)
+        except asyncio.TimeoutError:
+            future.cancel()  # Sólo tiene efecto si aún no empezó
+            with self._lock:
+                self.counters['timed_out'] += 1
+            raise JobTimeout(f"El análisis excedió {limit} s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'timeout_s': self.timeout,
+                'in_flight': self._in_flight,
+                **self.counters,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None